@@ -1,14 +1,24 @@
-from fastapi import Depends, HTTPException, status
+import tempfile
+from typing import AsyncIterator, BinaryIO, Optional
+
+from fastapi import Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import APIKeyHeader
+from video_enrichment_orm.schemas.video import Video
 
+from app.business.analytics import AnalyticsManager
 from app.business.detection import DetectionManager
 from app.business.entity import EntityManager
 from app.business.entity_media_gallery import EntityMediaGalleryManager
 from app.business.healthcheck import HealthcheckManager
+from app.business.ingest import IngestManager
 from app.business.segment_detection import SegmentDetectionManager
 from app.business.taxonomy import TaxonomyManager
 from app.business.video import VideoManager
+from app.business.video_search import VideoSearchManager
 from app.core.config import settings
+from app.schemas.detection import DetectionFilter, TrackFilter
+from app.schemas.segment_detection import SegmentDetectionFilter
 
 
 class ManagerFactory:
@@ -46,6 +56,23 @@ class ManagerFactory:
 
         return VideoManager()
 
+    @staticmethod
+    def for_video_search(
+        token: str = Depends(APIKeyHeader(name=settings.AUTH_HEADER_KEY)),
+    ) -> VideoSearchManager:
+        """
+        Build an instance of VideoSearchManager to inject
+        as a dependency in the endpoints.
+
+        Returns:
+            An instance of VideoSearchManager.
+        """
+
+        if token != settings.AUTH_SECRET_KEY:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+
+        return VideoSearchManager()
+
     @staticmethod
     def for_taxonomy(
         token: str = Depends(APIKeyHeader(name=settings.AUTH_HEADER_KEY)),
@@ -130,3 +157,220 @@ class ManagerFactory:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
 
         return DetectionManager()
+
+    @staticmethod
+    def for_analytics(
+        token: str = Depends(APIKeyHeader(name=settings.AUTH_HEADER_KEY)),
+    ) -> AnalyticsManager:
+        """
+        Build an instance of AnalyticsManager to inject
+        as a dependency in the endpoints.
+
+        Returns:
+            An instance of AnalyticsManager.
+        """
+
+        if token != settings.AUTH_SECRET_KEY:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+
+        return AnalyticsManager()
+
+    @staticmethod
+    def for_ingest(
+        token: str = Depends(APIKeyHeader(name=settings.AUTH_HEADER_KEY)),
+    ) -> IngestManager:
+        """
+        Build an instance of IngestManager to inject
+        as a dependency in the endpoints.
+
+        Returns:
+            An instance of IngestManager.
+        """
+
+        if token != settings.AUTH_SECRET_KEY:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+
+        return IngestManager()
+
+
+class ResourceFactory:
+
+    """
+    A factory class to load the rows addressed by the path of the endpoints.
+    """
+
+    @staticmethod
+    def for_video(video_id: int, manager: VideoManager = Depends(ManagerFactory.for_video)) -> Video:
+        """
+        Load the video of the path to inject as a dependency in the endpoints,
+        responding 404 when it does not exist.
+
+        Returns:
+            The video.
+        """
+
+        return manager.get_video_by_id(video_id=video_id)
+
+
+class FilterFactory:
+
+    """
+    A factory class to build the query filters of the listing endpoints.
+    """
+
+    @staticmethod
+    def for_detection(
+        from_frame: Optional[int] = Query(default=None, ge=0, description="First frame of the window (inclusive)"),
+        to_frame: Optional[int] = Query(default=None, ge=0, description="Last frame of the window (inclusive)"),
+        from_second: Optional[float] = Query(default=None, ge=0, description="Start of the window in seconds"),
+        to_second: Optional[float] = Query(default=None, ge=0, description="End of the window in seconds"),
+        stride: Optional[int] = Query(
+            default=None, ge=1, description="Keep the best detection per segment every `stride` frames"
+        ),
+        target_fps: Optional[float] = Query(
+            default=None, gt=0, description="Keep the best detection per segment at this many frames per second"
+        ),
+        min_detection_score: Optional[float] = Query(default=None, ge=0, le=1, description="Minimum detection score"),
+        min_entity_score: Optional[float] = Query(default=None, ge=0, le=1, description="Minimum entity score"),
+        entity_ids: Optional[list[int]] = Query(default=None, description="Only these entities"),
+        taxonomy_ids: Optional[list[int]] = Query(default=None, description="Only these taxonomies"),
+        region_x_min: Optional[float] = Query(
+            default=None, ge=0, le=1, description="Left edge of the region the boxes must intersect"
+        ),
+        region_y_min: Optional[float] = Query(
+            default=None, ge=0, le=1, description="Top edge of the region the boxes must intersect"
+        ),
+        region_x_max: Optional[float] = Query(
+            default=None, ge=0, le=1, description="Right edge of the region the boxes must intersect"
+        ),
+        region_y_max: Optional[float] = Query(
+            default=None, ge=0, le=1, description="Bottom edge of the region the boxes must intersect"
+        ),
+        min_area: Optional[float] = Query(
+            default=None, ge=0, le=1, description="Minimum area of the boxes as a fraction of the frame"
+        ),
+        max_area: Optional[float] = Query(
+            default=None, ge=0, le=1, description="Maximum area of the boxes as a fraction of the frame"
+        ),
+    ) -> DetectionFilter:
+        """
+        Build the detection filters from the query parameters.
+
+        Returns:
+            An instance of DetectionFilter.
+        """
+
+        return DetectionFilter(
+            from_frame=from_frame,
+            to_frame=to_frame,
+            from_second=from_second,
+            to_second=to_second,
+            stride=stride,
+            target_fps=target_fps,
+            min_detection_score=min_detection_score,
+            min_entity_score=min_entity_score,
+            entity_ids=entity_ids,
+            taxonomy_ids=taxonomy_ids,
+            region_x_min=region_x_min,
+            region_y_min=region_y_min,
+            region_x_max=region_x_max,
+            region_y_max=region_y_max,
+            min_area=min_area,
+            max_area=max_area,
+        )
+
+    @staticmethod
+    def for_track(
+        from_frame: Optional[int] = Query(default=None, ge=0, description="First frame of the window (inclusive)"),
+        to_frame: Optional[int] = Query(default=None, ge=0, description="Last frame of the window (inclusive)"),
+        from_second: Optional[float] = Query(default=None, ge=0, description="Start of the window in seconds"),
+        to_second: Optional[float] = Query(default=None, ge=0, description="End of the window in seconds"),
+        tolerance: float = Query(
+            default=settings.TRACK_TOLERANCE,
+            ge=0,
+            description="Largest deviation, in bounding box units, of a dropped box from the interpolated keyframes",
+        ),
+    ) -> TrackFilter:
+        """
+        Build the track filters from the query parameters.
+
+        Returns:
+            An instance of TrackFilter.
+        """
+
+        return TrackFilter(
+            from_frame=from_frame,
+            to_frame=to_frame,
+            from_second=from_second,
+            to_second=to_second,
+            tolerance=tolerance,
+        )
+
+    @staticmethod
+    def for_segment_detection(
+        from_frame: Optional[int] = Query(default=None, ge=0, description="First frame of the window (inclusive)"),
+        to_frame: Optional[int] = Query(default=None, ge=0, description="Last frame of the window (inclusive)"),
+        from_second: Optional[float] = Query(default=None, ge=0, description="Start of the window in seconds"),
+        to_second: Optional[float] = Query(default=None, ge=0, description="End of the window in seconds"),
+        min_detection_score: Optional[float] = Query(default=None, ge=0, le=1, description="Minimum detection score"),
+        min_entity_score: Optional[float] = Query(default=None, ge=0, le=1, description="Minimum entity score"),
+        entity_ids: Optional[list[int]] = Query(default=None, description="Only these entities"),
+        taxonomy_ids: Optional[list[int]] = Query(default=None, description="Only these taxonomies"),
+        merge_gap_frames: Optional[int] = Query(
+            default=None,
+            ge=0,
+            description="Merge the segments of the same entity and taxonomy separated by at most this many frames",
+        ),
+    ) -> SegmentDetectionFilter:
+        """
+        Build the segment detection filters from the query parameters.
+
+        Returns:
+            An instance of SegmentDetectionFilter.
+        """
+
+        return SegmentDetectionFilter(
+            from_frame=from_frame,
+            to_frame=to_frame,
+            from_second=from_second,
+            to_second=to_second,
+            min_detection_score=min_detection_score,
+            min_entity_score=min_entity_score,
+            entity_ids=entity_ids,
+            taxonomy_ids=taxonomy_ids,
+            merge_gap_frames=merge_gap_frames,
+        )
+
+
+class BodyFactory:
+
+    """
+    A factory class to read the request bodies of the upload endpoints.
+    """
+
+    @staticmethod
+    async def for_ingest(request: Request) -> AsyncIterator[BinaryIO]:
+        """
+        Stream the body of an ingest request into a spool, kept in memory up to INGEST_SPOOL_MEMORY_BYTES
+        and on disk past it, so the batch is never held twice and its size is bounded as it arrives.
+
+        Returns:
+            The spool positioned at the start of the body, closed once the response is sent.
+        """
+
+        spool = tempfile.SpooledTemporaryFile(max_size=settings.INGEST_SPOOL_MEMORY_BYTES)
+        try:
+            size = 0
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > settings.INGEST_MAX_BODY_BYTES:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"The batch is larger than {settings.INGEST_MAX_BODY_BYTES} bytes",
+                    )
+                # Past INGEST_SPOOL_MEMORY_BYTES the spool writes to disk, so the writes run off the event loop
+                await run_in_threadpool(spool.write, chunk)
+            spool.seek(0)
+            yield spool
+        finally:
+            spool.close()
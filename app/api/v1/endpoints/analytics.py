@@ -0,0 +1,60 @@
+from fastapi import APIRouter, Depends, status
+
+from app.api.dependencies import ManagerFactory
+from app.business.analytics import AnalyticsManager
+from app.schemas.analytics import (
+    CoOccurrenceRequest,
+    CoOccurrenceResponse,
+    ScreenTimeRequest,
+    ScreenTimeResponse,
+)
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+
+@router.post(
+    "/screen-time",
+    response_model=ScreenTimeResponse,
+    status_code=status.HTTP_200_OK,
+)
+def get_screen_time(
+    request: ScreenTimeRequest,
+    manager: AnalyticsManager = Depends(ManagerFactory.for_analytics),
+) -> ScreenTimeResponse:
+    """
+    Get the screen time of the entities across a set of videos should respond status OK and 200 HTTP Response Code.
+
+    Args:
+        request(ScreenTimeRequest): The videos, and optionally the entities and the number of entities to report.
+        manager(AnalyticsManager): The manager (domain) with the business logic.
+
+    Returns:
+        (json): the entities ranked by total screen time, with their screen time per video
+    """
+
+    return manager.get_screen_time(request=request)
+
+
+@router.post(
+    "/co-occurrence",
+    response_model=CoOccurrenceResponse,
+    status_code=status.HTTP_200_OK,
+)
+def get_cooccurrence(
+    request: CoOccurrenceRequest,
+    manager: AnalyticsManager = Depends(ManagerFactory.for_analytics),
+) -> CoOccurrenceResponse:
+    """
+    Get the entity co-occurrence matrix of a set of videos, or of the whole catalog, should respond status OK and
+    200 HTTP Response Code.
+
+    Args:
+        request(CoOccurrenceRequest): The videos (the whole catalog when omitted), the entities the pairs must involve
+            and the least frames together of a pair.
+        manager(AnalyticsManager): The manager (domain) with the business logic.
+
+    Returns:
+        (json): the pairs of entities on screen together, ranked by seconds together
+    """
+
+    return manager.get_cooccurrence(request=request)
@@ -1,8 +1,26 @@
-from fastapi import APIRouter, Depends, status
+from typing import BinaryIO
+
+from fastapi import APIRouter, Depends, Request, status
+from fastapi.responses import StreamingResponse
 from video_enrichment_orm.schemas.detection import Detection
+from video_enrichment_orm.schemas.video import Video
 
-from app.api.dependencies import ManagerFactory
+from app.api.dependencies import (
+    BodyFactory,
+    FilterFactory,
+    ManagerFactory,
+    ResourceFactory,
+)
 from app.business.detection import DetectionManager
+from app.business.ingest import IngestManager
+from app.core.ingest import BINARY_CONTENT_TYPE, NDJSON_CONTENT_TYPE
+from app.schemas.detection import (
+    DetectionBatchRequest,
+    DetectionFilter,
+    Track,
+    TrackFilter,
+)
+from app.schemas.ingest import IngestResponse
 
 router = APIRouter(prefix="/detection", tags=["Detection"])
 
@@ -13,21 +31,88 @@ router = APIRouter(prefix="/detection", tags=["Detection"])
     status_code=status.HTTP_200_OK,
 )
 async def get_detections_by_video_id(
-    video_id: int,
+    request: Request,
+    video: Video = Depends(ResourceFactory.for_video),
+    filters: DetectionFilter = Depends(FilterFactory.for_detection),
     manager: DetectionManager = Depends(ManagerFactory.for_detection),
 ) -> list[Detection]:
     """
     Get detections by video ID should respond status OK and 200 HTTP Response Code.
+    Without filters, the detections of a video with a fresh published snapshot are served from it.
 
     Args:
-        video_id(int): The video ID to filter detections.
+        request(Request): The request, whose Accept-Encoding and If-None-Match headers the snapshots honour.
+        video(Video): The video of the path.
+        filters(DetectionFilter): The optional frame (or seconds) window and temporal sampling of the detections.
         manager(DetectionManager): The manager (domain) with the business logic.
 
     Returns:
         (json): list of detections for the video
     """
 
-    return manager.get_detections_by_video_id(video_id=video_id)
+    if not filters.has_filters():
+        snapshot = manager.get_detections_snapshot(
+            video=video,
+            accept_encoding=request.headers.get("accept-encoding"),
+            if_none_match=request.headers.get("if-none-match"),
+        )
+        if snapshot is not None:
+            return snapshot
+
+    return manager.get_detections_by_video_id(video=video, filters=filters)
+
+
+@router.post(
+    "/by-videos",
+    status_code=status.HTTP_200_OK,
+)
+async def get_detections_by_video_ids(
+    request: DetectionBatchRequest,
+    filters: DetectionFilter = Depends(FilterFactory.for_detection),
+    manager: DetectionManager = Depends(ManagerFactory.for_detection),
+) -> StreamingResponse:
+    """
+    Get the detections of several videos should respond status OK and 200 HTTP Response Code.
+    The videos are validated and their detections fetched with one query each, and streamed grouped by video.
+
+    Args:
+        request(DetectionBatchRequest): The videos to fetch the detections of.
+        filters(DetectionFilter): The optional frame (or seconds) window, filters and sampling of every video.
+        manager(DetectionManager): The manager (domain) with the business logic.
+
+    Returns:
+        (ndjson): one line per video with its video_id and its detections
+    """
+
+    return StreamingResponse(
+        manager.get_detections_by_video_ids(request=request, filters=filters), media_type=NDJSON_CONTENT_TYPE
+    )
+
+
+@router.get(
+    "/by-video/{video_id}/tracks",
+    response_model=list[Track],
+    status_code=status.HTTP_200_OK,
+)
+async def get_tracks_by_video_id(
+    video: Video = Depends(ResourceFactory.for_video),
+    filters: TrackFilter = Depends(FilterFactory.for_track),
+    manager: DetectionManager = Depends(ManagerFactory.for_detection),
+) -> list[Track]:
+    """
+    Get the tracks of a video should respond status OK and 200 HTTP Response Code.
+    Every segment detection is returned as keyframes, clients interpolate the boxes linearly between them.
+
+    Args:
+        video(Video): The video of the tracks.
+        filters(TrackFilter): The optional frame (or seconds) window and the interpolation tolerance.
+        manager(DetectionManager): The manager (domain) with the business logic.
+
+    Returns:
+        (json): list of tracks for the video
+    """
+
+    return manager.get_tracks_by_video_id(video=video, filters=filters)
 
 
 @router.get(
@@ -51,3 +136,41 @@ async def get_detections_by_segment_detection_id(
     """
 
     return manager.get_detections_by_segment_detection_id(segment_detection_id=segment_detection_id)
+
+
+@router.post(
+    "/by-video/{video_id}/ingest",
+    response_model=IngestResponse,
+    status_code=status.HTTP_200_OK,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                NDJSON_CONTENT_TYPE: {"schema": {"type": "string"}},
+                BINARY_CONTENT_TYPE: {"schema": {"type": "string", "format": "binary"}},
+            },
+        }
+    },
+)
+def ingest_detections(
+    request: Request,
+    video: Video = Depends(ResourceFactory.for_video),
+    manager: IngestManager = Depends(ManagerFactory.for_ingest),
+    body: BinaryIO = Depends(BodyFactory.for_ingest),
+) -> IngestResponse:
+    """
+    Ingest detections of a video should respond status OK and 200 HTTP Response Code.
+    The body is either NDJSON, one object per row, or packed DETECTION_DTYPE records.
+
+    Args:
+        request(Request): The request with the content type of the batch.
+        video(Video): The video the detections belong to.
+        manager(IngestManager): The manager (domain) with the business logic.
+        body(BinaryIO): The batch of rows, streamed into a spool.
+
+    Returns:
+        (json): the number of loaded rows
+    """
+
+    # A plain function, so the parsing, the validation and the COPY run in the threadpool
+    return manager.ingest_detections(video=video, body=body, content_type=request.headers.get("content-type", ""))
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, Response, status
 from video_enrichment_orm.schemas.entity import Entity, EntityCreate, EntityUpdate
 
 from app.api.dependencies import ManagerFactory
 from app.business.entity import EntityManager
+from app.schemas.batch import BatchLookupRequest, BatchLookupResponse, BulkResponse
+from app.schemas.entity import EntityBulkCreateRequest
 
 router = APIRouter(prefix="/entity", tags=["Entity"])
 
@@ -14,7 +16,7 @@ router = APIRouter(prefix="/entity", tags=["Entity"])
 )
 async def get_all_entities(
     manager: EntityManager = Depends(ManagerFactory.for_entity),
-) -> list[Entity]:
+) -> Response:
     """
     Get all enabled entities should respond status OK and 200 HTTP Response Code.
 
@@ -36,7 +38,7 @@ async def get_all_entities(
 async def get_entity_by_uuid(
     entity_uuid: str,
     manager: EntityManager = Depends(ManagerFactory.for_entity),
-) -> Entity:
+) -> Response:
     """
     Get entity by uuid should respond status OK and 200 HTTP Response Code.
 
@@ -48,7 +50,7 @@ async def get_entity_by_uuid(
         (json): Entity
     """
 
-    return manager.get_entity_by_uuid(entity_uuid=entity_uuid)
+    return manager.get_entity_response_by_uuid(entity_uuid=entity_uuid)
 
 
 @router.get(
@@ -58,20 +60,68 @@ async def get_entity_by_uuid(
 )
 async def get_entities_by_taxonomy_id(
     taxonomy_id: int,
+    include_descendants: bool = Query(default=False),
     manager: EntityManager = Depends(ManagerFactory.for_entity),
-) -> list[Entity]:
+) -> Response:
     """
     Get enabled entities by taxonomy id should respond status OK and 200 HTTP Response Code.
 
     Args:
         taxonomy_id(int): The taxonomy id to filter entities.
+        include_descendants(bool): Whether to include the entities of all the descendant taxonomies.
         manager(EntityManager): The manager (domain) with the business logic.
 
     Returns:
         (json): list of enabled entities for the taxonomy
     """
 
-    return manager.get_entities_by_taxonomy_id(taxonomy_id=taxonomy_id)
+    return manager.get_entities_by_taxonomy_id(taxonomy_id=taxonomy_id, include_descendants=include_descendants)
+
+
+@router.post(
+    "/batch",
+    response_model=BatchLookupResponse[Entity],
+    status_code=status.HTTP_200_OK,
+)
+async def get_entities_batch(
+    request: BatchLookupRequest,
+    manager: EntityManager = Depends(ManagerFactory.for_entity),
+) -> BatchLookupResponse[Entity]:
+    """
+    Get entities by ids or uuids should respond status OK and 200 HTTP Response Code.
+
+    Args:
+        request(BatchLookupRequest): The ids or uuids to look up.
+        manager(EntityManager): The manager (domain) with the business logic.
+
+    Returns:
+        (json): entities found, in the order of the request, and the keys not found
+    """
+
+    return manager.get_entities_batch(request)
+
+
+@router.post(
+    "/bulk",
+    response_model=BulkResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def save_entities_bulk(
+    request: EntityBulkCreateRequest,
+    manager: EntityManager = Depends(ManagerFactory.for_entity),
+) -> BulkResponse:
+    """
+    Create entities in bulk should respond status OK and 200 HTTP Response Code.
+
+    Args:
+        request(EntityBulkCreateRequest): The entities to create.
+        manager(EntityManager): The manager (domain) with the business logic.
+
+    Returns:
+        (json): counts and outcome of every item, in the order of the request
+    """
+
+    return manager.save_entities_bulk(request)
 
 
 @router.post(
@@ -1,14 +1,25 @@
 import base64
 import mimetypes
 
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    Form,
+    HTTPException,
+    Response,
+    UploadFile,
+    status,
+)
 from fastapi.responses import StreamingResponse
 
 from app.api.dependencies import ManagerFactory
 from app.business.entity_media_gallery import EntityMediaGalleryManager
 from app.managers.aws.s3 import s3_manager
+from app.schemas.batch import BatchLookupRequest, BatchLookupResponse, BulkResponse
 from app.schemas.entity_media_gallery import (
     EntityMediaGallery,
+    EntityMediaGalleryBulkEnableRequest,
     EntityMediaGalleryUpdate,
 )
 
@@ -22,7 +33,7 @@ router = APIRouter(prefix="/entity-media-gallery", tags=["Entity Media Gallery"]
 )
 async def get_all_entity_media_galleries(
     manager: EntityMediaGalleryManager = Depends(ManagerFactory.for_entity_media_gallery),
-) -> list[EntityMediaGallery]:
+) -> Response:
     """
     Get all enabled entity media galleries should respond status OK and 200 HTTP Response Code.
 
@@ -44,7 +55,7 @@ async def get_all_entity_media_galleries(
 async def get_entity_media_gallery_by_uuid(
     media_gallery_uuid: str,
     manager: EntityMediaGalleryManager = Depends(ManagerFactory.for_entity_media_gallery),
-) -> EntityMediaGallery:
+) -> Response:
     """
     Get entity media gallery by uuid should respond status OK and 200 HTTP Response Code.
 
@@ -67,7 +78,7 @@ async def get_entity_media_gallery_by_uuid(
 async def get_entity_media_galleries_by_entity_id(
     entity_id: int,
     manager: EntityMediaGalleryManager = Depends(ManagerFactory.for_entity_media_gallery),
-) -> list[EntityMediaGallery]:
+) -> Response:
     """
     Get enabled entity media galleries by entity id should respond status OK and 200 HTTP Response Code.
 
@@ -82,6 +93,29 @@ async def get_entity_media_galleries_by_entity_id(
     return manager.get_entity_media_galleries_by_entity_id(entity_id=entity_id)
 
 
+@router.post(
+    "/batch",
+    response_model=BatchLookupResponse[EntityMediaGallery],
+    status_code=status.HTTP_200_OK,
+)
+async def get_entity_media_galleries_batch(
+    request: BatchLookupRequest,
+    manager: EntityMediaGalleryManager = Depends(ManagerFactory.for_entity_media_gallery),
+) -> BatchLookupResponse[EntityMediaGallery]:
+    """
+    Get entity media galleries by ids or uuids should respond status OK and 200 HTTP Response Code.
+
+    Args:
+        request(BatchLookupRequest): The ids or uuids to look up.
+        manager(EntityMediaGalleryManager): The manager (domain) with the business logic.
+
+    Returns:
+        (json): entity media galleries found, in the order of the request, and the keys not found
+    """
+
+    return manager.get_entity_media_galleries_batch(request)
+
+
 @router.post(
     "",
     response_model=EntityMediaGallery,
@@ -98,6 +132,29 @@ async def save_entity_media_gallery(
     return manager.save_entity_media_gallery_with_file(entity_id, file)
 
 
+@router.put(
+    "/bulk/enabled",
+    response_model=BulkResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def set_entity_media_galleries_enabled(
+    request: EntityMediaGalleryBulkEnableRequest,
+    manager: EntityMediaGalleryManager = Depends(ManagerFactory.for_entity_media_gallery),
+) -> BulkResponse:
+    """
+    Enable or disable entity media galleries in bulk should respond status OK and 200 HTTP Response Code.
+
+    Args:
+        request(EntityMediaGalleryBulkEnableRequest): The uuids of the entity media galleries and whether to enable them.
+        manager(EntityMediaGalleryManager): The manager (domain) with the business logic.
+
+    Returns:
+        (json): counts and outcome of every item, in the order of the request
+    """
+
+    return manager.set_entity_media_galleries_enabled(request)
+
+
 @router.put(
     "/{media_gallery_uuid}",
     response_model=EntityMediaGallery,
@@ -1,8 +1,23 @@
-from fastapi import APIRouter, Depends, status
+from typing import BinaryIO
+
+from fastapi import APIRouter, Depends, Query, Request, status
 from video_enrichment_orm.schemas.segment_detection import SegmentDetection
+from video_enrichment_orm.schemas.video import Video
 
-from app.api.dependencies import ManagerFactory
+from app.api.dependencies import (
+    BodyFactory,
+    FilterFactory,
+    ManagerFactory,
+    ResourceFactory,
+)
+from app.business.ingest import IngestManager
 from app.business.segment_detection import SegmentDetectionManager
+from app.core.ingest import BINARY_CONTENT_TYPE, NDJSON_CONTENT_TYPE
+from app.schemas.ingest import IngestResponse
+from app.schemas.segment_detection import (
+    SegmentCompactionResponse,
+    SegmentDetectionFilter,
+)
 
 router = APIRouter(prefix="/segment-detection", tags=["Segment Detection"])
 
@@ -13,21 +28,35 @@ router = APIRouter(prefix="/segment-detection", tags=["Segment Detection"])
     status_code=status.HTTP_200_OK,
 )
 async def get_segment_detections_by_video_id(
-    video_id: int,
+    request: Request,
+    video: Video = Depends(ResourceFactory.for_video),
+    filters: SegmentDetectionFilter = Depends(FilterFactory.for_segment_detection),
     manager: SegmentDetectionManager = Depends(ManagerFactory.for_segment_detection),
 ) -> list[SegmentDetection]:
     """
     Get segment detections by video ID should respond status OK and 200 HTTP Response Code.
+    Without filters, the segment detections of a video with a fresh published snapshot are served from it.
 
     Args:
-        video_id(int): The video ID to filter segment detections.
+        request(Request): The request, whose Accept-Encoding and If-None-Match headers the snapshots honour.
+        video(Video): The video of the path.
+        filters(SegmentDetectionFilter): The optional frame (or seconds) window the segments must overlap.
         manager(SegmentDetectionManager): The manager (domain) with the business logic.
 
     Returns:
         (json): list of segment detections for the video
     """
 
-    return manager.get_segment_detections_by_video_id(video_id=video_id)
+    if not filters.has_filters() and filters.merge_gap_frames is None:
+        snapshot = manager.get_segment_detections_snapshot(
+            video=video,
+            accept_encoding=request.headers.get("accept-encoding"),
+            if_none_match=request.headers.get("if-none-match"),
+        )
+        if snapshot is not None:
+            return snapshot
+
+    return manager.get_segment_detections_by_video_id(video=video, filters=filters)
 
 
 @router.get(
@@ -36,20 +65,92 @@ async def get_segment_detections_by_video_id(
     status_code=status.HTTP_200_OK,
 )
 async def get_segment_detections_by_video_and_taxonomy(
-    video_id: int,
     taxonomy_id: int,
+    video: Video = Depends(ResourceFactory.for_video),
+    include_descendants: bool = Query(default=False),
+    filters: SegmentDetectionFilter = Depends(FilterFactory.for_segment_detection),
     manager: SegmentDetectionManager = Depends(ManagerFactory.for_segment_detection),
 ) -> list[SegmentDetection]:
     """
     Get segment detections by video ID and taxonomy ID should respond status OK and 200 HTTP Response Code.
 
     Args:
-        video_id(int): The video ID to filter segment detections.
         taxonomy_id(int): The taxonomy ID to filter segment detections.
+        video(Video): The video of the path.
+        include_descendants(bool): Whether to include the segments of all the descendant taxonomies.
+        filters(SegmentDetectionFilter): The optional frame (or seconds) window the segments must overlap.
         manager(SegmentDetectionManager): The manager (domain) with the business logic.
 
     Returns:
         (json): list of segment detections for the video and taxonomy
     """
 
-    return manager.get_segment_detections_by_video_and_taxonomy(video_id=video_id, taxonomy_id=taxonomy_id)
+    return manager.get_segment_detections_by_video_and_taxonomy(
+        video=video, taxonomy_id=taxonomy_id, filters=filters, include_descendants=include_descendants
+    )
+
+
+@router.post(
+    "/by-video/{video_id}/ingest",
+    response_model=IngestResponse,
+    status_code=status.HTTP_200_OK,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                NDJSON_CONTENT_TYPE: {"schema": {"type": "string"}},
+                BINARY_CONTENT_TYPE: {"schema": {"type": "string", "format": "binary"}},
+            },
+        }
+    },
+)
+def ingest_segment_detections(
+    request: Request,
+    video: Video = Depends(ResourceFactory.for_video),
+    manager: IngestManager = Depends(ManagerFactory.for_ingest),
+    body: BinaryIO = Depends(BodyFactory.for_ingest),
+) -> IngestResponse:
+    """
+    Ingest segment detections of a video should respond status OK and 200 HTTP Response Code.
+    The body is either NDJSON, one object per row, or packed SEGMENT_DETECTION_DTYPE records.
+
+    Args:
+        request(Request): The request with the content type of the batch.
+        video(Video): The video the segment detections belong to.
+        manager(IngestManager): The manager (domain) with the business logic.
+        body(BinaryIO): The batch of rows, streamed into a spool.
+
+    Returns:
+        (json): the number of loaded rows
+    """
+
+    # A plain function, so the parsing, the validation and the COPY run in the threadpool
+    return manager.ingest_segment_detections(
+        video=video, body=body, content_type=request.headers.get("content-type", "")
+    )
+
+
+@router.post(
+    "/by-video/{video_id}/compact",
+    response_model=SegmentCompactionResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def compact_segment_detections(
+    video: Video = Depends(ResourceFactory.for_video),
+    merge_gap_frames: int = Query(ge=0, description="Merge the fragments separated by at most this many frames"),
+    manager: SegmentDetectionManager = Depends(ManagerFactory.for_segment_detection),
+) -> SegmentCompactionResponse:
+    """
+    Compact the fragmented segment detections of a video should respond status OK and 200 HTTP Response Code.
+
+    Args:
+        video(Video): The video to compact.
+        merge_gap_frames(int): The largest number of frames between two fragments of the same entity and taxonomy
+            that are merged.
+        manager(SegmentDetectionManager): The manager (domain) with the business logic.
+
+    Returns:
+        (json): the number of segment detections of the video before and after the compaction
+    """
+
+    return manager.compact_segment_detections(video=video, merge_gap_frames=merge_gap_frames)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Response, status
 from video_enrichment_orm.schemas.taxonomy import (
     Taxonomy,
     TaxonomyCreate,
@@ -7,6 +7,8 @@ from video_enrichment_orm.schemas.taxonomy import (
 
 from app.api.dependencies import ManagerFactory
 from app.business.taxonomy import TaxonomyManager
+from app.schemas.batch import BatchLookupRequest, BatchLookupResponse, BulkResponse
+from app.schemas.taxonomy import TaxonomyBulkCreateRequest, TaxonomyNode
 
 router = APIRouter(prefix="/taxonomy", tags=["Taxonomy"])
 
@@ -18,7 +20,7 @@ router = APIRouter(prefix="/taxonomy", tags=["Taxonomy"])
 )
 async def get_all_taxonomies(
     manager: TaxonomyManager = Depends(ManagerFactory.for_taxonomy),
-) -> list[Taxonomy]:
+) -> Response:
     """
     Get all taxonomies should respond status OK and 200 HTTP Response Code.
 
@@ -32,6 +34,73 @@ async def get_all_taxonomies(
     return manager.get_all_taxonomies()
 
 
+@router.get(
+    "/tree",
+    response_model=list[TaxonomyNode],
+    status_code=status.HTTP_200_OK,
+)
+async def get_taxonomy_tree(
+    manager: TaxonomyManager = Depends(ManagerFactory.for_taxonomy),
+) -> list[TaxonomyNode]:
+    """
+    Get the taxonomy tree should respond status OK and 200 HTTP Response Code.
+
+    Args:
+        manager(TaxonomyManager): The manager (domain) with the business logic.
+
+    Returns:
+        (json): list of root taxonomies with their descendants nested
+    """
+
+    return manager.get_taxonomy_tree()
+
+
+@router.get(
+    "/{taxonomy_uuid}/subtree",
+    response_model=TaxonomyNode,
+    status_code=status.HTTP_200_OK,
+)
+async def get_taxonomy_subtree(
+    taxonomy_uuid: str,
+    manager: TaxonomyManager = Depends(ManagerFactory.for_taxonomy),
+) -> TaxonomyNode:
+    """
+    Get the subtree of a taxonomy should respond status OK and 200 HTTP Response Code.
+
+    Args:
+        taxonomy_uuid(str): The uuid of the taxonomy.
+        manager(TaxonomyManager): The manager (domain) with the business logic.
+
+    Returns:
+        (json): Taxonomy with its descendants nested
+    """
+
+    return manager.get_taxonomy_subtree(taxonomy_uuid=taxonomy_uuid)
+
+
+@router.get(
+    "/{taxonomy_uuid}/ancestors",
+    response_model=list[Taxonomy],
+    status_code=status.HTTP_200_OK,
+)
+async def get_taxonomy_ancestors(
+    taxonomy_uuid: str,
+    manager: TaxonomyManager = Depends(ManagerFactory.for_taxonomy),
+) -> list[Taxonomy]:
+    """
+    Get the ancestors of a taxonomy should respond status OK and 200 HTTP Response Code.
+
+    Args:
+        taxonomy_uuid(str): The uuid of the taxonomy.
+        manager(TaxonomyManager): The manager (domain) with the business logic.
+
+    Returns:
+        (json): list of taxonomies from the root down to the parent
+    """
+
+    return manager.get_taxonomy_ancestors(taxonomy_uuid=taxonomy_uuid)
+
+
 @router.get(
     "/{taxonomy_uuid}",
     response_model=Taxonomy,
@@ -40,7 +109,7 @@ async def get_all_taxonomies(
 async def get_taxonomy_by_uuid(
     taxonomy_uuid: str,
     manager: TaxonomyManager = Depends(ManagerFactory.for_taxonomy),
-) -> Taxonomy:
+) -> Response:
     """
     Get taxonomy by uuid should respond status OK and 200 HTTP Response Code.
 
@@ -52,7 +121,53 @@ async def get_taxonomy_by_uuid(
         (json): Taxonomy
     """
 
-    return manager.get_taxonomy_by_uuid(taxonomy_uuid=taxonomy_uuid)
+    return manager.get_taxonomy_response_by_uuid(taxonomy_uuid=taxonomy_uuid)
+
+
+@router.post(
+    "/batch",
+    response_model=BatchLookupResponse[Taxonomy],
+    status_code=status.HTTP_200_OK,
+)
+async def get_taxonomies_batch(
+    request: BatchLookupRequest,
+    manager: TaxonomyManager = Depends(ManagerFactory.for_taxonomy),
+) -> BatchLookupResponse[Taxonomy]:
+    """
+    Get taxonomies by ids or uuids should respond status OK and 200 HTTP Response Code.
+
+    Args:
+        request(BatchLookupRequest): The ids or uuids to look up.
+        manager(TaxonomyManager): The manager (domain) with the business logic.
+
+    Returns:
+        (json): taxonomies found, in the order of the request, and the keys not found
+    """
+
+    return manager.get_taxonomies_batch(request)
+
+
+@router.post(
+    "/bulk",
+    response_model=BulkResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def save_taxonomies_bulk(
+    request: TaxonomyBulkCreateRequest,
+    manager: TaxonomyManager = Depends(ManagerFactory.for_taxonomy),
+) -> BulkResponse:
+    """
+    Create taxonomies in bulk should respond status OK and 200 HTTP Response Code.
+
+    Args:
+        request(TaxonomyBulkCreateRequest): The taxonomies to create.
+        manager(TaxonomyManager): The manager (domain) with the business logic.
+
+    Returns:
+        (json): counts and outcome of every item, in the order of the request
+    """
+
+    return manager.save_taxonomies_bulk(request)
 
 
 @router.post(
@@ -1,12 +1,23 @@
 import io
+from typing import Optional, Union
 
-from fastapi import APIRouter, Depends, File, Form, UploadFile, status
+from fastapi import APIRouter, Depends, File, Form, Query, Response, UploadFile, status
 from fastapi.responses import StreamingResponse
 from video_enrichment_orm.schemas.video import Video
 
 from app.api.dependencies import ManagerFactory
 from app.business.video import VideoManager
-from app.schemas.video import EntityIdsRequest
+from app.business.video_search import VideoSearchManager
+from app.schemas.batch import BatchLookupRequest, BatchLookupResponse
+from app.schemas.snapshot import SnapshotManifest
+from app.schemas.video import (
+    EntityIdsRequest,
+    VideoDetail,
+    VideoFacetRequest,
+    VideoFacetResponse,
+    VideoSearchRequest,
+    VideoTimeline,
+)
 
 router = APIRouter(prefix="/video", tags=["Video"])
 
@@ -18,7 +29,7 @@ router = APIRouter(prefix="/video", tags=["Video"])
 )
 async def get_all_videos(
     manager: VideoManager = Depends(ManagerFactory.for_video),
-) -> list[Video]:
+) -> Response:
     """
     Get all videos should respond status OK and 200 HTTP Response Code.
 
@@ -32,6 +43,29 @@ async def get_all_videos(
     return manager.get_all_videos()
 
 
+@router.post(
+    "/batch",
+    response_model=BatchLookupResponse[Video],
+    status_code=status.HTTP_200_OK,
+)
+async def get_videos_batch(
+    request: BatchLookupRequest,
+    manager: VideoManager = Depends(ManagerFactory.for_video),
+) -> BatchLookupResponse[Video]:
+    """
+    Get videos by ids or uuids should respond status OK and 200 HTTP Response Code.
+
+    Args:
+        request(BatchLookupRequest): The ids or uuids to look up.
+        manager(VideoManager): The manager (domain) with the business logic.
+
+    Returns:
+        (json): videos found, in the order of the request, and the keys not found
+    """
+
+    return manager.get_videos_batch(request)
+
+
 @router.post(
     "/by-entities",
     response_model=list[Video],
@@ -45,36 +79,87 @@ async def get_videos_by_entity_ids(
     Get videos by entity IDs should respond status OK and 200 HTTP Response Code.
 
     Args:
-        request(EntityIdsRequest): Request containing list of entity IDs to filter by.
+        request(EntityIdsRequest): Request containing list of entity IDs to filter by and the page to return.
         manager(VideoManager): The manager (domain) with the business logic.
 
     Returns:
-        (json): list of videos that contain detections of the specified entities
+        (json): page of the videos that contain detections of the specified entities
     """
-    return manager.get_videos_by_entity_ids(request.entity_ids)
+    return manager.get_videos_by_entity_ids(request.entity_ids, offset=request.offset, limit=request.limit)
+
+
+@router.post(
+    "/search",
+    response_model=list[Video],
+    status_code=status.HTTP_200_OK,
+)
+async def search_videos(
+    request: VideoSearchRequest,
+    manager: VideoSearchManager = Depends(ManagerFactory.for_video_search),
+) -> list[Video]:
+    """
+    Search videos by boolean and co-occurrence constraints should respond status OK and 200 HTTP Response Code.
+
+    Args:
+        request(VideoSearchRequest): The AND/OR/NOT entity and taxonomy terms, the co-occurrences and the page.
+        manager(VideoSearchManager): The manager (domain) with the business logic.
+
+    Returns:
+        (json): page of the videos matching the search
+    """
+    return manager.search_videos(request)
+
+
+@router.post(
+    "/facets",
+    response_model=VideoFacetResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def search_video_facets(
+    request: VideoFacetRequest,
+    manager: VideoSearchManager = Depends(ManagerFactory.for_video_search),
+) -> VideoFacetResponse:
+    """
+    Faceted search of videos should respond status OK and 200 HTTP Response Code.
+
+    Args:
+        request(VideoFacetRequest): The entity, taxonomy, extension and date filters, the facet size and the page.
+        manager(VideoSearchManager): The manager (domain) with the business logic.
+
+    Returns:
+        (json): total of matching videos, page of the videos and the counts of every facet
+    """
+    return manager.search_video_facets(request)
 
 
 @router.get(
     "/{video_uuid}",
-    response_model=Video,
+    response_model=Union[VideoDetail, Video],
     status_code=status.HTTP_200_OK,
 )
 async def get_video_by_uuid(
     video_uuid: str,
+    expand: Optional[str] = Query(
+        default=None, description="Comma separated related data to embed: segments, detections, entities, taxonomies"
+    ),
     manager: VideoManager = Depends(ManagerFactory.for_video),
-) -> Video:
+) -> Response:
     """
     Get video by id should respond status OK and 200 HTTP Response Code.
 
     Args:
         video_uuid(str): The uuid of the video.
+        expand(str): Comma separated related data to embed in the video.
         manager(VideoManager): The manager (domain) with the business logic.
 
     Returns:
-        (json): Video
+        (json): Video, with the expanded related data when expand is given
     """
 
-    return manager.get_video_by_uuid(video_uuid=video_uuid)
+    if expand:
+        return manager.get_video_detail(video_uuid=video_uuid, expand=expand)
+
+    return manager.get_video_response_by_uuid(video_uuid=video_uuid)
 
 
 @router.get(
@@ -104,6 +189,60 @@ async def get_video_thumbnail(
     )
 
 
+@router.get(
+    "/{video_uuid}/timeline",
+    response_model=VideoTimeline,
+    status_code=status.HTTP_200_OK,
+)
+async def get_video_timeline(
+    video_uuid: str,
+    bin_seconds: int = Query(default=1, ge=1, description="Seconds aggregated in every bin of the timeline"),
+    entity_ids: Optional[list[int]] = Query(default=None, description="Only these entities"),
+    taxonomy_ids: Optional[list[int]] = Query(default=None, description="Only these taxonomies"),
+    manager: VideoManager = Depends(ManagerFactory.for_video),
+) -> VideoTimeline:
+    """
+    Get the presence timeline of a video should respond status OK and 200 HTTP Response Code.
+
+    Args:
+        video_uuid(str): The uuid of the video.
+        bin_seconds(int): The seconds aggregated in every bin.
+        entity_ids(list): Only the presence of these entities.
+        taxonomy_ids(list): Only the presence of these taxonomies.
+        manager(VideoManager): The manager (domain) with the business logic.
+
+    Returns:
+        (json): the frames on screen per bin of every entity and taxonomy of the video
+    """
+
+    return manager.get_video_timeline(
+        video_uuid=video_uuid, bin_seconds=bin_seconds, entity_ids=entity_ids, taxonomy_ids=taxonomy_ids
+    )
+
+
+@router.post(
+    "/{video_uuid}/snapshot",
+    response_model=SnapshotManifest,
+    status_code=status.HTTP_200_OK,
+)
+async def publish_video_snapshot(
+    video_uuid: str,
+    manager: VideoManager = Depends(ManagerFactory.for_video),
+) -> SnapshotManifest:
+    """
+    Publish the detection snapshot of a video should respond status OK and 200 HTTP Response Code.
+
+    Args:
+        video_uuid(str): The uuid of the video.
+        manager(VideoManager): The manager (domain) with the business logic.
+
+    Returns:
+        (json): the manifest of the published snapshot
+    """
+
+    return manager.publish_video_snapshot(video_uuid=video_uuid)
+
+
 @router.get(
     "/{video_uuid}/bytes",
     status_code=status.HTTP_200_OK,
@@ -0,0 +1,207 @@
+import heapq
+from typing import Iterable, Iterator
+
+import numpy as np
+from fastapi import HTTPException, status
+from video_enrichment_orm.schemas.video import Video
+
+from app.core.config import settings
+from app.managers.db.segment_detection import segment_detection_query_manager
+from app.managers.db.video import video_query_manager
+from app.managers.index.analytics import PairTotals, analytics_index_manager
+from app.managers.index.detection import IntervalIndex
+from app.schemas.analytics import (
+    CoOccurrenceRequest,
+    CoOccurrenceResponse,
+    EntityPair,
+    EntityScreenTime,
+    ScreenTimeRequest,
+    ScreenTimeResponse,
+    VideoScreenTime,
+)
+
+
+class AnalyticsManager:
+    def __init__(self) -> None:
+        self._segment_detection_query = segment_detection_query_manager
+        self._video_query = video_query_manager
+        self._analytics_index = analytics_index_manager
+
+    def get_screen_time(self, request: ScreenTimeRequest) -> ScreenTimeResponse:
+        """
+        Rank the entities by the time they are on screen across the requested videos.
+        The frames on screen of every entity are computed once per video, unioning its segment detections, and
+        cached along with the interval index of the video (the indexes not cached are loaded with one query); they
+        are converted to seconds with the frame rate of each video and summed per entity with numpy. Only the top_k
+        entities are picked, through a heap.
+
+        Args:
+            request: The videos, and optionally the entities and the number of entities to report
+
+        Returns:
+            The entities ranked by total seconds on screen, with their screen time in every video
+        """
+
+        videos = self._get_videos(list(dict.fromkeys(request.video_ids)))
+
+        entity_ids, video_ids, frames, seconds = [], [], [], []
+        for video, interval_index in self._get_interval_indexes(videos):
+            video_entity_ids, video_frames = interval_index.screen_frames()
+            entity_ids.append(video_entity_ids)
+            video_ids.append(np.full(len(video_entity_ids), video.id, dtype=np.int64))
+            frames.append(video_frames)
+            seconds.append(video_frames / video.frame_rate)
+
+        entity_ids, video_ids = np.concatenate(entity_ids), np.concatenate(video_ids)
+        frames, seconds = np.concatenate(frames), np.concatenate(seconds)
+        if request.entity_ids is not None:
+            keep = np.isin(entity_ids, request.entity_ids)
+            entity_ids, video_ids, frames, seconds = entity_ids[keep], video_ids[keep], frames[keep], seconds[keep]
+
+        unique_entity_ids, inverse = np.unique(entity_ids, return_inverse=True)
+        total_frames = np.bincount(inverse, weights=frames, minlength=len(unique_entity_ids))
+        total_seconds = np.bincount(inverse, weights=seconds, minlength=len(unique_entity_ids))
+
+        # Longest screen time first, ties by entity id
+        candidates = zip(total_seconds.tolist(), (-unique_entity_ids).tolist(), range(len(unique_entity_ids)))
+        if request.top_k is None:
+            ranking = sorted(candidates, reverse=True)
+        else:
+            ranking = heapq.nlargest(request.top_k, candidates)
+
+        # The rows of every entity are contiguous once ordered by entity
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.searchsorted(inverse[order], np.arange(len(unique_entity_ids) + 1))
+        return ScreenTimeResponse(
+            entities=[
+                EntityScreenTime(
+                    entity_id=int(unique_entity_ids[position]),
+                    frames=int(total_frames[position]),
+                    seconds=total_seconds[position],
+                    videos=[
+                        VideoScreenTime(video_id=int(video_ids[row]), frames=int(frames[row]), seconds=seconds[row])
+                        for row in order[bounds[position] : bounds[position + 1]]
+                    ],
+                )
+                for _, _, position in ranking
+            ]
+        )
+
+    def get_cooccurrence(self, request: CoOccurrenceRequest) -> CoOccurrenceResponse:
+        """
+        Measure how long every pair of entities is on screen together, in the requested videos or in the whole
+        catalog (the videos without a frame rate are left out of it).
+        The overlaps of a video are swept once over its unioned segment intervals and cached along with its interval
+        index; the pairs of all the videos are then summed with numpy. The totals of the whole catalog are cached
+        until a video or its segment detections change, and its interval indexes are not.
+
+        Args:
+            request: The videos, the entities the pairs must involve and the least frames together of a pair
+
+        Returns:
+            The pairs of entities on screen together, ranked by total seconds together
+        """
+
+        if request.video_ids is None:
+            totals = self._analytics_index.get_catalog_totals(loader=self._load_catalog_totals)
+        else:
+            videos = self._get_videos(list(dict.fromkeys(request.video_ids)))
+            totals = self._sum_pairs(len(videos), self._get_interval_indexes(videos))
+
+        if not totals.videos:
+            return CoOccurrenceResponse(videos=0, pairs=[])
+
+        pairs, frames, seconds, video_counts = totals.pairs, totals.frames, totals.seconds, totals.video_counts
+        keep = frames >= request.min_frames
+        if request.entity_ids is not None:
+            keep &= np.isin(pairs[:, 0], request.entity_ids) | np.isin(pairs[:, 1], request.entity_ids)
+
+        # Longest time together first, ties by entity ids
+        positions = np.flatnonzero(keep)
+        positions = positions[np.lexsort((pairs[positions, 1], pairs[positions, 0], -seconds[positions]))]
+        return CoOccurrenceResponse(
+            videos=totals.videos,
+            pairs=[
+                EntityPair(
+                    entity_id=int(pairs[position, 0]),
+                    other_entity_id=int(pairs[position, 1]),
+                    frames=int(frames[position]),
+                    seconds=seconds[position],
+                    videos=int(video_counts[position]),
+                )
+                for position in positions.tolist()
+            ],
+        )
+
+    def _load_catalog_totals(self) -> PairTotals:
+        videos = self._video_query.get_videos_with_frame_rate()
+        return self._sum_pairs(len(videos), self._iter_interval_indexes(videos))
+
+    @staticmethod
+    def _sum_pairs(videos: int, interval_indexes: Iterable[tuple[Video, IntervalIndex]]) -> PairTotals:
+        """
+        Sum the time on screen together of every pair of entities over the interval indexes of the videos.
+        """
+
+        entity_ids, other_entity_ids, frames, seconds = [], [], [], []
+        for video, interval_index in interval_indexes:
+            video_entity_ids, video_other_entity_ids, video_frames = interval_index.cooccurrence_frames()
+            entity_ids.append(video_entity_ids)
+            other_entity_ids.append(video_other_entity_ids)
+            frames.append(video_frames)
+            seconds.append(video_frames / video.frame_rate)
+
+        if not videos:
+            empty = np.empty(0, dtype=np.int64)
+            return PairTotals(videos=0, pairs=empty.reshape(0, 2), frames=empty, seconds=empty, video_counts=empty)
+
+        entity_ids, other_entity_ids = np.concatenate(entity_ids), np.concatenate(other_entity_ids)
+        pairs, inverse = np.unique(np.column_stack((entity_ids, other_entity_ids)), axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        return PairTotals(
+            videos=videos,
+            pairs=pairs,
+            frames=np.bincount(inverse, weights=np.concatenate(frames), minlength=len(pairs)).astype(np.int64),
+            seconds=np.bincount(inverse, weights=np.concatenate(seconds), minlength=len(pairs)),
+            video_counts=np.bincount(inverse, minlength=len(pairs)),
+        )
+
+    def _iter_interval_indexes(self, videos: list[Video]) -> Iterator[tuple[Video, IntervalIndex]]:
+        """
+        Build the interval indexes of the videos batch by batch without caching them, for the whole catalog.
+        """
+
+        for start in range(0, len(videos), settings.BATCH_MAX_KEYS):
+            batch = videos[start : start + settings.BATCH_MAX_KEYS]
+            segment_detections = self._segment_detection_query.get_segment_detections_by_video_ids(
+                video_ids=[video.id for video in batch]
+            )
+            for video in batch:
+                yield video, IntervalIndex(segment_detections.get(video.id, []))
+
+    def _get_interval_indexes(self, videos: list[Video]) -> list[tuple[Video, IntervalIndex]]:
+        indexes = {}
+        for start in range(0, len(videos), settings.BATCH_MAX_KEYS):
+            indexes.update(
+                self._analytics_index.get_interval_indexes(
+                    [video.id for video in videos[start : start + settings.BATCH_MAX_KEYS]],
+                    loader=lambda video_ids: self._segment_detection_query.get_segment_detections_by_video_ids(
+                        video_ids=video_ids
+                    ),
+                )
+            )
+        return [(video, indexes[video.id]) for video in videos]
+
+    def _get_videos(self, video_ids: list[int]) -> list[Video]:
+        videos = {video.id: video for video in self._video_query.get_videos_by_keys(key="id", keys=video_ids)}
+        missing = [video_id for video_id in video_ids if video_id not in videos]
+        if missing:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Videos {missing} not found")
+
+        without_frame_rate = [video_id for video_id in video_ids if not videos[video_id].frame_rate]
+        if without_frame_rate:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Videos {without_frame_rate} have no frame rate to measure the screen time",
+            )
+        return [videos[video_id] for video_id in video_ids]
@@ -1,31 +1,144 @@
-from fastapi import HTTPException, status
+from itertools import groupby
+from operator import attrgetter
+from typing import Iterable, Iterator, Optional
+
+from fastapi import HTTPException, Response, status
 from video_enrichment_orm.managers.db_detection import db_detection_manager
 from video_enrichment_orm.managers.db_segment_detection import (
     db_segment_detection_manager,
 )
-from video_enrichment_orm.managers.db_video import db_video_manager
 from video_enrichment_orm.schemas.detection import Detection
+from video_enrichment_orm.schemas.video import Video
+
+from app.core.enums import SnapshotKind
+from app.managers.cache.snapshot import snapshot_store
+from app.managers.db.detection import detection_query_manager
+from app.managers.db.video import video_query_manager
+from app.managers.index.detection import FrameIndex, detection_index_manager
+from app.schemas.detection import (
+    DetectionBatchRequest,
+    DetectionFilter,
+    Track,
+    TrackFilter,
+    VideoDetections,
+)
 
 
 class DetectionManager:
     def __init__(self) -> None:
         self._db_detection = db_detection_manager
-        self._db_video = db_video_manager
         self._db_segment_detection = db_segment_detection_manager
+        self._detection_index = detection_index_manager
+        self._detection_query = detection_query_manager
+        self._video_query = video_query_manager
+        self._snapshot_store = snapshot_store
 
-    def get_detections_by_video_id(self, video_id: int) -> list[Detection]:
+    def get_detections_by_video_id(self, video: Video, filters: Optional[DetectionFilter] = None) -> list[Detection]:
         """
-        Get detections by video ID.
-        Validates that the video exists before returning results.
+        Get the detections of a video.
+        A frame (or seconds) window, the region and area filters of the boxes, the score thresholds and the temporal
+        sampling are answered from the cached frame index of the video, while entity and taxonomy filters (along with
+        the other filters) are executed in the database.
         """
+        if filters is None or not filters.has_filters():
+            return self._db_detection.get_detections_by_video_id(video_id=video.id)
+
         try:
-            video = self._db_video.get_video_by_id(video_id=video_id)
-            if not video:
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Video {video_id} not found")
+            from_frame, to_frame = filters.resolve_frames(frame_rate=video.frame_rate)
+            bucket_width = filters.resolve_bucket_width(frame_rate=video.frame_rate)
+            filters.resolve_region()
         except ValueError as e:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+
+        if filters.has_entity_filters():
+            detections = self._detection_query.get_detections_by_video_id(
+                video_id=video.id, filters=filters, from_frame=from_frame, to_frame=to_frame
+            )
+            if bucket_width is None:
+                return detections
+            return FrameIndex(detections).sample(bucket_width=bucket_width)
+
+        frame_index = self._detection_index.get_frame_index(
+            video.id, loader=lambda: self._db_detection.get_detections_by_video_id(video_id=video.id)
+        )
+        if bucket_width is None:
+            return frame_index.window(from_frame=from_frame, to_frame=to_frame, spatial=filters, scores=filters)
+
+        return frame_index.sample(
+            bucket_width=bucket_width, from_frame=from_frame, to_frame=to_frame, spatial=filters, scores=filters
+        )
+
+    def get_detections_by_video_ids(self, request: DetectionBatchRequest, filters: DetectionFilter) -> Iterator[bytes]:
+        """
+        Get the detections of several videos, grouped by video.
+        The videos are validated with one IN query and their detections fetched with one query, ordered by video, so
+        each video is sent as soon as its rows are read. The filters and the sampling apply to every video, the
+        windows in seconds and the sampling per second being resolved with the frame rate of each video.
+
+        Args:
+            request: The videos to fetch the detections of
+            filters: The optional frame (or seconds) window, attribute and spatial filters and temporal sampling
+
+        Returns:
+            One NDJSON line per video, in ascending video id order, with the detections of the video
+        """
+
+        video_ids = list(dict.fromkeys(request.video_ids))
+        videos = {video.id: video for video in self._video_query.get_videos_by_keys(key="id", keys=video_ids)}
+        missing = [video_id for video_id in video_ids if video_id not in videos]
+        if missing:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Videos {missing} not found")
+
+        # Resolved before streaming, so an invalid filter is still answered with a 400
+        windows, bucket_widths = {}, {}
+        try:
+            filters.resolve_region()
+            for video_id in sorted(video_ids):
+                windows[video_id] = filters.resolve_frames(frame_rate=videos[video_id].frame_rate)
+                bucket_widths[video_id] = filters.resolve_bucket_width(frame_rate=videos[video_id].frame_rate)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+
+        detections = self._detection_query.iter_detections_by_video_ids(windows=windows, filters=filters)
+        return self._stream_by_video(detections, bucket_widths=bucket_widths)
+
+    @staticmethod
+    def _stream_by_video(detections: Iterable[Detection], bucket_widths: dict[int, Optional[float]]) -> Iterator[bytes]:
+        groups = groupby(detections, key=attrgetter("video_id"))
+        group = next(groups, None)
+        for video_id, bucket_width in bucket_widths.items():
+            video_detections = []
+            if group is not None and group[0] == video_id:
+                video_detections = list(group[1])
+                group = next(groups, None)
+            if bucket_width is not None:
+                video_detections = FrameIndex(video_detections).sample(bucket_width=bucket_width)
+            yield VideoDetections(video_id=video_id, detections=video_detections).model_dump_json().encode() + b"\n"
+
+    def get_detections_snapshot(
+        self, video: Video, accept_encoding: Optional[str] = None, if_none_match: Optional[str] = None
+    ) -> Optional[Response]:
+        """
+        Serve the detections of a video from its published snapshot, with its ETag.
+        Returns None while the video has no fresh snapshot, so the detections are queried.
+        """
+        return self._snapshot_store.get_response(
+            video, SnapshotKind.Detections, accept_encoding=accept_encoding, if_none_match=if_none_match
+        )
+
+    def get_tracks_by_video_id(self, video: Video, filters: TrackFilter) -> list[Track]:
+        """
+        Get the tracks of a video, one per segment detection, answered from the cached frame index of the video.
+        """
+        try:
+            from_frame, to_frame = filters.resolve_frames(frame_rate=video.frame_rate)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
 
-        return self._db_detection.get_detections_by_video_id(video_id=video_id)
+        frame_index = self._detection_index.get_frame_index(
+            video.id, loader=lambda: self._db_detection.get_detections_by_video_id(video_id=video.id)
+        )
+        return frame_index.tracks(tolerance=filters.tolerance, from_frame=from_frame, to_frame=to_frame)
 
     def get_detections_by_segment_detection_id(self, segment_detection_id: int) -> list[Detection]:
         """
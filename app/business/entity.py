@@ -1,4 +1,6 @@
-from fastapi import HTTPException, status
+import uuid
+
+from fastapi import HTTPException, Response, status
 from video_enrichment_orm.managers.db_entity import db_entity_manager
 from video_enrichment_orm.managers.db_entity_media_gallery import (
     db_entity_media_gallery_manager,
@@ -6,7 +8,22 @@ from video_enrichment_orm.managers.db_entity_media_gallery import (
 from video_enrichment_orm.managers.db_taxonomy import db_taxonomy_manager
 from video_enrichment_orm.schemas.entity import Entity, EntityCreate, EntityUpdate
 
+from app.core.enums import BulkItemStatus, CacheNamespace, ChangeAction, ChangeTopic
 from app.managers.aws.s3 import s3_manager
+from app.managers.cache.lookup import IdentityMap
+from app.managers.cache.response import response_cache
+from app.managers.db.entity import entity_query_manager
+from app.managers.db.taxonomy import taxonomy_query_manager
+from app.managers.events.bus import event_bus
+from app.managers.index.taxonomy import taxonomy_tree_manager
+from app.schemas.batch import (
+    BatchLookupRequest,
+    BatchLookupResponse,
+    BulkItemResult,
+    BulkResponse,
+)
+from app.schemas.entity import EntityBulkCreateRequest
+from app.schemas.events import ChangeEvent
 
 
 class EntityManager:
@@ -14,32 +31,90 @@ class EntityManager:
         self._db_taxonomy = db_taxonomy_manager
         self._db_entity = db_entity_manager
         self._db_entity_media_gallery = db_entity_media_gallery_manager
+        self._entity_query = entity_query_manager
+        self._taxonomy_query = taxonomy_query_manager
+        self._taxonomy_tree = taxonomy_tree_manager
         self._s3_manager = s3_manager
+        self._event_bus = event_bus
+        self._response_cache = response_cache
+        self._identity_map = IdentityMap()
 
-    def get_all_entities(self) -> list[Entity]:
-        return self._db_entity.get_entities()
+    def get_all_entities(self) -> Response:
+        return self._response_cache.get_or_set(
+            CacheNamespace.Entity, "all", loader=self._db_entity.get_entities, response_model=list[Entity]
+        )
 
     def get_enabled_entities(self) -> list[Entity]:
         return self._db_entity.get_enabled_entities()
 
     def get_entity_by_id(self, entity_id: int) -> Entity:
         try:
-            entity = self._db_entity.get_entity_by_id(entity_id=entity_id)
+            entity = self._identity_map.get_or_load(
+                ChangeTopic.Entity, ("id", entity_id), lambda: self._db_entity.get_entity_by_id(entity_id=entity_id)
+            )
             return entity
         except ValueError as e:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
 
     def get_entity_by_uuid(self, entity_uuid: str) -> Entity:
         try:
-            entity = self._db_entity.get_entity_by_uuid(entity_uuid=entity_uuid)
+            entity = self._identity_map.get_or_load(
+                ChangeTopic.Entity,
+                ("uuid", entity_uuid),
+                lambda: self._db_entity.get_entity_by_uuid(entity_uuid=entity_uuid),
+            )
             return entity
         except ValueError as e:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
 
-    def get_entities_by_taxonomy_id(self, taxonomy_id: int) -> list[Entity]:
+    def get_entity_response_by_uuid(self, entity_uuid: str) -> Response:
+        return self._response_cache.get_or_set(
+            CacheNamespace.Entity,
+            self._response_cache.make_key("by-uuid", entity_uuid=entity_uuid),
+            loader=lambda: self.get_entity_by_uuid(entity_uuid=entity_uuid),
+            response_model=Entity,
+        )
+
+    def get_entities_batch(self, request: BatchLookupRequest) -> BatchLookupResponse[Entity]:
+        """
+        Get the entities of the ids or uuids with a single IN query.
+
+        Args:
+            request: The ids or uuids to look up
+
+        Returns:
+            The entities found, in the order of the requested keys, and the keys not found
+        """
+
+        entities = self._entity_query.get_entities_by_keys(key=request.key, keys=request.keys)
+        return BatchLookupResponse[Entity].from_rows(request, entities)
+
+    def get_entities_by_taxonomy_id(self, taxonomy_id: int, include_descendants: bool = False) -> Response:
+        return self._response_cache.get_or_set(
+            CacheNamespace.Entity,
+            self._response_cache.make_key(
+                "by-taxonomy", taxonomy_id=taxonomy_id, include_descendants=include_descendants
+            ),
+            loader=lambda: self._load_entities_by_taxonomy_id(taxonomy_id, include_descendants),
+            response_model=list[Entity],
+        )
+
+    def _load_entities_by_taxonomy_id(self, taxonomy_id: int, include_descendants: bool) -> list[Entity]:
+        if include_descendants:
+            # The subtree is resolved from the cached taxonomy tree, which also checks the taxonomy exists
+            try:
+                taxonomy_ids = self._taxonomy_tree.get_subtree_ids(taxonomy_id)
+            except ValueError as e:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
+            return self._entity_query.get_enabled_entities_by_taxonomy_ids(taxonomy_ids=taxonomy_ids)
+
         # Check if taxonomy exists
         try:
-            self._db_taxonomy.get_taxonomy_by_id(taxonomy_id=taxonomy_id)
+            self._identity_map.get_or_load(
+                ChangeTopic.Taxonomy,
+                ("id", taxonomy_id),
+                lambda: self._db_taxonomy.get_taxonomy_by_id(taxonomy_id=taxonomy_id),
+            )
         except ValueError as e:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
 
@@ -48,7 +123,11 @@ class EntityManager:
     def save_entity(self, entity: EntityCreate) -> Entity:
         # Check if taxonomy exists
         try:
-            self._db_taxonomy.get_taxonomy_by_id(taxonomy_id=entity.taxonomy_id)
+            self._identity_map.get_or_load(
+                ChangeTopic.Taxonomy,
+                ("id", entity.taxonomy_id),
+                lambda: self._db_taxonomy.get_taxonomy_by_id(taxonomy_id=entity.taxonomy_id),
+            )
         except ValueError as e:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
 
@@ -60,28 +139,97 @@ class EntityManager:
         )
 
         entity = self._db_entity.save_entity(entity=entity_request)
+        self._response_cache.invalidate(CacheNamespace.Entity)
+        self._event_bus.publish(ChangeEvent(topic=ChangeTopic.Entity, action=ChangeAction.Created, ids=[entity.id]))
         return entity
 
+    def save_entities_bulk(self, request: EntityBulkCreateRequest) -> BulkResponse:
+        """
+        Create many entities at once.
+        The taxonomies referenced by the items are checked with a single query and the items whose taxonomy does
+        not exist are reported as failed, the rest are inserted with a single INSERT where an item whose uuid already
+        exists, in the database or earlier in the request, is reported as failed without failing the others.
+
+        Args:
+            request: The entities to create
+
+        Returns:
+            The outcome of every item, in the order of the request
+        """
+
+        taxonomy_ids = sorted({item.taxonomy_id for item in request.items})
+        existing_ids = {
+            taxonomy.id for taxonomy in self._taxonomy_query.get_taxonomies_by_keys(key="id", keys=taxonomy_ids)
+        }
+
+        results: list[BulkItemResult] = [None] * len(request.items)
+        valid = []
+        for index, item in enumerate(request.items):
+            if item.taxonomy_id not in existing_ids:
+                results[index] = BulkItemResult(
+                    index=index, status=BulkItemStatus.Failed, detail=f"Taxonomy with id {item.taxonomy_id} not found"
+                )
+            else:
+                valid.append((index, item))
+
+        if valid:
+            rows = [item.model_dump() | {"uuid": item.uuid or str(uuid.uuid4())} for _, item in valid]
+            entities = []
+            for (index, _), row, entity in zip(valid, rows, self._entity_query.insert_entities(rows)):
+                if entity is None:
+                    results[index] = BulkItemResult(
+                        index=index,
+                        status=BulkItemStatus.Failed,
+                        detail=f"Entity with uuid {row['uuid']} already exists",
+                    )
+                else:
+                    entities.append(entity)
+                    results[index] = BulkItemResult(
+                        index=index, status=BulkItemStatus.Created, id=entity.id, uuid=entity.uuid
+                    )
+
+            if entities:
+                self._response_cache.invalidate(CacheNamespace.Entity)
+                self._event_bus.publish(
+                    ChangeEvent(
+                        topic=ChangeTopic.Entity, action=ChangeAction.Created, ids=[entity.id for entity in entities]
+                    )
+                )
+
+        return BulkResponse.from_results(results)
+
     def update_entity_by_uuid(self, entity_uuid: str, entity_update: EntityUpdate) -> Entity:
         try:
             entity = self._db_entity.update_entity(entity_update=entity_update, uuid=entity_uuid)
-            return entity
         except ValueError as e:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
 
+        self._response_cache.invalidate(CacheNamespace.Entity)
+        self._event_bus.publish(ChangeEvent(topic=ChangeTopic.Entity, action=ChangeAction.Updated, ids=[entity.id]))
+        return entity
+
     def delete_entity_by_id(self, entity_id: int) -> None:
         self.delete_media_galleries_for_entity(entity_id=entity_id)
-        return self._db_entity.delete_entity_by_id(entity_id=entity_id)
+        deleted = self._db_entity.delete_entity_by_id(entity_id=entity_id)
+        self._response_cache.invalidate(CacheNamespace.Entity, CacheNamespace.EntityMediaGallery)
+        self._event_bus.publish(ChangeEvent(topic=ChangeTopic.Entity, action=ChangeAction.Deleted, ids=[entity_id]))
+        return deleted
 
     def delete_entity_by_uuid(self, entity_uuid: str) -> None:
-        self.delete_media_galleries_for_entity(entity_uuid=entity_uuid)
-        return self._db_entity.delete_entity_by_uuid(entity_uuid=entity_uuid)
+        entity_id = self.delete_media_galleries_for_entity(entity_uuid=entity_uuid)
+        deleted = self._db_entity.delete_entity_by_uuid(entity_uuid=entity_uuid)
+        self._response_cache.invalidate(CacheNamespace.Entity, CacheNamespace.EntityMediaGallery)
+        self._event_bus.publish(ChangeEvent(topic=ChangeTopic.Entity, action=ChangeAction.Deleted, ids=[entity_id]))
+        return deleted
 
     def soft_delete_entity_by_uuid(self, entity_uuid: str) -> None:
-        self.delete_media_galleries_for_entity(entity_uuid=entity_uuid)
-        return self._db_entity.soft_delete_entity_by_uuid(entity_uuid=entity_uuid)
+        entity_id = self.delete_media_galleries_for_entity(entity_uuid=entity_uuid)
+        deleted = self._db_entity.soft_delete_entity_by_uuid(entity_uuid=entity_uuid)
+        self._response_cache.invalidate(CacheNamespace.Entity, CacheNamespace.EntityMediaGallery)
+        self._event_bus.publish(ChangeEvent(topic=ChangeTopic.Entity, action=ChangeAction.Deleted, ids=[entity_id]))
+        return deleted
 
-    def delete_media_galleries_for_entity(self, entity_id: int = None, entity_uuid: str = None) -> None:
+    def delete_media_galleries_for_entity(self, entity_id: int = None, entity_uuid: str = None) -> int:
         if not entity_id:
             entity = self.get_entity_by_uuid(entity_uuid=entity_uuid)
             if not entity:
@@ -93,3 +241,5 @@ class EntityManager:
         for media_gallery in media_galleries:
             bucket, key = s3_manager.decode_path(media_gallery.path)
             s3_manager.delete_object(bucket, key)
+
+        return entity_id
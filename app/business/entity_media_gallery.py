@@ -1,27 +1,57 @@
-from fastapi import HTTPException, status
+from fastapi import HTTPException, Response, status
 from video_enrichment_orm.managers.db_entity import db_entity_manager
 from video_enrichment_orm.managers.db_entity_media_gallery import (
     db_entity_media_gallery_manager,
 )
 
 from app.core.config import settings
+from app.core.enums import BulkItemStatus, CacheNamespace, ChangeAction, ChangeTopic
 from app.managers.aws.s3 import s3_manager
+from app.managers.cache.lookup import IdentityMap
+from app.managers.cache.response import response_cache
+from app.managers.db.entity_media_gallery import entity_media_gallery_query_manager
+from app.managers.events.bus import event_bus
+from app.schemas.batch import (
+    BatchLookupRequest,
+    BatchLookupResponse,
+    BulkItemResult,
+    BulkResponse,
+)
 from app.schemas.entity_media_gallery import (
     EntityMediaGallery,
+    EntityMediaGalleryBulkEnableRequest,
     EntityMediaGalleryCreate,
     EntityMediaGalleryUpdate,
 )
+from app.schemas.events import ChangeEvent
 
 
 class EntityMediaGalleryManager:
     def __init__(self) -> None:
         self._db_entity = db_entity_manager
         self._db_entity_media_gallery = db_entity_media_gallery_manager
+        self._entity_media_gallery_query = entity_media_gallery_query_manager
+        self._response_cache = response_cache
+        self._event_bus = event_bus
+        self._identity_map = IdentityMap()
+
+    def get_all_entity_media_galleries(self) -> Response:
+        return self._response_cache.get_or_set(
+            CacheNamespace.EntityMediaGallery,
+            "all",
+            loader=self._db_entity_media_gallery.get_enabled_entity_media_galleries,
+            response_model=list[EntityMediaGallery],
+        )
 
-    def get_all_entity_media_galleries(self) -> list[EntityMediaGallery]:
-        return self._db_entity_media_gallery.get_enabled_entity_media_galleries()
+    def get_entity_media_gallery_by_uuid(self, media_gallery_uuid: str) -> Response:
+        return self._response_cache.get_or_set(
+            CacheNamespace.EntityMediaGallery,
+            self._response_cache.make_key("by-uuid", media_gallery_uuid=media_gallery_uuid),
+            loader=lambda: self._load_entity_media_gallery_by_uuid(media_gallery_uuid),
+            response_model=EntityMediaGallery,
+        )
 
-    def get_entity_media_gallery_by_uuid(self, media_gallery_uuid: str) -> EntityMediaGallery:
+    def _load_entity_media_gallery_by_uuid(self, media_gallery_uuid: str) -> EntityMediaGallery:
         try:
             media_gallery = self._db_entity_media_gallery.get_entity_media_gallery_by_uuid(
                 media_gallery_uuid=media_gallery_uuid
@@ -30,9 +60,33 @@ class EntityMediaGalleryManager:
         except ValueError as e:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
 
-    def get_entity_media_galleries_by_entity_id(self, entity_id: int) -> list[EntityMediaGallery]:
+    def get_entity_media_galleries_batch(self, request: BatchLookupRequest) -> BatchLookupResponse[EntityMediaGallery]:
+        """
+        Get the entity media galleries of the ids or uuids with a single IN query.
+
+        Args:
+            request: The ids or uuids to look up
+
+        Returns:
+            The entity media galleries found, in the order of the requested keys, and the keys not found
+        """
+
+        media_galleries = self._entity_media_gallery_query.get_entity_media_galleries_by_keys(
+            key=request.key, keys=request.keys
+        )
+        return BatchLookupResponse[EntityMediaGallery].from_rows(request, media_galleries)
+
+    def get_entity_media_galleries_by_entity_id(self, entity_id: int) -> Response:
+        return self._response_cache.get_or_set(
+            CacheNamespace.EntityMediaGallery,
+            self._response_cache.make_key("by-entity", entity_id=entity_id),
+            loader=lambda: self._load_entity_media_galleries_by_entity_id(entity_id),
+            response_model=list[EntityMediaGallery],
+        )
+
+    def _load_entity_media_galleries_by_entity_id(self, entity_id: int) -> list[EntityMediaGallery]:
         try:
-            entity = self._db_entity.get_entity_by_id(entity_id=entity_id)
+            entity = self._get_entity(entity_id)
             if not entity:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Entity {entity_id} not found")
         except ValueError as e:
@@ -48,7 +102,7 @@ class EntityMediaGalleryManager:
             )
 
         try:
-            entity = self._db_entity.get_entity_by_id(entity_id=media_gallery.entity_id)
+            entity = self._get_entity(media_gallery.entity_id)
             if not entity:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND, detail=f"Entity {media_gallery.entity_id} not found"
@@ -65,19 +119,16 @@ class EntityMediaGalleryManager:
         )
 
         media_gallery = self._db_entity_media_gallery.save_entity_media_gallery(media_gallery=media_gallery_request)
+        self._on_write(ChangeAction.Created, media_gallery_ids=[media_gallery.id])
         return media_gallery
 
     def save_entity_media_gallery_with_file(self, entity_id, file):
-        # Get entity uuid
-        entity = self._db_entity.get_entity_by_id(entity_id=entity_id)
+        # Validate entity exists and get its uuid
+        entity = self._get_entity(entity_id)
         if not entity:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Entity {entity_id} not found")
         entity_uuid = entity.uuid
 
-        # Validate entity exists
-        entity = self._db_entity.get_entity_by_id(entity_id=entity_id)
-        if not entity:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Entity {entity_id} not found")
         # S3 path: S3_GALLERY_PATH/entity_uuid/file_name
         file_name = file.filename
         s3_path = f"{settings.S3_GALLERY_PATH}/{entity_uuid}/{file_name}"
@@ -94,6 +145,7 @@ class EntityMediaGalleryManager:
             enabled=True,
         )
         media_gallery = self._db_entity_media_gallery.save_entity_media_gallery(media_gallery=media_gallery_request)
+        self._on_write(ChangeAction.Created, media_gallery_ids=[media_gallery.id])
         return media_gallery
 
     def update_entity_media_gallery_by_uuid(
@@ -103,10 +155,46 @@ class EntityMediaGalleryManager:
             media_gallery = self._db_entity_media_gallery.update_entity_media_gallery(
                 media_gallery_update=media_gallery_update, uuid=media_gallery_uuid
             )
-            return media_gallery
         except ValueError as e:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
 
+        self._on_write(ChangeAction.Updated, media_gallery_ids=[media_gallery.id])
+        return media_gallery
+
+    def set_entity_media_galleries_enabled(self, request: EntityMediaGalleryBulkEnableRequest) -> BulkResponse:
+        """
+        Enable or disable many entity media galleries with a single statement.
+
+        Args:
+            request: The uuids of the entity media galleries and whether to enable them
+
+        Returns:
+            The outcome of every uuid, in the order of the request, the uuids not found are reported as failed
+        """
+
+        media_galleries = self._entity_media_gallery_query.set_entity_media_galleries_enabled(
+            uuids=list(dict.fromkeys(request.uuids)), enabled=request.enabled
+        )
+        ids_by_uuid = {media_gallery.uuid: media_gallery.id for media_gallery in media_galleries}
+
+        results = [
+            BulkItemResult(
+                index=index, status=BulkItemStatus.Updated, id=ids_by_uuid[media_gallery_uuid], uuid=media_gallery_uuid
+            )
+            if media_gallery_uuid in ids_by_uuid
+            else BulkItemResult(
+                index=index,
+                status=BulkItemStatus.Failed,
+                uuid=media_gallery_uuid,
+                detail=f"Media gallery {media_gallery_uuid} not found",
+            )
+            for index, media_gallery_uuid in enumerate(request.uuids)
+        ]
+
+        if media_galleries:
+            self._on_write(ChangeAction.Updated, media_gallery_ids=list(ids_by_uuid.values()))
+        return BulkResponse.from_results(results)
+
     def delete_entity_media_gallery_by_uuid(self, media_gallery_uuid: str) -> None:
         media_gallery = self._db_entity_media_gallery.get_entity_media_gallery_by_uuid(
             media_gallery_uuid=media_gallery_uuid
@@ -117,9 +205,33 @@ class EntityMediaGalleryManager:
             )
         bucket, key = s3_manager.decode_path(media_gallery.path)
         s3_manager.delete_object(bucket, key)
-        return self._db_entity_media_gallery.delete_entity_media_gallery_by_uuid(media_gallery_uuid=media_gallery_uuid)
+        deleted = self._db_entity_media_gallery.delete_entity_media_gallery_by_uuid(
+            media_gallery_uuid=media_gallery_uuid
+        )
+        self._on_write(ChangeAction.Deleted, media_gallery_ids=[media_gallery.id])
+        return deleted
 
     def soft_delete_entity_media_gallery_by_uuid(self, media_gallery_uuid: str) -> None:
-        return self._db_entity_media_gallery.soft_delete_entity_media_gallery_by_uuid(
+        media_gallery = self._db_entity_media_gallery.get_entity_media_gallery_by_uuid(
+            media_gallery_uuid=media_gallery_uuid
+        )
+        if not media_gallery:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail=f"Media gallery {media_gallery_uuid} not found"
+            )
+        deleted = self._db_entity_media_gallery.soft_delete_entity_media_gallery_by_uuid(
             media_gallery_uuid=media_gallery_uuid
         )
+        self._on_write(ChangeAction.Deleted, media_gallery_ids=[media_gallery.id])
+        return deleted
+
+    def _get_entity(self, entity_id: int):
+        return self._identity_map.get_or_load(
+            ChangeTopic.Entity, ("id", entity_id), lambda: self._db_entity.get_entity_by_id(entity_id=entity_id)
+        )
+
+    def _on_write(self, action: ChangeAction, media_gallery_ids: list[int] = None) -> None:
+        self._response_cache.invalidate(CacheNamespace.EntityMediaGallery)
+        self._event_bus.publish(
+            ChangeEvent(topic=ChangeTopic.EntityMediaGallery, action=action, ids=media_gallery_ids or [])
+        )
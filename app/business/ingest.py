@@ -0,0 +1,177 @@
+from datetime import datetime, timezone
+from typing import BinaryIO
+
+import numpy as np
+from fastapi import HTTPException, status
+from video_enrichment_orm.dao.detection import DetectionDAO
+from video_enrichment_orm.dao.segment_detection import SegmentDetectionDAO
+from video_enrichment_orm.schemas.video import Video
+
+from app.core.config import settings
+from app.core.enums import ChangeAction, ChangeTopic
+from app.core.ingest import (
+    BINARY_CONTENT_TYPE,
+    DETECTION_DTYPE,
+    NDJSON_CONTENT_TYPE,
+    SEGMENT_DETECTION_DTYPE,
+    InvalidRowsError,
+    parse_rows,
+    random_uuids,
+    report_invalid_rows,
+    to_copy_text,
+)
+from app.managers.db.entity import entity_query_manager
+from app.managers.db.postgres import postgres_manager
+from app.managers.db.segment_detection import segment_detection_query_manager
+from app.managers.db.taxonomy import taxonomy_query_manager
+from app.managers.events.bus import event_bus
+from app.schemas.events import ChangeEvent
+from app.schemas.ingest import IngestResponse
+
+
+class IngestManager:
+    def __init__(self) -> None:
+        self._postgres = postgres_manager
+        self._segment_detection_query = segment_detection_query_manager
+        self._entity_query = entity_query_manager
+        self._taxonomy_query = taxonomy_query_manager
+        self._event_bus = event_bus
+
+    def ingest_segment_detections(self, video: Video, body: BinaryIO, content_type: str) -> IngestResponse:
+        """
+        Load a batch of segment detections of a video.
+        The rows are validated column-wise, with one query for the referenced entities and one for the taxonomies,
+        and loaded with COPY in chunks of INGEST_COPY_CHUNK_ROWS inside a single transaction.
+        Nothing is loaded when any row is invalid.
+
+        Args:
+            video: The video the segment detections belong to
+            body: The spooled NDJSON rows or packed SEGMENT_DETECTION_DTYPE records
+            content_type: The content type of the body
+
+        Returns:
+            The number of loaded rows
+        """
+
+        rows = self._parse(body, content_type, SEGMENT_DETECTION_DTYPE)
+
+        entity_ids = np.unique(rows["entity_id"]).tolist()
+        taxonomy_ids = np.unique(rows["taxonomy_id"]).tolist()
+        existing_entity_ids = [
+            entity.id for entity in self._entity_query.get_entities_by_keys(key="id", keys=entity_ids)
+        ]
+        existing_taxonomy_ids = [
+            taxonomy.id for taxonomy in self._taxonomy_query.get_taxonomies_by_keys(key="id", keys=taxonomy_ids)
+        ]
+
+        self._validate(
+            {
+                "start_frame must not be negative": rows["start_frame"] < 0,
+                "end_frame must not be before start_frame": rows["end_frame"] < rows["start_frame"],
+                "entity not found": ~np.isin(rows["entity_id"], existing_entity_ids),
+                "taxonomy not found": ~np.isin(rows["taxonomy_id"], existing_taxonomy_ids),
+            }
+        )
+
+        self._copy(SegmentDetectionDAO, video_id=video.id, rows=rows)
+        self._event_bus.publish(
+            ChangeEvent(topic=ChangeTopic.SegmentDetection, action=ChangeAction.Created, video_ids=[video.id])
+        )
+        return IngestResponse(video_id=video.id, rows=len(rows))
+
+    def ingest_detections(self, video: Video, body: BinaryIO, content_type: str) -> IngestResponse:
+        """
+        Load a batch of detections of a video.
+        Every detection must belong to a segment detection of the video and fall within its frames, checked with
+        a binary search over the segment detections of the video loaded in a single query. The valid batch is loaded
+        with COPY in chunks of INGEST_COPY_CHUNK_ROWS inside a single transaction.
+        Nothing is loaded when any row is invalid.
+
+        Args:
+            video: The video the detections belong to
+            body: The spooled NDJSON rows or packed DETECTION_DTYPE records
+            content_type: The content type of the body
+
+        Returns:
+            The number of loaded rows
+        """
+
+        rows = self._parse(body, content_type, DETECTION_DTYPE)
+
+        segment_ids, segment_starts, segment_ends = self._segment_detection_query.get_segment_frames(video.id)
+        positions = np.clip(np.searchsorted(segment_ids, rows["segment_detection_id"]), 0, max(len(segment_ids) - 1, 0))
+        if len(segment_ids):
+            in_video = segment_ids[positions] == rows["segment_detection_id"]
+            in_segment = (rows["frame"] >= segment_starts[positions]) & (rows["frame"] <= segment_ends[positions])
+        else:
+            in_video = in_segment = np.zeros(len(rows), dtype=bool)
+
+        checks = {
+            "frame must not be negative": rows["frame"] < 0,
+            "segment detection not found in the video": ~in_video,
+            "frame outside of the segment detection": in_video & ~in_segment,
+        }
+        for score in ("detection_score", "entity_score"):
+            checks[f"{score} must be between 0 and 1"] = ~((rows[score] >= 0) & (rows[score] <= 1))
+        for axis in ("x", "y"):
+            checks[f"bbox_{axis}_min must not be after bbox_{axis}_max"] = ~(
+                rows[f"bbox_{axis}_min"] <= rows[f"bbox_{axis}_max"]
+            )
+        self._validate(checks)
+
+        self._copy(DetectionDAO, video_id=video.id, rows=rows)
+        self._event_bus.publish(
+            ChangeEvent(topic=ChangeTopic.Detection, action=ChangeAction.Created, video_ids=[video.id])
+        )
+        return IngestResponse(video_id=video.id, rows=len(rows))
+
+    @staticmethod
+    def _parse(body: BinaryIO, content_type: str, dtype: np.dtype) -> np.ndarray:
+        media_type = content_type.split(";")[0].strip().lower()
+        if media_type not in (NDJSON_CONTENT_TYPE, BINARY_CONTENT_TYPE):
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail=f"Content type must be {NDJSON_CONTENT_TYPE} or {BINARY_CONTENT_TYPE}",
+            )
+
+        try:
+            rows = parse_rows(body, media_type, dtype)
+        except InvalidRowsError as e:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=e.report) from e
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+
+        if len(rows) == 0:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="The batch has no rows")
+        if len(rows) > settings.INGEST_MAX_ROWS:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"The batch has more than {settings.INGEST_MAX_ROWS} rows",
+            )
+        return rows
+
+    @staticmethod
+    def _validate(checks: dict[str, np.ndarray]) -> None:
+        report = report_invalid_rows(checks)
+        if report:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=report)
+
+    def _copy(self, dao, video_id: int, rows: np.ndarray) -> None:
+        columns = ["uuid", "video_id", *rows.dtype.names, "created_at", "updated_at"]
+        chunk_size = settings.INGEST_COPY_CHUNK_ROWS
+        # COPY skips the timestamps the ORM sets on insert, the whole batch is stamped at once
+        now = datetime.now(timezone.utc).isoformat()
+        # The chunks are formatted lazily so only one of them is held as text at a time
+        chunks = (
+            to_copy_text(
+                [
+                    random_uuids(len(chunk)),
+                    [str(video_id)] * len(chunk),
+                    *(chunk[name] for name in rows.dtype.names),
+                    [now] * len(chunk),
+                    [now] * len(chunk),
+                ]
+            )
+            for chunk in (rows[start : start + chunk_size] for start in range(0, len(rows), chunk_size))
+        )
+        self._postgres.copy_rows(dao.__table__.name, columns=columns, chunks=chunks)
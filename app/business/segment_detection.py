@@ -1,53 +1,247 @@
-from fastapi import HTTPException, status
+from typing import Optional
+
+import numpy as np
+from fastapi import HTTPException, Response, status
 from video_enrichment_orm.managers.db_segment_detection import (
     db_segment_detection_manager,
 )
 from video_enrichment_orm.managers.db_taxonomy import db_taxonomy_manager
-from video_enrichment_orm.managers.db_video import db_video_manager
 from video_enrichment_orm.schemas.segment_detection import SegmentDetection
+from video_enrichment_orm.schemas.video import Video
+
+from app.core.enums import ChangeAction, ChangeTopic, SnapshotKind
+from app.core.intervals import label_merged_intervals
+from app.managers.cache.lookup import IdentityMap
+from app.managers.cache.snapshot import snapshot_store
+from app.managers.db.segment_detection import segment_detection_query_manager
+from app.managers.events.bus import event_bus
+from app.managers.index.detection import detection_index_manager
+from app.managers.index.taxonomy import taxonomy_tree_manager
+from app.schemas.events import ChangeEvent
+from app.schemas.segment_detection import (
+    SegmentCompactionResponse,
+    SegmentDetectionFilter,
+)
 
 
 class SegmentDetectionManager:
     def __init__(self) -> None:
         self._db_segment_detection = db_segment_detection_manager
-        self._db_video = db_video_manager
         self._db_taxonomy = db_taxonomy_manager
+        self._detection_index = detection_index_manager
+        self._segment_detection_query = segment_detection_query_manager
+        self._taxonomy_tree = taxonomy_tree_manager
+        self._snapshot_store = snapshot_store
+        self._event_bus = event_bus
+        self._identity_map = IdentityMap()
+
+    def get_segment_detections_by_video_id(
+        self, video: Video, filters: Optional[SegmentDetectionFilter] = None
+    ) -> list[SegmentDetection]:
+        """
+        Get the segment detections of a video.
+        """
+        if filters is None or not filters.has_filters():
+            segment_detections = self._db_segment_detection.get_segment_detections_by_video_id(video_id=video.id)
+        else:
+            segment_detections = self._get_filtered_segment_detections(video=video, filters=filters)
 
-    def get_segment_detections_by_video_id(self, video_id: int) -> list[SegmentDetection]:
+        return self._merge_fragments(segment_detections, filters=filters)
+
+    def get_segment_detections_snapshot(
+        self, video: Video, accept_encoding: Optional[str] = None, if_none_match: Optional[str] = None
+    ) -> Optional[Response]:
+        """
+        Serve the segment detections of a video from its published snapshot, with its ETag.
+        Returns None while the video has no fresh snapshot, so the segment detections are queried.
+        """
+        return self._snapshot_store.get_response(
+            video, SnapshotKind.SegmentDetections, accept_encoding=accept_encoding, if_none_match=if_none_match
+        )
+
+    def get_segment_detections_by_video_and_taxonomy(
+        self,
+        video: Video,
+        taxonomy_id: int,
+        filters: Optional[SegmentDetectionFilter] = None,
+        include_descendants: bool = False,
+    ) -> list[SegmentDetection]:
         """
-        Get segment detections by video ID.
-        Validates that the video exists before returning results.
+        Get segment detections by video ID and taxonomy ID, or any taxonomy of its subtree when
+        include_descendants is set.
+        Validates that the taxonomy exists before returning results.
         """
+        if include_descendants:
+            return self._merge_fragments(
+                self._get_subtree_segment_detections(video=video, taxonomy_id=taxonomy_id, filters=filters),
+                filters=filters,
+            )
+
+        # Check if taxonomy exists
         try:
-            video = self._db_video.get_video_by_id(video_id=video_id)
-            if not video:
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Video {video_id} not found")
+            taxonomy = self._identity_map.get_or_load(
+                ChangeTopic.Taxonomy,
+                ("id", taxonomy_id),
+                lambda: self._db_taxonomy.get_taxonomy_by_id(taxonomy_id=taxonomy_id),
+            )
+            if not taxonomy:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Taxonomy {taxonomy_id} not found")
         except ValueError as e:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
 
-        return self._db_segment_detection.get_segment_detections_by_video_id(video_id=video_id)
+        if filters is None or not filters.has_filters():
+            segment_detections = self._db_segment_detection.get_segment_detections_by_video_and_taxonomy(
+                video_id=video.id, taxonomy_id=taxonomy_id
+            )
+        else:
+            segment_detections = self._get_filtered_segment_detections(
+                video=video, filters=filters, taxonomy_id=taxonomy_id
+            )
 
-    def get_segment_detections_by_video_and_taxonomy(self, video_id: int, taxonomy_id: int) -> list[SegmentDetection]:
+        return self._merge_fragments(segment_detections, filters=filters)
+
+    def _get_subtree_segment_detections(
+        self, video: Video, taxonomy_id: int, filters: Optional[SegmentDetectionFilter] = None
+    ) -> list[SegmentDetection]:
         """
-        Get segment detections by video ID and taxonomy ID.
-        Validates that both the video and taxonomy exist before returning results.
+        Get the segment detections of a video for any taxonomy of the subtree, with a single IN query.
+        The subtree is resolved from the cached taxonomy tree, which also checks the taxonomy exists.
         """
-        # Check if video exists
         try:
-            video = self._db_video.get_video_by_id(video_id=video_id)
-            if not video:
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Video {video_id} not found")
+            taxonomy_ids = self._taxonomy_tree.get_subtree_ids(taxonomy_id)
         except ValueError as e:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
 
-        # Check if taxonomy exists
+        filters = filters or SegmentDetectionFilter()
+        if filters.taxonomy_ids:
+            requested = set(filters.taxonomy_ids)
+            taxonomy_ids = [subtree_id for subtree_id in taxonomy_ids if subtree_id in requested]
+            if not taxonomy_ids:
+                return []
+
+        return self._get_filtered_segment_detections(
+            video=video, filters=filters.model_copy(update={"taxonomy_ids": taxonomy_ids})
+        )
+
+    def _get_filtered_segment_detections(
+        self, video: Video, filters: SegmentDetectionFilter, taxonomy_id: Optional[int] = None
+    ) -> list[SegmentDetection]:
+        """
+        Get the segment detections of a video matching the filters.
+        A plain frame window is answered from the cached interval index of the video,
+        any other filter is executed in the database together with the window.
+        """
         try:
-            taxonomy = self._db_taxonomy.get_taxonomy_by_id(taxonomy_id=taxonomy_id)
-            if not taxonomy:
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Taxonomy {taxonomy_id} not found")
+            from_frame, to_frame = filters.resolve_frames(frame_rate=video.frame_rate)
         except ValueError as e:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+
+        if filters.has_attribute_filters():
+            return self._segment_detection_query.get_segment_detections_by_video_id(
+                video_id=video.id, filters=filters, taxonomy_id=taxonomy_id, from_frame=from_frame, to_frame=to_frame
+            )
+
+        interval_index = self._detection_index.get_interval_index(
+            video.id, loader=lambda: self._db_segment_detection.get_segment_detections_by_video_id(video_id=video.id)
+        )
+        segment_detections = interval_index.window(from_frame=from_frame, to_frame=to_frame)
+        if taxonomy_id is None:
+            return segment_detections
+        return [segment for segment in segment_detections if segment.taxonomy_id == taxonomy_id]
+
+    def compact_segment_detections(self, video: Video, merge_gap_frames: int) -> SegmentCompactionResponse:
+        """
+        Merge for good the fragmented segment detections of a video.
+        The fragments of the same entity and taxonomy separated by at most `merge_gap_frames` frames are merged into
+        their earliest fragment, which is widened, their detections are moved to it and the other fragments are
+        deleted, all in a single transaction that reads the fragments under a lock of the video.
 
-        return self._db_segment_detection.get_segment_detections_by_video_and_taxonomy(
-            video_id=video_id, taxonomy_id=taxonomy_id
+        Args:
+            video: The video to compact
+            merge_gap_frames: The largest number of frames between two fragments that are merged
+
+        Returns:
+            The number of segment detections of the video before and after the compaction
+        """
+
+        segment_detections, merged, absorbed = self._segment_detection_query.compact_segment_detections(
+            video_id=video.id, merge=lambda segments: self._group_fragments(segments, gap=merge_gap_frames)
         )
+        if absorbed:
+            self._event_bus.publish(
+                ChangeEvent(
+                    topic=ChangeTopic.SegmentDetection,
+                    action=ChangeAction.Updated,
+                    ids=sorted(absorbed),
+                    video_ids=[video.id],
+                )
+            )
+
+        return SegmentCompactionResponse(
+            video_id=video.id, segments_before=len(segment_detections), segments_after=len(merged)
+        )
+
+    def _merge_fragments(
+        self, segment_detections: list[SegmentDetection], filters: Optional[SegmentDetectionFilter]
+    ) -> list[SegmentDetection]:
+        if filters is None or filters.merge_gap_frames is None:
+            return segment_detections
+
+        merged, _ = self._group_fragments(segment_detections, gap=filters.merge_gap_frames)
+        return merged
+
+    @staticmethod
+    def _group_fragments(
+        segment_detections: list[SegmentDetection], gap: int
+    ) -> tuple[list[SegmentDetection], dict[int, int]]:
+        """
+        Merge the segment detections of the same entity and taxonomy separated by at most `gap` frames with a
+        single sorted sweep. Every merged segment keeps the id and uuid of its earliest fragment, and the segment
+        detections missing their entity or taxonomy are kept as they are.
+
+        Returns:
+            The merged segment detections, in the order of their earliest fragment, and the id of the segment
+            detection every absorbed fragment was merged into
+        """
+
+        count = len(segment_detections)
+        if count == 0:
+            return [], {}
+
+        starts = np.fromiter((segment.start_frame for segment in segment_detections), dtype=np.int64, count=count)
+        ends = np.fromiter((segment.end_frame for segment in segment_detections), dtype=np.int64, count=count)
+        # A fragment without an entity or a taxonomy gets a key of its own, so it is never merged
+        keys = np.array(
+            [
+                (segment.entity_id, segment.taxonomy_id)
+                if segment.entity_id is not None and segment.taxonomy_id is not None
+                else (-1 - index, -1)
+                for index, segment in enumerate(segment_detections)
+            ],
+            dtype=np.int64,
+        )
+        labels = label_merged_intervals(starts, ends, gap=gap, keys=keys)
+
+        groups = int(labels.max()) + 1
+        merged_starts = np.full(groups, np.iinfo(np.int64).max)
+        merged_ends = np.full(groups, np.iinfo(np.int64).min)
+        np.minimum.at(merged_starts, labels, starts)
+        np.maximum.at(merged_ends, labels, ends)
+
+        # The earliest fragment of every group survives, the first one of the input on ties
+        by_start = np.lexsort((np.arange(count), starts))
+        _, first = np.unique(labels[by_start], return_index=True)
+        survivors = by_start[first]
+
+        merged = [
+            segment_detections[index].model_copy(
+                update={"start_frame": int(merged_starts[label]), "end_frame": int(merged_ends[label])}
+            )
+            for label, index in sorted(enumerate(survivors.tolist()), key=lambda item: item[1])
+        ]
+        absorbed = {
+            segment_detections[index].id: segment_detections[survivors[label]].id
+            for index, label in enumerate(labels.tolist())
+            if index != survivors[label]
+        }
+        return merged, absorbed
@@ -1,4 +1,6 @@
-from fastapi import HTTPException, status
+import uuid
+
+from fastapi import HTTPException, Response, status
 from video_enrichment_orm.managers.db_taxonomy import db_taxonomy_manager
 from video_enrichment_orm.schemas.taxonomy import (
     Taxonomy,
@@ -6,35 +8,107 @@ from video_enrichment_orm.schemas.taxonomy import (
     TaxonomyUpdate,
 )
 
+from app.core.enums import BulkItemStatus, CacheNamespace, ChangeAction, ChangeTopic
+from app.managers.cache.lookup import IdentityMap
+from app.managers.cache.response import response_cache
+from app.managers.db.taxonomy import taxonomy_query_manager
+from app.managers.events.bus import event_bus
+from app.managers.index.taxonomy import taxonomy_tree_manager
+from app.schemas.batch import (
+    BatchLookupRequest,
+    BatchLookupResponse,
+    BulkItemResult,
+    BulkResponse,
+)
+from app.schemas.events import ChangeEvent
+from app.schemas.taxonomy import TaxonomyBulkCreateRequest, TaxonomyNode
+
 
 class TaxonomyManager:
     def __init__(self) -> None:
         self._db_taxonomy = db_taxonomy_manager
+        self._taxonomy_query = taxonomy_query_manager
+        self._taxonomy_tree = taxonomy_tree_manager
+        self._event_bus = event_bus
+        self._response_cache = response_cache
+        self._identity_map = IdentityMap()
 
-    def get_all_taxonomies(self) -> list[Taxonomy]:
-        return self._db_taxonomy.get_taxonomies()
+    def get_all_taxonomies(self) -> Response:
+        return self._response_cache.get_or_set(
+            CacheNamespace.Taxonomy, "all", loader=self._db_taxonomy.get_taxonomies, response_model=list[Taxonomy]
+        )
 
     def get_taxonomy_by_id(self, taxonomy_id: int) -> Taxonomy:
         try:
-            taxonomy = self._db_taxonomy.get_taxonomy_by_id(taxonomy_id=taxonomy_id)
+            taxonomy = self._identity_map.get_or_load(
+                ChangeTopic.Taxonomy,
+                ("id", taxonomy_id),
+                lambda: self._db_taxonomy.get_taxonomy_by_id(taxonomy_id=taxonomy_id),
+            )
             return taxonomy
         except ValueError as e:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
 
     def get_taxonomy_by_uuid(self, taxonomy_uuid: str) -> Taxonomy:
         try:
-            taxonomy = self._db_taxonomy.get_taxonomy_by_uuid(taxonomy_uuid=taxonomy_uuid)
+            taxonomy = self._identity_map.get_or_load(
+                ChangeTopic.Taxonomy,
+                ("uuid", taxonomy_uuid),
+                lambda: self._db_taxonomy.get_taxonomy_by_uuid(taxonomy_uuid=taxonomy_uuid),
+            )
             return taxonomy
         except ValueError as e:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
 
+    def get_taxonomy_response_by_uuid(self, taxonomy_uuid: str) -> Response:
+        return self._response_cache.get_or_set(
+            CacheNamespace.Taxonomy,
+            self._response_cache.make_key("by-uuid", taxonomy_uuid=taxonomy_uuid),
+            loader=lambda: self.get_taxonomy_by_uuid(taxonomy_uuid=taxonomy_uuid),
+            response_model=Taxonomy,
+        )
+
+    def get_taxonomies_batch(self, request: BatchLookupRequest) -> BatchLookupResponse[Taxonomy]:
+        """
+        Get the taxonomies of the ids or uuids with a single IN query.
+
+        Args:
+            request: The ids or uuids to look up
+
+        Returns:
+            The taxonomies found, in the order of the requested keys, and the keys not found
+        """
+
+        taxonomies = self._taxonomy_query.get_taxonomies_by_keys(key=request.key, keys=request.keys)
+        return BatchLookupResponse[Taxonomy].from_rows(request, taxonomies)
+
+    def get_taxonomy_tree(self) -> list[TaxonomyNode]:
+        """Get all the taxonomies nested under their parents, served from the per-worker taxonomy tree."""
+        return self._taxonomy_tree.get_tree().get_forest()
+
+    def get_taxonomy_subtree(self, taxonomy_uuid: str) -> TaxonomyNode:
+        """Get the taxonomy with all its descendants nested, served from the per-worker taxonomy tree."""
+        tree = self._taxonomy_tree.get_tree()
+        return tree.get_subtree(self._get_tree_taxonomy_id(tree, taxonomy_uuid))
+
+    def get_taxonomy_ancestors(self, taxonomy_uuid: str) -> list[Taxonomy]:
+        """Get the ancestors of the taxonomy from the root down to its parent, served from the per-worker taxonomy tree."""
+        tree = self._taxonomy_tree.get_tree()
+        return tree.get_ancestors(self._get_tree_taxonomy_id(tree, taxonomy_uuid))
+
+    @staticmethod
+    def _get_tree_taxonomy_id(tree, taxonomy_uuid: str) -> int:
+        taxonomy_id = tree.get_id_by_uuid(taxonomy_uuid)
+        if taxonomy_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail=f"Taxonomy with uuid {taxonomy_uuid} not found"
+            )
+        return taxonomy_id
+
     def save_taxonomy(self, taxonomy: TaxonomyCreate) -> Taxonomy:
         # Check if taxonomy exists
         if taxonomy.taxonomy_id:
-            try:
-                self._db_taxonomy.get_taxonomy_by_id(taxonomy_id=taxonomy.taxonomy_id)
-            except ValueError as e:
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
+            self.get_taxonomy_by_id(taxonomy_id=taxonomy.taxonomy_id)
 
         taxonomy_request = TaxonomyCreate(
             uuid=taxonomy.uuid,
@@ -43,17 +117,156 @@ class TaxonomyManager:
         )
 
         taxonomy = self._db_taxonomy.save_taxonomy(taxonomy=taxonomy_request)
+        self._invalidate_cache()
+        self._event_bus.publish(ChangeEvent(topic=ChangeTopic.Taxonomy, action=ChangeAction.Created, ids=[taxonomy.id]))
         return taxonomy
 
+    def save_taxonomies_bulk(self, request: TaxonomyBulkCreateRequest) -> BulkResponse:
+        """
+        Create many taxonomies at once.
+        The existing parents referenced by the items are checked with a single query, and an item can also have as
+        parent another item of the request by its uuid. The items whose parent does not exist are reported as failed,
+        the rest are inserted level by level in a single transaction, with one INSERT per level, where an item whose
+        uuid already exists, in the database or earlier in the request, is reported as failed without failing the
+        others, and so are its descendants.
+
+        Args:
+            request: The taxonomies to create
+
+        Returns:
+            The outcome of every item, in the order of the request
+        """
+
+        parent_ids = sorted({item.taxonomy_id for item in request.items if item.taxonomy_id})
+        existing_ids = (
+            {taxonomy.id for taxonomy in self._taxonomy_query.get_taxonomies_by_keys(key="id", keys=parent_ids)}
+            if parent_ids
+            else set()
+        )
+
+        results: list[BulkItemResult] = [None] * len(request.items)
+        valid = []
+        for index, item in enumerate(request.items):
+            if item.taxonomy_id and item.taxonomy_id not in existing_ids:
+                results[index] = BulkItemResult(
+                    index=index, status=BulkItemStatus.Failed, detail=f"Taxonomy with id {item.taxonomy_id} not found"
+                )
+            else:
+                valid.append(index)
+
+        rows = {index: request.items[index].model_dump() for index in valid}
+        for row in rows.values():
+            row["uuid"] = row["uuid"] or str(uuid.uuid4())
+
+        levels = self._get_bulk_levels(rows)
+        request_uuids = {item.uuid for item in request.items if item.uuid}
+        for index in valid:
+            if index not in levels:
+                # The parent is missing, failed, or one of its ancestors is missing, failed or forms a cycle
+                parent_uuid = rows[index]["parent_uuid"]
+                detail = (
+                    f"Parent taxonomy with uuid {parent_uuid} not found in the request"
+                    if parent_uuid not in request_uuids
+                    else f"Parent taxonomy with uuid {parent_uuid} was not created"
+                )
+                results[index] = BulkItemResult(index=index, status=BulkItemStatus.Failed, detail=detail)
+
+        indices_by_level = [[] for _ in range(max(levels.values(), default=-1) + 1)]
+        for index, level in sorted(levels.items()):
+            indices_by_level[level].append(index)
+
+        taxonomies = []
+        created_uuids = set()
+        if indices_by_level:
+            inserted = self._taxonomy_query.insert_taxonomy_levels(
+                [[rows[index] for index in indices] for indices in indices_by_level]
+            )
+            for indices, level_taxonomies in zip(indices_by_level, inserted):
+                for index, taxonomy in zip(indices, level_taxonomies):
+                    if taxonomy is None:
+                        parent_uuid = rows[index]["parent_uuid"]
+                        detail = (
+                            f"Parent taxonomy with uuid {parent_uuid} was not created"
+                            if parent_uuid and parent_uuid not in created_uuids
+                            else f"Taxonomy with uuid {rows[index]['uuid']} already exists"
+                        )
+                        results[index] = BulkItemResult(index=index, status=BulkItemStatus.Failed, detail=detail)
+                    else:
+                        taxonomies.append(taxonomy)
+                        created_uuids.add(taxonomy.uuid)
+                        results[index] = BulkItemResult(
+                            index=index, status=BulkItemStatus.Created, id=taxonomy.id, uuid=taxonomy.uuid
+                        )
+
+        if taxonomies:
+            self._invalidate_cache()
+            self._event_bus.publish(
+                ChangeEvent(
+                    topic=ChangeTopic.Taxonomy,
+                    action=ChangeAction.Created,
+                    ids=[taxonomy.id for taxonomy in taxonomies],
+                )
+            )
+
+        return BulkResponse.from_results(results)
+
+    @staticmethod
+    def _get_bulk_levels(rows: dict[int, dict]) -> dict[int, int]:
+        """
+        The level of every bulk row, 0 for the rows without parent_uuid and one more than its parent for the others.
+        A uuid repeated in the request refers to its first row. The rows whose parent_uuid is not the uuid of
+        another row, or whose ancestors form a cycle, get no level.
+        """
+
+        index_by_uuid = {}
+        for index, row in rows.items():
+            index_by_uuid.setdefault(row["uuid"], index)
+
+        levels = {index: 0 for index, row in rows.items() if not row["parent_uuid"]}
+        pending = [index for index in rows if index not in levels]
+        while pending:
+            unresolved = []
+            for index in pending:
+                parent_index = index_by_uuid.get(rows[index]["parent_uuid"])
+                if parent_index in levels:
+                    levels[index] = levels[parent_index] + 1
+                else:
+                    unresolved.append(index)
+            if len(unresolved) == len(pending):
+                break
+            pending = unresolved
+        return levels
+
     def update_taxonomy_by_uuid(self, taxonomy_uuid: str, taxonomy_update: TaxonomyUpdate) -> Taxonomy:
         try:
             taxonomy = self._db_taxonomy.update_taxonomy(taxonomy_update=taxonomy_update, uuid=taxonomy_uuid)
-            return taxonomy
         except ValueError as e:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
 
+        self._invalidate_cache()
+        self._event_bus.publish(ChangeEvent(topic=ChangeTopic.Taxonomy, action=ChangeAction.Updated, ids=[taxonomy.id]))
+        return taxonomy
+
     def delete_taxonomy_by_id(self, taxonomy_id: int) -> None:
-        return self._db_taxonomy.delete_taxonomy_by_id(taxonomy_id=taxonomy_id)
+        deleted = self._db_taxonomy.delete_taxonomy_by_id(taxonomy_id=taxonomy_id)
+        self._invalidate_cache()
+        self._event_bus.publish(ChangeEvent(topic=ChangeTopic.Taxonomy, action=ChangeAction.Deleted, ids=[taxonomy_id]))
+        return deleted
 
     def delete_taxonomy_by_uuid(self, taxonomy_uuid: str) -> None:
-        return self._db_taxonomy.delete_taxonomy_by_uuid(taxonomy_uuid=taxonomy_uuid)
+        # The id is looked up before the row is gone, the event handlers work on ids
+        taxonomies = self._taxonomy_query.get_taxonomies_by_keys(key="uuid", keys=[taxonomy_uuid])
+        deleted = self._db_taxonomy.delete_taxonomy_by_uuid(taxonomy_uuid=taxonomy_uuid)
+        self._invalidate_cache()
+        self._event_bus.publish(
+            ChangeEvent(
+                topic=ChangeTopic.Taxonomy,
+                action=ChangeAction.Deleted,
+                ids=[taxonomy.id for taxonomy in taxonomies],
+            )
+        )
+        return deleted
+
+    def _invalidate_cache(self) -> None:
+        # Entities by taxonomy depend on the taxonomy tree as well
+        self._response_cache.invalidate(CacheNamespace.Taxonomy, CacheNamespace.Entity)
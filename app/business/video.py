@@ -1,9 +1,11 @@
 import os
 import tempfile
 import uuid
+from typing import Optional
 
 import cv2
-from fastapi import HTTPException, UploadFile, status
+from fastapi import HTTPException, Response, UploadFile, status
+from video_enrichment_orm.managers.db_detection import db_detection_manager
 from video_enrichment_orm.managers.db_segment_detection import (
     db_segment_detection_manager,
 )
@@ -11,58 +13,255 @@ from video_enrichment_orm.managers.db_video import db_video_manager
 from video_enrichment_orm.schemas.video import Video, VideoCreate
 
 from app.core.config import settings
+from app.core.enums import CacheNamespace, ChangeAction, ChangeTopic, VideoExpansion
 from app.managers.aws.s3 import s3_manager
+from app.managers.cache.lookup import IdentityMap
+from app.managers.cache.response import response_cache
+from app.managers.cache.snapshot import snapshot_store
+from app.managers.db.entity import entity_query_manager
+from app.managers.db.segment_detection import segment_detection_query_manager
+from app.managers.db.taxonomy import taxonomy_query_manager
+from app.managers.db.video import video_query_manager
+from app.managers.events.bus import event_bus
+from app.managers.index.inverted import inverted_index_manager
+from app.managers.index.timeline import PresenceTimeline, timeline_manager
+from app.schemas.batch import BatchLookupRequest, BatchLookupResponse
+from app.schemas.events import ChangeEvent
+from app.schemas.snapshot import SnapshotManifest
+from app.schemas.video import VideoDetail, VideoTimeline
 
 
 class VideoManager:
     def __init__(self) -> None:
         self._db_video = db_video_manager
         self._db_segment_detection = db_segment_detection_manager
-
-    def get_all_videos(self) -> list[Video]:
-        return self._db_video.get_videos()
+        self._db_detection = db_detection_manager
+        self._video_query = video_query_manager
+        self._entity_query = entity_query_manager
+        self._taxonomy_query = taxonomy_query_manager
+        self._segment_detection_query = segment_detection_query_manager
+        self._inverted_index = inverted_index_manager
+        self._timeline = timeline_manager
+        self._snapshot_store = snapshot_store
+        self._event_bus = event_bus
+        self._response_cache = response_cache
+        self._identity_map = IdentityMap()
+
+    def get_all_videos(self) -> Response:
+        return self._response_cache.get_or_set(
+            CacheNamespace.Video, "all", loader=self._db_video.get_videos, response_model=list[Video]
+        )
 
     def get_video_by_id(self, video_id: int) -> Video:
-        video = self._db_video.get_video_by_id(video_id=video_id)
+        try:
+            video = self._identity_map.get_or_load(
+                ChangeTopic.Video, ("id", video_id), lambda: self._db_video.get_video_by_id(video_id=video_id)
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
         if not video:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Video {video_id} not found")
 
         return video
 
     def get_video_by_uuid(self, video_uuid: str) -> Video:
-        video = self._db_video.get_video_by_uuid(video_uuid=video_uuid)
+        video = self._identity_map.get_or_load(
+            ChangeTopic.Video, ("uuid", video_uuid), lambda: self._db_video.get_video_by_uuid(video_uuid=video_uuid)
+        )
         if not video:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Video {video_uuid} not found")
 
         return video
 
-    def get_videos_by_entity_ids(self, entity_ids: list[int]) -> list[Video]:
+    def get_video_response_by_uuid(self, video_uuid: str) -> Response:
+        return self._response_cache.get_or_set(
+            CacheNamespace.Video,
+            self._response_cache.make_key("by-uuid", video_uuid=video_uuid),
+            loader=lambda: self.get_video_by_uuid(video_uuid=video_uuid),
+            response_model=Video,
+        )
+
+    def get_videos_batch(self, request: BatchLookupRequest) -> BatchLookupResponse[Video]:
+        """
+        Get the videos of the ids or uuids with a single IN query.
+
+        Args:
+            request: The ids or uuids to look up
+
+        Returns:
+            The videos found, in the order of the requested keys, and the keys not found
+        """
+
+        videos = self._video_query.get_videos_by_keys(key=request.key, keys=request.keys)
+        return BatchLookupResponse[Video].from_rows(request, videos)
+
+    def get_video_detail(self, video_uuid: str, expand: str) -> VideoDetail:
+        """
+        Get a video with its related data embedded in a single document.
+        Every expansion is loaded with one batched query whatever the number of segments, so the detail costs
+        at most five queries: the video, its segment detections, its detections and the entities and taxonomies
+        referenced by the segment detections, each fetched with a single IN query.
+
+        Args:
+            video_uuid: The uuid of the video
+            expand: Comma separated expansions among "segments", "detections", "entities" and "taxonomies"
+
+        Returns:
+            The video with the requested expansions, ordered by id
+        """
+
+        expansions = self._parse_expand(expand)
+        video = self.get_video_by_uuid(video_uuid=video_uuid)
+        detail = VideoDetail(**video.model_dump())
+
+        segments = None
+        if expansions & {VideoExpansion.Segments, VideoExpansion.Entities, VideoExpansion.Taxonomies}:
+            # Loaded once and shared by the entity and taxonomy expansions
+            segments = self._db_segment_detection.get_segment_detections_by_video_id(video_id=video.id)
+
+        if VideoExpansion.Segments in expansions:
+            detail.segments = segments
+        if VideoExpansion.Detections in expansions:
+            detail.detections = self._db_detection.get_detections_by_video_id(video_id=video.id)
+        if VideoExpansion.Entities in expansions:
+            entity_ids = sorted({segment.entity_id for segment in segments})
+            detail.entities = self._entity_query.get_entities_by_ids(entity_ids) if entity_ids else []
+        if VideoExpansion.Taxonomies in expansions:
+            taxonomy_ids = sorted({segment.taxonomy_id for segment in segments})
+            detail.taxonomies = self._taxonomy_query.get_taxonomies_by_ids(taxonomy_ids) if taxonomy_ids else []
+
+        return detail
+
+    @staticmethod
+    def _parse_expand(expand: str) -> set[VideoExpansion]:
+        expansions = set()
+        for value in filter(None, (value.strip().lower() for value in expand.split(","))):
+            try:
+                expansions.add(VideoExpansion(value))
+            except ValueError as e:
+                allowed = ", ".join(expansion.value for expansion in VideoExpansion)
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Invalid expansion {value!r}, allowed values are {allowed}",
+                ) from e
+        return expansions
+
+    def get_videos_by_entity_ids(self, entity_ids: list[int], offset: int = 0, limit: int = 100) -> list[Video]:
         """
         Get videos that contain detections of the specified entities.
 
         Args:
             entity_ids: List of entity IDs to filter by
+            offset: Number of videos to skip
+            limit: Maximum number of videos to return
 
         Returns:
-            List of videos that contain detections of the specified entities
+            Page of the videos, ordered by id, that contain detections of the specified entities
         """
 
         if not entity_ids:
             return []
 
-        # Get all segment detections for the specified entities
-        segment_detections = self._db_segment_detection.get_segment_detections_by_entity_ids(entity_ids=entity_ids)
-
-        # Extract unique video IDs from segment detections
-        video_ids = list({detection.video_id for detection in segment_detections})
+        if not settings.INVERTED_INDEX_ENABLED:
+            return self._video_query.get_videos_by_entity_ids(entity_ids=entity_ids, offset=offset, limit=limit)
 
-        if not video_ids:
+        # Resolved from the inverted index, only the page of videos is read from the database
+        video_ids = self._inverted_index.get_videos_by_entity_ids(entity_ids).to_ids()[offset : offset + limit]
+        if len(video_ids) == 0:
             return []
 
-        # Get videos by IDs
-        videos = self._db_video.get_videos_by_ids(video_ids)
+        videos = self._db_video.get_videos_by_ids(video_ids.tolist())
+        return sorted(videos, key=lambda video: video.id)
 
-        return videos
+    def get_video_timeline(
+        self,
+        video_uuid: str,
+        bin_seconds: int = 1,
+        entity_ids: Optional[list[int]] = None,
+        taxonomy_ids: Optional[list[int]] = None,
+    ) -> VideoTimeline:
+        """
+        Get the presence of the entities and taxonomies of a video, binned every bin_seconds seconds.
+        The per-second presence is computed once per video and stored next to the video in S3, and the timelines
+        of the recently queried videos are kept in memory, so the timeline does not depend on the detection counts.
+
+        Args:
+            video_uuid: The video UUID
+            bin_seconds: The seconds aggregated in every bin
+            entity_ids: Only these entities, all of them when None
+            taxonomy_ids: Only these taxonomies, all of them when None
+
+        Returns:
+            The frames on screen per bin of every entity and taxonomy
+        """
+
+        video = self.get_video_by_uuid(video_uuid=video_uuid)
+        if not video.frame_rate:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=f"Video {video_uuid} has no frame rate for a timeline"
+            )
+
+        timeline = self._timeline.get_timeline(video.id, loader=lambda: self._load_timeline(video))
+        return VideoTimeline(
+            video_id=video.id,
+            frame_rate=video.frame_rate,
+            bin_seconds=bin_seconds,
+            bins=timeline.bins(bin_seconds),
+            entities=timeline.entities(bin_seconds, entity_ids=entity_ids),
+            taxonomies=timeline.taxonomies(bin_seconds, taxonomy_ids=taxonomy_ids),
+        )
+
+    def _load_timeline(self, video: Video) -> PresenceTimeline:
+        # The stored timeline is reused while the segment detections it was built from are unchanged
+        fingerprint = self._segment_detection_query.get_segment_fingerprint(video_id=video.id)
+        bucket, key = s3_manager.decode_path(f"{os.path.dirname(video.path)}/{settings.TIMELINE_FILE_NAME}")
+        if s3_manager.exists(bucket, key):
+            content = s3_manager.download_object(bucket, key)
+            if content:
+                timeline = PresenceTimeline.from_bytes(content)
+                if timeline.fingerprint == fingerprint and timeline.frame_rate == video.frame_rate:
+                    return timeline
+
+        timeline = PresenceTimeline.build(
+            self._db_segment_detection.get_segment_detections_by_video_id(video_id=video.id),
+            frame_rate=video.frame_rate,
+            frames=video.frames,
+            fingerprint=fingerprint,
+        )
+        s3_manager.upload_object(bucket, key, timeline.to_bytes())
+        return timeline
+
+    def publish_video_snapshot(self, video_uuid: str) -> SnapshotManifest:
+        """
+        Publish a snapshot of the segment detections and detections of a video, served by the detection endpoints
+        instead of the database while no detection of the video is written.
+
+        Args:
+            video_uuid: The video UUID
+
+        Returns:
+            The manifest of the published snapshot
+        """
+
+        video = self.get_video_by_uuid(video_uuid=video_uuid)
+
+        # Taken before reading the rows, so a write in between leaves the snapshot stale instead of wrong
+        fingerprint = self._snapshot_store.get_fingerprint(video.id)
+        manifest = self._snapshot_store.publish(
+            video,
+            fingerprint=fingerprint,
+            segment_detections=self._db_segment_detection.get_segment_detections_by_video_id(video_id=video.id),
+            detections=self._db_detection.get_detections_by_video_id(video_id=video.id),
+        )
+        if manifest is None:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to upload snapshot to S3"
+            )
+
+        self._event_bus.publish(
+            ChangeEvent(topic=ChangeTopic.Snapshot, action=ChangeAction.Created, video_ids=[video.id])
+        )
+        return manifest
 
     def get_video_thumbnail(self, video_uuid: str) -> bytes:
         """Get video thumbnail from S3 by video UUID."""
@@ -139,6 +338,8 @@ class VideoManager:
         )
 
         video = self._db_video.save_video(video=video_request)
+        self._response_cache.invalidate(CacheNamespace.Video)
+        self._event_bus.publish(ChangeEvent(topic=ChangeTopic.Video, action=ChangeAction.Created, ids=[video.id]))
 
         return video
 
@@ -213,17 +414,25 @@ class VideoManager:
         )
 
         video = self._db_video.save_video(video=video_request)
+        self._response_cache.invalidate(CacheNamespace.Video)
+        self._event_bus.publish(ChangeEvent(topic=ChangeTopic.Video, action=ChangeAction.Created, ids=[video.id]))
         return video
 
     def delete_video_by_id(self, video_id: int) -> None:
         self.delete_video_from_s3(video_id=video_id)
-        return self._db_video.delete_video_by_id(video_id=video_id)
+        deleted = self._db_video.delete_video_by_id(video_id=video_id)
+        self._response_cache.invalidate(CacheNamespace.Video)
+        self._event_bus.publish(ChangeEvent(topic=ChangeTopic.Video, action=ChangeAction.Deleted, ids=[video_id]))
+        return deleted
 
     def delete_video_by_uuid(self, video_uuid: str) -> None:
-        self.delete_video_from_s3(video_uuid=video_uuid)
-        return self._db_video.delete_video_by_uuid(video_uuid=video_uuid)
+        video = self.delete_video_from_s3(video_uuid=video_uuid)
+        deleted = self._db_video.delete_video_by_uuid(video_uuid=video_uuid)
+        self._response_cache.invalidate(CacheNamespace.Video)
+        self._event_bus.publish(ChangeEvent(topic=ChangeTopic.Video, action=ChangeAction.Deleted, ids=[video.id]))
+        return deleted
 
-    def delete_video_from_s3(self, video_id: int = None, video_uuid: str = None) -> None:
+    def delete_video_from_s3(self, video_id: int = None, video_uuid: str = None) -> Video:
         if video_id:
             video = self.get_video_by_id(video_id=video_id)
             if not video:
@@ -239,3 +448,4 @@ class VideoManager:
 
         bucket, key = s3_manager.decode_path(video_path)
         s3_manager.delete_object(bucket, key)
+        return video
@@ -0,0 +1,267 @@
+import math
+from collections import Counter, defaultdict
+from datetime import date
+
+import numpy as np
+from video_enrichment_orm.managers.db_video import db_video_manager
+from video_enrichment_orm.schemas.video import Video
+
+from app.core.config import settings
+from app.core.dates import parse_video_code_date
+from app.core.intervals import expand_intervals, intersect_intervals, merge_intervals
+from app.core.postings import PostingList
+from app.managers.db.segment_detection import segment_detection_query_manager
+from app.managers.db.video import video_query_manager
+from app.managers.index.inverted import inverted_index_manager, normalize_extension
+from app.schemas.video import (
+    CoOccurrence,
+    FacetCount,
+    VideoFacetRequest,
+    VideoFacetResponse,
+    VideoFacets,
+    VideoSearchRequest,
+)
+
+
+class VideoSearchManager:
+    def __init__(self) -> None:
+        self._db_video = db_video_manager
+        self._segment_detection_query = segment_detection_query_manager
+        self._video_query = video_query_manager
+        self._inverted_index = inverted_index_manager
+
+    def search_videos(self, search: VideoSearchRequest) -> list[Video]:
+        """
+        Search the videos matching the boolean and co-occurrence constraints.
+        The presence of every referenced entity and taxonomy is resolved first on video posting lists, then the co-occurrences
+        are checked only on the remaining candidates by intersecting their sorted segment intervals.
+
+        Args:
+            search: The boolean and co-occurrence constraints and the page to return
+
+        Returns:
+            Page of the matching videos, ordered by id
+        """
+
+        video_ids = self._match_presence(search).to_ids().tolist()
+        if search.together and video_ids:
+            video_ids = self._match_co_occurrences(video_ids=video_ids, together=search.together)
+
+        page = video_ids[search.offset : search.offset + search.limit]
+        if not page:
+            return []
+
+        videos = self._db_video.get_videos_by_ids(page)
+        return sorted(videos, key=lambda video: video.id)
+
+    def search_video_facets(self, search: VideoFacetRequest) -> VideoFacetResponse:
+        """
+        Faceted search of the videos, resolved and counted on the posting lists of the inverted index.
+        With the index disabled, it is resolved in the database instead, see `_search_video_facets_in_db`.
+        Entity and taxonomy counts are drill-downs under the whole filter, while date and extension
+        counts leave out their own filter so the alternative dates and extensions are still counted.
+
+        Args:
+            search: The entity, taxonomy, extension and date filters, the facet size and the page to return
+
+        Returns:
+            The total of matching videos, the page of videos ordered by id and the facet counts
+        """
+
+        if not settings.INVERTED_INDEX_ENABLED:
+            return self._search_video_facets_in_db(search)
+
+        index = self._inverted_index
+        terms = [index.get_entity_videos(entity_id) for entity_id in search.entity_ids] + [
+            index.get_taxonomy_videos(taxonomy_id) for taxonomy_id in search.taxonomy_ids
+        ]
+        by_terms = PostingList.intersection([index.get_all_videos(), *terms])
+        by_extensions = (
+            PostingList.union(index.get_extension_videos(extension) for extension in search.extensions)
+            if search.extensions
+            else None
+        )
+        by_dates = (
+            index.get_videos_by_dates(from_date=search.from_date, to_date=search.to_date)
+            if search.from_date or search.to_date
+            else None
+        )
+
+        without_dates = by_terms if by_extensions is None else by_terms & by_extensions
+        without_extensions = by_terms if by_dates is None else by_terms & by_dates
+        video_ids = without_dates if by_dates is None else without_dates & by_dates
+
+        facets = VideoFacets(
+            entities=self._top_facets(index.count_facets("entity", video_ids), search.facet_size),
+            taxonomies=self._top_facets(index.count_facets("taxonomy", video_ids), search.facet_size),
+            dates=self._top_facets(index.count_facets("date", without_dates), search.facet_size),
+            extensions=self._top_facets(index.count_facets("extension", without_extensions), search.facet_size),
+        )
+
+        return self._get_facet_response(search, video_ids=video_ids.to_ids().tolist(), facets=facets)
+
+    def _search_video_facets_in_db(self, search: VideoFacetRequest) -> VideoFacetResponse:
+        """
+        Faceted search without the inverted index. The entity and taxonomy filters are semi-joins of the query
+        of the date and extension fields of the videos, the date and extension filters and counts are applied on
+        those fields, and the entity and taxonomy counts are grouped in the database over the matching videos.
+        """
+
+        fields = {
+            video_id: (parse_video_code_date(code), normalize_extension(extension))
+            for video_id, code, extension in self._video_query.get_video_facet_fields(
+                entity_ids=search.entity_ids, taxonomy_ids=search.taxonomy_ids
+            )
+        }
+        extensions = {normalize_extension(extension) for extension in search.extensions}
+        without_dates = [
+            video_id for video_id, (_, extension) in fields.items() if not extensions or extension in extensions
+        ]
+        without_extensions = [
+            video_id
+            for video_id, (video_date, _) in fields.items()
+            if not (search.from_date or search.to_date)
+            or (
+                video_date is not None
+                and (search.from_date is None or video_date >= search.from_date)
+                and (search.to_date is None or video_date <= search.to_date)
+            )
+        ]
+        video_ids = sorted(set(without_dates).intersection(without_extensions))
+
+        date_counts = Counter(fields[video_id][0] for video_id in without_dates if fields[video_id][0] is not None)
+        extension_counts = Counter(fields[video_id][1] for video_id in without_extensions)
+        facets = VideoFacets(
+            entities=self._top_facets(
+                self._segment_detection_query.count_videos_by_entity(video_ids), search.facet_size
+            ),
+            taxonomies=self._top_facets(
+                self._segment_detection_query.count_videos_by_taxonomy(video_ids), search.facet_size
+            ),
+            dates=self._top_facets(date_counts, search.facet_size),
+            extensions=self._top_facets(extension_counts, search.facet_size),
+        )
+        return self._get_facet_response(search, video_ids=video_ids, facets=facets)
+
+    def _get_facet_response(
+        self, search: VideoFacetRequest, video_ids: list[int], facets: VideoFacets
+    ) -> VideoFacetResponse:
+        page = video_ids[search.offset : search.offset + search.limit]
+        videos = sorted(self._db_video.get_videos_by_ids(page), key=lambda video: video.id) if page else []
+        return VideoFacetResponse(total=len(video_ids), videos=videos, facets=facets)
+
+    @staticmethod
+    def _top_facets(counts: dict, size: int) -> list[FacetCount]:
+        top = sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))[:size]
+        return [
+            FacetCount(value=value.isoformat() if isinstance(value, date) else value, count=count)
+            for value, count in top
+        ]
+
+    def _match_presence(self, search: VideoSearchRequest) -> PostingList:
+        """
+        Apply the AND/OR/NOT terms over the posting lists of the videos each entity and taxonomy appears in.
+        Every entity or taxonomy taking part in a co-occurrence is required as well.
+        """
+
+        together_entity_ids = [entity_id for co_occurrence in search.together for entity_id in co_occurrence.entity_ids]
+        together_taxonomy_ids = [
+            taxonomy_id for co_occurrence in search.together for taxonomy_id in co_occurrence.taxonomy_ids
+        ]
+        entity_videos, taxonomy_videos = self._get_video_posting_lists(
+            entity_ids={*search.all_entity_ids, *search.any_entity_ids, *search.not_entity_ids, *together_entity_ids},
+            taxonomy_ids={
+                *search.all_taxonomy_ids,
+                *search.any_taxonomy_ids,
+                *search.not_taxonomy_ids,
+                *together_taxonomy_ids,
+            },
+        )
+
+        required = [entity_videos[entity_id] for entity_id in [*search.all_entity_ids, *together_entity_ids]] + [
+            taxonomy_videos[taxonomy_id] for taxonomy_id in [*search.all_taxonomy_ids, *together_taxonomy_ids]
+        ]
+        optional = [entity_videos[entity_id] for entity_id in search.any_entity_ids] + [
+            taxonomy_videos[taxonomy_id] for taxonomy_id in search.any_taxonomy_ids
+        ]
+        excluded = [entity_videos[entity_id] for entity_id in search.not_entity_ids] + [
+            taxonomy_videos[taxonomy_id] for taxonomy_id in search.not_taxonomy_ids
+        ]
+
+        video_ids = PostingList.intersection(required) if required else PostingList.union(optional)
+        if required and optional:
+            video_ids &= PostingList.union(optional)
+        return video_ids - PostingList.union(excluded)
+
+    def _get_video_posting_lists(
+        self, entity_ids: set[int], taxonomy_ids: set[int]
+    ) -> tuple[dict[int, PostingList], dict[int, PostingList]]:
+        """
+        Get the posting lists of the videos each entity and taxonomy appears in, from the inverted index when enabled.
+        """
+
+        if settings.INVERTED_INDEX_ENABLED:
+            return (
+                {entity_id: self._inverted_index.get_entity_videos(entity_id) for entity_id in entity_ids},
+                {taxonomy_id: self._inverted_index.get_taxonomy_videos(taxonomy_id) for taxonomy_id in taxonomy_ids},
+            )
+
+        by_entity = self._segment_detection_query.get_video_ids_by_entity_ids(list(entity_ids))
+        by_taxonomy = self._segment_detection_query.get_video_ids_by_taxonomy_ids(list(taxonomy_ids))
+        return (
+            {entity_id: PostingList.from_ids(by_entity[entity_id]) for entity_id in entity_ids},
+            {taxonomy_id: PostingList.from_ids(by_taxonomy[taxonomy_id]) for taxonomy_id in taxonomy_ids},
+        )
+
+    def _match_co_occurrences(self, video_ids: list[int], together: list[CoOccurrence]) -> list[int]:
+        """
+        Keep the videos in which every co-occurrence happens at least once.
+        """
+
+        entity_ids = list({entity_id for co_occurrence in together for entity_id in co_occurrence.entity_ids})
+        taxonomy_ids = list({taxonomy_id for co_occurrence in together for taxonomy_id in co_occurrence.taxonomy_ids})
+        rows = self._segment_detection_query.get_segment_intervals(
+            video_ids=video_ids, entity_ids=entity_ids, taxonomy_ids=taxonomy_ids
+        )
+
+        intervals = defaultdict(lambda: defaultdict(lambda: ([], [])))
+        frame_rates = {}
+        for video_id, entity_id, taxonomy_id, start_frame, end_frame, frame_rate in rows:
+            frame_rates[video_id] = frame_rate
+            for key in (("entity", entity_id), ("taxonomy", taxonomy_id)):
+                starts, ends = intervals[video_id][key]
+                starts.append(start_frame)
+                ends.append(end_frame)
+
+        return [
+            video_id
+            for video_id in video_ids
+            if all(
+                self._co_occurs(intervals[video_id], co_occurrence, frame_rate=frame_rates.get(video_id))
+                for co_occurrence in together
+            )
+        ]
+
+    @staticmethod
+    def _co_occurs(intervals: dict, co_occurrence: CoOccurrence, frame_rate: float) -> bool:
+        """
+        Check whether all the participants are on screen within `within_seconds` of each other at some point.
+        Widening every participant by half the tolerance reduces the check to a plain intersection.
+        """
+
+        keys = [("entity", entity_id) for entity_id in co_occurrence.entity_ids] + [
+            ("taxonomy", taxonomy_id) for taxonomy_id in co_occurrence.taxonomy_ids
+        ]
+        half_tolerance = math.ceil(co_occurrence.within_seconds * (frame_rate or 0) / 2)
+
+        common = None
+        for key in keys:
+            if key not in intervals:
+                return False
+            starts, ends = intervals[key]
+            starts, ends = merge_intervals(np.array(starts), np.array(ends))
+            starts, ends = expand_intervals(starts, ends, frames=half_tolerance)
+            common = (starts, ends) if common is None else intersect_intervals(*common, starts, ends)
+            if len(common[0]) == 0:
+                return False
+        return True
@@ -1,4 +1,5 @@
 import logging
+from typing import Literal
 
 from pydantic import model_validator
 from pydantic_settings import SettingsConfigDict
@@ -35,6 +36,68 @@ class Settings(ORMSettings):
     S3_GALLERY_PATH: str = "gallery"
     S3_VIDEO_PATH: str = "videos"
 
+    # Detection index configuration
+    DETECTION_INDEX_CACHE_SIZE: int = 64
+    DETECTION_INDEX_CACHE_TTL: int = 300
+    # Interval indexes of the analytics requests, kept apart so the wide requests do not evict the ones above
+    ANALYTICS_INDEX_CACHE_SIZE: int = 1024
+
+    # Columnar detection cache, memory-mapped files per video in a local directory shared by the workers
+    DETECTION_COLUMNAR_ENABLED: bool = True
+    DETECTION_COLUMNAR_PATH: str = "/tmp/video-enrichment-api/detections"
+    DETECTION_COLUMNAR_MAX_BYTES: int = 2147483648
+    # No longer than DETECTION_INDEX_CACHE_TTL, so the writes made without a change event show up as soon
+    DETECTION_COLUMNAR_TTL: int = 300
+
+    # Tracks configuration, the default deviation allowed to the interpolated boxes in bounding box units
+    TRACK_TOLERANCE: float = 0.002
+
+    # Presence timeline configuration, the timelines are stored next to the video as TIMELINE_FILE_NAME
+    TIMELINE_CACHE_SIZE: int = 64
+    TIMELINE_CACHE_TTL: int = 300
+    TIMELINE_FILE_NAME: str = "timeline.npz"
+
+    # Detection snapshots, published under S3_VIDEO_PATH/{uuid}/SNAPSHOT_PATH and served while fresh
+    SNAPSHOT_ENABLED: bool = True
+    SNAPSHOT_PATH: str = "snapshot"
+    SNAPSHOT_CACHE_SIZE: int = 1024
+    SNAPSHOT_CACHE_TTL: int = 300
+
+    # Inverted index configuration
+    INVERTED_INDEX_ENABLED: bool = True
+    INVERTED_INDEX_REFRESH_SECONDS: int = 900
+
+    # Response cache configuration
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_BACKEND: Literal["memory", "redis"] = "memory"
+    RESPONSE_CACHE_SIZE: int = 256
+    RESPONSE_CACHE_TTL: int = 300
+    RESPONSE_CACHE_REDIS_HOST: str = "localhost"
+    RESPONSE_CACHE_REDIS_PORT: int = 6379
+    RESPONSE_CACHE_REDIS_DB: int = 0
+
+    # Lookup cache configuration, rows used to validate the requests
+    LOOKUP_CACHE_SIZE: int = 1024
+    LOOKUP_CACHE_TTL: int = 30
+
+    # Batch endpoints configuration
+    BATCH_MAX_KEYS: int = 1000
+    BULK_MAX_ITEMS: int = 50000
+    DETECTION_BATCH_FETCH_ROWS: int = 10000
+
+    # Ingest configuration
+    INGEST_MAX_ROWS: int = 5000000
+    INGEST_COPY_CHUNK_ROWS: int = 100000
+    # The bodies are streamed into a spool kept in memory up to INGEST_SPOOL_MEMORY_BYTES, on disk past it
+    INGEST_MAX_BODY_BYTES: int = 1073741824
+    INGEST_SPOOL_MEMORY_BYTES: int = 16777216
+
+    # Change notifications between workers
+    CHANGE_NOTIFY_ENABLED: bool = True
+    CHANGE_NOTIFY_CHANNEL: str = "video_enrichment_changes"
+    CHANGE_NOTIFY_POLL_SECONDS: float = 5.0
+    CHANGE_NOTIFY_RECONNECT_SECONDS: float = 5.0
+
     @model_validator(mode="after")
     def ensemble_s3_paths(self):
         self.S3_BASE_PATH = f"{self.S3_BUCKET}/{self.S3_BASE_PATH}"
@@ -0,0 +1,21 @@
+from datetime import date, datetime
+from typing import Optional
+
+VIDEO_CODE_DATE_FORMAT = "%d_%m_%Y"
+
+
+def parse_video_code_date(code: str) -> Optional[date]:
+    """
+    Get the recording date of a video from its code, e.g. "20_11_2024_13_24_23_rtve" -> 2024-11-20.
+
+    Args:
+        code(str): The code of the video.
+
+    Returns:
+        The date of the video or None when the code does not start with a date.
+    """
+
+    try:
+        return datetime.strptime("_".join(code.split("_")[:3]), VIDEO_CODE_DATE_FORMAT).date()
+    except ValueError:
+        return None
@@ -9,3 +9,74 @@ class ServiceAvailability(Enum):
 
     Up = "UP"
     Down = "DOWN"
+
+
+class ChangeTopic(Enum):
+
+    """
+    The domain objects whose changes are published on the event bus.
+    """
+
+    Video = "VIDEO"
+    Taxonomy = "TAXONOMY"
+    Entity = "ENTITY"
+    EntityMediaGallery = "ENTITY_MEDIA_GALLERY"
+    SegmentDetection = "SEGMENT_DETECTION"
+    Detection = "DETECTION"
+    Snapshot = "SNAPSHOT"
+
+
+class ChangeAction(Enum):
+
+    """
+    The kinds of change published on the event bus.
+    """
+
+    Created = "CREATED"
+    Updated = "UPDATED"
+    Deleted = "DELETED"
+
+
+class CacheNamespace(Enum):
+
+    """
+    The groups of cached responses invalidated together by the writes.
+    """
+
+    Video = "VIDEO"
+    Taxonomy = "TAXONOMY"
+    Entity = "ENTITY"
+    EntityMediaGallery = "ENTITY_MEDIA_GALLERY"
+
+
+class VideoExpansion(Enum):
+
+    """
+    The related data that can be embedded in the video detail.
+    """
+
+    Segments = "segments"
+    Detections = "detections"
+    Entities = "entities"
+    Taxonomies = "taxonomies"
+
+
+class BulkItemStatus(Enum):
+
+    """
+    The outcome of every item of a bulk write.
+    """
+
+    Created = "CREATED"
+    Updated = "UPDATED"
+    Failed = "FAILED"
+
+
+class SnapshotKind(Enum):
+
+    """
+    The rows of a video published in its detection snapshot.
+    """
+
+    SegmentDetections = "segment_detections"
+    Detections = "detections"
@@ -0,0 +1,149 @@
+import json
+import os
+from typing import BinaryIO
+
+import numpy as np
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+BINARY_CONTENT_TYPE = "application/octet-stream"
+
+# Packed little-endian records of the binary ingest batches, one record after the other without header
+SEGMENT_DETECTION_DTYPE = np.dtype(
+    [
+        ("start_frame", "<i4"),
+        ("end_frame", "<i4"),
+        ("taxonomy_id", "<i8"),
+        ("entity_id", "<i8"),
+    ]
+)
+DETECTION_DTYPE = np.dtype(
+    [
+        ("frame", "<i4"),
+        ("segment_detection_id", "<i8"),
+        ("detection_score", "<f4"),
+        ("entity_score", "<f4"),
+        ("bbox_x_min", "<f4"),
+        ("bbox_y_min", "<f4"),
+        ("bbox_x_max", "<f4"),
+        ("bbox_y_max", "<f4"),
+    ]
+)
+
+
+class InvalidRowsError(ValueError):
+
+    """
+    A batch that is well formed but whose values do not fit the fields of the rows.
+    """
+
+    def __init__(self, report: list[dict]) -> None:
+        super().__init__(f"Invalid field values: {report}")
+        self.report = report
+
+
+def parse_rows(body: BinaryIO, content_type: str, dtype: np.dtype) -> np.ndarray:
+    """
+    Parse an ingest batch into a structured array.
+
+    Args:
+        body(BinaryIO): NDJSON objects with one key per field, or packed binary records of `dtype`.
+        content_type(str): NDJSON_CONTENT_TYPE or BINARY_CONTENT_TYPE.
+        dtype(np.dtype): The fields of the rows.
+
+    Returns:
+        The rows as a structured array of `dtype`.
+
+    Raises:
+        InvalidRowsError: If NDJSON integer fields have fractional values, numpy would truncate them.
+        ValueError: If the batch is malformed.
+    """
+
+    if content_type == BINARY_CONTENT_TYPE:
+        data = body.read()
+        if len(data) % dtype.itemsize:
+            raise ValueError(f"The binary batch is not a whole number of {dtype.itemsize} bytes records")
+        return np.frombuffer(data, dtype=dtype)
+
+    integer_fields = [name for name in dtype.names if dtype[name].kind in "iu"]
+    fractional = {name: [] for name in integer_fields}
+    rows = []
+    for number, line in enumerate(body, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+            rows.append(tuple(row[name] for name in dtype.names))
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"Invalid row at line {number}: {e!r}") from e
+        for name in integer_fields:
+            value = row[name]
+            if isinstance(value, float) and not value.is_integer():
+                fractional[name].append(len(rows) - 1)
+
+    if any(fractional.values()):
+        checks = {}
+        for name, positions in fractional.items():
+            checks[f"{name} must be an integer"] = np.zeros(len(rows), dtype=bool)
+            checks[f"{name} must be an integer"][positions] = True
+        raise InvalidRowsError(report_invalid_rows(checks))
+
+    try:
+        return np.array(rows, dtype=dtype)
+    except (ValueError, TypeError, OverflowError) as e:
+        raise ValueError(f"Invalid field values: {e}") from e
+
+
+def random_uuids(count: int) -> list[str]:
+    """
+    Generate `count` random (version 4) uuids at once, formatted with numpy instead of one uuid4 call per row.
+    """
+
+    if count == 0:
+        return []
+
+    raw = np.frombuffer(os.urandom(16 * count), dtype=np.uint8).reshape(count, 16).copy()
+    raw[:, 6] = raw[:, 6] & 0x0F | 0x40
+    raw[:, 8] = raw[:, 8] & 0x3F | 0x80
+
+    digits = np.frombuffer(raw.tobytes().hex().encode(), dtype="S1").reshape(count, 32)
+    dash = np.full((count, 1), b"-", dtype="S1")
+    formatted = np.hstack(
+        [digits[:, :8], dash, digits[:, 8:12], dash, digits[:, 12:16], dash, digits[:, 16:20], dash, digits[:, 20:]]
+    )
+    return formatted.view("S36").ravel().astype(str).tolist()
+
+
+def to_copy_text(columns: list) -> str:
+    """
+    Format the columns as the tab separated text of COPY ... FROM STDIN, one line per row.
+    """
+
+    formatted = [column if isinstance(column, list) else _format_column(np.asarray(column)) for column in columns]
+    return "".join(f"{line}\n" for line in map("\t".join, zip(*formatted)))
+
+
+def _format_column(column: np.ndarray) -> list[str]:
+    if column.dtype.kind == "f":
+        # 9 significant digits round-trip any float32
+        return list(map("{:.9g}".format, column.tolist()))
+    return list(map(str, column.tolist()))
+
+
+def report_invalid_rows(checks: dict[str, np.ndarray], sample_size: int = 10) -> list[dict]:
+    """
+    Summarize the failed checks of a batch.
+
+    Args:
+        checks(dict): The reason of every check and the mask of the rows that fail it.
+        sample_size(int): The number of failing row indexes reported per check.
+
+    Returns:
+        The reason, the count and the first failing row indexes of every failed check.
+    """
+
+    report = []
+    for reason, invalid in checks.items():
+        rows = np.flatnonzero(invalid)
+        if len(rows):
+            report.append({"reason": reason, "count": len(rows), "rows": rows[:sample_size].tolist()})
+    return report
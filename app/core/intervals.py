@@ -0,0 +1,174 @@
+from typing import Optional
+
+import numpy as np
+
+
+def merge_intervals(starts: np.ndarray, ends: np.ndarray, gap: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Merge inclusive frame intervals that overlap or are separated by at most `gap` frames.
+
+    Args:
+        starts(np.ndarray): The first frame of each interval.
+        ends(np.ndarray): The last frame of each interval.
+        gap(int): The largest number of frames between two intervals that are still merged.
+
+    Returns:
+        The sorted and disjoint (starts, ends) of the merged intervals.
+    """
+
+    if len(starts) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    order = np.lexsort((ends, starts))
+    starts = np.asarray(starts, dtype=np.int64)[order]
+    ends = np.asarray(ends, dtype=np.int64)[order]
+
+    # An interval opens a new group when it starts after everything before it has ended (plus the gap)
+    reach = np.maximum.accumulate(ends)
+    opens_group = np.ones(len(starts), dtype=bool)
+    opens_group[1:] = starts[1:] > reach[:-1] + gap + 1
+
+    group_starts = np.flatnonzero(opens_group)
+    return starts[group_starts], np.maximum.reduceat(ends, group_starts)
+
+
+def label_merged_intervals(
+    starts: np.ndarray, ends: np.ndarray, gap: int = 0, keys: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Label every inclusive interval with the merged interval it belongs to, merging as merge_intervals does.
+
+    Args:
+        starts(np.ndarray): The first frame of each interval.
+        ends(np.ndarray): The last frame of each interval.
+        gap(int): The largest number of frames between two intervals that are still merged.
+        keys(np.ndarray): Optional group of each interval (one row of values per interval for composite groups),
+            intervals of different groups are never merged.
+
+    Returns:
+        The label of each interval, in the input order. Labels are numbered from 0 in (key, start) order.
+    """
+
+    if len(starts) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    if keys is not None:
+        # Shifting every group past the reach of the previous one keeps the single sweep from merging across groups
+        _, ranks = np.unique(keys, axis=0, return_inverse=True)
+        shift = ranks.astype(np.int64) * (int(ends.max()) - int(starts.min()) + gap + 2)
+        starts, ends = starts + shift, ends + shift
+
+    order = np.lexsort((ends, starts))
+    reach = np.maximum.accumulate(ends[order])
+    opens_group = np.ones(len(starts), dtype=bool)
+    opens_group[1:] = starts[order][1:] > reach[:-1] + gap + 1
+
+    labels = np.empty(len(starts), dtype=np.int64)
+    labels[order] = np.cumsum(opens_group) - 1
+    return labels
+
+
+def merge_intervals_by_key(
+    starts: np.ndarray, ends: np.ndarray, keys: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Merge the overlapping or adjacent inclusive intervals of every key, as merge_intervals does for a single key.
+
+    Args:
+        starts(np.ndarray): The first frame of each interval.
+        ends(np.ndarray): The last frame of each interval.
+        keys(np.ndarray): The key of each interval.
+
+    Returns:
+        The (keys, starts, ends) of the merged intervals, sorted by key and start.
+    """
+
+    keys = np.asarray(keys, dtype=np.int64)
+    labels = label_merged_intervals(starts, ends, keys=keys)
+    count = int(labels.max()) + 1 if len(labels) else 0
+
+    merged_starts = np.full(count, np.iinfo(np.int64).max, dtype=np.int64)
+    merged_ends = np.full(count, np.iinfo(np.int64).min, dtype=np.int64)
+    merged_keys = np.empty(count, dtype=np.int64)
+    np.minimum.at(merged_starts, labels, np.asarray(starts, dtype=np.int64))
+    np.maximum.at(merged_ends, labels, np.asarray(ends, dtype=np.int64))
+    merged_keys[labels] = keys
+    return merged_keys, merged_starts, merged_ends
+
+
+def intersect_intervals(
+    a_starts: np.ndarray, a_ends: np.ndarray, b_starts: np.ndarray, b_ends: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Intersect two sorted lists of disjoint inclusive intervals.
+
+    Every interval of `a` is matched with the run of `b` intervals it overlaps through two
+    binary searches, so the cost is O((n + m) log m + k) for k overlapping pairs.
+
+    Returns:
+        The sorted (starts, ends) of the intersection.
+    """
+
+    if len(a_starts) == 0 or len(b_starts) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    low = np.searchsorted(b_ends, a_starts, side="left")
+    high = np.searchsorted(b_starts, a_ends, side="right")
+    counts = np.maximum(high - low, 0)
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    a_positions = np.repeat(np.arange(len(a_starts)), counts)
+    run_offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    b_positions = np.repeat(low, counts) + run_offsets
+
+    starts = np.maximum(a_starts[a_positions], b_starts[b_positions])
+    ends = np.minimum(a_ends[a_positions], b_ends[b_positions])
+    return starts, ends
+
+
+def expand_intervals(starts: np.ndarray, ends: np.ndarray, frames: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Widen inclusive intervals by `frames` on both sides, merging the ones that come to overlap.
+    """
+
+    if frames <= 0:
+        return starts, ends
+    return merge_intervals(starts - frames, ends + frames)
+
+
+def total_length(starts: np.ndarray, ends: np.ndarray) -> int:
+    """
+    Number of frames covered by sorted, disjoint inclusive intervals.
+    """
+
+    return int(np.sum(ends - starts + 1)) if len(starts) else 0
+
+
+def covered_frames_before(starts: np.ndarray, ends: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """
+    Number of frames of sorted, disjoint inclusive intervals that come before each point.
+    Only the last interval starting before a point can contain it, so a binary search per point is enough.
+
+    Args:
+        starts(np.ndarray): The first frame of each interval.
+        ends(np.ndarray): The last frame of each interval.
+        points(np.ndarray): The frames to count the covered frames before.
+
+    Returns:
+        The covered frames before each point.
+    """
+
+    points = np.asarray(points, dtype=np.int64)
+    if len(starts) == 0:
+        return np.zeros(len(points), dtype=np.int64)
+
+    lengths = np.cumsum(ends - starts + 1)
+    last = np.searchsorted(starts, points, side="left") - 1
+    before = np.where(last >= 0, lengths[np.maximum(last, 0)], 0)
+    # The frames of the last interval at or after the point are not before it
+    after = np.where(last >= 0, np.maximum(ends[np.maximum(last, 0)] + 1 - points, 0), 0)
+    return before - after
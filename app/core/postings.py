@@ -0,0 +1,93 @@
+from typing import Iterable
+
+import numpy as np
+
+_EMPTY = np.empty(0, dtype=np.int64)
+_EMPTY.flags.writeable = False
+
+
+class PostingList:
+
+    """
+    An immutable set of ids stored as a sorted array of unique int64, so its memory follows the number of
+    ids rather than the largest one, and unions, intersections and differences are linear merges in numpy.
+    """
+
+    __slots__ = ("_ids",)
+
+    def __init__(self, ids: np.ndarray = _EMPTY) -> None:
+        # Sorted and unique, shared with the callers of `to_ids` so it is kept read-only
+        ids.flags.writeable = False
+        self._ids = ids
+
+    @classmethod
+    def from_ids(cls, ids: Iterable[int]) -> "PostingList":
+        return cls(np.unique(np.fromiter(ids, dtype=np.int64)))
+
+    def to_ids(self) -> np.ndarray:
+        """
+        The ids of the set as a sorted read-only array.
+        """
+
+        return self._ids
+
+    def add(self, id_: int) -> "PostingList":
+        position = np.searchsorted(self._ids, id_)
+        if position < len(self._ids) and self._ids[position] == id_:
+            return self
+        return PostingList(np.insert(self._ids, position, id_))
+
+    def remove(self, id_: int) -> "PostingList":
+        position = np.searchsorted(self._ids, id_)
+        if position == len(self._ids) or self._ids[position] != id_:
+            return self
+        return PostingList(np.delete(self._ids, position))
+
+    def __contains__(self, id_: int) -> bool:
+        position = np.searchsorted(self._ids, id_)
+        return bool(position < len(self._ids) and self._ids[position] == id_)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __bool__(self) -> bool:
+        return len(self._ids) > 0
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, PostingList) and np.array_equal(self._ids, other._ids)
+
+    def __hash__(self) -> int:
+        return hash(self._ids.tobytes())
+
+    def __and__(self, other: "PostingList") -> "PostingList":
+        return PostingList(np.intersect1d(self._ids, other._ids, assume_unique=True))
+
+    def __or__(self, other: "PostingList") -> "PostingList":
+        return PostingList(np.union1d(self._ids, other._ids))
+
+    def __sub__(self, other: "PostingList") -> "PostingList":
+        return PostingList(np.setdiff1d(self._ids, other._ids, assume_unique=True))
+
+    def __repr__(self) -> str:
+        return f"PostingList({self._ids.tolist()})"
+
+    @classmethod
+    def union(cls, posting_lists: Iterable["PostingList"]) -> "PostingList":
+        arrays = [posting_list._ids for posting_list in posting_lists]
+        if not arrays:
+            return cls()
+        return cls(np.unique(np.concatenate(arrays)))
+
+    @classmethod
+    def intersection(cls, posting_lists: Iterable["PostingList"]) -> "PostingList":
+        # From the shortest list, so every merge is bounded by the ids left
+        arrays = sorted((posting_list._ids for posting_list in posting_lists), key=len)
+        if not arrays:
+            return cls()
+
+        ids = arrays[0]
+        for other in arrays[1:]:
+            if len(ids) == 0:
+                break
+            ids = np.intersect1d(ids, other, assume_unique=True)
+        return cls(ids)
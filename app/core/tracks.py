@@ -0,0 +1,64 @@
+import numpy as np
+
+
+def select_keyframes(frames: np.ndarray, boxes: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Select the keyframes of a track so that linearly interpolating the boxes between consecutive keyframes
+    stays within `tolerance` of every dropped box (Ramer-Douglas-Peucker over time).
+
+    Args:
+        frames(np.ndarray): The strictly increasing frames of the track.
+        boxes(np.ndarray): The (x_min, y_min, x_max, y_max) box of every frame, one row per frame.
+        tolerance(float): The largest deviation, on any coordinate, of a dropped box from the interpolated path.
+
+    Returns:
+        The sorted positions of the keyframes, always including the first and the last frame.
+    """
+
+    count = len(frames)
+    if count <= 2:
+        return np.arange(count)
+
+    frames = np.asarray(frames, dtype=np.float64)
+    boxes = np.asarray(boxes, dtype=np.float64)
+    keep = np.zeros(count, dtype=bool)
+    keep[[0, -1]] = True
+
+    # Every range between two keyframes is split at its worst interpolated box until all of them are close enough
+    ranges = [(0, count - 1)]
+    while ranges:
+        first, last = ranges.pop()
+        if last - first < 2:
+            continue
+
+        weights = (frames[first + 1 : last] - frames[first]) / (frames[last] - frames[first])
+        interpolated = boxes[first] + weights[:, None] * (boxes[last] - boxes[first])
+        errors = np.abs(boxes[first + 1 : last] - interpolated).max(axis=1)
+        worst = int(np.argmax(errors))
+        if errors[worst] > tolerance:
+            split = first + 1 + worst
+            keep[split] = True
+            ranges.extend(((first, split), (split, last)))
+
+    return np.flatnonzero(keep)
+
+
+def split_at_gaps(frames: np.ndarray) -> list[tuple[int, int]]:
+    """
+    Split a track at the gaps in its frames, so the boxes are never interpolated across frames without detections.
+    The sampling step of the track is the median distance between its frames, a gap misses at least one sample.
+
+    Args:
+        frames(np.ndarray): The strictly increasing frames of the track.
+
+    Returns:
+        The (start, end) positions of the runs of the track, the end excluded.
+    """
+
+    if len(frames) < 2:
+        return [(0, len(frames))]
+
+    steps = np.diff(frames)
+    # Half a step of slack, so the jitter of an irregular sampling does not split the track
+    breaks = (np.flatnonzero(steps > 1.5 * np.median(steps)) + 1).tolist()
+    return list(zip([0, *breaks], [*breaks, len(frames)]))
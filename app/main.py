@@ -1,7 +1,10 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.v1.endpoints import (
+    analytics,
     detection,
     entity,
     entity_media_gallery,
@@ -10,11 +13,32 @@ from app.api.v1.endpoints import (
     taxonomy,
     video,
 )
-from app.core.config import settings
+from app.core.config import logger, settings
+from app.managers.events.postgres import postgres_notify_manager
+from app.managers.index.inverted import inverted_index_manager
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Listen for the writes of the other workers before warming up, so none is missed meanwhile
+    if settings.CHANGE_NOTIFY_ENABLED:
+        postgres_notify_manager.start()
+
+    # Warm up the per-worker indexes, they are built lazily on first use if this fails
+    if settings.INVERTED_INDEX_ENABLED:
+        try:
+            inverted_index_manager.build()
+        except Exception as err:
+            logger.error(f"Error building the inverted index: {err}")
+    yield
+
+    postgres_notify_manager.stop()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
@@ -33,3 +57,4 @@ app.include_router(entity.router, prefix=settings.API_V1_STR)
 app.include_router(entity_media_gallery.router, prefix=settings.API_V1_STR)
 app.include_router(segment_detection.router, prefix=settings.API_V1_STR)
 app.include_router(detection.router, prefix=settings.API_V1_STR)
+app.include_router(analytics.router, prefix=settings.API_V1_STR)
@@ -0,0 +1,80 @@
+from typing import Any, Callable, Hashable
+
+from app.core.config import settings
+from app.core.enums import ChangeTopic
+from app.managers.cache.memory import LRUCache
+from app.managers.events.bus import event_bus
+from app.schemas.events import ChangeEvent
+
+LOOKUP_TOPICS = (ChangeTopic.Video, ChangeTopic.Taxonomy, ChangeTopic.Entity)
+
+
+class LookupCacheManager:
+
+    """
+    A short-lived per-worker cache of the video, taxonomy and entity rows the managers validate the
+    requests against, cleared on every change of their kind (including the writes of other workers).
+    """
+
+    def __init__(self, maxsize: int, ttl: float, enabled: bool = True) -> None:
+        self._caches = {topic: LRUCache(maxsize=maxsize, ttl=ttl) for topic in LOOKUP_TOPICS}
+        self._enabled = enabled
+
+    def get_or_load(self, topic: ChangeTopic, key: Hashable, loader: Callable[[], Any]) -> Any:
+        if not self._enabled:
+            return loader()
+
+        cache = self._caches[topic]
+        value = cache.get(key)
+        if value is None:
+            value = loader()
+            # Missing rows are not cached, a 404 must not outlive the creation of the row
+            if value is not None:
+                cache.set(key, value)
+        return value
+
+    def clear(self) -> None:
+        for cache in self._caches.values():
+            cache.clear()
+
+    def on_change(self, event: ChangeEvent) -> None:
+        self._caches[event.topic].clear()
+
+
+class IdentityMap:
+
+    """
+    The rows already loaded while serving the current request, so each one is read at most once.
+    The business managers are built per request, each one keeps its own map. Misses go through
+    the per-worker lookup cache.
+    """
+
+    def __init__(self) -> None:
+        self._lookup_cache = lookup_cache_manager
+        self._rows: dict[tuple[ChangeTopic, Hashable], Any] = {}
+
+    def get_or_load(self, topic: ChangeTopic, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Get a row of the request, loading it through the lookup cache the first time.
+
+        Args:
+            topic(ChangeTopic): The kind of row, whose changes evict the lookup cache.
+            key(Hashable): The key of the row, e.g. ("uuid", video_uuid).
+            loader(Callable): Reads the row from the database.
+
+        Returns:
+            The row, or what the loader returns when it does not exist.
+        """
+
+        if (topic, key) not in self._rows:
+            self._rows[(topic, key)] = self._lookup_cache.get_or_load(topic, key, loader)
+        return self._rows[(topic, key)]
+
+
+lookup_cache_manager = LookupCacheManager(
+    maxsize=settings.LOOKUP_CACHE_SIZE,
+    ttl=settings.LOOKUP_CACHE_TTL,
+    enabled=settings.LOOKUP_CACHE_TTL > 0,
+)
+for topic in LOOKUP_TOPICS:
+    event_bus.subscribe(topic, lookup_cache_manager.on_change)
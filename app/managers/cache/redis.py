@@ -0,0 +1,98 @@
+import socket
+import threading
+from typing import Any, Optional
+
+
+class RedisError(Exception):
+    """An error reply of the server"""
+
+
+class RedisClient:
+
+    """
+    A minimal client of the Redis serialization protocol (RESP2), enough for the few commands the
+    response cache sends, so any Redis compatible server can back it without an extra dependency.
+    A single connection is shared behind a lock and reopened after any network error.
+    """
+
+    def __init__(self, host: str, port: int, db: int = 0, timeout: Optional[float] = 1.0) -> None:
+        self._host = host
+        self._port = port
+        self._db = db
+        self._timeout = timeout
+        self._socket: Optional[socket.socket] = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> None:
+        self._socket = socket.create_connection((self._host, self._port), timeout=self._timeout)
+        self._reader = self._socket.makefile("rb")
+        if self._db:
+            self._send(("SELECT", self._db))
+            self._read()
+
+    def close(self) -> None:
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            finally:
+                self._socket = None
+                self._reader = None
+
+    def execute(self, *args: Any) -> Any:
+        """
+        Send a command and return its decoded reply.
+
+        Raises:
+            RedisError: If the server replies with an error.
+            OSError: If the server can not be reached.
+        """
+
+        with self._lock:
+            try:
+                if self._socket is None:
+                    self._connect()
+                self._send(args)
+                return self._read()
+            except OSError:
+                self.close()
+                raise
+
+    def _send(self, args: tuple) -> None:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._socket.sendall(b"".join(parts))
+
+    def _read(self) -> Any:
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by the server")
+
+        prefix, payload = line[:1], line[1:-2]
+        if prefix == b"+":
+            return payload.decode()
+        if prefix == b"-":
+            raise RedisError(payload.decode())
+        if prefix == b":":
+            return int(payload)
+        if prefix == b"$":
+            length = int(payload)
+            return None if length == -1 else self._reader.read(length + 2)[:-2]
+        if prefix == b"*":
+            length = int(payload)
+            return None if length == -1 else [self._read() for _ in range(length)]
+        raise ConnectionError(f"Unexpected reply from the server: {line!r}")
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.execute("GET", key)
+
+    def set(self, key: str, value: bytes, ex: Optional[int] = None) -> None:
+        if ex:
+            self.execute("SET", key, value, "EX", ex)
+        else:
+            self.execute("SET", key, value)
+
+    def incr(self, key: str) -> int:
+        return self.execute("INCR", key)
@@ -0,0 +1,180 @@
+import threading
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Callable, Optional
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+from app.core.config import logger, settings
+from app.core.enums import CacheNamespace, ChangeTopic
+from app.managers.cache.memory import LRUCache
+from app.managers.cache.redis import RedisClient, RedisError
+from app.managers.events.bus import event_bus
+from app.schemas.events import ChangeEvent
+
+# The cached responses each kind of change makes stale
+CHANGE_NAMESPACES = {
+    ChangeTopic.Video: (CacheNamespace.Video,),
+    ChangeTopic.Taxonomy: (CacheNamespace.Taxonomy, CacheNamespace.Entity),
+    ChangeTopic.Entity: (CacheNamespace.Entity, CacheNamespace.EntityMediaGallery),
+    ChangeTopic.EntityMediaGallery: (CacheNamespace.EntityMediaGallery,),
+}
+
+
+@lru_cache(maxsize=None)
+def _get_type_adapter(response_model: Any) -> TypeAdapter:
+    return TypeAdapter(response_model)
+
+
+class MemoryCacheBackend:
+
+    """
+    Per-worker storage of the cached responses, each worker invalidates its own copy.
+    """
+
+    shared = False
+
+    def __init__(self, maxsize: int, ttl: Optional[float]) -> None:
+        self._values = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._versions: dict[CacheNamespace, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._values.get(key)
+
+    def set(self, key: str, value: bytes) -> None:
+        self._values.set(key, value)
+
+    def get_version(self, namespace: CacheNamespace) -> int:
+        return self._versions[namespace]
+
+    def bump_version(self, namespace: CacheNamespace) -> None:
+        with self._lock:
+            self._versions[namespace] += 1
+
+
+class RedisCacheBackend:
+
+    """
+    Storage of the cached responses in a Redis compatible server shared by all the workers,
+    so a write invalidates the responses cached by every worker.
+    """
+
+    shared = True
+
+    def __init__(self, client: RedisClient, ttl: Optional[int], prefix: str = "video-enrichment-api:response") -> None:
+        self._client = client
+        self._ttl = ttl
+        self._prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(f"{self._prefix}:{key}")
+
+    def set(self, key: str, value: bytes) -> None:
+        self._client.set(f"{self._prefix}:{key}", value, ex=self._ttl)
+
+    def get_version(self, namespace: CacheNamespace) -> int:
+        return int(self._client.get(f"{self._prefix}:version:{namespace.value}") or 0)
+
+    def bump_version(self, namespace: CacheNamespace) -> None:
+        self._client.incr(f"{self._prefix}:version:{namespace.value}")
+
+
+class ResponseCache:
+
+    """
+    A read-through cache of serialized JSON responses. Keys live in a namespace whose version is part
+    of the key, so invalidating a namespace after a write is a single version bump and the stale
+    entries simply age out. Backend failures are logged and served as cache misses.
+    """
+
+    def __init__(self, backend, enabled: bool = True) -> None:
+        self._backend = backend
+        self._enabled = enabled
+
+    @staticmethod
+    def make_key(name: str, **params: Any) -> str:
+        return "&".join([name, *(f"{key}={value}" for key, value in sorted(params.items()))])
+
+    def get_or_set(
+        self, namespace: CacheNamespace, key: str, loader: Callable[[], Any], response_model: Any
+    ) -> Response:
+        """
+        Return the cached response for the key, loading and serializing it on a miss.
+
+        Args:
+            namespace(CacheNamespace): The namespace the writes invalidate the response by.
+            key(str): The key of the response inside the namespace, see `make_key`.
+            loader(Callable): Builds the response content when it is not cached.
+            response_model(Any): The type the content is serialized as.
+
+        Returns:
+            The JSON response.
+        """
+
+        if not self._enabled:
+            return self._to_response(loader(), response_model)
+
+        try:
+            cache_key = f"{namespace.value}:{self._backend.get_version(namespace)}:{key}"
+            content = self._backend.get(cache_key)
+        except (OSError, RedisError) as err:
+            logger.error(f"Error reading the response cache: {err}")
+            return self._to_response(loader(), response_model)
+
+        if content is not None:
+            return Response(content=content, media_type="application/json")
+
+        response = self._to_response(loader(), response_model)
+        try:
+            self._backend.set(cache_key, response.body)
+        except (OSError, RedisError) as err:
+            logger.error(f"Error writing the response cache: {err}")
+        return response
+
+    def invalidate(self, *namespaces: CacheNamespace) -> None:
+        if not self._enabled:
+            return
+
+        for namespace in namespaces:
+            try:
+                self._backend.bump_version(namespace)
+            except (OSError, RedisError) as err:
+                logger.error(f"Error invalidating the {namespace.value} response cache: {err}")
+
+    def clear(self) -> None:
+        self.invalidate(*CacheNamespace)
+
+    def on_change(self, event: ChangeEvent) -> None:
+        """
+        Invalidate the responses made stale by a write of another worker, the local writes invalidate
+        them directly and a shared backend is already invalidated by the worker that wrote.
+        """
+
+        if event.origin is None or self._backend.shared:
+            return
+        self.invalidate(*CHANGE_NAMESPACES.get(event.topic, ()))
+
+    @staticmethod
+    def _to_response(content: Any, response_model: Any) -> Response:
+        return Response(content=_get_type_adapter(response_model).dump_json(content), media_type="application/json")
+
+
+def _get_backend():
+    if settings.RESPONSE_CACHE_BACKEND == "redis":
+        client = RedisClient(
+            host=settings.RESPONSE_CACHE_REDIS_HOST,
+            port=settings.RESPONSE_CACHE_REDIS_PORT,
+            db=settings.RESPONSE_CACHE_REDIS_DB,
+        )
+        return RedisCacheBackend(client=client, ttl=settings.RESPONSE_CACHE_TTL)
+    return MemoryCacheBackend(maxsize=settings.RESPONSE_CACHE_SIZE, ttl=settings.RESPONSE_CACHE_TTL)
+
+
+response_cache = ResponseCache(
+    backend=_get_backend(),
+    enabled=settings.RESPONSE_CACHE_ENABLED,
+)
+for topic in CHANGE_NAMESPACES:
+    event_bus.subscribe(topic, response_cache.on_change)
@@ -0,0 +1,219 @@
+import gzip
+import hashlib
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import Response, status
+from pydantic import TypeAdapter
+from video_enrichment_orm.schemas.detection import Detection
+from video_enrichment_orm.schemas.segment_detection import SegmentDetection
+from video_enrichment_orm.schemas.video import Video
+
+from app.core.config import settings
+from app.core.enums import ChangeTopic, SnapshotKind
+from app.managers.aws.s3 import s3_manager
+from app.managers.cache.memory import LRUCache
+from app.managers.db.detection import detection_query_manager
+from app.managers.db.segment_detection import segment_detection_query_manager
+from app.managers.events.bus import event_bus
+from app.schemas.events import ChangeEvent
+from app.schemas.snapshot import SnapshotBlob, SnapshotManifest
+
+SNAPSHOT_ADAPTERS = {
+    SnapshotKind.SegmentDetections: TypeAdapter(list[SegmentDetection]),
+    SnapshotKind.Detections: TypeAdapter(list[Detection]),
+}
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """
+    Whether an Accept-Encoding header accepts gzip, honouring the q-values (q=0 refuses a coding).
+    """
+
+    qualities = {}
+    for coding in (accept_encoding or "").split(","):
+        name, *params = (part.strip() for part in coding.split(";"))
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            qualities[name.lower()] = quality
+
+    for name in ("gzip", "x-gzip", "*"):
+        if name in qualities:
+            return qualities[name] > 0
+    return False
+
+
+class SnapshotStore:
+
+    """
+    Snapshots of the segment detections and detections of a video, published in S3 as gzip compressed
+    JSON blobs under a version prefix, with a manifest pointing to the current version. The manifest
+    keeps the fingerprint of the rows it was published from, so a snapshot is only served while nothing
+    was written to the video since. The fresh manifests, and the videos without one, are cached per
+    worker until the video changes.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float], enabled: bool = True) -> None:
+        self._s3 = s3_manager
+        self._detection_query = detection_query_manager
+        self._segment_detection_query = segment_detection_query_manager
+        self._manifests = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._enabled = enabled
+
+    def get_fingerprint(self, video_id: int) -> str:
+        segment_fingerprint = self._segment_detection_query.get_segment_fingerprint(video_id=video_id)
+        detection_fingerprint = self._detection_query.get_detection_fingerprint(video_id=video_id)
+        return f"{segment_fingerprint}/{detection_fingerprint}"
+
+    def get_manifest(self, video: Video) -> Optional[SnapshotManifest]:
+        """
+        The manifest of the fresh snapshot of the video, None when it has none or it is stale.
+        """
+
+        if not self._enabled:
+            return None
+        # Wrapped so the videos without a fresh snapshot are cached too and their live queries skip S3
+        return self._manifests.get_or_set(video.id, lambda: (self._load_fresh_manifest(video),))[0]
+
+    def get_response(
+        self,
+        video: Video,
+        kind: SnapshotKind,
+        accept_encoding: Optional[str] = None,
+        if_none_match: Optional[str] = None,
+    ) -> Optional[Response]:
+        """
+        Serve the published rows of the video as they are stored, gzip compressed unless the client does not
+        accept it, or a 304 when the client already has them.
+
+        Args:
+            video(Video): The video of the rows.
+            kind(SnapshotKind): The rows to serve.
+            accept_encoding(str): The Accept-Encoding header of the request.
+            if_none_match(str): The If-None-Match header of the request.
+
+        Returns:
+            The response, or None when the video has no fresh snapshot and the rows must be queried.
+        """
+
+        manifest = self.get_manifest(video)
+        if manifest is None:
+            return None
+
+        blob = manifest.blobs[kind.value]
+        gzipped = accepts_gzip(accept_encoding)
+        # Each representation has its own ETag, so a 304 is never sent for the other one
+        etag = blob.etag if gzipped else f'{blob.etag[:-1]}-identity"'
+        headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+        if if_none_match and etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        content = self._s3.download_object(*self._s3.decode_path(blob.path))
+        if not content:
+            # The version was replaced meanwhile, the new manifest is read on the next request
+            self.invalidate(video.id)
+            return None
+
+        if gzipped:
+            headers["Content-Encoding"] = "gzip"
+        else:
+            content = gzip.decompress(content)
+        return Response(content=content, media_type="application/json", headers=headers)
+
+    def publish(
+        self,
+        video: Video,
+        fingerprint: str,
+        segment_detections: list[SegmentDetection],
+        detections: list[Detection],
+    ) -> Optional[SnapshotManifest]:
+        """
+        Publish a new version of the snapshot of the video. The blobs are uploaded first and the manifest
+        last, so readers switch to the new version at once, then the blobs of the previous version are deleted.
+
+        Args:
+            video(Video): The video of the rows.
+            fingerprint(str): The fingerprint of the rows, taken before reading them.
+            segment_detections(list): The segment detections of the video.
+            detections(list): The detections of the video.
+
+        Returns:
+            The manifest of the new version, None when it could not be uploaded.
+        """
+
+        previous = self._read_manifest(video)
+        version = previous.version + 1 if previous else 1
+        rows = {SnapshotKind.SegmentDetections: segment_detections, SnapshotKind.Detections: detections}
+
+        blobs = {}
+        for kind, kind_rows in rows.items():
+            # A fixed mtime keeps the blob, and so its ETag, identical for identical rows
+            content = gzip.compress(SNAPSHOT_ADAPTERS[kind].dump_json(kind_rows), mtime=0)
+            path = f"{self._get_path(video)}/v{version}/{kind.value}.json.gz"
+            if not self._s3.upload_object(*self._s3.decode_path(path), content):
+                return None
+            blobs[kind.value] = SnapshotBlob(
+                path=path, etag=f'"{hashlib.sha1(content).hexdigest()}"', rows=len(kind_rows), size=len(content)
+            )
+
+        manifest = SnapshotManifest(
+            video_id=video.id,
+            version=version,
+            fingerprint=fingerprint,
+            published_at=datetime.now(timezone.utc),
+            blobs=blobs,
+        )
+        if not self._s3.upload_object(*self._get_manifest_path(video), manifest.model_dump_json().encode()):
+            return None
+
+        if previous:
+            for blob in previous.blobs.values():
+                self._s3.delete_object(*self._s3.decode_path(blob.path))
+        self.invalidate(video.id)
+        return manifest
+
+    def _load_fresh_manifest(self, video: Video) -> Optional[SnapshotManifest]:
+        manifest = self._read_manifest(video)
+        if manifest is None or manifest.fingerprint != self.get_fingerprint(video.id):
+            return None
+        return manifest
+
+    def _read_manifest(self, video: Video) -> Optional[SnapshotManifest]:
+        bucket, key = self._get_manifest_path(video)
+        if not self._s3.exists(bucket, key):
+            return None
+        content = self._s3.download_object(bucket, key)
+        return SnapshotManifest.model_validate_json(content) if content else None
+
+    @staticmethod
+    def _get_path(video: Video) -> str:
+        return f"{settings.S3_VIDEO_PATH}/{video.uuid}/{settings.SNAPSHOT_PATH}"
+
+    def _get_manifest_path(self, video: Video) -> tuple[str, str]:
+        return self._s3.decode_path(f"{self._get_path(video)}/manifest.json")
+
+    def invalidate(self, video_id: int) -> None:
+        self._manifests.delete(video_id)
+
+    def clear(self) -> None:
+        self._manifests.clear()
+
+    def on_change(self, event: ChangeEvent) -> None:
+        for video_id in event.changed_video_ids:
+            self.invalidate(video_id)
+
+
+snapshot_store = SnapshotStore(
+    maxsize=settings.SNAPSHOT_CACHE_SIZE,
+    ttl=settings.SNAPSHOT_CACHE_TTL,
+    enabled=settings.SNAPSHOT_ENABLED,
+)
+for topic in (ChangeTopic.Video, ChangeTopic.SegmentDetection, ChangeTopic.Detection, ChangeTopic.Snapshot):
+    event_bus.subscribe(topic, snapshot_store.on_change)
@@ -0,0 +1,134 @@
+from collections import defaultdict
+from typing import Iterator, Optional
+
+from sqlalchemy import Select, and_, func, or_, select
+from video_enrichment_orm.dao.detection import DetectionDAO
+from video_enrichment_orm.dao.segment_detection import SegmentDetectionDAO
+from video_enrichment_orm.schemas.detection import Detection
+
+from app.core.config import settings
+from app.managers.db.postgres import postgres_manager
+from app.schemas.detection import DetectionFilter
+
+
+def apply_detection_filters(
+    statement: Select,
+    filters: DetectionFilter,
+    from_frame: Optional[int] = None,
+    to_frame: Optional[int] = None,
+) -> Select:
+    """
+    Push the frame window, the attribute and the spatial filters of a detection query down to SQL.
+    Entity and taxonomy filters join the segment detection each detection belongs to.
+    """
+
+    if from_frame is not None:
+        statement = statement.where(DetectionDAO.frame >= from_frame)
+    if to_frame is not None:
+        statement = statement.where(DetectionDAO.frame <= to_frame)
+    if filters.min_detection_score is not None:
+        statement = statement.where(DetectionDAO.detection_score >= filters.min_detection_score)
+    if filters.min_entity_score is not None:
+        statement = statement.where(DetectionDAO.entity_score >= filters.min_entity_score)
+
+    if filters.has_region():
+        x_min, y_min, x_max, y_max = filters.resolve_region()
+        statement = statement.where(
+            DetectionDAO.bbox_x_min <= x_max,
+            DetectionDAO.bbox_x_max >= x_min,
+            DetectionDAO.bbox_y_min <= y_max,
+            DetectionDAO.bbox_y_max >= y_min,
+        )
+    if filters.min_area is not None or filters.max_area is not None:
+        area = (DetectionDAO.bbox_x_max - DetectionDAO.bbox_x_min) * (DetectionDAO.bbox_y_max - DetectionDAO.bbox_y_min)
+        if filters.min_area is not None:
+            statement = statement.where(area >= filters.min_area)
+        if filters.max_area is not None:
+            statement = statement.where(area <= filters.max_area)
+
+    if filters.entity_ids or filters.taxonomy_ids:
+        statement = statement.join(SegmentDetectionDAO, SegmentDetectionDAO.id == DetectionDAO.segment_detection_id)
+        if filters.entity_ids:
+            statement = statement.where(SegmentDetectionDAO.entity_id.in_(filters.entity_ids))
+        if filters.taxonomy_ids:
+            statement = statement.where(SegmentDetectionDAO.taxonomy_id.in_(filters.taxonomy_ids))
+
+    return statement
+
+
+class DetectionQueryManager:
+    def __init__(self) -> None:
+        self._postgres = postgres_manager
+
+    def get_detections_by_video_id(
+        self,
+        video_id: int,
+        filters: DetectionFilter,
+        from_frame: Optional[int] = None,
+        to_frame: Optional[int] = None,
+    ) -> list[Detection]:
+        """
+        Get the detections of a video matching the filters, ordered by frame.
+        Served by the (video_id, frame) index of the detection table.
+        """
+
+        statement = select(DetectionDAO).where(DetectionDAO.video_id == video_id)
+        statement = apply_detection_filters(statement, filters=filters, from_frame=from_frame, to_frame=to_frame)
+        statement = statement.order_by(DetectionDAO.frame, DetectionDAO.id)
+
+        with self._postgres.session() as session:
+            return [Detection.model_validate(row, from_attributes=True) for row in session.scalars(statement)]
+
+    def iter_detections_by_video_ids(
+        self, windows: dict[int, tuple[Optional[int], Optional[int]]], filters: DetectionFilter
+    ) -> Iterator[Detection]:
+        """
+        Stream the detections of several videos matching the filters with a single query, ordered by video and frame.
+        Every video has its own frame window (the windows in seconds depend on the frame rate of the video), the
+        videos sharing a window are matched together with one IN condition. The rows are fetched in chunks of
+        DETECTION_BATCH_FETCH_ROWS, so the detections are not all held in memory at once.
+        """
+
+        video_ids_by_window = defaultdict(list)
+        for video_id, window in windows.items():
+            video_ids_by_window[window].append(video_id)
+
+        conditions = []
+        for (from_frame, to_frame), video_ids in video_ids_by_window.items():
+            condition = [DetectionDAO.video_id.in_(video_ids)]
+            if from_frame is not None:
+                condition.append(DetectionDAO.frame >= from_frame)
+            if to_frame is not None:
+                condition.append(DetectionDAO.frame <= to_frame)
+            conditions.append(and_(*condition))
+
+        statement = select(DetectionDAO).where(or_(*conditions))
+        statement = apply_detection_filters(statement, filters=filters)
+        statement = statement.order_by(DetectionDAO.video_id, DetectionDAO.frame, DetectionDAO.id).execution_options(
+            yield_per=settings.DETECTION_BATCH_FETCH_ROWS
+        )
+
+        with self._postgres.session() as session:
+            for row in session.scalars(statement):
+                yield Detection.model_validate(row, from_attributes=True)
+
+    def get_detection_fingerprint(self, video_id: int) -> str:
+        """
+        Get a fingerprint of the detections of a video, which changes when any of them is created, deleted
+        or changed, to tell whether the data derived from them is stale without loading them.
+        """
+
+        statement = select(
+            func.count(DetectionDAO.id),
+            func.coalesce(func.max(DetectionDAO.id), 0),
+            func.coalesce(func.sum(DetectionDAO.frame), 0),
+            func.coalesce(func.sum(DetectionDAO.segment_detection_id), 0),
+            # The ORM stamps every update, so the scores and boxes changed in place are noticed too
+            func.max(DetectionDAO.updated_at),
+        ).where(DetectionDAO.video_id == video_id)
+
+        with self._postgres.session() as session:
+            return ":".join(str(value) for value in session.execute(statement).one())
+
+
+detection_query_manager = DetectionQueryManager()
@@ -0,0 +1,62 @@
+from typing import Optional, Union
+
+from sqlalchemy import select
+from video_enrichment_orm.dao.entity import EntityDAO
+from video_enrichment_orm.schemas.entity import Entity
+
+from app.managers.db.postgres import postgres_manager
+
+
+class EntityQueryManager:
+    def __init__(self) -> None:
+        self._postgres = postgres_manager
+
+    def get_entities_by_ids(self, entity_ids: list[int]) -> list[Entity]:
+        """
+        Get the entities with a single IN query, ordered by id.
+        """
+
+        statement = select(EntityDAO).where(EntityDAO.id.in_(entity_ids)).order_by(EntityDAO.id)
+
+        with self._postgres.session() as session:
+            return [Entity.model_validate(row, from_attributes=True) for row in session.scalars(statement)]
+
+    def get_entities_by_keys(self, key: str, keys: list[Union[int, str]]) -> list[Entity]:
+        """
+        Get the entities whose `key` column ("id" or "uuid") is any of the keys, with a single IN query.
+        """
+
+        statement = select(EntityDAO).where(getattr(EntityDAO, key).in_(keys))
+
+        with self._postgres.session() as session:
+            return [Entity.model_validate(row, from_attributes=True) for row in session.scalars(statement)]
+
+    def get_enabled_entities_by_taxonomy_ids(self, taxonomy_ids: list[int]) -> list[Entity]:
+        """
+        Get the enabled entities of any of the taxonomies with a single IN query, ordered by id.
+        """
+
+        statement = (
+            select(EntityDAO)
+            .where(EntityDAO.enabled.is_(True), EntityDAO.taxonomy_id.in_(taxonomy_ids))
+            .order_by(EntityDAO.id)
+        )
+
+        with self._postgres.session() as session:
+            return [Entity.model_validate(row, from_attributes=True) for row in session.scalars(statement)]
+
+    def insert_entities(self, rows: list[dict]) -> list[Optional[Entity]]:
+        """
+        Insert the entities with a single INSERT, a row whose uuid already exists being skipped on its own.
+
+        Returns:
+            The created entity, or None when its uuid already exists, for every row in the order of the rows
+        """
+
+        return [
+            Entity.model_validate(row, from_attributes=True) if row is not None else None
+            for row in self._postgres.insert_rows(EntityDAO, rows)
+        ]
+
+
+entity_query_manager = EntityQueryManager()
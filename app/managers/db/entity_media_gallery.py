@@ -0,0 +1,43 @@
+from typing import Union
+
+from sqlalchemy import select, update
+from video_enrichment_orm.dao.entity_media_gallery import EntityMediaGalleryDAO
+
+from app.managers.db.postgres import postgres_manager
+from app.schemas.entity_media_gallery import EntityMediaGallery
+
+
+class EntityMediaGalleryQueryManager:
+    def __init__(self) -> None:
+        self._postgres = postgres_manager
+
+    def get_entity_media_galleries_by_keys(self, key: str, keys: list[Union[int, str]]) -> list[EntityMediaGallery]:
+        """
+        Get the entity media galleries whose `key` column ("id" or "uuid") is any of the keys, with a single IN query.
+        """
+
+        statement = select(EntityMediaGalleryDAO).where(getattr(EntityMediaGalleryDAO, key).in_(keys))
+
+        with self._postgres.session() as session:
+            return [EntityMediaGallery.model_validate(row, from_attributes=True) for row in session.scalars(statement)]
+
+    def set_entity_media_galleries_enabled(self, uuids: list[str], enabled: bool) -> list[EntityMediaGallery]:
+        """
+        Enable or disable the entity media galleries with a single UPDATE ... RETURNING statement.
+
+        Returns:
+            The updated entity media galleries
+        """
+
+        statement = (
+            update(EntityMediaGalleryDAO)
+            .where(EntityMediaGalleryDAO.uuid.in_(uuids))
+            .values(enabled=enabled)
+            .returning(EntityMediaGalleryDAO)
+        )
+
+        with self._postgres.session() as session:
+            return [EntityMediaGallery.model_validate(row, from_attributes=True) for row in session.scalars(statement)]
+
+
+entity_media_gallery_query_manager = EntityMediaGalleryQueryManager()
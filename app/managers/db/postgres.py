@@ -0,0 +1,131 @@
+import io
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, Optional
+
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import URL
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import logger, settings
+
+# The INSERT of every dialect with ON CONFLICT, sqlite being the one of the tests
+_DIALECT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def _get_engine() -> Engine:
+    """
+    The engine of the ORM, so the queries of both share one connection pool. Only built here when the
+    installed ORM does not expose it.
+    """
+
+    try:
+        from video_enrichment_orm.core.database import engine
+    except ImportError:
+        logger.warning("The ORM does not expose its engine, opening a separate connection pool")
+    else:
+        return engine
+
+    url = URL.create(
+        drivername="postgresql+psycopg2",
+        username=settings.POSTGRES_USER,
+        password=settings.POSTGRES_PASSWORD,
+        host=settings.POSTGRES_HOST,
+        port=int(settings.POSTGRES_PORT),
+        database=settings.POSTGRES_DB,
+    )
+    return create_engine(url, pool_pre_ping=True)
+
+
+class PostgresManager:
+
+    """
+    Direct access to the database for the queries the ORM managers do not expose.
+    """
+
+    def __init__(self):
+        self._engine = _get_engine()
+        self._session_factory = sessionmaker(bind=self._engine, expire_on_commit=False)
+
+    @property
+    def engine(self) -> Engine:
+        return self._engine
+
+    def connect(self):
+        """
+        Open a dedicated DBAPI connection outside the pool, for long lived uses such as LISTEN.
+        """
+
+        cargs, cparams = self._engine.dialect.create_connect_args(self._engine.url)
+        return self._engine.dialect.connect(*cargs, **cparams)
+
+    @contextmanager
+    def session(self) -> Iterator[Session]:
+        """
+        Open a session that commits when the block succeeds and rolls back otherwise.
+        """
+
+        session = self._session_factory()
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def insert_rows(self, dao: Any, rows: list[dict], key: str = "uuid") -> list[Optional[Any]]:
+        """
+        Insert the rows with a single multi-row INSERT ... ON CONFLICT DO NOTHING RETURNING, so a row
+        conflicting with an existing one, or with an earlier row of the batch, is skipped without failing
+        the others. The skipped rows are the ones whose key is not returned.
+
+        Args:
+            dao: The mapped class of the table
+            rows: The values of the rows, each one with its unique key
+            key: The unique column the returned rows are matched to the rows by
+
+        Returns:
+            The created row, or None when it was skipped as a conflict, for every row in the order of the rows
+        """
+
+        with self.session() as session:
+            return self.insert_rows_in_session(session, dao, rows, key=key)
+
+    def insert_rows_in_session(
+        self, session: Session, dao: Any, rows: list[dict], key: str = "uuid"
+    ) -> list[Optional[Any]]:
+        """
+        Same as `insert_rows` in the transaction of the session, so several batches can be inserted at once.
+        """
+
+        if not rows:
+            return []
+
+        statement = _DIALECT_INSERTS[self._engine.dialect.name](dao).on_conflict_do_nothing().returning(dao)
+        created = {getattr(row, key): row for row in session.scalars(statement, rows)}
+        # A key repeated in the batch belongs to its first row, the later ones were skipped
+        return [created.pop(row[key], None) for row in rows]
+
+    def copy_rows(self, table: str, columns: list[str], chunks: Iterable[str]) -> None:
+        """
+        Load the chunks of tab separated rows into the table with one COPY ... FROM STDIN per chunk,
+        all of them in a single transaction. COPY goes through copy_expert, which only the psycopg2
+        driver has.
+        """
+
+        if self.engine.dialect.driver != "psycopg2":
+            raise NotImplementedError(f"COPY is not supported by the {self.engine.dialect.driver} driver")
+
+        statement = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+        with self.session() as session:
+            cursor = session.connection().connection.driver_connection.cursor()
+            try:
+                for chunk in chunks:
+                    cursor.copy_expert(statement, io.StringIO(chunk))
+            finally:
+                cursor.close()
+
+
+postgres_manager = PostgresManager()
@@ -0,0 +1,284 @@
+from collections import defaultdict
+from typing import Callable, Optional
+
+import numpy as np
+from sqlalchemy import Row, Select, case, delete, exists, func, or_, select, update
+from video_enrichment_orm.dao.detection import DetectionDAO
+from video_enrichment_orm.dao.segment_detection import SegmentDetectionDAO
+from video_enrichment_orm.dao.video import VideoDAO
+from video_enrichment_orm.schemas.segment_detection import SegmentDetection
+
+from app.managers.db.postgres import postgres_manager
+from app.schemas.segment_detection import SegmentDetectionFilter
+
+
+def apply_segment_detection_filters(
+    statement: Select,
+    filters: SegmentDetectionFilter,
+    from_frame: Optional[int] = None,
+    to_frame: Optional[int] = None,
+) -> Select:
+    """
+    Push the frame window and the attribute filters of a segment detection query down to SQL.
+    Segments carry no scores, so score thresholds keep the segments with at least one qualifying detection.
+    """
+
+    if from_frame is not None:
+        statement = statement.where(SegmentDetectionDAO.end_frame >= from_frame)
+    if to_frame is not None:
+        statement = statement.where(SegmentDetectionDAO.start_frame <= to_frame)
+    if filters.entity_ids:
+        statement = statement.where(SegmentDetectionDAO.entity_id.in_(filters.entity_ids))
+    if filters.taxonomy_ids:
+        statement = statement.where(SegmentDetectionDAO.taxonomy_id.in_(filters.taxonomy_ids))
+
+    if filters.min_detection_score is not None or filters.min_entity_score is not None:
+        qualifying_detection = exists().where(DetectionDAO.segment_detection_id == SegmentDetectionDAO.id)
+        if filters.min_detection_score is not None:
+            qualifying_detection = qualifying_detection.where(
+                DetectionDAO.detection_score >= filters.min_detection_score
+            )
+        if filters.min_entity_score is not None:
+            qualifying_detection = qualifying_detection.where(DetectionDAO.entity_score >= filters.min_entity_score)
+        statement = statement.where(qualifying_detection)
+
+    return statement
+
+
+class SegmentDetectionQueryManager:
+    def __init__(self) -> None:
+        self._postgres = postgres_manager
+
+    def get_segment_detections_by_video_id(
+        self,
+        video_id: int,
+        filters: SegmentDetectionFilter,
+        taxonomy_id: Optional[int] = None,
+        from_frame: Optional[int] = None,
+        to_frame: Optional[int] = None,
+    ) -> list[SegmentDetection]:
+        """
+        Get the segment detections of a video matching the filters, ordered by start frame.
+        Served by the (video_id, start_frame) index of the segment detection table.
+        """
+
+        statement = select(SegmentDetectionDAO).where(SegmentDetectionDAO.video_id == video_id)
+        if taxonomy_id is not None:
+            statement = statement.where(SegmentDetectionDAO.taxonomy_id == taxonomy_id)
+        statement = apply_segment_detection_filters(
+            statement, filters=filters, from_frame=from_frame, to_frame=to_frame
+        )
+        statement = statement.order_by(SegmentDetectionDAO.start_frame, SegmentDetectionDAO.id)
+
+        with self._postgres.session() as session:
+            return [SegmentDetection.model_validate(row, from_attributes=True) for row in session.scalars(statement)]
+
+    def get_segment_detections_by_video_ids(self, video_ids: list[int]) -> dict[int, list[SegmentDetection]]:
+        """
+        Get the segment detections of several videos with a single IN query, grouped by video.
+        """
+
+        statement = (
+            select(SegmentDetectionDAO)
+            .where(SegmentDetectionDAO.video_id.in_(video_ids))
+            .order_by(SegmentDetectionDAO.video_id, SegmentDetectionDAO.start_frame, SegmentDetectionDAO.id)
+        )
+
+        segment_detections = defaultdict(list)
+        with self._postgres.session() as session:
+            for row in session.scalars(statement):
+                segment_detections[row.video_id].append(SegmentDetection.model_validate(row, from_attributes=True))
+        return segment_detections
+
+    def get_segment_fingerprint(self, video_id: int) -> str:
+        """
+        Get a fingerprint of the segment detections of a video, which changes when any of them is created, deleted
+        or changed, or when the frame rate of the video changes, to tell whether the data derived from them is stale
+        without loading them.
+        """
+
+        statement = select(
+            func.count(SegmentDetectionDAO.id),
+            func.coalesce(func.max(SegmentDetectionDAO.id), 0),
+            func.coalesce(func.sum(SegmentDetectionDAO.start_frame), 0),
+            func.coalesce(func.sum(SegmentDetectionDAO.end_frame), 0),
+            func.coalesce(func.sum(SegmentDetectionDAO.entity_id), 0),
+            func.coalesce(func.sum(SegmentDetectionDAO.taxonomy_id), 0),
+            # The ORM stamps every update, so the rows changed in place without changing the sums are noticed too
+            func.max(SegmentDetectionDAO.updated_at),
+            select(VideoDAO.frame_rate).where(VideoDAO.id == video_id).scalar_subquery(),
+        ).where(SegmentDetectionDAO.video_id == video_id)
+
+        with self._postgres.session() as session:
+            return ":".join(str(value) for value in session.execute(statement).one())
+
+    def get_segment_frames(self, video_id: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Get the (ids, start frames, end frames) of the segment detections of a video, ordered by id.
+        """
+
+        statement = (
+            select(SegmentDetectionDAO.id, SegmentDetectionDAO.start_frame, SegmentDetectionDAO.end_frame)
+            .where(SegmentDetectionDAO.video_id == video_id)
+            .order_by(SegmentDetectionDAO.id)
+        )
+
+        with self._postgres.session() as session:
+            rows = np.array(session.execute(statement).all(), dtype=np.int64).reshape(-1, 3)
+        return rows[:, 0], rows[:, 1], rows[:, 2]
+
+    def compact_segment_detections(
+        self,
+        video_id: int,
+        merge: Callable[[list[SegmentDetection]], tuple[list[SegmentDetection], dict[int, int]]],
+    ) -> tuple[list[SegmentDetection], list[SegmentDetection], dict[int, int]]:
+        """
+        Compact the segment detections of a video in a single transaction: read them, merge them, widen the
+        surviving segment detections, move the detections of the absorbed fragments to the segment detection they
+        were merged into and delete the absorbed fragments. The video row is locked first, so concurrent compactions
+        of the video run one after the other and each one merges the segment detections the previous one left.
+
+        Args:
+            video_id: The video to compact
+            merge: Merges the segment detections of the video, returning the merged segment detections and the id
+                of the segment detection every absorbed fragment was merged into
+
+        Returns:
+            The segment detections of the video before the compaction, the merged ones and the absorbed fragments
+        """
+
+        with self._postgres.session() as session:
+            session.execute(select(VideoDAO.id).where(VideoDAO.id == video_id).with_for_update())
+            segment_detections = [
+                SegmentDetection.model_validate(row, from_attributes=True)
+                for row in session.scalars(
+                    select(SegmentDetectionDAO)
+                    .where(SegmentDetectionDAO.video_id == video_id)
+                    .order_by(SegmentDetectionDAO.id)
+                    .with_for_update()
+                )
+            ]
+            merged, absorbed = merge(segment_detections)
+            if not absorbed:
+                return segment_detections, merged, absorbed
+
+            bounds = {segment.id: (segment.start_frame, segment.end_frame) for segment in segment_detections}
+            updates = [
+                {"id": segment.id, "start_frame": segment.start_frame, "end_frame": segment.end_frame}
+                for segment in merged
+                if bounds[segment.id] != (segment.start_frame, segment.end_frame)
+            ]
+            absorbed_ids = list(absorbed)
+            if updates:
+                session.execute(update(SegmentDetectionDAO), updates)
+            session.execute(
+                update(DetectionDAO)
+                .where(DetectionDAO.segment_detection_id.in_(absorbed_ids))
+                .values(segment_detection_id=case(absorbed, value=DetectionDAO.segment_detection_id))
+                .execution_options(synchronize_session=False)
+            )
+            session.execute(
+                delete(SegmentDetectionDAO)
+                .where(SegmentDetectionDAO.id.in_(absorbed_ids))
+                .execution_options(synchronize_session=False)
+            )
+        return segment_detections, merged, absorbed
+
+    def get_video_ids_by_entity_ids(self, entity_ids: list[int]) -> dict[int, set[int]]:
+        """
+        Get, for each entity, the ids of the videos it was detected in.
+        """
+
+        return self._get_video_ids_by(SegmentDetectionDAO.entity_id, ids=entity_ids)
+
+    def get_video_ids_by_taxonomy_ids(self, taxonomy_ids: list[int]) -> dict[int, set[int]]:
+        """
+        Get, for each taxonomy, the ids of the videos it was detected in.
+        """
+
+        return self._get_video_ids_by(SegmentDetectionDAO.taxonomy_id, ids=taxonomy_ids)
+
+    def _get_video_ids_by(self, column, ids: list[int]) -> dict[int, set[int]]:
+        video_ids = defaultdict(set)
+        if not ids:
+            return video_ids
+
+        statement = select(column, SegmentDetectionDAO.video_id).where(column.in_(ids)).distinct()
+        with self._postgres.session() as session:
+            for key, video_id in session.execute(statement):
+                video_ids[key].add(video_id)
+        return video_ids
+
+    def count_videos_by_entity(self, video_ids: list[int]) -> dict[int, int]:
+        """
+        Count, for each entity detected in the videos, the number of those videos it was detected in.
+        """
+
+        return self._count_videos_by(SegmentDetectionDAO.entity_id, video_ids=video_ids)
+
+    def count_videos_by_taxonomy(self, video_ids: list[int]) -> dict[int, int]:
+        """
+        Count, for each taxonomy detected in the videos, the number of those videos it was detected in.
+        """
+
+        return self._count_videos_by(SegmentDetectionDAO.taxonomy_id, video_ids=video_ids)
+
+    def _count_videos_by(self, column, video_ids: list[int]) -> dict[int, int]:
+        if not video_ids:
+            return {}
+
+        statement = (
+            select(column, func.count(SegmentDetectionDAO.video_id.distinct()))
+            .where(SegmentDetectionDAO.video_id.in_(video_ids))
+            .group_by(column)
+        )
+        with self._postgres.session() as session:
+            return dict(session.execute(statement).all())
+
+    def get_video_terms(self, video_ids: Optional[list[int]] = None) -> list[Row]:
+        """
+        Get the distinct (video_id, entity_id, taxonomy_id) rows of the segment detections,
+        for the given videos or for the whole catalog.
+        """
+
+        statement = select(
+            SegmentDetectionDAO.video_id, SegmentDetectionDAO.entity_id, SegmentDetectionDAO.taxonomy_id
+        ).distinct()
+        if video_ids is not None:
+            statement = statement.where(SegmentDetectionDAO.video_id.in_(video_ids))
+
+        with self._postgres.session() as session:
+            return list(session.execute(statement))
+
+    def get_segment_intervals(self, video_ids: list[int], entity_ids: list[int], taxonomy_ids: list[int]) -> list[Row]:
+        """
+        Get the (video_id, entity_id, taxonomy_id, start_frame, end_frame, frame_rate) rows of the segment
+        detections of the videos that belong to any of the entities or taxonomies.
+        """
+
+        if not video_ids or not (entity_ids or taxonomy_ids):
+            return []
+
+        statement = (
+            select(
+                SegmentDetectionDAO.video_id,
+                SegmentDetectionDAO.entity_id,
+                SegmentDetectionDAO.taxonomy_id,
+                SegmentDetectionDAO.start_frame,
+                SegmentDetectionDAO.end_frame,
+                VideoDAO.frame_rate,
+            )
+            .join(VideoDAO, VideoDAO.id == SegmentDetectionDAO.video_id)
+            .where(
+                SegmentDetectionDAO.video_id.in_(video_ids),
+                or_(
+                    SegmentDetectionDAO.entity_id.in_(entity_ids),
+                    SegmentDetectionDAO.taxonomy_id.in_(taxonomy_ids),
+                ),
+            )
+        )
+        with self._postgres.session() as session:
+            return list(session.execute(statement))
+
+
+segment_detection_query_manager = SegmentDetectionQueryManager()
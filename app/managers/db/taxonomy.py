@@ -0,0 +1,71 @@
+from typing import Optional, Union
+
+from sqlalchemy import select
+from video_enrichment_orm.dao.taxonomy import TaxonomyDAO
+from video_enrichment_orm.schemas.taxonomy import Taxonomy
+
+from app.managers.db.postgres import postgres_manager
+
+
+class TaxonomyQueryManager:
+    def __init__(self) -> None:
+        self._postgres = postgres_manager
+
+    def get_taxonomies_by_ids(self, taxonomy_ids: list[int]) -> list[Taxonomy]:
+        """
+        Get the taxonomies with a single IN query, ordered by id.
+        """
+
+        statement = select(TaxonomyDAO).where(TaxonomyDAO.id.in_(taxonomy_ids)).order_by(TaxonomyDAO.id)
+
+        with self._postgres.session() as session:
+            return [Taxonomy.model_validate(row, from_attributes=True) for row in session.scalars(statement)]
+
+    def get_taxonomies_by_keys(self, key: str, keys: list[Union[int, str]]) -> list[Taxonomy]:
+        """
+        Get the taxonomies whose `key` column ("id" or "uuid") is any of the keys, with a single IN query.
+        """
+
+        statement = select(TaxonomyDAO).where(getattr(TaxonomyDAO, key).in_(keys))
+
+        with self._postgres.session() as session:
+            return [Taxonomy.model_validate(row, from_attributes=True) for row in session.scalars(statement)]
+
+    def insert_taxonomy_levels(self, levels: list[list[dict]]) -> list[list[Optional[Taxonomy]]]:
+        """
+        Insert the taxonomies in a single transaction, one INSERT per level, so the rows of a level can reference
+        by their parent_uuid the taxonomies created by the previous levels. A row whose uuid already exists is
+        skipped on its own, and so is a row whose parent was skipped.
+
+        Args:
+            levels: The rows of every level, the rows of the first level without parent_uuid
+
+        Returns:
+            The created taxonomy, or None when it was skipped, for every row of every level in the order of the rows
+        """
+
+        results = []
+        with self._postgres.session() as session:
+            created_ids: dict[str, int] = {}
+            for rows in levels:
+                # The rows whose parent was skipped are not inserted
+                insertable = [row.get("parent_uuid") is None or row["parent_uuid"] in created_ids for row in rows]
+                values = [self._resolve_parent(row, created_ids) for row, ok in zip(rows, insertable) if ok]
+                inserted = iter(self._postgres.insert_rows_in_session(session, TaxonomyDAO, values))
+                taxonomies = []
+                for ok in insertable:
+                    row = next(inserted) if ok else None
+                    taxonomies.append(Taxonomy.model_validate(row, from_attributes=True) if row is not None else None)
+                created_ids.update({taxonomy.uuid: taxonomy.id for taxonomy in taxonomies if taxonomy})
+                results.append(taxonomies)
+        return results
+
+    @staticmethod
+    def _resolve_parent(row: dict, created_ids: dict[str, int]) -> dict:
+        values = {key: value for key, value in row.items() if key != "parent_uuid"}
+        if row.get("parent_uuid") is not None:
+            values["taxonomy_id"] = created_ids[row["parent_uuid"]]
+        return values
+
+
+taxonomy_query_manager = TaxonomyQueryManager()
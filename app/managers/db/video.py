@@ -0,0 +1,72 @@
+from typing import Optional, Union
+
+from sqlalchemy import exists, select
+from video_enrichment_orm.dao.segment_detection import SegmentDetectionDAO
+from video_enrichment_orm.dao.video import VideoDAO
+from video_enrichment_orm.schemas.video import Video
+
+from app.managers.db.postgres import postgres_manager
+
+
+class VideoQueryManager:
+    def __init__(self) -> None:
+        self._postgres = postgres_manager
+
+    def get_videos_by_entity_ids(self, entity_ids: list[int], offset: int, limit: int) -> list[Video]:
+        """
+        Get a page of the videos with at least one segment detection of the entities, ordered by id.
+        Resolved with a single semi-join, served by the (entity_id, video_id) index of the segment detection table.
+        """
+
+        has_entity = exists().where(
+            SegmentDetectionDAO.video_id == VideoDAO.id,
+            SegmentDetectionDAO.entity_id.in_(entity_ids),
+        )
+        statement = select(VideoDAO).where(has_entity).order_by(VideoDAO.id).offset(offset).limit(limit)
+
+        with self._postgres.session() as session:
+            return [Video.model_validate(row, from_attributes=True) for row in session.scalars(statement)]
+
+    def get_videos_by_keys(self, key: str, keys: list[Union[int, str]]) -> list[Video]:
+        """
+        Get the videos whose `key` column ("id" or "uuid") is any of the keys, with a single IN query.
+        """
+
+        statement = select(VideoDAO).where(getattr(VideoDAO, key).in_(keys))
+
+        with self._postgres.session() as session:
+            return [Video.model_validate(row, from_attributes=True) for row in session.scalars(statement)]
+
+    def get_videos_with_frame_rate(self) -> list[Video]:
+        """
+        Get the videos of the whole catalog that have a frame rate, ordered by id.
+        """
+
+        statement = select(VideoDAO).where(VideoDAO.frame_rate > 0).order_by(VideoDAO.id)
+
+        with self._postgres.session() as session:
+            return [Video.model_validate(row, from_attributes=True) for row in session.scalars(statement)]
+
+    def get_video_facet_fields(
+        self, video_ids: Optional[list[int]] = None, entity_ids: list[int] = (), taxonomy_ids: list[int] = ()
+    ) -> list[tuple[int, str, str]]:
+        """
+        Get the (video_id, code, extension) the facets of the videos are derived from, optionally only of the
+        videos with segment detections of all the entities and taxonomies, one semi-join each.
+        """
+
+        statement = select(VideoDAO.id, VideoDAO.code, VideoDAO.extension)
+        if video_ids is not None:
+            statement = statement.where(VideoDAO.id.in_(video_ids))
+        for column, ids in (
+            (SegmentDetectionDAO.entity_id, entity_ids),
+            (SegmentDetectionDAO.taxonomy_id, taxonomy_ids),
+        ):
+            for id_ in ids:
+                statement = statement.where(exists().where(SegmentDetectionDAO.video_id == VideoDAO.id, column == id_))
+
+        with self._postgres.session() as session:
+            return [tuple(row) for row in session.execute(statement)]
+
+
+video_query_manager = VideoQueryManager()
@@ -0,0 +1,38 @@
+import threading
+from collections import defaultdict
+from typing import Callable
+
+from app.core.config import logger
+from app.core.enums import ChangeTopic
+from app.schemas.events import ChangeEvent
+
+ChangeHandler = Callable[[ChangeEvent], None]
+
+
+class EventBus:
+
+    """
+    An in-process publish/subscribe bus the business managers notify their writes on,
+    so the per-worker caches and indexes can follow the changes incrementally.
+    """
+
+    def __init__(self) -> None:
+        self._handlers: dict[ChangeTopic, list[ChangeHandler]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic: ChangeTopic, handler: ChangeHandler) -> None:
+        with self._lock:
+            self._handlers[topic].append(handler)
+
+    def publish(self, event: ChangeEvent) -> None:
+        with self._lock:
+            handlers = list(self._handlers[event.topic])
+
+        for handler in handlers:
+            try:
+                handler(event)
+            except Exception as err:
+                logger.error(f"Error handling {event.action.value} {event.topic.value} event: {err}")
+
+
+event_bus = EventBus()
@@ -0,0 +1,146 @@
+import json
+import select
+import threading
+import uuid
+from typing import Optional
+
+from sqlalchemy import text
+
+from app.core.config import logger, settings
+from app.core.enums import ChangeTopic
+from app.managers.db.postgres import postgres_manager
+from app.managers.events.bus import event_bus
+from app.schemas.events import ChangeEvent
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more, larger events are split by ids
+MAX_NOTIFICATION_BYTES = 7999
+
+
+class PostgresNotifyManager:
+
+    """
+    Relays the change events between the workers of every pod through a Postgres channel.
+    The local events are sent with pg_notify tagged with the id of this worker, and a listener
+    thread publishes the events of the other workers on the local event bus, so their caches
+    and indexes are evicted as if the write had happened here.
+    """
+
+    def __init__(self, channel: str, poll_seconds: float, reconnect_seconds: float) -> None:
+        self._postgres = postgres_manager
+        self._event_bus = event_bus
+        self._channel = channel
+        self._poll_seconds = poll_seconds
+        self._reconnect_seconds = reconnect_seconds
+        self._worker_id = uuid.uuid4().hex
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def worker_id(self) -> str:
+        return self._worker_id
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._listen, name="change-notify-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self._poll_seconds + 1)
+            self._thread = None
+
+    def on_change(self, event: ChangeEvent) -> None:
+        """
+        Send the local events to the other workers, the events received from them are not sent back.
+        """
+
+        if event.origin is not None or not self.running:
+            return
+
+        payloads = self.split(event)
+        with self._postgres.session() as session:
+            for payload in payloads:
+                session.execute(
+                    text("SELECT pg_notify(:channel, :payload)"), {"channel": self._channel, "payload": payload}
+                )
+
+    def split(self, event: ChangeEvent) -> list[str]:
+        """
+        Encode the event as the fewest payloads within MAX_NOTIFICATION_BYTES, each one with part of its ids.
+        """
+
+        # Every id adds its digits and a comma to the payload of the event without ids
+        base_size = len(self.encode(event, ids=[], video_ids=[]).encode())
+        payloads = []
+        chunk = {"ids": [], "video_ids": []}
+        size = base_size
+        for field in chunk:
+            for value in getattr(event, field):
+                value_size = len(str(value)) + 1
+                if size + value_size > MAX_NOTIFICATION_BYTES and (chunk["ids"] or chunk["video_ids"]):
+                    payloads.append(self.encode(event, **chunk))
+                    chunk = {"ids": [], "video_ids": []}
+                    size = base_size
+                chunk[field].append(value)
+                size += value_size
+        payloads.append(self.encode(event, **chunk))
+        return payloads
+
+    def encode(self, event: ChangeEvent, ids: list[int], video_ids: list[int]) -> str:
+        return event.model_copy(
+            update={"ids": ids, "video_ids": video_ids, "origin": self._worker_id}
+        ).model_dump_json()
+
+    def dispatch(self, payload: str) -> None:
+        """
+        Publish on the local event bus a notification received from the channel, unless this worker sent it.
+        """
+
+        try:
+            event = ChangeEvent.model_validate(json.loads(payload))
+        except ValueError as err:
+            logger.error(f"Invalid change notification {payload!r}: {err}")
+            return
+
+        if event.origin != self._worker_id:
+            self._event_bus.publish(event)
+
+    def _listen(self) -> None:
+        while not self._stop.is_set():
+            try:
+                connection = self._postgres.connect()
+                try:
+                    connection.autocommit = True
+                    with connection.cursor() as cursor:
+                        cursor.execute(f'LISTEN "{self._channel}"')
+                    logger.info(f"Listening for change notifications on {self._channel}")
+
+                    while not self._stop.is_set():
+                        if select.select([connection], [], [], self._poll_seconds) == ([], [], []):
+                            continue
+                        connection.poll()
+                        while connection.notifies:
+                            self.dispatch(connection.notifies.pop(0).payload)
+                finally:
+                    connection.close()
+            except Exception as err:
+                # Notifications sent while disconnected are lost, the caches fall back on their TTLs
+                logger.error(f"Error listening for change notifications: {err}")
+                self._stop.wait(self._reconnect_seconds)
+
+
+postgres_notify_manager = PostgresNotifyManager(
+    channel=settings.CHANGE_NOTIFY_CHANNEL,
+    poll_seconds=settings.CHANGE_NOTIFY_POLL_SECONDS,
+    reconnect_seconds=settings.CHANGE_NOTIFY_RECONNECT_SECONDS,
+)
+for topic in ChangeTopic:
+    event_bus.subscribe(topic, postgres_notify_manager.on_change)
@@ -0,0 +1,109 @@
+import threading
+import time
+from typing import Callable, NamedTuple, Optional
+
+import numpy as np
+from video_enrichment_orm.schemas.segment_detection import SegmentDetection
+
+from app.core.config import settings
+from app.core.enums import ChangeTopic
+from app.managers.cache.memory import LRUCache
+from app.managers.events.bus import event_bus
+from app.managers.index.detection import IntervalIndex
+from app.schemas.events import ChangeEvent
+
+
+class PairTotals(NamedTuple):
+    """The time on screen together of every pair of entities, summed over a set of videos."""
+
+    videos: int
+    pairs: np.ndarray
+    frames: np.ndarray
+    seconds: np.ndarray
+    video_counts: np.ndarray
+
+
+class AnalyticsIndexManager:
+
+    """
+    A per-worker cache of the interval indexes of the videos the analytics are asked about, apart from the
+    indexes of the detection endpoints so the wide analytics requests do not evict them, and of the
+    co-occurrence totals of the whole catalog. The catalog totals are dropped on any change of a video
+    or of its segment detections, and expire after the ttl to pick up external writes.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float]) -> None:
+        self._ttl = ttl
+        self._segment_detections = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._catalog: Optional[tuple[float, PairTotals]] = None
+        # Bumped on every change, a catalog loaded across a change is not kept
+        self._generation = 0
+        self._lock = threading.Lock()
+        # One catalog load at a time, the concurrent requests wait for it
+        self._catalog_lock = threading.Lock()
+
+    def get_interval_indexes(
+        self, video_ids: list[int], loader: Callable[[list[int]], dict[int, list[SegmentDetection]]]
+    ) -> dict[int, IntervalIndex]:
+        """
+        The interval indexes of several videos, the ones not cached are loaded together with a single loader call.
+        """
+
+        indexes = {video_id: self._segment_detections.get(video_id) for video_id in video_ids}
+        missing = [video_id for video_id, index in indexes.items() if index is None]
+        if missing:
+            segment_detections = loader(missing)
+            for video_id in missing:
+                indexes[video_id] = IntervalIndex(segment_detections.get(video_id, []))
+                self._segment_detections.set(video_id, indexes[video_id])
+        return indexes
+
+    def get_catalog_totals(self, loader: Callable[[], PairTotals]) -> PairTotals:
+        """
+        The co-occurrence totals of the whole catalog, loaded on a miss.
+        """
+
+        totals = self._get_catalog()
+        if totals is not None:
+            return totals
+
+        with self._catalog_lock:
+            totals = self._get_catalog()
+            if totals is not None:
+                return totals
+
+            generation = self._generation
+            totals = loader()
+            with self._lock:
+                if generation == self._generation:
+                    self._catalog = (time.monotonic(), totals)
+            return totals
+
+    def _get_catalog(self) -> Optional[PairTotals]:
+        catalog = self._catalog
+        if catalog is None or (self._ttl is not None and time.monotonic() - catalog[0] > self._ttl):
+            return None
+        return catalog[1]
+
+    def invalidate_catalog(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._catalog = None
+
+    def clear(self) -> None:
+        self._segment_detections.clear()
+        self.invalidate_catalog()
+
+    def on_change(self, event: ChangeEvent) -> None:
+        for video_id in event.changed_video_ids:
+            self._segment_detections.delete(video_id)
+        # A new video, or a changed frame rate, changes the catalog even without segment detections
+        self.invalidate_catalog()
+
+
+analytics_index_manager = AnalyticsIndexManager(
+    maxsize=settings.ANALYTICS_INDEX_CACHE_SIZE,
+    ttl=settings.DETECTION_INDEX_CACHE_TTL,
+)
+for topic in (ChangeTopic.Video, ChangeTopic.SegmentDetection):
+    event_bus.subscribe(topic, analytics_index_manager.on_change)
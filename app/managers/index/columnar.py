@@ -0,0 +1,254 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Optional
+
+import numpy as np
+from video_enrichment_orm.schemas.detection import Detection
+
+from app.core.config import logger, settings
+
+# Fixed-width columns of the detections, the boxes are stored together as a (n, 4) column
+NUMERIC_COLUMNS = {
+    "id": np.int64,
+    "video_id": np.int64,
+    "frame": np.int64,
+    "segment_detection_id": np.int64,
+    "detection_score": np.float64,
+    "entity_score": np.float64,
+}
+BBOX_FIELDS = ("bbox_x_min", "bbox_y_min", "bbox_x_max", "bbox_y_max")
+TEXT_COLUMNS = ("uuid", "created_by", "updated_by")
+TIMESTAMP_COLUMNS = ("created_at", "updated_at")
+
+
+class DetectionColumns:
+
+    """
+    The detections of a video held column by column and sorted by frame, every column a fixed-width array
+    (in memory, or memory-mapped from the .npy files of the columnar cache). The Detection of a row is only
+    built when it is returned, so the filters run over the arrays without materialising the other rows.
+    """
+
+    def __init__(self, columns: dict[str, np.ndarray]) -> None:
+        self._columns = columns
+
+    @classmethod
+    def from_detections(cls, detections: list[Detection]) -> "DetectionColumns":
+        count = len(detections)
+        frames = np.fromiter((detection.frame for detection in detections), dtype=np.int64, count=count)
+        order = np.argsort(frames, kind="stable")
+        detections = [detections[i] for i in order]
+
+        columns = {
+            name: np.fromiter((getattr(detection, name) for detection in detections), dtype=dtype, count=count)
+            for name, dtype in NUMERIC_COLUMNS.items()
+        }
+        columns["bbox"] = np.array(
+            [tuple(getattr(detection, name) for name in BBOX_FIELDS) for detection in detections], dtype=np.float64
+        ).reshape(count, 4)
+        # Missing texts and timestamps are stored as empty strings, the timestamps in ISO format
+        for name in TEXT_COLUMNS:
+            columns[name] = np.array([getattr(detection, name) or "" for detection in detections], dtype=str)
+        for name in TIMESTAMP_COLUMNS:
+            columns[name] = np.array(
+                [_format_timestamp(getattr(detection, name)) for detection in detections], dtype=str
+            )
+        return cls(columns)
+
+    @classmethod
+    def load(cls, directory: str) -> "DetectionColumns":
+        names = (*NUMERIC_COLUMNS, "bbox", *TEXT_COLUMNS, *TIMESTAMP_COLUMNS)
+        return cls({name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in names})
+
+    def save(self, directory: str) -> None:
+        for name, column in self._columns.items():
+            np.save(os.path.join(directory, f"{name}.npy"), column)
+
+    def __len__(self) -> int:
+        return len(self._columns["frame"])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self._columns[name]
+
+    def rows(self, positions: np.ndarray) -> list[Detection]:
+        """
+        Build the detections of the rows at the given positions, in that order.
+        """
+
+        positions = np.asarray(positions, dtype=np.int64)
+        fields = {name: self._columns[name][positions].tolist() for name in (*NUMERIC_COLUMNS, *TEXT_COLUMNS)}
+        for name in TIMESTAMP_COLUMNS:
+            fields[name] = [_parse_timestamp(value) for value in self._columns[name][positions].tolist()]
+        boxes = self._columns["bbox"][positions].tolist()
+
+        return [
+            Detection.model_construct(
+                id=fields["id"][row],
+                uuid=fields["uuid"][row] or None,
+                video_id=fields["video_id"][row],
+                frame=fields["frame"][row],
+                segment_detection_id=fields["segment_detection_id"][row],
+                detection_score=fields["detection_score"][row],
+                entity_score=fields["entity_score"][row],
+                bbox_x_min=boxes[row][0],
+                bbox_y_min=boxes[row][1],
+                bbox_x_max=boxes[row][2],
+                bbox_y_max=boxes[row][3],
+                created_at=fields["created_at"][row],
+                created_by=fields["created_by"][row] or None,
+                updated_at=fields["updated_at"][row],
+                updated_by=fields["updated_by"][row] or None,
+            )
+            for row in range(len(positions))
+        ]
+
+
+def _format_timestamp(value: Optional[datetime]) -> str:
+    return value.isoformat() if value is not None else ""
+
+
+def _parse_timestamp(value: str) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+class ColumnarCacheManager:
+
+    """
+    A local cache directory with the detections of the most recently queried videos as columnar files, one
+    directory per video with a .npy file per column that is memory-mapped when opened. The files are shared by
+    the workers of the host and kept across restarts, so the repeated reads of a video skip Postgres. Past
+    max_bytes the least recently opened videos are evicted, and a video is rebuilt when it changes or its files
+    are older than the ttl.
+    Every worker invalidates the video on its change events, which bumps the generation of the video, so a build
+    that loaded the detections before the change is not stored over the invalidation.
+    """
+
+    def __init__(self, path: str, max_bytes: int, ttl: Optional[float], enabled: bool = True) -> None:
+        self._path = path
+        self._max_bytes = max_bytes
+        self._ttl = ttl
+        self._enabled = enabled
+        self._generations: dict[int, int] = defaultdict(int)
+        # Makes the generation check and the rename of a build atomic with respect to the invalidations
+        self._lock = threading.Lock()
+
+    def get_or_build(self, video_id: int, loader: Callable[[], list[Detection]]) -> DetectionColumns:
+        """
+        Open the columnar files of the video, building them from the loaded detections on a miss.
+
+        Args:
+            video_id(int): The video of the detections.
+            loader(Callable): Loads the detections of the video when they are not cached or they have expired.
+
+        Returns:
+            The memory-mapped columns, or the columns in memory when they could not be stored.
+        """
+
+        if not self._enabled:
+            return DetectionColumns.from_detections(loader())
+
+        directory = self._get_directory(video_id)
+        columns = self._open(directory)
+        if columns is not None:
+            return columns
+
+        generation = self._generations[video_id]
+        columns = DetectionColumns.from_detections(loader())
+        try:
+            if not self._store(video_id, directory, columns, generation=generation):
+                # Changed while loading, the columns are served once but not stored
+                return columns
+            self._evict()
+        except OSError as err:
+            logger.error(f"Error storing the columnar detections of video {video_id}: {err}")
+            return columns
+        stored = self._open(directory)
+        return columns if stored is None else stored
+
+    def invalidate(self, video_id: int) -> None:
+        with self._lock:
+            self._generations[video_id] += 1
+            shutil.rmtree(self._get_directory(video_id), ignore_errors=True)
+
+    def clear(self) -> None:
+        if not os.path.isdir(self._path):
+            return
+
+        for entry in os.scandir(self._path):
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+    def _get_directory(self, video_id: int) -> str:
+        return os.path.join(self._path, str(video_id))
+
+    def _open(self, directory: str) -> Optional[DetectionColumns]:
+        try:
+            built_at = os.path.getmtime(os.path.join(directory, "frame.npy"))
+            if self._ttl is not None and time.time() - built_at > self._ttl:
+                shutil.rmtree(directory, ignore_errors=True)
+                return None
+
+            columns = DetectionColumns.load(directory)
+            # The modification time of the directory is its last use for the eviction
+            os.utime(directory)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as err:
+            logger.error(f"Invalid columnar detections in {directory}, rebuilding them: {err}")
+            shutil.rmtree(directory, ignore_errors=True)
+            return None
+        return columns
+
+    def _store(self, video_id: int, directory: str, columns: DetectionColumns, generation: int) -> bool:
+        """
+        Store the columns of the video unless it was invalidated since the given generation.
+        """
+
+        os.makedirs(self._path, exist_ok=True)
+        # Written aside and renamed, so the other workers never open a partial directory
+        building = tempfile.mkdtemp(prefix=".build-", dir=self._path)
+        try:
+            columns.save(building)
+            with self._lock:
+                if self._generations[video_id] != generation:
+                    shutil.rmtree(building, ignore_errors=True)
+                    return False
+                os.rename(building, directory)
+        except OSError:
+            shutil.rmtree(building, ignore_errors=True)
+            if not os.path.isdir(directory):
+                raise
+        return True
+
+    def _evict(self) -> None:
+        videos = []
+        for entry in os.scandir(self._path):
+            try:
+                if entry.name.startswith(".build-"):
+                    # Left by a worker that stopped while building
+                    if self._ttl is not None and time.time() - entry.stat().st_mtime > self._ttl:
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                    continue
+                size = sum(file.stat().st_size for file in os.scandir(entry.path))
+                videos.append((entry.stat().st_mtime, size, entry.path))
+            except FileNotFoundError:
+                continue
+
+        total = sum(size for _, size, _ in videos)
+        for _, size, path in sorted(videos):
+            if total <= self._max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+
+columnar_cache_manager = ColumnarCacheManager(
+    path=settings.DETECTION_COLUMNAR_PATH,
+    max_bytes=settings.DETECTION_COLUMNAR_MAX_BYTES,
+    ttl=settings.DETECTION_COLUMNAR_TTL,
+    enabled=settings.DETECTION_COLUMNAR_ENABLED,
+)
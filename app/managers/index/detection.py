@@ -0,0 +1,366 @@
+import heapq
+from collections import defaultdict
+from typing import Callable, Optional, Union
+
+import numpy as np
+from video_enrichment_orm.schemas.detection import Detection
+from video_enrichment_orm.schemas.segment_detection import SegmentDetection
+
+from app.core.config import settings
+from app.core.enums import ChangeTopic
+from app.core.intervals import merge_intervals_by_key
+from app.core.tracks import select_keyframes, split_at_gaps
+from app.managers.cache.memory import LRUCache
+from app.managers.events.bus import event_bus
+from app.managers.index.columnar import DetectionColumns, columnar_cache_manager
+from app.schemas.detection import AttributeFilter, Keyframe, SpatialFilter, Track
+from app.schemas.events import ChangeEvent
+
+
+class FrameIndex:
+
+    """
+    Per-frame detections of a single video sorted by frame number, so a frame
+    window is resolved with two binary searches plus the slice of matches.
+    The detections are kept as columns and only the returned ones are built.
+    """
+
+    def __init__(self, detections: Union[list[Detection], DetectionColumns]) -> None:
+        if not isinstance(detections, DetectionColumns):
+            detections = DetectionColumns.from_detections(detections)
+        self._columns = detections
+        self._frames = detections["frame"]
+        self._segment_detection_ids = detections["segment_detection_id"]
+        self._detection_scores = detections["detection_score"]
+        self._entity_scores = detections["entity_score"]
+        self._boxes = detections["bbox"]
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    @property
+    def frames(self) -> np.ndarray:
+        return self._frames
+
+    @property
+    def detections(self) -> list[Detection]:
+        return self._columns.rows(np.arange(len(self._frames)))
+
+    def bounds(self, from_frame: Optional[int] = None, to_frame: Optional[int] = None) -> tuple[int, int]:
+        """
+        Positions of the first and past-the-last detection inside the inclusive frame window.
+        """
+
+        low = 0 if from_frame is None else int(np.searchsorted(self._frames, from_frame, side="left"))
+        high = len(self._frames) if to_frame is None else int(np.searchsorted(self._frames, to_frame, side="right"))
+        return low, max(low, high)
+
+    def positions(
+        self,
+        from_frame: Optional[int] = None,
+        to_frame: Optional[int] = None,
+        spatial: Optional[SpatialFilter] = None,
+        scores: Optional[AttributeFilter] = None,
+    ) -> np.ndarray:
+        """
+        Positions, in frame order, of the detections inside the frame window whose boxes match the spatial filters
+        and whose scores reach the score thresholds.
+        """
+
+        low, high = self.bounds(from_frame=from_frame, to_frame=to_frame)
+        positions = np.arange(low, high)
+        if spatial is not None and spatial.has_spatial_filters():
+            positions = positions[spatial.mask(self._boxes[positions])]
+        if scores is not None and scores.has_score_filters():
+            positions = positions[scores.mask_scores(self._detection_scores[positions], self._entity_scores[positions])]
+        return positions
+
+    def window(
+        self,
+        from_frame: Optional[int] = None,
+        to_frame: Optional[int] = None,
+        spatial: Optional[SpatialFilter] = None,
+        scores: Optional[AttributeFilter] = None,
+    ) -> list[Detection]:
+        return self._columns.rows(
+            self.positions(from_frame=from_frame, to_frame=to_frame, spatial=spatial, scores=scores)
+        )
+
+    def sample(
+        self,
+        bucket_width: float,
+        from_frame: Optional[int] = None,
+        to_frame: Optional[int] = None,
+        spatial: Optional[SpatialFilter] = None,
+        scores: Optional[AttributeFilter] = None,
+    ) -> list[Detection]:
+        """
+        Keep, among the detections inside the frame window that match the spatial and score filters, the best
+        scoring detection of every segment detection in each bucket of bucket_width frames.
+
+        Args:
+            bucket_width(float): The width of the sampling buckets in frames.
+            from_frame(int): The first frame of the window (inclusive).
+            to_frame(int): The last frame of the window (inclusive).
+            spatial(SpatialFilter): The optional region and area filters of the boxes.
+            scores(AttributeFilter): The optional score thresholds of the detections.
+
+        Returns:
+            The sampled detections in frame order.
+        """
+
+        positions = self.positions(from_frame=from_frame, to_frame=to_frame, spatial=spatial, scores=scores)
+        if len(positions) == 0:
+            return []
+
+        buckets = np.floor_divide(self._frames[positions], bucket_width).astype(np.int64)
+        segment_detection_ids = self._segment_detection_ids[positions]
+
+        # Group by (segment detection, bucket) with the best detection first inside each group
+        order = np.lexsort(
+            (
+                -self._entity_scores[positions],
+                -self._detection_scores[positions],
+                buckets,
+                segment_detection_ids,
+            )
+        )
+        first_of_group = np.ones(len(order), dtype=bool)
+        first_of_group[1:] = (np.diff(segment_detection_ids[order]) != 0) | (np.diff(buckets[order]) != 0)
+
+        return self._columns.rows(positions[np.sort(order[first_of_group])])
+
+    def tracks(self, tolerance: float, from_frame: Optional[int] = None, to_frame: Optional[int] = None) -> list[Track]:
+        """
+        Compress, inside the frame window, the detections of every segment detection into keyframes.
+        When a segment detection has several detections on a frame only the best scoring one is part of its track,
+        and a segment detection with gaps in its frames has one track per run of frames.
+
+        Args:
+            tolerance(float): The largest deviation of a dropped box from the boxes interpolated between keyframes.
+            from_frame(int): The first frame of the window (inclusive).
+            to_frame(int): The last frame of the window (inclusive).
+
+        Returns:
+            The tracks sorted by segment detection id and start frame.
+        """
+
+        low, high = self.bounds(from_frame=from_frame, to_frame=to_frame)
+        if high - low == 0:
+            return []
+
+        frames = self._frames[low:high]
+        segment_detection_ids = self._segment_detection_ids[low:high]
+
+        # Group by segment detection in frame order with the best detection first inside each frame
+        order = np.lexsort(
+            (
+                -self._entity_scores[low:high],
+                -self._detection_scores[low:high],
+                frames,
+                segment_detection_ids,
+            )
+        )
+        first_of_frame = np.ones(len(order), dtype=bool)
+        first_of_frame[1:] = (np.diff(segment_detection_ids[order]) != 0) | (np.diff(frames[order]) != 0)
+        positions = order[first_of_frame] + low
+
+        frames = self._frames[positions]
+        segment_detection_ids = self._segment_detection_ids[positions]
+        boxes = self._boxes[positions]
+
+        starts = np.flatnonzero(np.diff(segment_detection_ids, prepend=-1) != 0)
+        ends = np.append(starts[1:], len(positions))
+        tracks = []
+        runs = [
+            (start + run_start, start + run_end)
+            for start, end in zip(starts.tolist(), ends.tolist())
+            for run_start, run_end in split_at_gaps(frames[start:end])
+        ]
+        for start, end in runs:
+            keyframes = positions[start + select_keyframes(frames[start:end], boxes[start:end], tolerance=tolerance)]
+            tracks.append(
+                Track(
+                    segment_detection_id=int(segment_detection_ids[start]),
+                    start_frame=int(frames[start]),
+                    end_frame=int(frames[end - 1]),
+                    detections=end - start,
+                    keyframes=[
+                        Keyframe(
+                            detection_id=detection.id,
+                            frame=detection.frame,
+                            detection_score=detection.detection_score,
+                            entity_score=detection.entity_score,
+                            bbox_x_min=detection.bbox_x_min,
+                            bbox_y_min=detection.bbox_y_min,
+                            bbox_x_max=detection.bbox_x_max,
+                            bbox_y_max=detection.bbox_y_max,
+                        )
+                        for detection in self._columns.rows(keyframes)
+                    ],
+                )
+            )
+        return tracks
+
+
+class IntervalIndex:
+
+    """
+    Segment detections of a single video sorted by start frame, with the running
+    maximum of their end frames. Both arrays are monotonic, so the candidates that
+    overlap a window are delimited by two binary searches and only the candidates
+    inside those bounds are checked.
+    """
+
+    def __init__(self, segment_detections: list[SegmentDetection]) -> None:
+        count = len(segment_detections)
+        starts = np.fromiter((segment.start_frame for segment in segment_detections), dtype=np.int64, count=count)
+        ends = np.fromiter((segment.end_frame for segment in segment_detections), dtype=np.int64, count=count)
+        order = np.lexsort((ends, starts))
+        self._starts = starts[order]
+        self._ends = ends[order]
+        self._max_ends = np.maximum.accumulate(self._ends) if count else self._ends
+        self._segments = [segment_detections[i] for i in order]
+        self._merged_by_entity: Optional[tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+        self._screen_frames: Optional[tuple[np.ndarray, np.ndarray]] = None
+        self._cooccurrence_frames: Optional[tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return len(self._segments)
+
+    @property
+    def starts(self) -> np.ndarray:
+        return self._starts
+
+    @property
+    def ends(self) -> np.ndarray:
+        return self._ends
+
+    @property
+    def segments(self) -> list[SegmentDetection]:
+        return self._segments
+
+    def overlapping(self, from_frame: Optional[int] = None, to_frame: Optional[int] = None) -> np.ndarray:
+        """
+        Positions, in start order, of the segments that overlap the inclusive frame window.
+        """
+
+        low = 0 if from_frame is None else int(np.searchsorted(self._max_ends, from_frame, side="left"))
+        high = len(self._starts) if to_frame is None else int(np.searchsorted(self._starts, to_frame, side="right"))
+        if high <= low:
+            return np.empty(0, dtype=np.int64)
+
+        positions = np.arange(low, high)
+        if from_frame is not None:
+            positions = positions[self._ends[low:high] >= from_frame]
+        return positions
+
+    def window(self, from_frame: Optional[int] = None, to_frame: Optional[int] = None) -> list[SegmentDetection]:
+        return [self._segments[i] for i in self.overlapping(from_frame=from_frame, to_frame=to_frame)]
+
+    def merged_by_entity(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        The segment detections of every entity unioned into disjoint intervals, computed once per index, so frames
+        covered by several segments of an entity (e.g. under different taxonomies) count once.
+
+        Returns:
+            The (entity_ids, starts, ends) of the unioned intervals, sorted by entity and start.
+        """
+
+        if self._merged_by_entity is None:
+            entity_ids = np.fromiter(
+                (segment.entity_id for segment in self._segments), dtype=np.int64, count=len(self._segments)
+            )
+            self._merged_by_entity = merge_intervals_by_key(self._starts, self._ends, keys=entity_ids)
+        return self._merged_by_entity
+
+    def screen_frames(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Frames on screen of every entity of the video, computed once per index.
+
+        Returns:
+            The sorted entity ids and the number of frames each of them is on screen.
+        """
+
+        if self._screen_frames is None:
+            entity_ids, starts, ends = self.merged_by_entity()
+            unique_entity_ids, inverse = np.unique(entity_ids, return_inverse=True)
+            frames = np.bincount(inverse, weights=ends - starts + 1, minlength=len(unique_entity_ids))
+            self._screen_frames = unique_entity_ids, frames.astype(np.int64)
+        return self._screen_frames
+
+    def cooccurrence_frames(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Frames on screen together of every pair of entities of the video, computed once per index.
+        The unioned intervals are swept by start frame keeping a heap of the open ones by end frame, so each
+        interval is only compared with the intervals it overlaps.
+
+        Returns:
+            The (entity_ids, other_entity_ids, frames) of the pairs that overlap, the first id below the second.
+        """
+
+        if self._cooccurrence_frames is None:
+            entity_ids, starts, ends = self.merged_by_entity()
+            order = np.argsort(starts, kind="stable")
+
+            frames: dict[tuple[int, int], int] = defaultdict(int)
+            open_intervals: list[tuple[int, int]] = []
+            for entity_id, start, end in zip(entity_ids[order].tolist(), starts[order].tolist(), ends[order].tolist()):
+                while open_intervals and open_intervals[0][0] < start:
+                    heapq.heappop(open_intervals)
+                # The intervals of an entity are disjoint, so the open intervals belong to other entities
+                for open_end, open_entity_id in open_intervals:
+                    pair = (open_entity_id, entity_id) if open_entity_id < entity_id else (entity_id, open_entity_id)
+                    frames[pair] += min(open_end, end) - start + 1
+                heapq.heappush(open_intervals, (end, entity_id))
+
+            pairs = sorted(frames)
+            self._cooccurrence_frames = (
+                np.array([pair[0] for pair in pairs], dtype=np.int64),
+                np.array([pair[1] for pair in pairs], dtype=np.int64),
+                np.array([frames[pair] for pair in pairs], dtype=np.int64),
+            )
+        return self._cooccurrence_frames
+
+
+class DetectionIndexManager:
+
+    """
+    A per-worker cache of the frame and interval indexes of the most recently queried videos.
+    The frame indexes are opened from the columnar cache of the host, so the videos evicted from
+    memory, or first queried by another worker, are not loaded from the database again.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float]) -> None:
+        self._columnar_cache = columnar_cache_manager
+        self._detections = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._segment_detections = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def get_frame_index(self, video_id: int, loader: Callable[[], list[Detection]]) -> FrameIndex:
+        return self._detections.get_or_set(
+            video_id, lambda: FrameIndex(self._columnar_cache.get_or_build(video_id, loader=loader))
+        )
+
+    def get_interval_index(self, video_id: int, loader: Callable[[], list[SegmentDetection]]) -> IntervalIndex:
+        return self._segment_detections.get_or_set(video_id, lambda: IntervalIndex(loader()))
+
+    def invalidate(self, video_id: int) -> None:
+        self._columnar_cache.invalidate(video_id)
+        self._detections.delete(video_id)
+        self._segment_detections.delete(video_id)
+
+    def clear(self) -> None:
+        self._detections.clear()
+        self._segment_detections.clear()
+
+    def on_change(self, event: ChangeEvent) -> None:
+        for video_id in event.changed_video_ids:
+            self.invalidate(video_id)
+
+
+detection_index_manager = DetectionIndexManager(
+    maxsize=settings.DETECTION_INDEX_CACHE_SIZE,
+    ttl=settings.DETECTION_INDEX_CACHE_TTL,
+)
+for topic in (ChangeTopic.Video, ChangeTopic.SegmentDetection, ChangeTopic.Detection):
+    event_bus.subscribe(topic, detection_index_manager.on_change)
@@ -0,0 +1,343 @@
+import threading
+import time
+from collections import defaultdict
+from datetime import date
+from typing import Iterable, NamedTuple, Optional
+
+from app.core.config import logger, settings
+from app.core.dates import parse_video_code_date
+from app.core.enums import ChangeAction, ChangeTopic
+from app.core.postings import PostingList
+from app.managers.db.segment_detection import segment_detection_query_manager
+from app.managers.db.video import video_query_manager
+from app.managers.events.bus import event_bus
+from app.schemas.events import ChangeEvent
+
+
+def normalize_extension(extension: Optional[str]) -> str:
+    return (extension or "").lower().lstrip(".")
+
+
+class InvertedIndexMaps(NamedTuple):
+    """The maps of the inverted index, their posting lists are replaced rather than changed."""
+
+    all_videos: PostingList
+    entity_videos: dict[int, PostingList]
+    taxonomy_videos: dict[int, PostingList]
+    date_videos: dict[date, PostingList]
+    extension_videos: dict[str, PostingList]
+    video_terms: dict[int, tuple[frozenset[int], frozenset[int]]]
+    video_fields: dict[int, tuple[Optional[date], str]]
+    built_at: float
+
+
+class InvertedIndexManager:
+
+    """
+    A per-worker inverted index from entities, taxonomies, dates and extensions to the posting lists
+    of the videos they belong to. It is built once from the videos and their segment detections,
+    kept up to date from the change events and fully rebuilt every `refresh_seconds` to pick up
+    external writes.
+    The posting lists are immutable: a change replaces in the maps only the posting lists it touches,
+    so the readers use them without locking, and iterate over a snapshot of the items of a map.
+    The rebuilds run in the background and the readers keep the previous maps meanwhile.
+    """
+
+    def __init__(self, refresh_seconds: Optional[float]) -> None:
+        self._segment_detection_query = segment_detection_query_manager
+        self._video_query = video_query_manager
+        self._refresh_seconds = refresh_seconds
+        self._maps: Optional[InvertedIndexMaps] = None
+        # Serialises the changes to the maps, never held while querying the database
+        self._lock = threading.Lock()
+        # One build at a time, the events received meanwhile are replayed on the built maps
+        self._build_lock = threading.Lock()
+        self._missed_events: Optional[list[ChangeEvent]] = None
+
+    def build(self) -> None:
+        """
+        Build the whole index from the videos and the distinct (video, entity, taxonomy) triples of
+        the segment detections.
+        """
+
+        with self._build_lock:
+            self._build()
+
+    def _build(self) -> None:
+        with self._lock:
+            self._missed_events = []
+        try:
+            maps = self._load_maps()
+        finally:
+            with self._lock:
+                missed, self._missed_events = self._missed_events, None
+
+        with self._lock:
+            self._maps = maps
+        # Their rows may have been read before the change, so they are applied again
+        for event in missed:
+            self._apply(event)
+
+    def _load_maps(self) -> InvertedIndexMaps:
+        video_rows = self._video_query.get_video_facet_fields()
+        term_rows = self._segment_detection_query.get_video_terms()
+
+        date_video_ids = defaultdict(list)
+        extension_video_ids = defaultdict(list)
+        video_fields = {}
+        for video_id, code, extension in video_rows:
+            video_date, video_extension = parse_video_code_date(code), normalize_extension(extension)
+            if video_date is not None:
+                date_video_ids[video_date].append(video_id)
+            extension_video_ids[video_extension].append(video_id)
+            video_fields[video_id] = (video_date, video_extension)
+
+        entity_video_ids = defaultdict(list)
+        taxonomy_video_ids = defaultdict(list)
+        video_terms = defaultdict(lambda: (set(), set()))
+        for video_id, entity_id, taxonomy_id in term_rows:
+            entity_video_ids[entity_id].append(video_id)
+            taxonomy_video_ids[taxonomy_id].append(video_id)
+            video_terms[video_id][0].add(entity_id)
+            video_terms[video_id][1].add(taxonomy_id)
+
+        return InvertedIndexMaps(
+            all_videos=PostingList.from_ids(video_fields),
+            entity_videos={key: PostingList.from_ids(ids) for key, ids in entity_video_ids.items()},
+            taxonomy_videos={key: PostingList.from_ids(ids) for key, ids in taxonomy_video_ids.items()},
+            date_videos={key: PostingList.from_ids(ids) for key, ids in date_video_ids.items()},
+            extension_videos={key: PostingList.from_ids(ids) for key, ids in extension_video_ids.items()},
+            video_terms={
+                video_id: (frozenset(entity_ids), frozenset(taxonomy_ids))
+                for video_id, (entity_ids, taxonomy_ids) in video_terms.items()
+            },
+            video_fields=video_fields,
+            built_at=time.monotonic(),
+        )
+
+    def _get_maps(self) -> InvertedIndexMaps:
+        maps = self._maps
+        if maps is None:
+            # Nothing to serve yet, the first readers wait for the first build
+            with self._build_lock:
+                if self._maps is None:
+                    self._build()
+            return self._maps
+
+        if self._refresh_seconds is not None and time.monotonic() - maps.built_at > self._refresh_seconds:
+            if self._build_lock.acquire(blocking=False):
+                threading.Thread(target=self._refresh, name="inverted-index-refresh", daemon=True).start()
+        return maps
+
+    def _refresh(self) -> None:
+        try:
+            self._build()
+        except Exception as err:
+            # The previous maps are kept, the next stale read tries again
+            logger.error(f"Error refreshing the inverted index: {err}")
+        finally:
+            self._build_lock.release()
+
+    def get_all_videos(self) -> PostingList:
+        return self._get_maps().all_videos
+
+    def get_entity_videos(self, entity_id: int) -> PostingList:
+        return self._get_maps().entity_videos.get(entity_id, PostingList())
+
+    def get_taxonomy_videos(self, taxonomy_id: int) -> PostingList:
+        return self._get_maps().taxonomy_videos.get(taxonomy_id, PostingList())
+
+    def get_extension_videos(self, extension: str) -> PostingList:
+        return self._get_maps().extension_videos.get(normalize_extension(extension), PostingList())
+
+    def get_videos_by_entity_ids(self, entity_ids: Iterable[int]) -> PostingList:
+        entity_videos = self._get_maps().entity_videos
+        return PostingList.union(entity_videos.get(entity_id, PostingList()) for entity_id in entity_ids)
+
+    def get_videos_by_dates(self, from_date: Optional[date] = None, to_date: Optional[date] = None) -> PostingList:
+        """
+        Union of the videos recorded between the two dates (inclusive).
+        """
+
+        return PostingList.union(
+            posting_list
+            for video_date, posting_list in list(self._get_maps().date_videos.items())
+            if (from_date is None or video_date >= from_date) and (to_date is None or video_date <= to_date)
+        )
+
+    def count_facets(self, facet: str, videos: PostingList) -> dict:
+        """
+        Count the videos of every value of a facet ("entity", "taxonomy", "date" or "extension") that are
+        in `videos`, one intersection per value. Values without videos are left out.
+        """
+
+        maps = self._get_maps()
+        posting_lists = {
+            "entity": maps.entity_videos,
+            "taxonomy": maps.taxonomy_videos,
+            "date": maps.date_videos,
+            "extension": maps.extension_videos,
+        }[facet]
+
+        counts = {}
+        for value, posting_list in list(posting_lists.items()):
+            count = len(posting_list & videos)
+            if count:
+                counts[value] = count
+        return counts
+
+    def remove_videos(self, video_ids: Iterable[int]) -> None:
+        video_ids = list(video_ids)
+        with self._lock:
+            if self._maps is None:
+                return
+
+            maps = self._maps
+            removed_terms, removed_fields = ({}, {}), ({}, {})
+            for video_id in video_ids:
+                self._collect(removed_terms, video_id, maps.video_terms.pop(video_id, (frozenset(), frozenset())))
+                self._collect(removed_fields, video_id, self._field_keys(maps.video_fields.pop(video_id, None)))
+            self._update_posting_lists(maps.entity_videos, removed=removed_terms[0])
+            self._update_posting_lists(maps.taxonomy_videos, removed=removed_terms[1])
+            self._update_posting_lists(maps.date_videos, removed=removed_fields[0])
+            self._update_posting_lists(maps.extension_videos, removed=removed_fields[1])
+            self._maps = maps._replace(all_videos=maps.all_videos - PostingList.from_ids(video_ids))
+
+    @staticmethod
+    def _field_keys(fields: Optional[tuple[Optional[date], str]]) -> tuple[frozenset, frozenset]:
+        """
+        The date and extension keys a video is indexed by, from its (date, extension) fields.
+        """
+
+        if fields is None:
+            return frozenset(), frozenset()
+        video_date, video_extension = fields
+        return frozenset() if video_date is None else frozenset([video_date]), frozenset([video_extension])
+
+    @staticmethod
+    def _collect(video_ids_by_key: tuple[dict, dict], video_id: int, keys: tuple[Iterable, Iterable]) -> None:
+        """
+        Add the video to the ids of every key of the pair of maps, the first keys going to the first map.
+        """
+
+        for video_ids, map_keys in zip(video_ids_by_key, keys):
+            for key in map_keys:
+                video_ids.setdefault(key, []).append(video_id)
+
+    @staticmethod
+    def _update_posting_lists(
+        posting_lists: dict, added: Optional[dict] = None, removed: Optional[dict] = None
+    ) -> None:
+        """
+        Replace the posting lists of the keys with videos added or removed, one merge per key, leaving the
+        others untouched. The keys left without videos are dropped.
+        """
+
+        added, removed = added or {}, removed or {}
+        for key in added.keys() | removed.keys():
+            posting_list = posting_lists.get(key, PostingList())
+            if key in removed:
+                posting_list = posting_list - PostingList.from_ids(removed[key])
+            if key in added:
+                posting_list = posting_list | PostingList.from_ids(added[key])
+            if posting_list:
+                posting_lists[key] = posting_list
+            else:
+                posting_lists.pop(key, None)
+
+    def refresh_videos(self, video_ids: list[int]) -> None:
+        """
+        Re-index the terms of the given videos from their current segment detections.
+        """
+
+        if not video_ids:
+            return
+
+        rows = self._segment_detection_query.get_video_terms(video_ids=video_ids)
+        video_terms = defaultdict(lambda: (set(), set()))
+        for video_id, entity_id, taxonomy_id in rows:
+            video_terms[video_id][0].add(entity_id)
+            video_terms[video_id][1].add(taxonomy_id)
+
+        with self._lock:
+            if self._maps is None:
+                return
+
+            maps = self._maps
+            added, removed = ({}, {}), ({}, {})
+            for video_id in set(video_ids) | video_terms.keys():
+                old_entity_ids, old_taxonomy_ids = maps.video_terms.pop(video_id, (frozenset(), frozenset()))
+                entity_ids, taxonomy_ids = video_terms.get(video_id, (set(), set()))
+                # Only the terms the video gained or lost touch their posting lists
+                self._collect(removed, video_id, (old_entity_ids - entity_ids, old_taxonomy_ids - taxonomy_ids))
+                self._collect(added, video_id, (entity_ids - old_entity_ids, taxonomy_ids - old_taxonomy_ids))
+                if entity_ids or taxonomy_ids:
+                    maps.video_terms[video_id] = (frozenset(entity_ids), frozenset(taxonomy_ids))
+            self._update_posting_lists(maps.entity_videos, added=added[0], removed=removed[0])
+            self._update_posting_lists(maps.taxonomy_videos, added=added[1], removed=removed[1])
+
+    def refresh_video_fields(self, video_ids: list[int]) -> None:
+        """
+        Re-index the date and extension of the given videos from the videos table.
+        """
+
+        if not video_ids:
+            return
+
+        rows = self._video_query.get_video_facet_fields(video_ids=video_ids)
+        video_fields = {
+            video_id: (parse_video_code_date(code), normalize_extension(extension))
+            for video_id, code, extension in rows
+        }
+        with self._lock:
+            if self._maps is None:
+                return
+
+            maps = self._maps
+            added, removed = ({}, {}), ({}, {})
+            for video_id in set(video_ids) | video_fields.keys():
+                old_fields, fields = maps.video_fields.pop(video_id, None), video_fields.get(video_id)
+                if old_fields != fields:
+                    self._collect(removed, video_id, self._field_keys(old_fields))
+                    self._collect(added, video_id, self._field_keys(fields))
+                if fields is not None:
+                    maps.video_fields[video_id] = fields
+            self._update_posting_lists(maps.date_videos, added=added[0], removed=removed[0])
+            self._update_posting_lists(maps.extension_videos, added=added[1], removed=removed[1])
+            self._maps = maps._replace(all_videos=maps.all_videos | PostingList.from_ids(video_fields))
+
+    def remove_terms(self, entity_ids: Iterable[int] = (), taxonomy_ids: Iterable[int] = ()) -> None:
+        with self._lock:
+            if self._maps is None:
+                return
+
+            for entity_id in entity_ids:
+                self._maps.entity_videos.pop(entity_id, None)
+            for taxonomy_id in taxonomy_ids:
+                self._maps.taxonomy_videos.pop(taxonomy_id, None)
+
+    def on_change(self, event: ChangeEvent) -> None:
+        with self._lock:
+            if self._missed_events is not None:
+                self._missed_events.append(event)
+            if self._maps is None:
+                return
+
+        self._apply(event)
+
+    def _apply(self, event: ChangeEvent) -> None:
+        if event.topic == ChangeTopic.Video and event.action == ChangeAction.Deleted:
+            self.remove_videos(event.ids)
+        elif event.topic == ChangeTopic.Video:
+            self.refresh_video_fields(event.ids)
+        elif event.topic == ChangeTopic.SegmentDetection:
+            self.refresh_videos(event.video_ids)
+        elif event.topic == ChangeTopic.Entity and event.action == ChangeAction.Deleted:
+            self.remove_terms(entity_ids=event.ids)
+        elif event.topic == ChangeTopic.Taxonomy and event.action == ChangeAction.Deleted:
+            self.remove_terms(taxonomy_ids=event.ids)
+
+
+inverted_index_manager = InvertedIndexManager(refresh_seconds=settings.INVERTED_INDEX_REFRESH_SECONDS)
+for topic in (ChangeTopic.Video, ChangeTopic.SegmentDetection, ChangeTopic.Entity, ChangeTopic.Taxonomy):
+    event_bus.subscribe(topic, inverted_index_manager.on_change)
@@ -0,0 +1,158 @@
+import threading
+from collections import defaultdict
+from typing import Optional
+
+from video_enrichment_orm.managers.db_taxonomy import db_taxonomy_manager
+from video_enrichment_orm.schemas.taxonomy import Taxonomy
+
+from app.core.enums import ChangeTopic
+from app.managers.events.bus import event_bus
+from app.schemas.events import ChangeEvent
+from app.schemas.taxonomy import TaxonomyNode
+
+
+class TaxonomyTree:
+
+    """
+    The taxonomy hierarchy laid out in an Euler tour: the taxonomies are stored in preorder and
+    every taxonomy keeps the [enter, exit) positions of its subtree, so a subtree is a slice of
+    the preorder and "is descendant" is an interval check. Taxonomies whose parent is missing
+    are treated as roots.
+    """
+
+    def __init__(self, taxonomies: list[Taxonomy]) -> None:
+        self._taxonomies = {taxonomy.id: taxonomy for taxonomy in taxonomies}
+        self._ids_by_uuid = {taxonomy.uuid: taxonomy.id for taxonomy in taxonomies}
+
+        children = defaultdict(list)
+        roots = []
+        for taxonomy in sorted(taxonomies, key=lambda taxonomy: taxonomy.id):
+            if taxonomy.taxonomy_id in self._taxonomies and taxonomy.taxonomy_id != taxonomy.id:
+                children[taxonomy.taxonomy_id].append(taxonomy.id)
+            else:
+                roots.append(taxonomy.id)
+
+        self._preorder: list[int] = []
+        self._depths: dict[int, int] = {}
+        self._enter: dict[int, int] = {}
+        self._exit: dict[int, int] = {}
+        for root_id in roots:
+            self._visit(root_id, children)
+        # Taxonomies only reachable through a parent cycle are promoted to roots
+        for taxonomy_id in sorted(self._taxonomies.keys() - self._enter.keys()):
+            self._visit(taxonomy_id, children)
+
+    def _visit(self, root_id: int, children: dict[int, list[int]]) -> None:
+        # Iterative DFS, a (taxonomy, exiting) pair is pushed again to close the subtree after its children
+        stack = [(root_id, 0, False)]
+        while stack:
+            taxonomy_id, depth, exiting = stack.pop()
+            if exiting:
+                self._exit[taxonomy_id] = len(self._preorder)
+                continue
+            if taxonomy_id in self._enter:
+                continue
+
+            self._enter[taxonomy_id] = len(self._preorder)
+            self._depths[taxonomy_id] = depth
+            self._preorder.append(taxonomy_id)
+            stack.append((taxonomy_id, depth, True))
+            stack.extend((child_id, depth + 1, False) for child_id in reversed(children[taxonomy_id]))
+
+    def __len__(self) -> int:
+        return len(self._preorder)
+
+    def __contains__(self, taxonomy_id: int) -> bool:
+        return taxonomy_id in self._enter
+
+    def get_id_by_uuid(self, taxonomy_uuid: str) -> Optional[int]:
+        return self._ids_by_uuid.get(taxonomy_uuid)
+
+    def is_descendant(self, taxonomy_id: int, ancestor_id: int) -> bool:
+        return self._enter[ancestor_id] <= self._enter[taxonomy_id] < self._exit[ancestor_id]
+
+    def get_subtree_ids(self, taxonomy_id: int) -> list[int]:
+        """
+        Ids of the taxonomy and all its descendants, in preorder.
+        """
+
+        return self._preorder[self._enter[taxonomy_id] : self._exit[taxonomy_id]]
+
+    def get_ancestors(self, taxonomy_id: int) -> list[Taxonomy]:
+        """
+        The ancestors of the taxonomy, from the root down to its parent.
+        """
+
+        ancestors = []
+        while self._depths[taxonomy_id] > 0:
+            taxonomy_id = self._taxonomies[taxonomy_id].taxonomy_id
+            ancestors.append(self._taxonomies[taxonomy_id])
+        return ancestors[::-1]
+
+    def get_subtree(self, taxonomy_id: int) -> TaxonomyNode:
+        """
+        The taxonomy with its descendants nested, built from the preorder slice of its subtree.
+        """
+
+        return self._nest(self.get_subtree_ids(taxonomy_id))[0]
+
+    def get_forest(self) -> list[TaxonomyNode]:
+        return self._nest(self._preorder)
+
+    def _nest(self, preorder: list[int]) -> list[TaxonomyNode]:
+        roots = []
+        # Open nodes by depth, the parent of a node is the last open node one level above
+        path: list[TaxonomyNode] = []
+        base_depth = self._depths[preorder[0]] if preorder else 0
+        for taxonomy_id in preorder:
+            depth = self._depths[taxonomy_id] - base_depth
+            node = TaxonomyNode(**self._taxonomies[taxonomy_id].model_dump())
+            del path[depth:]
+            if path:
+                path[-1].children.append(node)
+            else:
+                roots.append(node)
+            path.append(node)
+        return roots
+
+
+class TaxonomyTreeManager:
+
+    """
+    A per-worker taxonomy tree, loaded once from the database and dropped on every taxonomy change.
+    """
+
+    def __init__(self) -> None:
+        self._db_taxonomy = db_taxonomy_manager
+        self._tree: Optional[TaxonomyTree] = None
+        self._lock = threading.Lock()
+
+    def get_tree(self) -> TaxonomyTree:
+        with self._lock:
+            if self._tree is None:
+                self._tree = TaxonomyTree(self._db_taxonomy.get_taxonomies())
+            return self._tree
+
+    def get_subtree_ids(self, taxonomy_id: int) -> list[int]:
+        """
+        Ids of the taxonomy and all its descendants.
+
+        Raises:
+            ValueError: If the taxonomy does not exist.
+        """
+
+        tree = self.get_tree()
+        if taxonomy_id not in tree:
+            raise ValueError(f"Taxonomy with id {taxonomy_id} not found")
+        return tree.get_subtree_ids(taxonomy_id)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._tree = None
+
+    def on_change(self, event: ChangeEvent) -> None:
+        self.invalidate()
+
+
+taxonomy_tree_manager = TaxonomyTreeManager()
+event_bus.subscribe(ChangeTopic.Taxonomy, taxonomy_tree_manager.on_change)
@@ -0,0 +1,178 @@
+import io
+import math
+from typing import Callable, Optional
+
+import numpy as np
+from video_enrichment_orm.schemas.segment_detection import SegmentDetection
+
+from app.core.config import settings
+from app.core.enums import ChangeTopic
+from app.core.intervals import covered_frames_before, merge_intervals_by_key
+from app.managers.cache.memory import LRUCache
+from app.managers.events.bus import event_bus
+from app.schemas.events import ChangeEvent
+from app.schemas.video import PresenceSeries
+
+
+class PresenceTimeline:
+
+    """
+    The frames every entity and every taxonomy of a video is on screen in each second of the video,
+    one row per entity (or taxonomy) and one column per second. Seconds start at the frame
+    ceil(second * frame_rate), so fractional frame rates never drift. The timeline carries the
+    fingerprint of the segment detections it was built from, to tell when a stored copy is stale.
+    """
+
+    def __init__(
+        self,
+        frame_rate: float,
+        entity_ids: np.ndarray,
+        entity_presence: np.ndarray,
+        taxonomy_ids: np.ndarray,
+        taxonomy_presence: np.ndarray,
+        fingerprint: str,
+    ) -> None:
+        self._frame_rate = frame_rate
+        self._entity_ids = entity_ids
+        self._entity_presence = entity_presence
+        self._taxonomy_ids = taxonomy_ids
+        self._taxonomy_presence = taxonomy_presence
+        self._fingerprint = fingerprint
+
+    @classmethod
+    def build(
+        cls, segment_detections: list[SegmentDetection], frame_rate: float, frames: int, fingerprint: str
+    ) -> "PresenceTimeline":
+        """
+        Build the timeline of a video from its segment detections, unioned per entity and per taxonomy.
+
+        Args:
+            segment_detections(list): The segment detections of the video.
+            frame_rate(float): The frame rate of the video.
+            frames(int): The number of frames of the video, extended to the last segment detection if shorter.
+            fingerprint(str): The fingerprint of the segment detections.
+
+        Returns:
+            The per-second presence of the entities and taxonomies of the video.
+        """
+
+        count = len(segment_detections)
+        starts = np.fromiter((segment.start_frame for segment in segment_detections), dtype=np.int64, count=count)
+        ends = np.fromiter((segment.end_frame for segment in segment_detections), dtype=np.int64, count=count)
+        entity_ids = np.fromiter((segment.entity_id for segment in segment_detections), dtype=np.int64, count=count)
+        taxonomy_ids = np.fromiter((segment.taxonomy_id for segment in segment_detections), dtype=np.int64, count=count)
+
+        frames = max(frames or 0, int(ends.max()) + 1 if count else 0)
+        seconds = math.ceil(frames / frame_rate)
+        boundaries = np.ceil(np.arange(seconds + 1) * frame_rate).astype(np.int64)
+
+        return cls(
+            frame_rate,
+            *cls._presence(starts, ends, entity_ids, boundaries),
+            *cls._presence(starts, ends, taxonomy_ids, boundaries),
+            fingerprint=fingerprint,
+        )
+
+    @staticmethod
+    def _presence(
+        starts: np.ndarray, ends: np.ndarray, keys: np.ndarray, boundaries: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        merged_keys, merged_starts, merged_ends = merge_intervals_by_key(starts, ends, keys=keys)
+        unique_keys, first = np.unique(merged_keys, return_index=True)
+        last = np.append(first[1:], len(merged_keys))
+
+        # Frames covered per second as the difference of the covered frames before each second boundary
+        presence = np.empty((len(unique_keys), len(boundaries) - 1), dtype=np.uint16)
+        for row, (low, high) in enumerate(zip(first.tolist(), last.tolist())):
+            covered = covered_frames_before(merged_starts[low:high], merged_ends[low:high], boundaries)
+            presence[row] = np.diff(covered)
+        return unique_keys, presence
+
+    @property
+    def fingerprint(self) -> str:
+        return self._fingerprint
+
+    @property
+    def frame_rate(self) -> float:
+        return self._frame_rate
+
+    @property
+    def seconds(self) -> int:
+        return self._entity_presence.shape[1]
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            frame_rate=np.float64(self._frame_rate),
+            entity_ids=self._entity_ids,
+            entity_presence=self._entity_presence,
+            taxonomy_ids=self._taxonomy_ids,
+            taxonomy_presence=self._taxonomy_presence,
+            fingerprint=np.str_(self._fingerprint),
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, content: bytes) -> "PresenceTimeline":
+        with np.load(io.BytesIO(content), allow_pickle=False) as arrays:
+            return cls(
+                frame_rate=float(arrays["frame_rate"]),
+                entity_ids=arrays["entity_ids"],
+                entity_presence=arrays["entity_presence"],
+                taxonomy_ids=arrays["taxonomy_ids"],
+                taxonomy_presence=arrays["taxonomy_presence"],
+                fingerprint=str(arrays["fingerprint"]),
+            )
+
+    def entities(self, bin_seconds: int, entity_ids: Optional[list[int]] = None) -> list[PresenceSeries]:
+        return self._series(self._entity_ids, self._entity_presence, bin_seconds, entity_ids)
+
+    def taxonomies(self, bin_seconds: int, taxonomy_ids: Optional[list[int]] = None) -> list[PresenceSeries]:
+        return self._series(self._taxonomy_ids, self._taxonomy_presence, bin_seconds, taxonomy_ids)
+
+    def bins(self, bin_seconds: int) -> int:
+        return math.ceil(self.seconds / bin_seconds)
+
+    def _series(
+        self, keys: np.ndarray, presence: np.ndarray, bin_seconds: int, only: Optional[list[int]]
+    ) -> list[PresenceSeries]:
+        rows = np.arange(len(keys)) if only is None else np.flatnonzero(np.isin(keys, only))
+
+        # The last bin is padded with empty seconds so every bin sums bin_seconds columns
+        padded = np.zeros((len(rows), self.bins(bin_seconds) * bin_seconds), dtype=np.int64)
+        padded[:, : self.seconds] = presence[rows]
+        binned = padded.reshape(len(rows), -1, bin_seconds).sum(axis=2)
+        return [PresenceSeries(id=int(keys[row]), frames=frames) for row, frames in zip(rows, binned.tolist())]
+
+
+class TimelineManager:
+
+    """
+    A per-worker cache of the presence timelines of the most recently queried videos.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float]) -> None:
+        self._timelines = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def get_timeline(self, video_id: int, loader: Callable[[], PresenceTimeline]) -> PresenceTimeline:
+        return self._timelines.get_or_set(video_id, loader)
+
+    def invalidate(self, video_id: int) -> None:
+        self._timelines.delete(video_id)
+
+    def clear(self) -> None:
+        self._timelines.clear()
+
+    def on_change(self, event: ChangeEvent) -> None:
+        # An update of a video may change its frame rate or frames
+        for video_id in event.changed_video_ids:
+            self.invalidate(video_id)
+
+
+timeline_manager = TimelineManager(
+    maxsize=settings.TIMELINE_CACHE_SIZE,
+    ttl=settings.TIMELINE_CACHE_TTL,
+)
+for topic in (ChangeTopic.Video, ChangeTopic.SegmentDetection):
+    event_bus.subscribe(topic, timeline_manager.on_change)
@@ -0,0 +1,59 @@
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+from app.core.config import settings
+
+
+class ScreenTimeRequest(BaseModel):
+    """Videos to report the screen time of, optionally restricted to some entities and to the top k of them"""
+
+    video_ids: list[int] = Field(min_length=1, max_length=settings.BATCH_MAX_KEYS)
+    entity_ids: Optional[list[int]] = None
+    top_k: Optional[int] = Field(default=None, ge=1)
+
+
+class VideoScreenTime(BaseModel):
+    video_id: int
+    frames: int
+    seconds: float
+
+
+class EntityScreenTime(BaseModel):
+    """Time an entity is on screen, in total and per video"""
+
+    entity_id: int
+    frames: int
+    seconds: float
+    videos: list[VideoScreenTime]
+
+
+class ScreenTimeResponse(BaseModel):
+    """Entities ranked by their total screen time"""
+
+    entities: list[EntityScreenTime]
+
+
+class CoOccurrenceRequest(BaseModel):
+    """Videos to measure the co-occurrence in, the whole catalog when omitted, optionally around some entities"""
+
+    video_ids: Optional[list[int]] = Field(default=None, min_length=1, max_length=settings.BATCH_MAX_KEYS)
+    entity_ids: Optional[list[int]] = None
+    min_frames: int = Field(default=1, ge=1)
+
+
+class EntityPair(BaseModel):
+    """Time two entities are on screen together, the first id below the second"""
+
+    entity_id: int
+    other_entity_id: int
+    frames: int
+    seconds: float
+    videos: int
+
+
+class CoOccurrenceResponse(BaseModel):
+    """The non-zero cells of the symmetric entity co-occurrence matrix, ranked by seconds together"""
+
+    videos: int
+    pairs: list[EntityPair]
@@ -0,0 +1,74 @@
+from typing import Any, Generic, Optional, TypeVar, Union
+
+from pydantic import BaseModel, Field, model_validator
+
+from app.core.config import settings
+from app.core.enums import BulkItemStatus
+
+T = TypeVar("T")
+
+
+class BatchLookupRequest(BaseModel):
+    """Keys to look up in a single query, either ids or uuids"""
+
+    ids: list[int] = Field(default=[], max_length=settings.BATCH_MAX_KEYS)
+    uuids: list[str] = Field(default=[], max_length=settings.BATCH_MAX_KEYS)
+
+    @model_validator(mode="after")
+    def check_keys(self):
+        if bool(self.ids) == bool(self.uuids):
+            raise ValueError("Either ids or uuids must be given")
+        return self
+
+    @property
+    def key(self) -> str:
+        return "id" if self.ids else "uuid"
+
+    @property
+    def keys(self) -> list[Union[int, str]]:
+        """The requested keys without duplicates, in the order of the request."""
+        return list(dict.fromkeys(self.ids or self.uuids))
+
+
+class BatchLookupResponse(BaseModel, Generic[T]):
+    """Rows found, in the order of the requested keys, and the keys not found"""
+
+    items: list[T]
+    missing: list[Union[int, str]]
+
+    @classmethod
+    def from_rows(cls, request: BatchLookupRequest, rows: list[Any]) -> "BatchLookupResponse[T]":
+        rows_by_key = {getattr(row, request.key): row for row in rows}
+        return cls(
+            items=[rows_by_key[key] for key in request.keys if key in rows_by_key],
+            missing=[key for key in request.keys if key not in rows_by_key],
+        )
+
+
+class BulkItemResult(BaseModel):
+    """Outcome of the item at `index` of a bulk write"""
+
+    index: int
+    status: BulkItemStatus
+    id: Optional[int] = None
+    uuid: Optional[str] = None
+    detail: Optional[str] = None
+
+
+class BulkResponse(BaseModel):
+    """Counts of a bulk write and the outcome of every item, in the order of the request"""
+
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    results: list[BulkItemResult]
+
+    @classmethod
+    def from_results(cls, results: list[BulkItemResult]) -> "BulkResponse":
+        statuses = [result.status for result in results]
+        return cls(
+            created=statuses.count(BulkItemStatus.Created),
+            updated=statuses.count(BulkItemStatus.Updated),
+            failed=statuses.count(BulkItemStatus.Failed),
+            results=results,
+        )
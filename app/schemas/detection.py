@@ -0,0 +1,226 @@
+import math
+from typing import Optional
+
+import numpy as np
+from pydantic import BaseModel, Field
+from video_enrichment_orm.schemas.detection import Detection
+
+from app.core.config import settings
+
+
+class FrameRangeFilter(BaseModel):
+    """Inclusive time window, expressed either in frames or in seconds"""
+
+    from_frame: Optional[int] = None
+    to_frame: Optional[int] = None
+    from_second: Optional[float] = None
+    to_second: Optional[float] = None
+
+    def has_frame_range(self) -> bool:
+        return any(bound is not None for bound in (self.from_frame, self.to_frame, self.from_second, self.to_second))
+
+    def resolve_frames(self, frame_rate: Optional[float]) -> tuple[Optional[int], Optional[int]]:
+        """
+        Resolve the window to inclusive frame bounds, converting seconds with the video frame rate.
+
+        Args:
+            frame_rate(float): The frame rate of the video the window applies to.
+
+        Returns:
+            The (from_frame, to_frame) bounds, None meaning unbounded.
+        """
+
+        uses_frames = self.from_frame is not None or self.to_frame is not None
+        uses_seconds = self.from_second is not None or self.to_second is not None
+        if uses_frames and uses_seconds:
+            raise ValueError("Frame and second bounds cannot be combined")
+
+        from_frame, to_frame = self.from_frame, self.to_frame
+        if uses_seconds:
+            if not frame_rate:
+                raise ValueError("Video has no frame rate to convert seconds into frames")
+            if self.from_second is not None:
+                from_frame = math.floor(self.from_second * frame_rate)
+            if self.to_second is not None:
+                to_frame = math.ceil(self.to_second * frame_rate)
+
+        if from_frame is not None and to_frame is not None and from_frame > to_frame:
+            raise ValueError(f"Invalid frame range: {from_frame} is greater than {to_frame}")
+
+        return from_frame, to_frame
+
+
+class AttributeFilter(BaseModel):
+    """Score thresholds and entity/taxonomy filters, the entity and taxonomy filters are pushed down to the database"""
+
+    min_detection_score: Optional[float] = None
+    min_entity_score: Optional[float] = None
+    entity_ids: Optional[list[int]] = None
+    taxonomy_ids: Optional[list[int]] = None
+
+    def has_attribute_filters(self) -> bool:
+        return (
+            self.min_detection_score is not None
+            or self.min_entity_score is not None
+            or bool(self.entity_ids)
+            or bool(self.taxonomy_ids)
+        )
+
+    def has_score_filters(self) -> bool:
+        return self.min_detection_score is not None or self.min_entity_score is not None
+
+    def has_entity_filters(self) -> bool:
+        return bool(self.entity_ids) or bool(self.taxonomy_ids)
+
+    def mask_scores(self, detection_scores: np.ndarray, entity_scores: np.ndarray) -> np.ndarray:
+        """
+        Evaluate the score thresholds over the scores of the detections.
+        """
+
+        keep = np.ones(len(detection_scores), dtype=bool)
+        if self.min_detection_score is not None:
+            keep &= detection_scores >= self.min_detection_score
+        if self.min_entity_score is not None:
+            keep &= entity_scores >= self.min_entity_score
+        return keep
+
+
+class SpatialFilter(BaseModel):
+    """Region and area filters over the normalised bounding boxes, the missing region bounds are the frame edges"""
+
+    region_x_min: Optional[float] = None
+    region_y_min: Optional[float] = None
+    region_x_max: Optional[float] = None
+    region_y_max: Optional[float] = None
+    min_area: Optional[float] = None
+    max_area: Optional[float] = None
+
+    def has_spatial_filters(self) -> bool:
+        return self.has_region() or self.min_area is not None or self.max_area is not None
+
+    def has_region(self) -> bool:
+        return any(
+            bound is not None for bound in (self.region_x_min, self.region_y_min, self.region_x_max, self.region_y_max)
+        )
+
+    def resolve_region(self) -> tuple[float, float, float, float]:
+        """
+        Resolve the region to the (x_min, y_min, x_max, y_max) bounds, the missing bounds being the frame edges.
+        """
+
+        x_min = 0.0 if self.region_x_min is None else self.region_x_min
+        y_min = 0.0 if self.region_y_min is None else self.region_y_min
+        x_max = 1.0 if self.region_x_max is None else self.region_x_max
+        y_max = 1.0 if self.region_y_max is None else self.region_y_max
+        if x_min > x_max or y_min > y_max:
+            raise ValueError(f"Invalid region: ({x_min}, {y_min}) is not before ({x_max}, {y_max})")
+        if self.min_area is not None and self.max_area is not None and self.min_area > self.max_area:
+            raise ValueError(f"Invalid area range: {self.min_area} is greater than {self.max_area}")
+        return x_min, y_min, x_max, y_max
+
+    def mask(self, boxes: np.ndarray) -> np.ndarray:
+        """
+        Evaluate the filters over an array of boxes.
+
+        Args:
+            boxes(np.ndarray): The (x_min, y_min, x_max, y_max) boxes, one row per detection.
+
+        Returns:
+            The mask of the boxes that intersect the region and whose area is within the area range.
+        """
+
+        keep = np.ones(len(boxes), dtype=bool)
+        if self.has_region():
+            x_min, y_min, x_max, y_max = self.resolve_region()
+            keep &= (boxes[:, 0] <= x_max) & (boxes[:, 2] >= x_min) & (boxes[:, 1] <= y_max) & (boxes[:, 3] >= y_min)
+        if self.min_area is not None or self.max_area is not None:
+            areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+            if self.min_area is not None:
+                keep &= areas >= self.min_area
+            if self.max_area is not None:
+                keep &= areas <= self.max_area
+        return keep
+
+
+class DetectionFilter(FrameRangeFilter, AttributeFilter, SpatialFilter):
+    """Filters accepted by the detection queries"""
+
+    stride: Optional[int] = None
+    target_fps: Optional[float] = None
+
+    def has_filters(self) -> bool:
+        return (
+            self.has_frame_range() or self.has_sampling() or self.has_attribute_filters() or self.has_spatial_filters()
+        )
+
+    def has_sampling(self) -> bool:
+        return self.stride is not None or self.target_fps is not None
+
+    def resolve_bucket_width(self, frame_rate: Optional[float]) -> Optional[float]:
+        """
+        Resolve the sampling parameters to the width, in frames, of the buckets that keep one detection per segment.
+
+        Args:
+            frame_rate(float): The frame rate of the video the sampling applies to.
+
+        Returns:
+            The bucket width in frames, or None when no sampling is requested.
+        """
+
+        if self.stride is not None and self.target_fps is not None:
+            raise ValueError("Stride and target fps cannot be combined")
+
+        if self.stride is not None:
+            return float(self.stride)
+
+        if self.target_fps is not None:
+            if not frame_rate:
+                raise ValueError("Video has no frame rate to sample detections per second")
+            return max(frame_rate / self.target_fps, 1.0)
+
+        return None
+
+
+class DetectionBatchRequest(BaseModel):
+    """Videos to fetch the detections of in a single request"""
+
+    video_ids: list[int] = Field(min_length=1, max_length=settings.BATCH_MAX_KEYS)
+
+
+class VideoDetections(BaseModel):
+    """Detections of a video, one per line of the batch responses"""
+
+    video_id: int
+    detections: list[Detection]
+
+
+class TrackFilter(FrameRangeFilter):
+    """Frame window and interpolation tolerance of the tracks"""
+
+    tolerance: float
+
+
+class Keyframe(BaseModel):
+    """A detection kept as a keyframe of a track"""
+
+    detection_id: int
+    frame: int
+    detection_score: float
+    entity_score: float
+    bbox_x_min: float
+    bbox_y_min: float
+    bbox_x_max: float
+    bbox_y_max: float
+
+
+class Track(BaseModel):
+    """
+    Detections of a run of frames of a segment detection compressed into keyframes, the boxes in between are
+    interpolated linearly. A segment detection with gaps in its frames has one track per run.
+    """
+
+    segment_detection_id: int
+    start_frame: int
+    end_frame: int
+    detections: int
+    keyframes: list[Keyframe]
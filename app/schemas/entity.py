@@ -0,0 +1,10 @@
+from pydantic import BaseModel, Field
+from video_enrichment_orm.schemas.entity import EntityCreate
+
+from app.core.config import settings
+
+
+class EntityBulkCreateRequest(BaseModel):
+    """Entities to create in a single transaction"""
+
+    items: list[EntityCreate] = Field(min_length=1, max_length=settings.BULK_MAX_ITEMS)
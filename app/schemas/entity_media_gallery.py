@@ -1,10 +1,12 @@
 import uuid
-from typing import Optional
+from typing import Any, Optional
 
-from pydantic import Field
+from pydantic import BaseModel, Field, model_validator
 from video_enrichment_orm.dao.entity_media_gallery import EntityMediaGalleryDAO
 from video_enrichment_orm.schemas.timestamps import Timestamps
 
+from app.core.config import settings
+
 
 class EntityMediaGalleryBase(Timestamps):
     """Base class for EntityMediaGallery schemas to avoid code duplication"""
@@ -22,20 +24,24 @@ class EntityMediaGallery(EntityMediaGalleryBase):
     id: Optional[int] = None
     has_embedding: bool = False
 
+    @model_validator(mode="before")
     @classmethod
-    def from_orm(cls, obj: EntityMediaGalleryDAO) -> "EntityMediaGallery":
-        return cls(
-            id=obj.id,
-            uuid=obj.uuid,
-            entity_id=obj.entity_id,
-            path=obj.path,
-            enabled=obj.enabled,
-            has_embedding=obj.embedding is not None,
-            created_at=obj.created_at,
-            created_by=obj.created_by,
-            updated_at=obj.updated_at,
-            updated_by=obj.updated_by,
-        )
+    def derive_has_embedding(cls, data: Any) -> Any:
+        # The embedding of a row is never returned, only whether it has one
+        if isinstance(data, EntityMediaGalleryDAO):
+            return {
+                "id": data.id,
+                "uuid": data.uuid,
+                "entity_id": data.entity_id,
+                "path": data.path,
+                "enabled": data.enabled,
+                "has_embedding": data.embedding is not None,
+                "created_at": data.created_at,
+                "created_by": data.created_by,
+                "updated_at": data.updated_at,
+                "updated_by": data.updated_by,
+            }
+        return data
 
 
 class EntityMediaGalleryCreate(EntityMediaGalleryBase):
@@ -60,3 +66,10 @@ class EntityMediaGalleryCreate(EntityMediaGalleryBase):
 class EntityMediaGalleryUpdate(Timestamps):
     path: Optional[str] = None
     enabled: Optional[bool] = None
+
+
+class EntityMediaGalleryBulkEnableRequest(BaseModel):
+    """Entity media galleries to enable or disable in a single statement"""
+
+    uuids: list[str] = Field(min_length=1, max_length=settings.BULK_MAX_ITEMS)
+    enabled: bool
@@ -0,0 +1,21 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+from app.core.enums import ChangeAction, ChangeTopic
+
+
+class ChangeEvent(BaseModel):
+    """A change of one or more rows of a domain object"""
+
+    topic: ChangeTopic
+    action: ChangeAction
+    ids: list[int] = []
+    video_ids: list[int] = []
+    # The worker the event comes from, None for the events of this worker
+    origin: Optional[str] = None
+
+    @property
+    def changed_video_ids(self) -> list[int]:
+        """The videos the change touches, the events of the videos carry them in ids and the others in video_ids"""
+        return self.ids if self.topic == ChangeTopic.Video else self.video_ids
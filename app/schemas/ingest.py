@@ -0,0 +1,6 @@
+from pydantic import BaseModel
+
+
+class IngestResponse(BaseModel):
+    video_id: int
+    rows: int
@@ -0,0 +1,20 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+from app.schemas.detection import AttributeFilter, FrameRangeFilter
+
+
+class SegmentDetectionFilter(FrameRangeFilter, AttributeFilter):
+    """Filters accepted by the segment detection queries"""
+
+    merge_gap_frames: Optional[int] = None
+
+    def has_filters(self) -> bool:
+        return self.has_frame_range() or self.has_attribute_filters()
+
+
+class SegmentCompactionResponse(BaseModel):
+    video_id: int
+    segments_before: int
+    segments_after: int
@@ -0,0 +1,22 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class SnapshotBlob(BaseModel):
+    """A gzip compressed JSON array of the rows of a video published in S3"""
+
+    path: str
+    etag: str
+    rows: int
+    size: int
+
+
+class SnapshotManifest(BaseModel):
+    """The current version of the snapshot of a video, fresh while its fingerprint matches the database"""
+
+    video_id: int
+    version: int
+    fingerprint: str
+    published_at: datetime
+    blobs: dict[str, SnapshotBlob]
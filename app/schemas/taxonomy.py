@@ -0,0 +1,31 @@
+from typing import Optional
+
+from pydantic import BaseModel, Field, model_validator
+from video_enrichment_orm.schemas.taxonomy import Taxonomy, TaxonomyCreate
+
+from app.core.config import settings
+
+
+class TaxonomyNode(Taxonomy):
+    """Taxonomy with its child taxonomies nested"""
+
+    children: list["TaxonomyNode"] = []
+
+
+class TaxonomyBulkCreateItem(TaxonomyCreate):
+    """Taxonomy to create in bulk, its parent is either an existing taxonomy or another item of the request"""
+
+    # The uuid of the item of the same request the taxonomy is a child of
+    parent_uuid: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_parent(self):
+        if self.taxonomy_id and self.parent_uuid:
+            raise ValueError("Either taxonomy_id or parent_uuid can be given, not both")
+        return self
+
+
+class TaxonomyBulkCreateRequest(BaseModel):
+    """Taxonomies to create in a single transaction, their parents must exist or be created by the request"""
+
+    items: list[TaxonomyBulkCreateItem] = Field(min_length=1, max_length=settings.BULK_MAX_ITEMS)
@@ -1,5 +1,119 @@
-from pydantic import BaseModel
+from datetime import date
+from typing import Optional, Union
+
+from pydantic import BaseModel, Field, model_validator
+from video_enrichment_orm.schemas.detection import Detection
+from video_enrichment_orm.schemas.entity import Entity
+from video_enrichment_orm.schemas.segment_detection import SegmentDetection
+from video_enrichment_orm.schemas.taxonomy import Taxonomy
+from video_enrichment_orm.schemas.video import Video
 
 
 class EntityIdsRequest(BaseModel):
     entity_ids: list[int]
+    offset: int = Field(default=0, ge=0)
+    limit: int = Field(default=100, ge=1, le=1000)
+
+
+class CoOccurrence(BaseModel):
+    """Entities and taxonomies that must be on screen together, within `within_seconds` of each other"""
+
+    entity_ids: list[int] = []
+    taxonomy_ids: list[int] = []
+    within_seconds: float = Field(default=0, ge=0)
+
+    @model_validator(mode="after")
+    def check_participants(self):
+        if len(self.entity_ids) + len(self.taxonomy_ids) < 2:
+            raise ValueError("A co-occurrence needs at least two entities or taxonomies")
+        return self
+
+
+class VideoSearchRequest(BaseModel):
+    """Boolean and co-occurrence search over the entities and taxonomies detected in the videos"""
+
+    all_entity_ids: list[int] = []
+    any_entity_ids: list[int] = []
+    not_entity_ids: list[int] = []
+    all_taxonomy_ids: list[int] = []
+    any_taxonomy_ids: list[int] = []
+    not_taxonomy_ids: list[int] = []
+    together: list[CoOccurrence] = []
+    offset: int = Field(default=0, ge=0)
+    limit: int = Field(default=100, ge=1, le=1000)
+
+    @model_validator(mode="after")
+    def check_positive_terms(self):
+        if not (
+            self.all_entity_ids
+            or self.any_entity_ids
+            or self.all_taxonomy_ids
+            or self.any_taxonomy_ids
+            or self.together
+        ):
+            raise ValueError("The search needs at least one entity or taxonomy that must be present")
+        return self
+
+
+class VideoFacetRequest(BaseModel):
+    """Faceted search over the videos: all the entities and taxonomies, any of the extensions and a date range"""
+
+    entity_ids: list[int] = []
+    taxonomy_ids: list[int] = []
+    extensions: list[str] = []
+    from_date: Optional[date] = None
+    to_date: Optional[date] = None
+    facet_size: int = Field(default=20, ge=1, le=1000)
+    offset: int = Field(default=0, ge=0)
+    limit: int = Field(default=100, ge=1, le=1000)
+
+    @model_validator(mode="after")
+    def check_date_range(self):
+        if self.from_date and self.to_date and self.from_date > self.to_date:
+            raise ValueError("from_date must not be after to_date")
+        return self
+
+
+class FacetCount(BaseModel):
+    value: Union[int, str]
+    count: int
+
+
+class VideoFacets(BaseModel):
+    entities: list[FacetCount] = []
+    taxonomies: list[FacetCount] = []
+    dates: list[FacetCount] = []
+    extensions: list[FacetCount] = []
+
+
+class VideoFacetResponse(BaseModel):
+    total: int
+    videos: list[Video]
+    facets: VideoFacets
+
+
+class VideoDetail(Video):
+    """Video with the expanded related data embedded, the expansions not requested are left as null"""
+
+    segments: Optional[list[SegmentDetection]] = None
+    detections: Optional[list[Detection]] = None
+    entities: Optional[list[Entity]] = None
+    taxonomies: Optional[list[Taxonomy]] = None
+
+
+class PresenceSeries(BaseModel):
+    """Frames an entity or a taxonomy is on screen in every bin of the timeline"""
+
+    id: int
+    frames: list[int]
+
+
+class VideoTimeline(BaseModel):
+    """Presence of the entities and taxonomies of a video, binned every `bin_seconds` seconds"""
+
+    video_id: int
+    frame_rate: float
+    bin_seconds: int
+    bins: int
+    entities: list[PresenceSeries]
+    taxonomies: list[PresenceSeries]
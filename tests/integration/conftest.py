@@ -0,0 +1,38 @@
+from unittest.mock import patch
+
+import pytest
+
+from app.managers.cache.lookup import lookup_cache_manager
+from app.managers.cache.response import response_cache
+from app.managers.cache.snapshot import snapshot_store
+from app.managers.index.analytics import analytics_index_manager
+from app.managers.index.columnar import columnar_cache_manager
+from app.managers.index.detection import detection_index_manager
+from app.managers.index.timeline import timeline_manager
+
+CACHES = (
+    response_cache,
+    lookup_cache_manager,
+    snapshot_store,
+    detection_index_manager,
+    analytics_index_manager,
+    timeline_manager,
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_caches(tmp_path):
+    """
+    Run every test on empty caches, the tests reuse the same ids with different mocked rows.
+    The snapshots are only served by the tests that enable them, and the columnar files are
+    written to the directory of the test.
+    """
+
+    for cache in CACHES:
+        cache.clear()
+    with patch.object(snapshot_store, "_enabled", False), patch.object(
+        columnar_cache_manager, "_path", str(tmp_path / "columnar")
+    ):
+        yield
+    for cache in CACHES:
+        cache.clear()
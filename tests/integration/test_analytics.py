@@ -0,0 +1,212 @@
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from video_enrichment_orm.schemas.segment_detection import SegmentDetection
+from video_enrichment_orm.schemas.video import Video
+
+from app.core.config import settings
+from app.core.enums import ChangeAction, ChangeTopic
+from app.main import app
+from app.managers.index.analytics import analytics_index_manager
+from app.schemas.events import ChangeEvent
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def auth_headers():
+    return {settings.AUTH_HEADER_KEY: settings.AUTH_SECRET_KEY}
+
+
+def segment_detection(
+    segment_id: int, video_id: int, start_frame: int, end_frame: int, entity_id: int, taxonomy_id: int
+):
+    return SegmentDetection(
+        id=segment_id,
+        uuid=f"00000000-0000-4000-8000-{segment_id:012d}",
+        video_id=video_id,
+        start_frame=start_frame,
+        end_frame=end_frame,
+        taxonomy_id=taxonomy_id,
+        entity_id=entity_id,
+        created_at="2024-01-01T00:00:00Z",
+        created_by="test_user",
+        updated_at="2024-01-01T00:00:00Z",
+        updated_by="test_user",
+    )
+
+
+# Sample data for testing
+video_data = [
+    Video(id=100, code="code100", path="path", extension=".mp4", frames=1000, length=40, frame_rate=25),
+    Video(id=101, code="code101", path="path", extension=".mp4", frames=1000, length=20, frame_rate=50),
+]
+
+segment_detection_data = {
+    100: [
+        # Entity 300 under two taxonomies, the overlapping frames count once
+        segment_detection(1, 100, 0, 49, 300, 200),
+        segment_detection(2, 100, 25, 74, 300, 201),
+        segment_detection(3, 100, 100, 124, 301, 200),
+        segment_detection(6, 100, 60, 109, 302, 200),
+    ],
+    101: [
+        segment_detection(4, 101, 0, 199, 301, 200),
+        segment_detection(5, 101, 0, 49, 302, 200),
+    ],
+}
+
+
+class TestAnalyticsEndpoints:
+    """Test cases for analytics API endpoints."""
+
+    def test_get_screen_time_success(self, client, auth_headers):
+        """Test the screen time of every entity is unioned per video and ranked across the videos."""
+        analytics_index_manager.clear()
+        with patch("app.business.analytics.video_query_manager") as mock_video_query, patch(
+            "app.business.analytics.segment_detection_query_manager"
+        ) as mock_segment_detection_query:
+            mock_video_query.get_videos_by_keys.return_value = video_data
+            mock_segment_detection_query.get_segment_detections_by_video_ids.side_effect = lambda video_ids: {
+                video_id: segment_detection_data[video_id] for video_id in video_ids
+            }
+
+            response = client.post(
+                f"{settings.API_V1_STR}/analytics/screen-time", json={"video_ids": [100, 101]}, headers=auth_headers
+            )
+            top = client.post(
+                f"{settings.API_V1_STR}/analytics/screen-time",
+                json={"video_ids": [101, 100], "top_k": 2},
+                headers=auth_headers,
+            )
+            filtered = client.post(
+                f"{settings.API_V1_STR}/analytics/screen-time",
+                json={"video_ids": [100, 101], "entity_ids": [300, 302]},
+                headers=auth_headers,
+            )
+
+            assert response.status_code == 200
+            assert response.json()["entities"] == [
+                {
+                    "entity_id": 301,
+                    "frames": 225,
+                    "seconds": 5.0,
+                    "videos": [
+                        {"video_id": 100, "frames": 25, "seconds": 1.0},
+                        {"video_id": 101, "frames": 200, "seconds": 4.0},
+                    ],
+                },
+                {
+                    "entity_id": 300,
+                    "frames": 75,
+                    "seconds": 3.0,
+                    "videos": [{"video_id": 100, "frames": 75, "seconds": 3.0}],
+                },
+                {
+                    "entity_id": 302,
+                    "frames": 100,
+                    "seconds": 3.0,
+                    "videos": [
+                        {"video_id": 100, "frames": 50, "seconds": 2.0},
+                        {"video_id": 101, "frames": 50, "seconds": 1.0},
+                    ],
+                },
+            ]
+            assert top.status_code == 200
+            assert [entity["entity_id"] for entity in top.json()["entities"]] == [301, 300]
+            assert filtered.status_code == 200
+            assert [entity["entity_id"] for entity in filtered.json()["entities"]] == [300, 302]
+            # The interval indexes of the videos are loaded with one query and cached
+            mock_segment_detection_query.get_segment_detections_by_video_ids.assert_called_once_with(
+                video_ids=[100, 101]
+            )
+        analytics_index_manager.clear()
+
+    def test_get_cooccurrence_success(self, client, auth_headers):
+        """Test the overlapping screen time of every pair of entities is summed across the videos."""
+        analytics_index_manager.clear()
+        with patch("app.business.analytics.video_query_manager") as mock_video_query, patch(
+            "app.business.analytics.segment_detection_query_manager"
+        ) as mock_segment_detection_query:
+            mock_video_query.get_videos_by_keys.return_value = video_data
+            mock_video_query.get_videos_with_frame_rate.return_value = video_data
+            mock_segment_detection_query.get_segment_detections_by_video_ids.side_effect = lambda video_ids: {
+                video_id: segment_detection_data[video_id] for video_id in video_ids
+            }
+
+            response = client.post(
+                f"{settings.API_V1_STR}/analytics/co-occurrence", json={"video_ids": [100, 101]}, headers=auth_headers
+            )
+            catalog = client.post(f"{settings.API_V1_STR}/analytics/co-occurrence", json={}, headers=auth_headers)
+            by_entity = client.post(
+                f"{settings.API_V1_STR}/analytics/co-occurrence", json={"entity_ids": [300]}, headers=auth_headers
+            )
+            by_frames = client.post(
+                f"{settings.API_V1_STR}/analytics/co-occurrence", json={"min_frames": 20}, headers=auth_headers
+            )
+
+            assert response.status_code == 200
+            assert response.json() == {
+                "videos": 2,
+                "pairs": [
+                    {"entity_id": 301, "other_entity_id": 302, "frames": 60, "seconds": 1.4, "videos": 2},
+                    {"entity_id": 300, "other_entity_id": 302, "frames": 15, "seconds": 0.6, "videos": 1},
+                ],
+            }
+            assert catalog.status_code == 200
+            assert catalog.json() == response.json()
+            assert [(pair["entity_id"], pair["other_entity_id"]) for pair in by_entity.json()["pairs"]] == [(300, 302)]
+            assert [(pair["entity_id"], pair["other_entity_id"]) for pair in by_frames.json()["pairs"]] == [(301, 302)]
+            # The requested videos are cached per video, the catalog as a whole and only once
+            assert mock_segment_detection_query.get_segment_detections_by_video_ids.call_count == 2
+            mock_video_query.get_videos_with_frame_rate.assert_called_once_with()
+
+            # A change of the segment detections drops the catalog
+            analytics_index_manager.on_change(
+                ChangeEvent(topic=ChangeTopic.SegmentDetection, action=ChangeAction.Created, video_ids=[100])
+            )
+            client.post(f"{settings.API_V1_STR}/analytics/co-occurrence", json={}, headers=auth_headers)
+            assert mock_video_query.get_videos_with_frame_rate.call_count == 2
+        analytics_index_manager.clear()
+
+    def test_get_cooccurrence_empty_catalog(self, client, auth_headers):
+        """Test a catalog without videos has no pairs."""
+        with patch("app.business.analytics.video_query_manager") as mock_video_query:
+            mock_video_query.get_videos_with_frame_rate.return_value = []
+
+            response = client.post(f"{settings.API_V1_STR}/analytics/co-occurrence", json={}, headers=auth_headers)
+
+            assert response.status_code == 200
+            assert response.json() == {"videos": 0, "pairs": []}
+
+    def test_get_screen_time_video_not_found(self, client, auth_headers):
+        """Test the missing videos are reported."""
+        with patch("app.business.analytics.video_query_manager") as mock_video_query:
+            mock_video_query.get_videos_by_keys.return_value = video_data[:1]
+
+            response = client.post(
+                f"{settings.API_V1_STR}/analytics/screen-time", json={"video_ids": [100, 101]}, headers=auth_headers
+            )
+
+            assert response.status_code == 404
+            assert response.json()["detail"] == "Videos [101] not found"
+
+    def test_get_screen_time_invalid_request(self, client, auth_headers):
+        """Test that at least one video and a positive top_k are required."""
+        no_videos = client.post(
+            f"{settings.API_V1_STR}/analytics/screen-time", json={"video_ids": []}, headers=auth_headers
+        )
+        no_top = client.post(
+            f"{settings.API_V1_STR}/analytics/screen-time", json={"video_ids": [100], "top_k": 0}, headers=auth_headers
+        )
+        assert no_videos.status_code == 422
+        assert no_top.status_code == 422
+
+    def test_get_screen_time_unauthorized(self, client):
+        """Test the screen time requires the auth header."""
+        response = client.post(f"{settings.API_V1_STR}/analytics/screen-time", json={"video_ids": [100]})
+        assert response.status_code == 403
@@ -1,12 +1,22 @@
+import json
+import os
 from unittest.mock import patch
 
+import numpy as np
 import pytest
 from fastapi import HTTPException, status
 from fastapi.testclient import TestClient
 from video_enrichment_orm.schemas.detection import Detection
+from video_enrichment_orm.schemas.video import Video
 
 from app.core.config import settings
+from app.core.enums import ChangeAction, ChangeTopic
+from app.core.ingest import BINARY_CONTENT_TYPE, DETECTION_DTYPE, NDJSON_CONTENT_TYPE
 from app.main import app
+from app.managers.index.columnar import ColumnarCacheManager
+from app.managers.index.detection import detection_index_manager
+from app.schemas.detection import DetectionFilter
+from app.schemas.events import ChangeEvent
 
 
 @pytest.fixture
@@ -74,13 +84,18 @@ detection_data = [
     ),
 ]
 
+# The video the dependency of the by-video endpoints resolves
+video_data = Video(id=100, code="code", path="path", extension=".mp4", frames=300, length=10, frame_rate=30)
+
 
 class TestDetectionEndpoints:
     """Test cases for detection API endpoints."""
 
     def test_get_detections_by_video_id_success(self, client, auth_headers):
         """Test successful retrieval of detections by video ID."""
-        with patch("app.business.detection.DetectionManager.get_detections_by_video_id") as mock_get_by_video:
+        with patch("app.business.video.VideoManager.get_video_by_id", return_value=video_data), patch(
+            "app.business.detection.DetectionManager.get_detections_by_video_id"
+        ) as mock_get_by_video:
             mock_get_by_video.return_value = detection_data
 
             response = client.get(f"{settings.API_V1_STR}/detection/by-video/100", headers=auth_headers)
@@ -96,7 +111,7 @@ class TestDetectionEndpoints:
             assert data[0]["bbox_y_min"] == 0.2
             assert data[0]["bbox_x_max"] == 0.8
             assert data[0]["bbox_y_max"] == 0.9
-            mock_get_by_video.assert_called_once_with(video_id=100)
+            mock_get_by_video.assert_called_once_with(video=video_data, filters=DetectionFilter())
 
     def test_get_detections_by_video_id_video_not_found(self, client, auth_headers):
         """Test detections by video ID when video doesn't exist."""
@@ -157,7 +172,9 @@ class TestDetectionEndpoints:
 
     def test_get_detections_by_video_id_empty_result(self, client, auth_headers):
         """Test detections by video ID when no detections exist."""
-        with patch("app.business.detection.DetectionManager.get_detections_by_video_id") as mock_get_by_video:
+        with patch("app.business.video.VideoManager.get_video_by_id", return_value=video_data), patch(
+            "app.business.detection.DetectionManager.get_detections_by_video_id"
+        ) as mock_get_by_video:
             mock_get_by_video.return_value = []
 
             response = client.get(f"{settings.API_V1_STR}/detection/by-video/100", headers=auth_headers)
@@ -165,7 +182,7 @@ class TestDetectionEndpoints:
             assert response.status_code == 200
             data = response.json()
             assert len(data) == 0
-            mock_get_by_video.assert_called_once_with(video_id=100)
+            mock_get_by_video.assert_called_once_with(video=video_data, filters=DetectionFilter())
 
     def test_get_detections_by_segment_detection_id_empty_result(self, client, auth_headers):
         """Test detections by segment detection ID when no detections exist."""
@@ -340,3 +357,507 @@ class TestDetectionEndpoints:
                 assert 0.0 <= detection["bbox_y_min"] <= 1.0
                 assert 0.0 <= detection["bbox_x_max"] <= 1.0
                 assert 0.0 <= detection["bbox_y_max"] <= 1.0
+
+    def test_get_detections_by_video_id_with_frame_range(self, client, auth_headers):
+        """Test that the frame window query parameters reach the manager."""
+        with patch("app.business.video.VideoManager.get_video_by_id", return_value=video_data), patch(
+            "app.business.detection.DetectionManager.get_detections_by_video_id"
+        ) as mock_get_by_video:
+            mock_get_by_video.return_value = [detection_data[1]]
+
+            response = client.get(
+                f"{settings.API_V1_STR}/detection/by-video/100?from_frame=155&to_frame=165", headers=auth_headers
+            )
+
+            assert response.status_code == 200
+            assert len(response.json()) == 1
+            mock_get_by_video.assert_called_once_with(
+                video=video_data, filters=DetectionFilter(from_frame=155, to_frame=165)
+            )
+
+    def test_get_detections_by_video_id_with_negative_frame(self, client, auth_headers):
+        """Test that negative frame bounds are rejected."""
+        response = client.get(f"{settings.API_V1_STR}/detection/by-video/100?from_frame=-1", headers=auth_headers)
+        assert response.status_code == 422
+
+    def test_get_detections_by_video_id_frame_window_from_index(self, client, auth_headers):
+        """Test that frame and seconds windows are answered from the per-video frame index."""
+        detection_index_manager.clear()
+        with patch("app.business.video.db_video_manager") as mock_db_video, patch(
+            "app.business.detection.db_detection_manager"
+        ) as mock_db_detection:
+            mock_db_video.get_video_by_id.return_value = Video(
+                id=100, code="code", path="path", extension=".mp4", frames=300, length=10, frame_rate=30
+            )
+            mock_db_detection.get_detections_by_video_id.return_value = list(reversed(detection_data))
+
+            by_frame = client.get(
+                f"{settings.API_V1_STR}/detection/by-video/100?from_frame=155&to_frame=170", headers=auth_headers
+            )
+            by_second = client.get(
+                f"{settings.API_V1_STR}/detection/by-video/100?from_second=5&to_second=5.4", headers=auth_headers
+            )
+
+            assert by_frame.status_code == 200
+            assert [detection["frame"] for detection in by_frame.json()] == [160, 170]
+            assert by_second.status_code == 200
+            assert [detection["frame"] for detection in by_second.json()] == [150, 160]
+            mock_db_detection.get_detections_by_video_id.assert_called_once_with(video_id=100)
+        detection_index_manager.clear()
+
+    def test_get_detections_by_video_id_mixed_bounds(self, client, auth_headers):
+        """Test that frame and seconds bounds cannot be combined."""
+        with patch("app.business.video.db_video_manager") as mock_db_video:
+            mock_db_video.get_video_by_id.return_value = Video(
+                id=100, code="code", path="path", extension=".mp4", frames=300, length=10, frame_rate=30
+            )
+
+            response = client.get(
+                f"{settings.API_V1_STR}/detection/by-video/100?from_frame=10&to_second=2", headers=auth_headers
+            )
+
+            assert response.status_code == 400
+            assert response.json()["detail"] == "Frame and second bounds cannot be combined"
+
+    def test_get_detections_by_video_id_with_sampling(self, client, auth_headers):
+        """Test that the sampling query parameters reach the manager."""
+        with patch("app.business.video.VideoManager.get_video_by_id", return_value=video_data), patch(
+            "app.business.detection.DetectionManager.get_detections_by_video_id"
+        ) as mock_get_by_video:
+            mock_get_by_video.return_value = [detection_data[0]]
+
+            response = client.get(f"{settings.API_V1_STR}/detection/by-video/100?target_fps=2", headers=auth_headers)
+
+            assert response.status_code == 200
+            mock_get_by_video.assert_called_once_with(video=video_data, filters=DetectionFilter(target_fps=2))
+
+    def test_get_detections_by_video_id_sampling_keeps_best_per_segment(self, client, auth_headers):
+        """Test that sampling keeps the best scoring detection of each segment in every bucket."""
+        detection_index_manager.clear()
+        with patch("app.business.video.db_video_manager") as mock_db_video, patch(
+            "app.business.detection.db_detection_manager"
+        ) as mock_db_detection:
+            mock_db_video.get_video_by_id.return_value = Video(
+                id=100, code="code", path="path", extension=".mp4", frames=300, length=10, frame_rate=30
+            )
+            mock_db_detection.get_detections_by_video_id.return_value = detection_data
+
+            by_stride = client.get(f"{settings.API_V1_STR}/detection/by-video/100?stride=30", headers=auth_headers)
+            by_fps = client.get(f"{settings.API_V1_STR}/detection/by-video/100?target_fps=3", headers=auth_headers)
+            combined = client.get(
+                f"{settings.API_V1_STR}/detection/by-video/100?stride=30&target_fps=3", headers=auth_headers
+            )
+
+            assert by_stride.status_code == 200
+            assert [detection["id"] for detection in by_stride.json()] == [1, 3]
+            assert by_fps.status_code == 200
+            assert [detection["id"] for detection in by_fps.json()] == [1, 2, 3]
+            assert combined.status_code == 400
+        detection_index_manager.clear()
+
+    def test_get_detections_by_video_id_with_attribute_filters(self, client, auth_headers):
+        """Test that score, entity and taxonomy filters are executed by the database query."""
+        with patch("app.business.video.db_video_manager") as mock_db_video, patch(
+            "app.business.detection.db_detection_manager"
+        ) as mock_db_detection, patch("app.business.detection.detection_query_manager") as mock_query:
+            mock_db_video.get_video_by_id.return_value = Video(
+                id=100, code="code", path="path", extension=".mp4", frames=300, length=10, frame_rate=30
+            )
+            mock_query.get_detections_by_video_id.return_value = [detection_data[0]]
+
+            response = client.get(
+                f"{settings.API_V1_STR}/detection/by-video/100"
+                "?min_detection_score=0.9&min_entity_score=0.8&entity_ids=300&entity_ids=301&to_frame=160",
+                headers=auth_headers,
+            )
+
+            assert response.status_code == 200
+            assert [detection["id"] for detection in response.json()] == [1]
+            mock_query.get_detections_by_video_id.assert_called_once_with(
+                video_id=100,
+                filters=DetectionFilter(
+                    to_frame=160, min_detection_score=0.9, min_entity_score=0.8, entity_ids=[300, 301]
+                ),
+                from_frame=None,
+                to_frame=160,
+            )
+            mock_db_detection.get_detections_by_video_id.assert_not_called()
+
+    def test_get_detections_by_video_id_with_spatial_filters(self, client, auth_headers):
+        """Test that region and area filters are evaluated over the boxes of the frame index."""
+        detection_index_manager.clear()
+        with patch("app.business.video.db_video_manager") as mock_db_video, patch(
+            "app.business.detection.db_detection_manager"
+        ) as mock_db_detection:
+            mock_db_video.get_video_by_id.return_value = Video(
+                id=100, code="code", path="path", extension=".mp4", frames=300, length=10, frame_rate=30
+            )
+            mock_db_detection.get_detections_by_video_id.return_value = detection_data
+
+            lower_third = client.get(
+                f"{settings.API_V1_STR}/detection/by-video/100?region_y_min=0.92", headers=auth_headers
+            )
+            sampled = client.get(
+                f"{settings.API_V1_STR}/detection/by-video/100?region_y_min=0.92&stride=30&from_frame=165",
+                headers=auth_headers,
+            )
+            large = client.get(f"{settings.API_V1_STR}/detection/by-video/100?min_area=0.5", headers=auth_headers)
+            inverted = client.get(
+                f"{settings.API_V1_STR}/detection/by-video/100?region_x_min=0.8&region_x_max=0.2", headers=auth_headers
+            )
+
+            assert lower_third.status_code == 200
+            assert [detection["id"] for detection in lower_third.json()] == [2, 3]
+            assert sampled.status_code == 200
+            assert [detection["id"] for detection in sampled.json()] == [3]
+            assert large.status_code == 200
+            assert large.json() == []
+            assert inverted.status_code == 400
+            mock_db_detection.get_detections_by_video_id.assert_called_once_with(video_id=100)
+        detection_index_manager.clear()
+
+    def test_get_detections_by_video_id_score_filters_from_index(self, client, auth_headers):
+        """Test that score thresholds without entity or taxonomy filters are evaluated over the frame index."""
+        detection_index_manager.clear()
+        with patch("app.business.video.db_video_manager") as mock_db_video, patch(
+            "app.business.detection.db_detection_manager"
+        ) as mock_db_detection, patch("app.business.detection.detection_query_manager") as mock_query:
+            mock_db_video.get_video_by_id.return_value = Video(
+                id=100, code="code", path="path", extension=".mp4", frames=300, length=10, frame_rate=30
+            )
+            mock_db_detection.get_detections_by_video_id.return_value = detection_data
+
+            confident = client.get(
+                f"{settings.API_V1_STR}/detection/by-video/100?min_detection_score=0.9", headers=auth_headers
+            )
+            sampled = client.get(
+                f"{settings.API_V1_STR}/detection/by-video/100?min_entity_score=0.8&stride=300", headers=auth_headers
+            )
+
+            assert confident.status_code == 200
+            assert [detection["id"] for detection in confident.json()] == [1, 2]
+            assert sampled.status_code == 200
+            assert [detection["id"] for detection in sampled.json()] == [1]
+            mock_db_detection.get_detections_by_video_id.assert_called_once_with(video_id=100)
+            mock_query.get_detections_by_video_id.assert_not_called()
+        detection_index_manager.clear()
+
+    def test_get_detections_by_video_id_from_columnar_cache(self, client, auth_headers, tmp_path):
+        """Test that the frame index is reopened from the columnar files instead of the database."""
+        columnar_cache = ColumnarCacheManager(path=str(tmp_path), max_bytes=10**6, ttl=None)
+        video = Video(id=100, code="code", path="path", extension=".mp4", frames=300, length=10, frame_rate=30)
+        detection_index_manager.clear()
+        with patch.object(detection_index_manager, "_columnar_cache", columnar_cache), patch(
+            "app.business.video.db_video_manager"
+        ) as mock_db_video, patch("app.business.detection.db_detection_manager") as mock_db_detection:
+            mock_db_video.get_video_by_id.return_value = video
+            mock_db_detection.get_detections_by_video_id.return_value = detection_data
+
+            built = client.get(f"{settings.API_V1_STR}/detection/by-video/100?from_frame=155", headers=auth_headers)
+            # Another worker, or this one once the index is evicted from memory, maps the same files
+            detection_index_manager.clear()
+            mapped = client.get(f"{settings.API_V1_STR}/detection/by-video/100?from_frame=155", headers=auth_headers)
+
+            assert built.status_code == 200
+            assert mapped.status_code == 200
+            assert mapped.json() == built.json()
+            assert [detection["id"] for detection in mapped.json()] == [2, 3]
+            assert mapped.json()[0]["uuid"] == detection_data[1].uuid
+            assert mapped.json()[0]["created_by"] == "test_user"
+            assert (tmp_path / "100" / "frame.npy").exists()
+            mock_db_detection.get_detections_by_video_id.assert_called_once_with(video_id=100)
+
+            # Past max_bytes the least recently used video is evicted
+            columnar_cache._max_bytes = sum(file.stat().st_size for file in (tmp_path / "100").iterdir())
+            os.utime(tmp_path / "100", (0, 0))
+            mock_db_video.get_video_by_id.return_value = video.model_copy(update={"id": 101})
+            client.get(f"{settings.API_V1_STR}/detection/by-video/101?to_frame=160", headers=auth_headers)
+
+            assert sorted(path.name for path in tmp_path.iterdir()) == ["101"]
+
+            # A write to the video removes its files
+            detection_index_manager.on_change(
+                ChangeEvent(topic=ChangeTopic.Detection, action=ChangeAction.Created, video_ids=[101])
+            )
+
+            assert list(tmp_path.iterdir()) == []
+        detection_index_manager.clear()
+
+    def test_columnar_cache_skips_builds_invalidated_while_loading(self, tmp_path):
+        """Test that a build whose video changed while it was loading is served but not stored."""
+        columnar_cache = ColumnarCacheManager(path=str(tmp_path), max_bytes=10**6, ttl=None)
+
+        def loader():
+            # The change event arrives while the detections are read
+            columnar_cache.invalidate(100)
+            return detection_data
+
+        columns = columnar_cache.get_or_build(100, loader=loader)
+
+        assert len(columns) == len(detection_data)
+        assert list(tmp_path.iterdir()) == []
+
+        columnar_cache.get_or_build(100, loader=lambda: detection_data)
+        assert (tmp_path / "100" / "frame.npy").exists()
+
+    def test_get_detections_by_video_ids(self, client, auth_headers):
+        """Test that the detections of several videos are fetched with one query and streamed grouped by video."""
+        videos = [
+            Video(id=100, code="code", path="path", extension=".mp4", frames=300, length=10, frame_rate=30),
+            Video(id=101, code="code", path="path", extension=".mp4", frames=300, length=10, frame_rate=10),
+            Video(id=102, code="code", path="path", extension=".mp4", frames=300, length=10, frame_rate=30),
+        ]
+        other_video_detection = detection_data[0].model_copy(update={"id": 4, "video_id": 102, "frame": 30})
+        with patch("app.business.detection.video_query_manager") as mock_video_query, patch(
+            "app.business.detection.detection_query_manager"
+        ) as mock_query:
+            mock_video_query.get_videos_by_keys.return_value = videos
+            mock_query.iter_detections_by_video_ids.return_value = iter([*detection_data, other_video_detection])
+
+            response = client.post(
+                f"{settings.API_V1_STR}/detection/by-videos?to_second=6&stride=300",
+                json={"video_ids": [102, 100, 101, 100]},
+                headers=auth_headers,
+            )
+
+            assert response.status_code == 200
+            assert response.headers["content-type"] == NDJSON_CONTENT_TYPE
+            lines = [json.loads(line) for line in response.text.splitlines()]
+            # One line per video in id order, the sampling keeps the best detection per segment and bucket
+            assert [line["video_id"] for line in lines] == [100, 101, 102]
+            assert [detection["id"] for detection in lines[0]["detections"]] == [1, 3]
+            assert lines[1]["detections"] == []
+            assert [detection["id"] for detection in lines[2]["detections"]] == [4]
+            mock_video_query.get_videos_by_keys.assert_called_once_with(key="id", keys=[102, 100, 101])
+            mock_query.iter_detections_by_video_ids.assert_called_once_with(
+                windows={100: (None, 180), 101: (None, 60), 102: (None, 180)},
+                filters=DetectionFilter(to_second=6, stride=300),
+            )
+
+    def test_get_detections_by_video_ids_video_not_found(self, client, auth_headers):
+        """Test that the missing videos are reported before any detection is fetched."""
+        with patch("app.business.detection.video_query_manager") as mock_video_query, patch(
+            "app.business.detection.detection_query_manager"
+        ) as mock_query:
+            mock_video_query.get_videos_by_keys.return_value = [
+                Video(id=100, code="code", path="path", extension=".mp4", frames=300, length=10, frame_rate=30)
+            ]
+
+            response = client.post(
+                f"{settings.API_V1_STR}/detection/by-videos", json={"video_ids": [100, 998, 999]}, headers=auth_headers
+            )
+            empty = client.post(
+                f"{settings.API_V1_STR}/detection/by-videos", json={"video_ids": []}, headers=auth_headers
+            )
+
+            assert response.status_code == 404
+            assert response.json()["detail"] == "Videos [998, 999] not found"
+            assert empty.status_code == 422
+            mock_query.iter_detections_by_video_ids.assert_not_called()
+
+    def test_get_detections_by_video_id_with_invalid_score(self, client, auth_headers):
+        """Test that score thresholds outside [0, 1] are rejected."""
+        response = client.get(
+            f"{settings.API_V1_STR}/detection/by-video/100?min_detection_score=1.5", headers=auth_headers
+        )
+        assert response.status_code == 422
+
+    def test_ingest_detections_binary(self, client, auth_headers):
+        """Test a packed binary batch is validated against the segments of the video and loaded with COPY."""
+        rows = np.zeros(3, dtype=DETECTION_DTYPE)
+        rows["frame"] = [10, 11, 55]
+        rows["segment_detection_id"] = [7, 7, 9]
+        rows["detection_score"] = 0.5
+        rows["entity_score"] = 0.25
+        rows["bbox_x_max"] = rows["bbox_y_max"] = 1
+        with patch("app.business.video.db_video_manager") as mock_db_video, patch(
+            "app.business.ingest.segment_detection_query_manager"
+        ) as mock_query, patch("app.business.ingest.postgres_manager") as mock_postgres:
+            mock_db_video.get_video_by_id.return_value = Video(
+                id=100, code="code", path="path", extension=".mp4", frames=300, length=10, frame_rate=30
+            )
+            mock_query.get_segment_frames.return_value = (np.array([7, 9]), np.array([0, 50]), np.array([20, 60]))
+
+            response = client.post(
+                f"{settings.API_V1_STR}/detection/by-video/100/ingest",
+                content=rows.tobytes(),
+                headers={**auth_headers, "Content-Type": BINARY_CONTENT_TYPE},
+            )
+
+            assert response.status_code == 200
+            assert response.json() == {"video_id": 100, "rows": 3}
+            table = mock_postgres.copy_rows.call_args.args[0]
+            columns = mock_postgres.copy_rows.call_args.kwargs["columns"]
+            lines = "".join(mock_postgres.copy_rows.call_args.kwargs["chunks"]).splitlines()
+            assert table == "detection"
+            assert columns[:4] == ["uuid", "video_id", "frame", "segment_detection_id"]
+            assert [line.split("\t")[1:5] for line in lines] == [
+                ["100", "10", "7", "0.5"],
+                ["100", "11", "7", "0.5"],
+                ["100", "55", "9", "0.5"],
+            ]
+
+    def test_ingest_detections_invalid_rows(self, client, auth_headers):
+        """Test a batch with invalid rows is rejected with the failing rows and nothing is loaded."""
+        lines = [
+            {"frame": 10, "segment_detection_id": 7, "detection_score": 0.5, "entity_score": 0.5},
+            {"frame": 30, "segment_detection_id": 7, "detection_score": 1.5, "entity_score": 0.5},
+            {"frame": 10, "segment_detection_id": 8, "detection_score": 0.5, "entity_score": 0.5},
+        ]
+        body = "\n".join(
+            json.dumps({**line, "bbox_x_min": 0, "bbox_y_min": 0, "bbox_x_max": 1, "bbox_y_max": 1}) for line in lines
+        )
+        with patch("app.business.video.db_video_manager") as mock_db_video, patch(
+            "app.business.ingest.segment_detection_query_manager"
+        ) as mock_query, patch("app.business.ingest.postgres_manager") as mock_postgres:
+            mock_db_video.get_video_by_id.return_value = Video(
+                id=100, code="code", path="path", extension=".mp4", frames=300, length=10, frame_rate=30
+            )
+            mock_query.get_segment_frames.return_value = (np.array([7]), np.array([0]), np.array([20]))
+
+            response = client.post(
+                f"{settings.API_V1_STR}/detection/by-video/100/ingest",
+                content=body,
+                headers={**auth_headers, "Content-Type": NDJSON_CONTENT_TYPE},
+            )
+
+            assert response.status_code == 422
+            assert {error["reason"]: error["rows"] for error in response.json()["detail"]} == {
+                "segment detection not found in the video": [2],
+                "frame outside of the segment detection": [1],
+                "detection_score must be between 0 and 1": [1],
+            }
+            mock_postgres.copy_rows.assert_not_called()
+
+    def test_ingest_detections_fractional_integers(self, client, auth_headers):
+        """Test that NDJSON integer fields with fractional values are rejected instead of truncated."""
+        lines = [{"frame": 10, "segment_detection_id": 7}, {"frame": 10.5, "segment_detection_id": 7.0}]
+        body = "\n".join(
+            json.dumps(
+                {
+                    **line,
+                    "detection_score": 0.5,
+                    "entity_score": 0.5,
+                    "bbox_x_min": 0,
+                    "bbox_y_min": 0,
+                    "bbox_x_max": 1,
+                    "bbox_y_max": 1,
+                }
+            )
+            for line in lines
+        )
+        with patch("app.business.video.db_video_manager"), patch(
+            "app.business.ingest.postgres_manager"
+        ) as mock_postgres:
+            response = client.post(
+                f"{settings.API_V1_STR}/detection/by-video/100/ingest",
+                content=body,
+                headers={**auth_headers, "Content-Type": NDJSON_CONTENT_TYPE},
+            )
+
+            assert response.status_code == 422
+            assert response.json()["detail"] == [{"reason": "frame must be an integer", "count": 1, "rows": [1]}]
+            mock_postgres.copy_rows.assert_not_called()
+
+    def test_ingest_detections_body_too_large(self, client, auth_headers):
+        """Test that a body past INGEST_MAX_BODY_BYTES is refused while it is streamed."""
+        with patch.object(settings, "INGEST_MAX_BODY_BYTES", DETECTION_DTYPE.itemsize), patch(
+            "app.business.video.db_video_manager"
+        ), patch("app.business.ingest.postgres_manager") as mock_postgres:
+            response = client.post(
+                f"{settings.API_V1_STR}/detection/by-video/100/ingest",
+                content=np.zeros(2, dtype=DETECTION_DTYPE).tobytes(),
+                headers={**auth_headers, "Content-Type": BINARY_CONTENT_TYPE},
+            )
+
+            assert response.status_code == 413
+            mock_postgres.copy_rows.assert_not_called()
+
+    def test_ingest_detections_unsupported_content_type(self, client, auth_headers):
+        """Test only NDJSON and packed binary batches are accepted."""
+        with patch("app.business.video.db_video_manager"):
+            response = client.post(
+                f"{settings.API_V1_STR}/detection/by-video/100/ingest", json=[], headers=auth_headers
+            )
+        assert response.status_code == 415
+
+    def test_get_tracks_by_video_id_keyframes(self, client, auth_headers):
+        """Test that the boxes on the interpolated path are dropped and the turns of the path are kept."""
+        # A box moving right until frame 4, then down, with a weaker duplicate on frame 2 of the segment
+        path = [(0.0, 0.0), (0.1, 0.0), (0.2, 0.0), (0.3, 0.0), (0.4, 0.0), (0.4, 0.1), (0.4, 0.2)]
+        detections = [
+            detection_data[0].model_copy(
+                update={
+                    "id": 10 + frame,
+                    "frame": frame,
+                    "bbox_x_min": x,
+                    "bbox_y_min": y,
+                    "bbox_x_max": x + 0.2,
+                    "bbox_y_max": y + 0.2,
+                }
+            )
+            for frame, (x, y) in enumerate(path)
+        ]
+        detections.append(detections[2].model_copy(update={"id": 99, "detection_score": 0.1, "bbox_x_min": 0.9}))
+        detections.append(detection_data[2])
+
+        detection_index_manager.clear()
+        with patch("app.business.video.db_video_manager") as mock_db_video, patch(
+            "app.business.detection.db_detection_manager"
+        ) as mock_db_detection:
+            mock_db_video.get_video_by_id.return_value = Video(
+                id=100, code="code", path="path", extension=".mp4", frames=300, length=10, frame_rate=30
+            )
+            mock_db_detection.get_detections_by_video_id.return_value = detections
+
+            response = client.get(f"{settings.API_V1_STR}/detection/by-video/100/tracks", headers=auth_headers)
+            window = client.get(
+                f"{settings.API_V1_STR}/detection/by-video/100/tracks?to_frame=4&tolerance=0.0001", headers=auth_headers
+            )
+
+            assert response.status_code == 200
+            tracks = response.json()
+            assert [track["segment_detection_id"] for track in tracks] == [200, 201]
+            assert tracks[0]["start_frame"] == 0
+            assert tracks[0]["end_frame"] == 6
+            assert tracks[0]["detections"] == 7
+            assert [keyframe["detection_id"] for keyframe in tracks[0]["keyframes"]] == [10, 14, 16]
+            assert [keyframe["detection_id"] for keyframe in tracks[1]["keyframes"]] == [3]
+
+            assert window.status_code == 200
+            assert [keyframe["frame"] for keyframe in window.json()[0]["keyframes"]] == [0, 4]
+            mock_db_detection.get_detections_by_video_id.assert_called_once_with(video_id=100)
+        detection_index_manager.clear()
+
+    def test_get_tracks_by_video_id_split_at_gaps(self, client, auth_headers):
+        """Test that a segment detection with a gap in its frames has one track per run of frames."""
+        # Sampled every 2 frames, with the samples of frames 8 to 18 missing
+        frames = [0, 2, 4, 6, 20, 22, 24]
+        detections = [
+            detection_data[0].model_copy(update={"id": 10 + frame, "frame": frame, "bbox_x_min": frame / 100})
+            for frame in frames
+        ]
+
+        with patch("app.business.video.db_video_manager") as mock_db_video, patch(
+            "app.business.detection.db_detection_manager"
+        ) as mock_db_detection:
+            mock_db_video.get_video_by_id.return_value = Video(
+                id=100, code="code", path="path", extension=".mp4", frames=300, length=10, frame_rate=30
+            )
+            mock_db_detection.get_detections_by_video_id.return_value = detections
+
+            response = client.get(f"{settings.API_V1_STR}/detection/by-video/100/tracks", headers=auth_headers)
+
+            assert response.status_code == 200
+            tracks = response.json()
+            assert [(track["start_frame"], track["end_frame"], track["detections"]) for track in tracks] == [
+                (0, 6, 4),
+                (20, 24, 3),
+            ]
+            assert [keyframe["frame"] for keyframe in tracks[0]["keyframes"]] == [0, 6]
+            assert [keyframe["frame"] for keyframe in tracks[1]["keyframes"]] == [20, 24]
+
+    def test_get_tracks_by_video_id_invalid_tolerance(self, client, auth_headers):
+        """Test that a negative tolerance is rejected."""
+        response = client.get(f"{settings.API_V1_STR}/detection/by-video/100/tracks?tolerance=-1", headers=auth_headers)
+        assert response.status_code == 422
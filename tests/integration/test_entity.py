@@ -3,10 +3,21 @@ from unittest.mock import patch
 import pytest
 from fastapi import HTTPException, status
 from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from video_enrichment_orm.dao.entity import EntityDAO
 from video_enrichment_orm.schemas.entity import Entity, EntityCreate, EntityUpdate
+from video_enrichment_orm.schemas.taxonomy import Taxonomy
 
+from app.business.entity import EntityManager
 from app.core.config import settings
+from app.core.enums import CacheNamespace, ChangeAction, ChangeTopic
 from app.main import app
+from app.managers.db.entity import EntityQueryManager
+from app.managers.db.postgres import PostgresManager
+from app.managers.index.taxonomy import taxonomy_tree_manager
+from app.schemas.events import ChangeEvent
 
 
 @pytest.fixture
@@ -92,6 +103,90 @@ class TestEntityEndpoints:
         response = client.get(f"{settings.API_V1_STR}/entity")
         assert response.status_code == 403
 
+    def test_save_entities_bulk(self, client, auth_headers):
+        """Test the bulk creation validates the taxonomies at once and reports the outcome of every item."""
+        with patch("app.business.entity.taxonomy_query_manager") as mock_taxonomy_query, patch(
+            "app.business.entity.entity_query_manager"
+        ) as mock_entity_query:
+            mock_taxonomy_query.get_taxonomies_by_keys.return_value = [Taxonomy(id=100, label="Football")]
+            mock_entity_query.insert_entities.return_value = [entity_data[0], entity_data[1]]
+
+            response = client.post(
+                f"{settings.API_V1_STR}/entity/bulk",
+                json={
+                    "items": [
+                        {"uuid": entity_data[0].uuid, "alias": entity_data[0].alias, "taxonomy_id": 100},
+                        {"alias": ["Unknown"], "taxonomy_id": 999},
+                        {"uuid": entity_data[1].uuid, "alias": entity_data[1].alias, "taxonomy_id": 100},
+                    ]
+                },
+                headers=auth_headers,
+            )
+
+            assert response.status_code == 200
+            data = response.json()
+            assert (data["created"], data["failed"]) == (2, 1)
+            assert [result["status"] for result in data["results"]] == ["CREATED", "FAILED", "CREATED"]
+            assert [result["id"] for result in data["results"]] == [1, None, 2]
+            assert data["results"][1]["detail"] == "Taxonomy with id 999 not found"
+            mock_taxonomy_query.get_taxonomies_by_keys.assert_called_once_with(key="id", keys=[100, 999])
+            rows = mock_entity_query.insert_entities.call_args.args[0]
+            assert [row["uuid"] for row in rows] == [entity_data[0].uuid, entity_data[1].uuid]
+
+    def test_save_entities_bulk_conflict(self, client, auth_headers):
+        """Test an item whose uuid already exists fails on its own and the rest of the batch is still created."""
+        # One in-memory database shared by the threads of the test client
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        EntityDAO.metadata.create_all(engine, tables=[EntityDAO.__table__])
+        with engine.begin() as connection:
+            connection.exec_driver_sql("CREATE UNIQUE INDEX ix_entity_uuid ON entity (uuid)")
+        with patch("app.managers.db.postgres._get_engine", return_value=engine):
+            entity_query = EntityQueryManager()
+            entity_query._postgres = PostgresManager()
+
+        with patch("app.business.entity.taxonomy_query_manager") as mock_taxonomy_query, patch(
+            "app.business.entity.entity_query_manager", entity_query
+        ):
+            mock_taxonomy_query.get_taxonomies_by_keys.return_value = [Taxonomy(id=100, label="Football")]
+
+            response = client.post(
+                f"{settings.API_V1_STR}/entity/bulk",
+                json={
+                    "items": [
+                        {"uuid": entity_data[0].uuid, "alias": ["Real Madrid"], "enabled": True, "taxonomy_id": 100},
+                        {"uuid": entity_data[0].uuid, "alias": ["Madrid"], "enabled": True, "taxonomy_id": 100},
+                        {"uuid": entity_data[1].uuid, "alias": ["Barcelona"], "enabled": True, "taxonomy_id": 100},
+                    ]
+                },
+                headers=auth_headers,
+            )
+
+            assert response.status_code == 200
+            data = response.json()
+            assert (data["created"], data["failed"]) == (2, 1)
+            assert [result["status"] for result in data["results"]] == ["CREATED", "FAILED", "CREATED"]
+            assert data["results"][1]["detail"] == f"Entity with uuid {entity_data[0].uuid} already exists"
+            with Session(engine) as session:
+                assert session.scalars(select(EntityDAO.uuid).order_by(EntityDAO.id)).all() == [
+                    entity_data[0].uuid,
+                    entity_data[1].uuid,
+                ]
+
+            # A uuid already in the database is skipped the same way
+            again = client.post(
+                f"{settings.API_V1_STR}/entity/bulk",
+                json={
+                    "items": [
+                        {"uuid": entity_data[1].uuid, "alias": ["Barcelona"], "enabled": True, "taxonomy_id": 100},
+                        {"uuid": entity_data[2].uuid, "alias": ["Valencia"], "enabled": True, "taxonomy_id": 100},
+                    ]
+                },
+                headers=auth_headers,
+            )
+
+            assert [result["status"] for result in again.json()["results"]] == ["FAILED", "CREATED"]
+            assert again.json()["results"][1]["id"] == 3
+
     def test_get_entity_by_uuid_success(self, client, auth_headers):
         """Test successful retrieval of entity by UUID."""
         with patch("app.business.entity.EntityManager.get_entity_by_uuid") as mock_get_entity:
@@ -142,7 +237,23 @@ class TestEntityEndpoints:
             assert len(data) == 2
             assert data[0]["alias"] == ["Real Madrid", "Madrid"]
             assert data[1]["alias"] == ["Barcelona", "Barça"]
-            mock_get_by_taxonomy.assert_called_once_with(taxonomy_id=100)
+            mock_get_by_taxonomy.assert_called_once_with(taxonomy_id=100, include_descendants=False)
+
+    def test_get_entities_by_taxonomy_id_include_descendants(self, client, auth_headers):
+        """Test that the entities of the whole taxonomy subtree are read with a single query."""
+        with patch("app.business.entity.entity_query_manager") as mock_query, patch(
+            "app.business.entity.db_taxonomy_manager"
+        ) as mock_db_taxonomy, patch.object(taxonomy_tree_manager, "get_subtree_ids", return_value=[100, 101]):
+            mock_query.get_enabled_entities_by_taxonomy_ids.return_value = [entity_data[0], entity_data[1]]
+
+            response = client.get(
+                f"{settings.API_V1_STR}/entity/by-taxonomy/100?include_descendants=true", headers=auth_headers
+            )
+
+            assert response.status_code == 200
+            assert len(response.json()) == 2
+            mock_query.get_enabled_entities_by_taxonomy_ids.assert_called_once_with(taxonomy_ids=[100, 101])
+            mock_db_taxonomy.get_taxonomy_by_id.assert_not_called()
 
     def test_get_entities_by_taxonomy_id_not_found(self, client, auth_headers):
         """Test entities by taxonomy ID when taxonomy doesn't exist."""
@@ -386,3 +497,23 @@ class TestEntityEndpoints:
                 response = client.delete(url, headers=invalid_headers)
 
             assert response.status_code == 403
+
+    def test_soft_delete_entity_invalidates_caches(self):
+        """Test that a soft delete evicts the entity like a hard delete does."""
+        with patch("app.business.entity.db_entity_manager") as mock_db_entity, patch(
+            "app.business.entity.db_entity_media_gallery_manager"
+        ) as mock_db_gallery, patch("app.business.entity.response_cache") as mock_response_cache, patch(
+            "app.business.entity.event_bus"
+        ) as mock_event_bus:
+            mock_db_entity.get_entity_by_uuid.return_value = entity_data[0]
+            mock_db_gallery.get_entity_media_galleries_by_entity_id.return_value = []
+
+            EntityManager().soft_delete_entity_by_uuid(entity_uuid=entity_data[0].uuid)
+
+            mock_db_entity.soft_delete_entity_by_uuid.assert_called_once_with(entity_uuid=entity_data[0].uuid)
+            mock_response_cache.invalidate.assert_called_once_with(
+                CacheNamespace.Entity, CacheNamespace.EntityMediaGallery
+            )
+            mock_event_bus.publish.assert_called_once_with(
+                ChangeEvent(topic=ChangeTopic.Entity, action=ChangeAction.Deleted, ids=[1])
+            )
@@ -3,14 +3,18 @@ from unittest.mock import patch
 import pytest
 from fastapi import HTTPException, status
 from fastapi.testclient import TestClient
+from video_enrichment_orm.dao.entity_media_gallery import EntityMediaGalleryDAO
 
+from app.business.entity_media_gallery import EntityMediaGalleryManager
 from app.core.config import settings
+from app.core.enums import CacheNamespace, ChangeAction, ChangeTopic
 from app.main import app
 from app.schemas.entity_media_gallery import (
     EntityMediaGallery,
     EntityMediaGalleryCreate,
     EntityMediaGalleryUpdate,
 )
+from app.schemas.events import ChangeEvent
 
 
 @pytest.fixture
@@ -105,6 +109,38 @@ class TestEntityMediaGalleryEndpoints:
         response = client.get(f"{settings.API_V1_STR}/entity-media-gallery")
         assert response.status_code == 403
 
+    def test_set_entity_media_galleries_enabled(self, client, auth_headers):
+        """Test the bulk enable reports the uuids not found."""
+        with patch("app.business.entity_media_gallery.entity_media_gallery_query_manager") as mock_query:
+            mock_query.set_entity_media_galleries_enabled.return_value = [entity_media_gallery_data[0]]
+
+            response = client.put(
+                f"{settings.API_V1_STR}/entity-media-gallery/bulk/enabled",
+                json={"uuids": [entity_media_gallery_data[0].uuid, "missing-uuid"], "enabled": False},
+                headers=auth_headers,
+            )
+
+            assert response.status_code == 200
+            data = response.json()
+            assert (data["updated"], data["failed"]) == (1, 1)
+            assert data["results"][0]["id"] == entity_media_gallery_data[0].id
+            assert data["results"][1]["uuid"] == "missing-uuid"
+            mock_query.set_entity_media_galleries_enabled.assert_called_once_with(
+                uuids=[entity_media_gallery_data[0].uuid, "missing-uuid"], enabled=False
+            )
+
+    def test_entity_media_gallery_from_row(self):
+        """Test a row is validated with only whether it has an embedding, never the embedding itself."""
+        row = EntityMediaGalleryDAO(
+            id=1, uuid="uuid", entity_id=100, path="bucket/gallery/1.jpg", embedding="[0.1, 0.2]", enabled=True
+        )
+
+        media_gallery = EntityMediaGallery.model_validate(row, from_attributes=True)
+
+        assert media_gallery.has_embedding is True
+        assert media_gallery.embedding is None
+        assert (media_gallery.id, media_gallery.entity_id, media_gallery.enabled) == (1, 100, True)
+
     def test_get_entity_media_gallery_by_uuid_success(self, client, auth_headers):
         """Test successful retrieval of entity media gallery by UUID."""
         with patch(
@@ -401,6 +437,39 @@ class TestEntityMediaGalleryEndpoints:
             assert response.status_code == 200
             mock_delete.assert_called_once_with(media_gallery_uuid="f50ec0b7-f960-400d-91f0-c42a6d44e3d0")
 
+    def test_soft_delete_entity_media_gallery_publishes_its_id(self):
+        """Test that a soft delete publishes the deletion of the gallery like a hard delete does."""
+        with patch("app.business.entity_media_gallery.db_entity_media_gallery_manager") as mock_db_gallery, patch(
+            "app.business.entity_media_gallery.response_cache"
+        ) as mock_response_cache, patch("app.business.entity_media_gallery.event_bus") as mock_event_bus:
+            mock_db_gallery.get_entity_media_gallery_by_uuid.return_value = entity_media_gallery_data[0]
+
+            EntityMediaGalleryManager().soft_delete_entity_media_gallery_by_uuid(
+                media_gallery_uuid=entity_media_gallery_data[0].uuid
+            )
+
+            mock_db_gallery.soft_delete_entity_media_gallery_by_uuid.assert_called_once_with(
+                media_gallery_uuid=entity_media_gallery_data[0].uuid
+            )
+            mock_response_cache.invalidate.assert_called_once_with(CacheNamespace.EntityMediaGallery)
+            mock_event_bus.publish.assert_called_once_with(
+                ChangeEvent(topic=ChangeTopic.EntityMediaGallery, action=ChangeAction.Deleted, ids=[1])
+            )
+
+    def test_soft_delete_entity_media_gallery_not_found(self):
+        """Test that a soft delete of a missing gallery is a 404 and publishes nothing."""
+        with patch("app.business.entity_media_gallery.db_entity_media_gallery_manager") as mock_db_gallery, patch(
+            "app.business.entity_media_gallery.event_bus"
+        ) as mock_event_bus:
+            mock_db_gallery.get_entity_media_gallery_by_uuid.return_value = None
+
+            with pytest.raises(HTTPException) as error:
+                EntityMediaGalleryManager().soft_delete_entity_media_gallery_by_uuid(media_gallery_uuid="missing")
+
+            assert error.value.status_code == 404
+            mock_db_gallery.soft_delete_entity_media_gallery_by_uuid.assert_not_called()
+            mock_event_bus.publish.assert_not_called()
+
     def test_delete_entity_media_gallery_unauthorized(self, client):
         """Test unauthorized access to delete entity media gallery."""
         response = client.delete(f"{settings.API_V1_STR}/entity-media-gallery/f50ec0b7-f960-400d-91f0-c42a6d44e3d0")
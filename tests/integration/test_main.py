@@ -1,9 +1,21 @@
+import json
+from unittest.mock import PropertyMock, patch
+
 import pytest
 from fastapi.testclient import TestClient
 
 from app.core.config import settings
-from app.core.enums import ServiceAvailability
+from app.core.enums import (
+    CacheNamespace,
+    ChangeAction,
+    ChangeTopic,
+    ServiceAvailability,
+)
 from app.main import app
+from app.managers.cache.response import MemoryCacheBackend, ResponseCache
+from app.managers.events.bus import EventBus
+from app.managers.events.postgres import MAX_NOTIFICATION_BYTES, PostgresNotifyManager
+from app.schemas.events import ChangeEvent
 from app.schemas.healthcheck import HealthcheckStatus
 
 
@@ -30,3 +42,80 @@ def test_health_check(client):
     value = response.json()
     assert value["name"] == health_response.name
     assert value["status"] == health_response.status.value
+
+
+def test_change_notifications_are_sent_with_the_worker_id():
+    """
+    GIVEN A listening worker.
+    WHEN a local change is published.
+    THEN it is sent with pg_notify tagged with the worker id, split to fit the payload limit.
+    """
+
+    notifier = PostgresNotifyManager(channel="changes", poll_seconds=1, reconnect_seconds=1)
+    event = ChangeEvent(topic=ChangeTopic.Video, action=ChangeAction.Deleted, ids=list(range(2000)))
+    with patch.object(PostgresNotifyManager, "running", new_callable=PropertyMock, return_value=True), patch.object(
+        notifier, "_postgres"
+    ) as mock_postgres:
+        notifier.on_change(event)
+        notifier.on_change(event.model_copy(update={"origin": "other-worker"}))
+
+        session = mock_postgres.session.return_value.__enter__.return_value
+        payloads = [json.loads(call.args[1]["payload"]) for call in session.execute.call_args_list]
+        assert len(payloads) == 2
+        assert [id_ for payload in payloads for id_ in payload["ids"]] == event.ids
+        assert {payload["origin"] for payload in payloads} == {notifier.worker_id}
+        assert {call.args[1]["channel"] for call in session.execute.call_args_list} == {"changes"}
+
+
+def test_change_notifications_fit_the_payload_limit():
+    """
+    GIVEN An event with more ids, of 16 digits, than fit in a notification.
+    WHEN it is split into payloads.
+    THEN every payload stays within the limit, is filled up to it and all the ids are sent once.
+    """
+
+    notifier = PostgresNotifyManager(channel="changes", poll_seconds=1, reconnect_seconds=1)
+    event = ChangeEvent(
+        topic=ChangeTopic.Detection,
+        action=ChangeAction.Created,
+        ids=[10**15 + i for i in range(600)],
+        video_ids=[10**15 + i for i in range(300)],
+    )
+
+    payloads = notifier.split(event)
+    decoded = [json.loads(payload) for payload in payloads]
+
+    assert len(payloads) > 1
+    assert all(len(payload.encode()) <= MAX_NOTIFICATION_BYTES for payload in payloads)
+    # Full but for the last one, one more id would go past the limit
+    assert all(len(payload.encode()) + 17 > MAX_NOTIFICATION_BYTES for payload in payloads[:-1])
+    assert [id_ for payload in decoded for id_ in payload["ids"]] == event.ids
+    assert [id_ for payload in decoded for id_ in payload["video_ids"]] == event.video_ids
+    assert notifier.split(event.model_copy(update={"ids": [], "video_ids": []})) == [
+        notifier.encode(event, ids=[], video_ids=[])
+    ]
+
+
+def test_change_notifications_from_other_workers_evict_local_caches():
+    """
+    GIVEN A memory response cache subscribed to the local event bus.
+    WHEN notifications are received from the channel.
+    THEN the ones of other workers invalidate the cache and the own ones are ignored.
+    """
+
+    bus = EventBus()
+    cache = ResponseCache(backend=MemoryCacheBackend(maxsize=16, ttl=None))
+    bus.subscribe(ChangeTopic.Taxonomy, cache.on_change)
+    notifier = PostgresNotifyManager(channel="changes", poll_seconds=1, reconnect_seconds=1)
+    event = ChangeEvent(topic=ChangeTopic.Taxonomy, action=ChangeAction.Updated, ids=[1])
+
+    with patch.object(notifier, "_event_bus", bus):
+        notifier.dispatch(notifier.encode(event, ids=[1], video_ids=[]))
+        assert cache._backend.get_version(CacheNamespace.Taxonomy) == 0
+
+        notifier.dispatch(event.model_copy(update={"origin": "other-worker"}).model_dump_json())
+        assert cache._backend.get_version(CacheNamespace.Taxonomy) == 1
+        assert cache._backend.get_version(CacheNamespace.Entity) == 1
+
+        notifier.dispatch("not json")
+        assert cache._backend.get_version(CacheNamespace.Taxonomy) == 1
@@ -1,12 +1,29 @@
-from unittest.mock import patch
+import json
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
 
 import pytest
 from fastapi import HTTPException, status
 from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from video_enrichment_orm.dao.detection import DetectionDAO
+from video_enrichment_orm.dao.segment_detection import SegmentDetectionDAO
+from video_enrichment_orm.dao.video import VideoDAO
+from video_enrichment_orm.schemas.entity import Entity
 from video_enrichment_orm.schemas.segment_detection import SegmentDetection
+from video_enrichment_orm.schemas.taxonomy import Taxonomy
+from video_enrichment_orm.schemas.video import Video
 
+from app.business.segment_detection import SegmentDetectionManager
 from app.core.config import settings
+from app.core.ingest import NDJSON_CONTENT_TYPE
 from app.main import app
+from app.managers.db.segment_detection import SegmentDetectionQueryManager
+from app.managers.index.detection import detection_index_manager
+from app.managers.index.taxonomy import taxonomy_tree_manager
+from app.schemas.segment_detection import SegmentDetectionFilter
 
 
 @pytest.fixture
@@ -62,13 +79,16 @@ segment_detection_data = [
     ),
 ]
 
+# The video the dependency of the by-video endpoints resolves
+video_data = Video(id=100, code="code", path="path", extension=".mp4", frames=300, length=10, frame_rate=30)
+
 
 class TestSegmentDetectionEndpoints:
     """Test cases for segment detection API endpoints."""
 
     def test_get_segment_detections_by_video_id_success(self, client, auth_headers):
         """Test successful retrieval of segment detections by video ID."""
-        with patch(
+        with patch("app.business.video.VideoManager.get_video_by_id", return_value=video_data), patch(
             "app.business.segment_detection.SegmentDetectionManager.get_segment_detections_by_video_id"
         ) as mock_get_by_video:
             mock_get_by_video.return_value = segment_detection_data
@@ -83,7 +103,7 @@ class TestSegmentDetectionEndpoints:
             assert data[0]["end_frame"] == 150
             assert data[0]["taxonomy_id"] == 200
             assert data[0]["entity_id"] == 300
-            mock_get_by_video.assert_called_once_with(video_id=100)
+            mock_get_by_video.assert_called_once_with(video=video_data, filters=SegmentDetectionFilter())
 
     def test_get_segment_detections_by_video_id_video_not_found(self, client, auth_headers):
         """Test segment detections by video ID when video doesn't exist."""
@@ -107,7 +127,7 @@ class TestSegmentDetectionEndpoints:
 
     def test_get_segment_detections_by_video_and_taxonomy_success(self, client, auth_headers):
         """Test successful retrieval of segment detections by video and taxonomy."""
-        with patch(
+        with patch("app.business.video.VideoManager.get_video_by_id", return_value=video_data), patch(
             "app.business.segment_detection.SegmentDetectionManager.get_segment_detections_by_video_and_taxonomy"
         ) as mock_get_by_video_taxonomy:
             # Return only detections for video_id 100 and taxonomy_id 200
@@ -124,7 +144,9 @@ class TestSegmentDetectionEndpoints:
             assert data[0]["taxonomy_id"] == 200
             assert data[1]["video_id"] == 100
             assert data[1]["taxonomy_id"] == 200
-            mock_get_by_video_taxonomy.assert_called_once_with(video_id=100, taxonomy_id=200)
+            mock_get_by_video_taxonomy.assert_called_once_with(
+                video=video_data, taxonomy_id=200, filters=SegmentDetectionFilter(), include_descendants=False
+            )
 
     def test_get_segment_detections_by_video_and_taxonomy_video_not_found(self, client, auth_headers):
         """Test segment detections by video and taxonomy when video doesn't exist."""
@@ -167,7 +189,7 @@ class TestSegmentDetectionEndpoints:
 
     def test_get_segment_detections_by_video_id_empty_result(self, client, auth_headers):
         """Test segment detections by video ID when no detections exist."""
-        with patch(
+        with patch("app.business.video.VideoManager.get_video_by_id", return_value=video_data), patch(
             "app.business.segment_detection.SegmentDetectionManager.get_segment_detections_by_video_id"
         ) as mock_get_by_video:
             mock_get_by_video.return_value = []
@@ -177,11 +199,11 @@ class TestSegmentDetectionEndpoints:
             assert response.status_code == 200
             data = response.json()
             assert len(data) == 0
-            mock_get_by_video.assert_called_once_with(video_id=100)
+            mock_get_by_video.assert_called_once_with(video=video_data, filters=SegmentDetectionFilter())
 
     def test_get_segment_detections_by_video_and_taxonomy_empty_result(self, client, auth_headers):
         """Test segment detections by video and taxonomy when no detections exist."""
-        with patch(
+        with patch("app.business.video.VideoManager.get_video_by_id", return_value=video_data), patch(
             "app.business.segment_detection.SegmentDetectionManager.get_segment_detections_by_video_and_taxonomy"
         ) as mock_get_by_video_taxonomy:
             mock_get_by_video_taxonomy.return_value = []
@@ -193,7 +215,9 @@ class TestSegmentDetectionEndpoints:
             assert response.status_code == 200
             data = response.json()
             assert len(data) == 0
-            mock_get_by_video_taxonomy.assert_called_once_with(video_id=100, taxonomy_id=999)
+            mock_get_by_video_taxonomy.assert_called_once_with(
+                video=video_data, taxonomy_id=999, filters=SegmentDetectionFilter(), include_descendants=False
+            )
 
     def test_segment_detection_endpoints_without_auth_header(self, client):
         """Test all segment detection endpoints without authentication header."""
@@ -286,3 +310,319 @@ class TestSegmentDetectionEndpoints:
             assert detection["end_frame"] == 150
             assert detection["taxonomy_id"] == 200
             assert detection["entity_id"] == 300
+
+    def test_get_segment_detections_by_video_id_with_frame_range(self, client, auth_headers):
+        """Test that the frame window query parameters reach the manager."""
+        with patch("app.business.video.VideoManager.get_video_by_id", return_value=video_data), patch(
+            "app.business.segment_detection.SegmentDetectionManager.get_segment_detections_by_video_id"
+        ) as mock_get_by_video:
+            mock_get_by_video.return_value = [segment_detection_data[1]]
+
+            response = client.get(
+                f"{settings.API_V1_STR}/segment-detection/by-video/100?from_second=1.5&to_second=2",
+                headers=auth_headers,
+            )
+
+            assert response.status_code == 200
+            mock_get_by_video.assert_called_once_with(
+                video=video_data, filters=SegmentDetectionFilter(from_second=1.5, to_second=2)
+            )
+
+    def test_get_segment_detections_frame_window_from_index(self, client, auth_headers):
+        """Test that segments overlapping a frame window are answered from the per-video interval index."""
+        detection_index_manager.clear()
+        with patch("app.business.video.db_video_manager") as mock_db_video, patch(
+            "app.business.segment_detection.db_taxonomy_manager"
+        ), patch("app.business.segment_detection.db_segment_detection_manager") as mock_db_segment_detection:
+            mock_db_video.get_video_by_id.return_value = Video(
+                id=100, code="code", path="path", extension=".mp4", frames=400, length=4, frame_rate=100
+            )
+            mock_db_segment_detection.get_segment_detections_by_video_id.return_value = segment_detection_data
+
+            response = client.get(
+                f"{settings.API_V1_STR}/segment-detection/by-video/100?from_frame=140&to_frame=210",
+                headers=auth_headers,
+            )
+            by_taxonomy = client.get(
+                f"{settings.API_V1_STR}/segment-detection/by-video/100/taxonomy/201?from_frame=240",
+                headers=auth_headers,
+            )
+
+            assert response.status_code == 200
+            assert [segment["id"] for segment in response.json()] == [1, 2]
+            assert by_taxonomy.status_code == 200
+            assert [segment["id"] for segment in by_taxonomy.json()] == [3]
+            mock_db_segment_detection.get_segment_detections_by_video_id.assert_called_once_with(video_id=100)
+        detection_index_manager.clear()
+
+    def test_get_segment_detections_by_video_and_taxonomy_with_attribute_filters(self, client, auth_headers):
+        """Test that score and entity filters are executed by the database query."""
+        with patch("app.business.video.db_video_manager") as mock_db_video, patch(
+            "app.business.segment_detection.db_taxonomy_manager"
+        ), patch("app.business.segment_detection.segment_detection_query_manager") as mock_query:
+            mock_db_video.get_video_by_id.return_value = Video(
+                id=100, code="code", path="path", extension=".mp4", frames=400, length=4, frame_rate=100
+            )
+            mock_query.get_segment_detections_by_video_id.return_value = [segment_detection_data[0]]
+
+            response = client.get(
+                f"{settings.API_V1_STR}/segment-detection/by-video/100/taxonomy/200?min_detection_score=0.5&entity_ids=300",
+                headers=auth_headers,
+            )
+
+            assert response.status_code == 200
+            assert [segment["id"] for segment in response.json()] == [1]
+            mock_query.get_segment_detections_by_video_id.assert_called_once_with(
+                video_id=100,
+                filters=SegmentDetectionFilter(min_detection_score=0.5, entity_ids=[300]),
+                taxonomy_id=200,
+                from_frame=None,
+                to_frame=None,
+            )
+
+    def test_get_segment_detections_by_video_and_taxonomy_include_descendants(self, client, auth_headers):
+        """Test that the taxonomy subtree is expanded once into a single IN query."""
+        with patch("app.business.video.db_video_manager") as mock_db_video, patch(
+            "app.business.segment_detection.db_taxonomy_manager"
+        ) as mock_db_taxonomy, patch(
+            "app.business.segment_detection.segment_detection_query_manager"
+        ) as mock_query, patch.object(
+            taxonomy_tree_manager, "get_subtree_ids", return_value=[200, 201, 202]
+        ):
+            mock_db_video.get_video_by_id.return_value = Video(
+                id=100, code="code", path="path", extension=".mp4", frames=400, length=4, frame_rate=100
+            )
+            mock_query.get_segment_detections_by_video_id.return_value = segment_detection_data
+
+            response = client.get(
+                f"{settings.API_V1_STR}/segment-detection/by-video/100/taxonomy/200?include_descendants=true",
+                headers=auth_headers,
+            )
+            narrowed = client.get(
+                f"{settings.API_V1_STR}/segment-detection/by-video/100/taxonomy/200"
+                "?include_descendants=true&taxonomy_ids=201&taxonomy_ids=999",
+                headers=auth_headers,
+            )
+
+            assert response.status_code == 200
+            assert [segment["id"] for segment in response.json()] == [1, 2, 3]
+            assert narrowed.status_code == 200
+            mock_query.get_segment_detections_by_video_id.assert_any_call(
+                video_id=100,
+                filters=SegmentDetectionFilter(taxonomy_ids=[200, 201, 202]),
+                taxonomy_id=None,
+                from_frame=None,
+                to_frame=None,
+            )
+            mock_query.get_segment_detections_by_video_id.assert_called_with(
+                video_id=100,
+                filters=SegmentDetectionFilter(taxonomy_ids=[201]),
+                taxonomy_id=None,
+                from_frame=None,
+                to_frame=None,
+            )
+            mock_db_taxonomy.get_taxonomy_by_id.assert_not_called()
+
+    def test_get_segment_detections_by_video_and_taxonomy_include_descendants_not_found(self, client, auth_headers):
+        """Test that an unknown taxonomy is rejected when expanding its subtree."""
+        with patch("app.business.video.db_video_manager"), patch.object(
+            taxonomy_tree_manager, "get_subtree_ids", side_effect=ValueError("Taxonomy with id 999 not found")
+        ):
+            response = client.get(
+                f"{settings.API_V1_STR}/segment-detection/by-video/100/taxonomy/999?include_descendants=true",
+                headers=auth_headers,
+            )
+
+            assert response.status_code == 404
+            assert response.json()["detail"] == "Taxonomy with id 999 not found"
+
+    def test_ingest_segment_detections_ndjson(self, client, auth_headers):
+        """Test an NDJSON batch checks the entities and taxonomies at once and publishes the change of the video."""
+        body = "\n".join(
+            json.dumps({"start_frame": start, "end_frame": start + 10, "taxonomy_id": 5, "entity_id": 7})
+            for start in (0, 20)
+        )
+        with patch("app.business.video.db_video_manager") as mock_db_video, patch(
+            "app.business.ingest.entity_query_manager"
+        ) as mock_entity_query, patch("app.business.ingest.taxonomy_query_manager") as mock_taxonomy_query, patch(
+            "app.business.ingest.postgres_manager"
+        ) as mock_postgres, patch.object(
+            detection_index_manager, "invalidate"
+        ) as mock_invalidate:
+            mock_db_video.get_video_by_id.return_value = Video(
+                id=100, code="code", path="path", extension=".mp4", frames=300, length=10, frame_rate=30
+            )
+            mock_entity_query.get_entities_by_keys.return_value = [Entity(id=7, alias=["a"], taxonomy_id=5)]
+            mock_taxonomy_query.get_taxonomies_by_keys.return_value = [Taxonomy(id=5, label="Person")]
+
+            response = client.post(
+                f"{settings.API_V1_STR}/segment-detection/by-video/100/ingest",
+                content=body,
+                headers={**auth_headers, "Content-Type": f"{NDJSON_CONTENT_TYPE}; charset=utf-8"},
+            )
+
+            assert response.status_code == 200
+            assert response.json() == {"video_id": 100, "rows": 2}
+            mock_entity_query.get_entities_by_keys.assert_called_once_with(key="id", keys=[7])
+            mock_taxonomy_query.get_taxonomies_by_keys.assert_called_once_with(key="id", keys=[5])
+            lines = "".join(mock_postgres.copy_rows.call_args.kwargs["chunks"]).splitlines()
+            assert [line.split("\t")[1:6] for line in lines] == [
+                ["100", "0", "10", "5", "7"],
+                ["100", "20", "30", "5", "7"],
+            ]
+            assert mock_postgres.copy_rows.call_args.kwargs["columns"][-2:] == ["created_at", "updated_at"]
+            assert all(line.split("\t")[6] == line.split("\t")[7] != "" for line in lines)
+            mock_invalidate.assert_called_once_with(100)
+
+    def test_get_segment_detections_by_video_id_merge_gap_frames(self, client, auth_headers):
+        """Test the fragments of the same entity and taxonomy within the gap are merged into the earliest one."""
+        fragments = [
+            SegmentDetection(id=1, video_id=100, start_frame=0, end_frame=10, taxonomy_id=5, entity_id=7),
+            SegmentDetection(id=2, video_id=100, start_frame=5, end_frame=40, taxonomy_id=5, entity_id=8),
+            SegmentDetection(id=3, video_id=100, start_frame=13, end_frame=20, taxonomy_id=5, entity_id=7),
+            SegmentDetection(id=4, video_id=100, start_frame=30, end_frame=35, taxonomy_id=5, entity_id=7),
+            SegmentDetection(id=5, video_id=100, start_frame=21, end_frame=25, taxonomy_id=6, entity_id=7),
+        ]
+        with patch("app.business.video.db_video_manager") as mock_db_video, patch(
+            "app.business.segment_detection.db_segment_detection_manager"
+        ) as mock_db_segment_detection:
+            mock_db_video.get_video_by_id.return_value = Video(
+                id=100, code="code", path="path", extension=".mp4", frames=300, length=10, frame_rate=30
+            )
+            mock_db_segment_detection.get_segment_detections_by_video_id.return_value = fragments
+
+            response = client.get(
+                f"{settings.API_V1_STR}/segment-detection/by-video/100?merge_gap_frames=2", headers=auth_headers
+            )
+
+            assert response.status_code == 200
+            assert [(segment["id"], segment["start_frame"], segment["end_frame"]) for segment in response.json()] == [
+                (1, 0, 20),
+                (2, 5, 40),
+                (4, 30, 35),
+                (5, 21, 25),
+            ]
+
+    def test_group_fragments_without_entity_or_taxonomy(self):
+        """Test the fragments missing their entity or taxonomy are kept apart instead of failing the merge."""
+        fragments = [
+            SegmentDetection(id=1, video_id=100, start_frame=0, end_frame=10, taxonomy_id=5, entity_id=7),
+            SegmentDetection.model_construct(
+                id=2, video_id=100, start_frame=11, end_frame=20, taxonomy_id=5, entity_id=None
+            ),
+            SegmentDetection.model_construct(
+                id=3, video_id=100, start_frame=12, end_frame=25, taxonomy_id=None, entity_id=None
+            ),
+            SegmentDetection(id=4, video_id=100, start_frame=12, end_frame=30, taxonomy_id=5, entity_id=7),
+        ]
+
+        merged, absorbed = SegmentDetectionManager._group_fragments(fragments, gap=2)
+
+        assert [(segment.id, segment.start_frame, segment.end_frame) for segment in merged] == [
+            (1, 0, 30),
+            (2, 11, 20),
+            (3, 12, 25),
+        ]
+        assert absorbed == {4: 1}
+
+    def test_compact_segment_detections(self, client, auth_headers):
+        """Test the compaction widens the survivors and moves the detections of the absorbed fragments."""
+        # One in-memory database shared by the threads of the test client
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        SegmentDetectionDAO.metadata.create_all(
+            engine, tables=[VideoDAO.__table__, DetectionDAO.__table__, SegmentDetectionDAO.__table__]
+        )
+        with Session(engine) as session:
+            session.add(
+                VideoDAO(
+                    id=100,
+                    uuid="uuid",
+                    code="code",
+                    path="path",
+                    extension=".mp4",
+                    frames=300,
+                    length=10,
+                    frame_rate=30,
+                )
+            )
+            for segment_id, start_frame, end_frame in ((1, 0, 10), (2, 12, 20), (3, 18, 30), (4, 100, 110)):
+                session.add(
+                    SegmentDetectionDAO(
+                        id=segment_id,
+                        uuid=f"uuid-{segment_id}",
+                        video_id=100,
+                        start_frame=start_frame,
+                        end_frame=end_frame,
+                        taxonomy_id=5,
+                        entity_id=7,
+                    )
+                )
+                session.add(
+                    DetectionDAO(
+                        id=segment_id,
+                        uuid=f"uuid-{segment_id}",
+                        video_id=100,
+                        frame=start_frame,
+                        segment_detection_id=segment_id,
+                        detection_score=0.9,
+                        entity_score=0.8,
+                        bbox_x_min=0.1,
+                        bbox_y_min=0.2,
+                        bbox_x_max=0.3,
+                        bbox_y_max=0.4,
+                    )
+                )
+            session.commit()
+
+        @contextmanager
+        def transaction():
+            with Session(engine) as session, session.begin():
+                yield session
+
+        database = MagicMock()
+        database.session.side_effect = transaction
+        segment_detection_query = SegmentDetectionQueryManager()
+        segment_detection_query._postgres = database
+
+        with patch("app.business.video.db_video_manager") as mock_db_video, patch(
+            "app.business.segment_detection.segment_detection_query_manager", segment_detection_query
+        ), patch.object(detection_index_manager, "invalidate") as mock_invalidate:
+            mock_db_video.get_video_by_id.return_value = Video(
+                id=100, code="code", path="path", extension=".mp4", frames=300, length=10, frame_rate=30
+            )
+
+            response = client.post(
+                f"{settings.API_V1_STR}/segment-detection/by-video/100/compact?merge_gap_frames=1",
+                headers=auth_headers,
+            )
+
+            assert response.status_code == 200
+            assert response.json() == {"video_id": 100, "segments_before": 4, "segments_after": 2}
+            with Session(engine) as session:
+                segments = session.execute(
+                    select(
+                        SegmentDetectionDAO.id, SegmentDetectionDAO.start_frame, SegmentDetectionDAO.end_frame
+                    ).order_by(SegmentDetectionDAO.id)
+                ).all()
+                detections = session.execute(
+                    select(DetectionDAO.id, DetectionDAO.segment_detection_id).order_by(DetectionDAO.id)
+                ).all()
+            assert [tuple(row) for row in segments] == [(1, 0, 30), (4, 100, 110)]
+            assert [tuple(row) for row in detections] == [(1, 1), (2, 1), (3, 1), (4, 4)]
+            mock_invalidate.assert_called_once_with(100)
+
+    def test_compact_segment_detections_video_not_found(self, client, auth_headers):
+        """Test the video of the path is resolved by the dependency, a missing one is answered before the manager."""
+        with patch("app.business.video.db_video_manager") as mock_db_video, patch(
+            "app.business.segment_detection.segment_detection_query_manager"
+        ) as mock_query:
+            mock_db_video.get_video_by_id.return_value = None
+
+            response = client.post(
+                f"{settings.API_V1_STR}/segment-detection/by-video/999/compact?merge_gap_frames=1",
+                headers=auth_headers,
+            )
+
+            assert response.status_code == 404
+            assert response.json()["detail"] == "Video 999 not found"
+            mock_query.compact_segment_detections.assert_not_called()
@@ -1,8 +1,15 @@
+import socket
+import socketserver
+import threading
 from unittest.mock import patch
 
 import pytest
 from fastapi import HTTPException, status
 from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from video_enrichment_orm.dao.taxonomy import TaxonomyDAO
 from video_enrichment_orm.schemas.taxonomy import (
     Taxonomy,
     TaxonomyCreate,
@@ -10,7 +17,17 @@ from video_enrichment_orm.schemas.taxonomy import (
 )
 
 from app.core.config import settings
+from app.core.enums import CacheNamespace
 from app.main import app
+from app.managers.cache.redis import RedisClient
+from app.managers.cache.response import (
+    MemoryCacheBackend,
+    RedisCacheBackend,
+    ResponseCache,
+)
+from app.managers.db.postgres import PostgresManager
+from app.managers.db.taxonomy import TaxonomyQueryManager
+from app.managers.index.taxonomy import taxonomy_tree_manager
 
 
 @pytest.fixture
@@ -47,6 +64,18 @@ taxonomy_data = [
     ),
 ]
 
+# Sports (1) > Football (3) > Goals (5), Sports (1) > Tennis (4), News (2)
+taxonomy_tree_data = [
+    Taxonomy(id=id_, uuid=f"uuid-{id_}", label=label, taxonomy_id=parent_id)
+    for id_, label, parent_id in [
+        (1, "Sports", None),
+        (2, "News", None),
+        (3, "Football", 1),
+        (4, "Tennis", 1),
+        (5, "Goals", 3),
+    ]
+]
+
 taxonomy_create_data = TaxonomyCreate(
     uuid="test-uuid-123",
     label="Test Taxonomy",
@@ -58,6 +87,39 @@ taxonomy_update_data = TaxonomyUpdate(
 )
 
 
+class RESPStandIn(socketserver.ThreadingTCPServer):
+    """A local stand-in of a Redis server answering GET, SET and INCR from a dict"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), RESPStandInHandler)
+        self.data = {}
+
+
+class RESPStandInHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        while line := self.rfile.readline():
+            args = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(length + 2)[:-2])
+
+            command, data = args[0].upper(), self.server.data
+            if command == b"GET":
+                value = data.get(args[1])
+                self.wfile.write(b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value))
+            elif command == b"SET":
+                data[args[1]] = args[2]
+                self.wfile.write(b"+OK\r\n")
+            elif command == b"INCR":
+                data[args[1]] = b"%d" % (int(data.get(args[1], b"0")) + 1)
+                self.wfile.write(b":%s\r\n" % data[args[1]])
+            else:
+                self.wfile.write(b"-ERR unknown command\r\n")
+
+
 class TestTaxonomyEndpoints:
     """Test cases for taxonomy API endpoints."""
 
@@ -96,6 +158,23 @@ class TestTaxonomyEndpoints:
             assert data["taxonomy_id"] == 100
             mock_get_taxonomy.assert_called_once_with(taxonomy_uuid="f50ec0b7-f960-400d-91f0-c42a6d44e3d0")
 
+    def test_get_taxonomies_batch_success(self, client, auth_headers):
+        """Test the batch lookup of taxonomies by id."""
+        with patch("app.business.taxonomy.taxonomy_query_manager") as mock_query:
+            mock_query.get_taxonomies_by_keys.return_value = [taxonomy_data[0]]
+
+            response = client.post(
+                f"{settings.API_V1_STR}/taxonomy/batch",
+                json={"ids": [999, taxonomy_data[0].id]},
+                headers=auth_headers,
+            )
+
+            assert response.status_code == 200
+            data = response.json()
+            assert [taxonomy["id"] for taxonomy in data["items"]] == [taxonomy_data[0].id]
+            assert data["missing"] == [999]
+            mock_query.get_taxonomies_by_keys.assert_called_once_with(key="id", keys=[999, taxonomy_data[0].id])
+
     def test_get_taxonomy_by_uuid_not_found(self, client, auth_headers):
         """Test taxonomy not found by UUID."""
         with patch("app.business.taxonomy.TaxonomyManager.get_taxonomy_by_uuid") as mock_get_taxonomy:
@@ -250,6 +329,194 @@ class TestTaxonomyEndpoints:
             assert response.status_code == 200
             mock_delete.assert_called_once_with(taxonomy_uuid="f50ec0b7-f960-400d-91f0-c42a6d44e3d0")
 
+    def test_delete_taxonomy_publishes_its_id(self, client, auth_headers):
+        """Test the deletion looks the id up with a keyed query, without loading the taxonomy tree."""
+        with patch("app.business.taxonomy.db_taxonomy_manager") as mock_db_taxonomy, patch(
+            "app.business.taxonomy.taxonomy_query_manager"
+        ) as mock_query, patch("app.business.taxonomy.event_bus") as mock_event_bus, patch.object(
+            taxonomy_tree_manager, "get_tree"
+        ) as mock_get_tree:
+            mock_query.get_taxonomies_by_keys.return_value = [Taxonomy(id=7, uuid="uuid-7", label="Football")]
+
+            response = client.delete(f"{settings.API_V1_STR}/taxonomy/uuid-7", headers=auth_headers)
+
+            assert response.status_code == 200
+            mock_query.get_taxonomies_by_keys.assert_called_once_with(key="uuid", keys=["uuid-7"])
+            mock_db_taxonomy.delete_taxonomy_by_uuid.assert_called_once_with(taxonomy_uuid="uuid-7")
+            assert mock_event_bus.publish.call_args.args[0].ids == [7]
+            mock_get_tree.assert_not_called()
+
+    def test_get_taxonomy_tree_success(self, client, auth_headers):
+        """Test that the taxonomy tree is nested and loaded once until a taxonomy changes."""
+        taxonomy_tree_manager.invalidate()
+        with patch.object(taxonomy_tree_manager, "_db_taxonomy") as mock_db_taxonomy, patch(
+            "app.business.taxonomy.db_taxonomy_manager"
+        ) as mock_db_manager:
+            mock_db_taxonomy.get_taxonomies.return_value = taxonomy_tree_data
+            mock_db_manager.save_taxonomy.return_value = taxonomy_tree_data[0]
+
+            response = client.get(f"{settings.API_V1_STR}/taxonomy/tree", headers=auth_headers)
+            client.get(f"{settings.API_V1_STR}/taxonomy/tree", headers=auth_headers)
+
+            assert response.status_code == 200
+            assert [node["id"] for node in response.json()] == [1, 2]
+            assert [node["id"] for node in response.json()[0]["children"]] == [3, 4]
+            assert [node["id"] for node in response.json()[0]["children"][0]["children"]] == [5]
+            mock_db_taxonomy.get_taxonomies.assert_called_once()
+
+            client.post(f"{settings.API_V1_STR}/taxonomy", headers=auth_headers, json={"label": "New"})
+            client.get(f"{settings.API_V1_STR}/taxonomy/tree", headers=auth_headers)
+            assert mock_db_taxonomy.get_taxonomies.call_count == 2
+        taxonomy_tree_manager.invalidate()
+
+    def test_get_taxonomy_subtree_and_ancestors(self, client, auth_headers):
+        """Test the subtree and the ancestors of a taxonomy."""
+        taxonomy_tree_manager.invalidate()
+        with patch.object(taxonomy_tree_manager, "_db_taxonomy") as mock_db_taxonomy:
+            mock_db_taxonomy.get_taxonomies.return_value = taxonomy_tree_data
+
+            subtree = client.get(f"{settings.API_V1_STR}/taxonomy/uuid-3/subtree", headers=auth_headers)
+            ancestors = client.get(f"{settings.API_V1_STR}/taxonomy/uuid-5/ancestors", headers=auth_headers)
+            missing = client.get(f"{settings.API_V1_STR}/taxonomy/unknown/subtree", headers=auth_headers)
+
+            assert subtree.status_code == 200
+            assert subtree.json()["id"] == 3
+            assert [node["id"] for node in subtree.json()["children"]] == [5]
+            assert ancestors.status_code == 200
+            assert [taxonomy["id"] for taxonomy in ancestors.json()] == [1, 3]
+            assert missing.status_code == 404
+        taxonomy_tree_manager.invalidate()
+
+    def test_save_taxonomies_bulk_with_parents_in_the_request(self, client, auth_headers):
+        """Test the items created as children of other items of the request, level by level in one transaction."""
+        # One in-memory database shared by the threads of the test client
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        TaxonomyDAO.metadata.create_all(engine, tables=[TaxonomyDAO.__table__])
+        with engine.begin() as connection:
+            connection.exec_driver_sql("CREATE UNIQUE INDEX ix_taxonomy_uuid ON taxonomy (uuid)")
+            connection.exec_driver_sql("INSERT INTO taxonomy (id, uuid, label) VALUES (1, 'existing', 'Existing')")
+        with patch("app.managers.db.postgres._get_engine", return_value=engine):
+            taxonomy_query = TaxonomyQueryManager()
+            taxonomy_query._postgres = PostgresManager()
+
+        with patch("app.business.taxonomy.taxonomy_query_manager", taxonomy_query):
+            response = client.post(
+                f"{settings.API_V1_STR}/taxonomy/bulk",
+                json={
+                    "items": [
+                        {"uuid": "goal", "label": "Goal", "parent_uuid": "football"},
+                        {"uuid": "football", "label": "Football", "parent_uuid": "sports"},
+                        {"uuid": "sports", "label": "Sports"},
+                        {"uuid": "existing", "label": "Duplicate"},
+                        {"uuid": "orphan", "label": "Orphan", "parent_uuid": "existing"},
+                        {"uuid": "lost", "label": "Lost", "parent_uuid": "missing"},
+                        {"uuid": "news", "label": "News", "taxonomy_id": 1},
+                    ]
+                },
+                headers=auth_headers,
+            )
+
+            assert response.status_code == 200
+            data = response.json()
+            assert (data["created"], data["failed"]) == (4, 3)
+            assert [result["status"] for result in data["results"]] == [
+                "CREATED",
+                "CREATED",
+                "CREATED",
+                "FAILED",
+                "FAILED",
+                "FAILED",
+                "CREATED",
+            ]
+            assert data["results"][3]["detail"] == "Taxonomy with uuid existing already exists"
+            assert data["results"][4]["detail"] == "Parent taxonomy with uuid existing was not created"
+            assert data["results"][5]["detail"] == "Parent taxonomy with uuid missing not found in the request"
+            with Session(engine) as session:
+                parents = dict(session.execute(select(TaxonomyDAO.uuid, TaxonomyDAO.taxonomy_id)).all())
+                ids = dict(session.execute(select(TaxonomyDAO.uuid, TaxonomyDAO.id)).all())
+            assert parents == {
+                "existing": None,
+                "sports": None,
+                "news": 1,
+                "football": ids["sports"],
+                "goal": ids["football"],
+            }
+
+    def test_save_taxonomies_bulk_parent_given_twice(self, client, auth_headers):
+        """Test an item cannot have both an existing parent and a parent in the request."""
+        response = client.post(
+            f"{settings.API_V1_STR}/taxonomy/bulk",
+            json={"items": [{"label": "Goal", "taxonomy_id": 1, "parent_uuid": "football"}]},
+            headers=auth_headers,
+        )
+
+        assert response.status_code == 422
+
+    def test_get_all_taxonomies_cached_until_write(self, client, auth_headers):
+        """Test that the taxonomies are served from the response cache until a taxonomy is written."""
+        cache = ResponseCache(backend=MemoryCacheBackend(maxsize=16, ttl=None))
+        with patch("app.business.taxonomy.response_cache", cache), patch(
+            "app.business.taxonomy.db_taxonomy_manager"
+        ) as mock_db_taxonomy:
+            mock_db_taxonomy.get_taxonomies.return_value = taxonomy_data
+            mock_db_taxonomy.update_taxonomy.return_value = taxonomy_data[0]
+
+            first = client.get(f"{settings.API_V1_STR}/taxonomy", headers=auth_headers)
+            second = client.get(f"{settings.API_V1_STR}/taxonomy", headers=auth_headers)
+            assert first.status_code == second.status_code == 200
+            assert first.content == second.content
+            assert [taxonomy["id"] for taxonomy in second.json()] == [1, 2]
+            mock_db_taxonomy.get_taxonomies.assert_called_once()
+
+            client.put(
+                f"{settings.API_V1_STR}/taxonomy/f50ec0b7-f960-400d-91f0-c42a6d44e3d0",
+                headers=auth_headers,
+                json={"label": "Updated"},
+            )
+            client.get(f"{settings.API_V1_STR}/taxonomy", headers=auth_headers)
+            assert mock_db_taxonomy.get_taxonomies.call_count == 2
+
+    def test_get_all_taxonomies_cached_in_redis_protocol_backend(self, client, auth_headers):
+        """Test the response cache backed by a Redis protocol server, served by a local stand-in."""
+        server = RESPStandIn()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        redis_client = RedisClient(host="127.0.0.1", port=server.server_address[1])
+        cache = ResponseCache(backend=RedisCacheBackend(client=redis_client, ttl=60))
+        try:
+            with patch("app.business.taxonomy.response_cache", cache), patch(
+                "app.business.taxonomy.db_taxonomy_manager"
+            ) as mock_db_taxonomy:
+                mock_db_taxonomy.get_taxonomies.return_value = taxonomy_data
+
+                first = client.get(f"{settings.API_V1_STR}/taxonomy", headers=auth_headers)
+                second = client.get(f"{settings.API_V1_STR}/taxonomy", headers=auth_headers)
+                cache.invalidate(CacheNamespace.Taxonomy)
+                client.get(f"{settings.API_V1_STR}/taxonomy", headers=auth_headers)
+
+                assert first.json() == second.json()
+                assert mock_db_taxonomy.get_taxonomies.call_count == 2
+                assert server.data[b"video-enrichment-api:response:version:TAXONOMY"] == b"1"
+        finally:
+            redis_client.close()
+            server.shutdown()
+            server.server_close()
+
+    def test_get_all_taxonomies_cache_backend_down(self, client, auth_headers):
+        """Test that an unreachable cache backend is served as a cache miss."""
+        with socket.socket() as unused:
+            unused.bind(("127.0.0.1", 0))
+            port = unused.getsockname()[1]
+        cache = ResponseCache(backend=RedisCacheBackend(client=RedisClient(host="127.0.0.1", port=port), ttl=60))
+        with patch("app.business.taxonomy.response_cache", cache), patch(
+            "app.business.taxonomy.db_taxonomy_manager"
+        ) as mock_db_taxonomy:
+            mock_db_taxonomy.get_taxonomies.return_value = taxonomy_data
+
+            response = client.get(f"{settings.API_V1_STR}/taxonomy", headers=auth_headers)
+
+            assert response.status_code == 200
+            assert len(response.json()) == 2
+
     def test_delete_taxonomy_unauthorized(self, client):
         """Test unauthorized access to delete taxonomy."""
         response = client.delete(f"{settings.API_V1_STR}/taxonomy/f50ec0b7-f960-400d-91f0-c42a6d44e3d0")
@@ -1,12 +1,35 @@
-from unittest.mock import patch
+import threading
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from unittest.mock import MagicMock, patch
 
 import pytest
 from fastapi import HTTPException, status
 from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from video_enrichment_orm.dao.detection import DetectionDAO
+from video_enrichment_orm.dao.segment_detection import SegmentDetectionDAO
+from video_enrichment_orm.dao.video import VideoDAO
+from video_enrichment_orm.schemas.detection import Detection
+from video_enrichment_orm.schemas.entity import Entity
+from video_enrichment_orm.schemas.segment_detection import SegmentDetection
+from video_enrichment_orm.schemas.taxonomy import Taxonomy
 from video_enrichment_orm.schemas.video import Video, VideoCreate
 
 from app.core.config import settings
+from app.core.enums import ChangeAction, ChangeTopic
 from app.main import app
+from app.managers.cache.lookup import LookupCacheManager
+from app.managers.cache.snapshot import accepts_gzip, snapshot_store
+from app.managers.db.detection import DetectionQueryManager
+from app.managers.db.segment_detection import SegmentDetectionQueryManager
+from app.managers.events.bus import event_bus
+from app.managers.index.inverted import InvertedIndexManager
+from app.managers.index.timeline import timeline_manager
+from app.schemas.events import ChangeEvent
+from app.schemas.video import VideoSearchRequest
 
 
 @pytest.fixture
@@ -54,6 +77,22 @@ video_create_data = VideoCreate(
 )
 
 
+def mock_s3_objects(objects: dict) -> MagicMock:
+    """An S3 manager mock storing the objects in the given dict, keyed by path."""
+
+    def upload_object(bucket, key, content):
+        objects[f"{bucket}/{key}"] = content
+        return True
+
+    mock_s3 = MagicMock()
+    mock_s3.decode_path.side_effect = lambda path: tuple(path.split("/", 1))
+    mock_s3.exists.side_effect = lambda bucket, key: f"{bucket}/{key}" in objects
+    mock_s3.download_object.side_effect = lambda bucket, key: objects.get(f"{bucket}/{key}")
+    mock_s3.upload_object.side_effect = upload_object
+    mock_s3.delete_object.side_effect = lambda bucket, key: objects.pop(f"{bucket}/{key}")
+    return mock_s3
+
+
 class TestVideoEndpoints:
     """Test cases for video API endpoints."""
 
@@ -89,6 +128,8 @@ class TestVideoEndpoints:
             data = response.json()
             assert data["uuid"] == "f50ec0b7-f960-400d-91f0-c42a6d44e3d0"
             assert data["code"] == "20_11_2024_13_24_23_rtve"
+            # Without expand the plain video is returned, not a detail with null expansions
+            assert "segments" not in data
             mock_get_video.assert_called_once_with(video_uuid="f50ec0b7-f960-400d-91f0-c42a6d44e3d0")
 
     def test_get_video_by_uuid_not_found(self, client, auth_headers):
@@ -106,6 +147,95 @@ class TestVideoEndpoints:
             data = response.json()
             assert data["detail"] == "Video f50ec0b7-f960-400d-91f0-c42a6d44e3d1 not found"
 
+    def test_get_videos_batch_success(self, client, auth_headers):
+        """Test the batch lookup keeps the order of the request and reports the misses."""
+        with patch("app.business.video.video_query_manager") as mock_query:
+            mock_query.get_videos_by_keys.return_value = [video_data[0], video_data[1]]
+
+            response = client.post(
+                f"{settings.API_V1_STR}/video/batch",
+                json={"uuids": [video_data[1].uuid, "missing-uuid", video_data[0].uuid, video_data[1].uuid]},
+                headers=auth_headers,
+            )
+
+            assert response.status_code == 200
+            data = response.json()
+            assert [video["id"] for video in data["items"]] == [2, 1]
+            assert data["missing"] == ["missing-uuid"]
+            mock_query.get_videos_by_keys.assert_called_once_with(
+                key="uuid", keys=[video_data[1].uuid, "missing-uuid", video_data[0].uuid]
+            )
+
+    def test_get_videos_batch_invalid_keys(self, client, auth_headers):
+        """Test the batch lookup needs either ids or uuids."""
+        response = client.post(
+            f"{settings.API_V1_STR}/video/batch", json={"ids": [1], "uuids": ["a"]}, headers=auth_headers
+        )
+        assert response.status_code == 422
+
+        response = client.post(
+            f"{settings.API_V1_STR}/video/batch",
+            json={"ids": list(range(settings.BATCH_MAX_KEYS + 1))},
+            headers=auth_headers,
+        )
+        assert response.status_code == 422
+
+    def test_get_video_by_uuid_expanded(self, client, auth_headers):
+        """Test the video detail embeds the expansions with one batched query each."""
+        segments = [
+            SegmentDetection(id=1, video_id=1, start_frame=0, end_frame=10, taxonomy_id=5, entity_id=7),
+            SegmentDetection(id=2, video_id=1, start_frame=20, end_frame=30, taxonomy_id=5, entity_id=8),
+            SegmentDetection(id=3, video_id=1, start_frame=40, end_frame=50, taxonomy_id=6, entity_id=7),
+        ]
+        with patch("app.business.video.VideoManager.get_video_by_uuid") as mock_get_video, patch(
+            "app.business.video.db_segment_detection_manager"
+        ) as mock_db_segment_detection, patch("app.business.video.db_detection_manager") as mock_db_detection, patch(
+            "app.business.video.entity_query_manager"
+        ) as mock_entity_query, patch(
+            "app.business.video.taxonomy_query_manager"
+        ) as mock_taxonomy_query:
+            mock_get_video.return_value = video_data[0]
+            mock_db_segment_detection.get_segment_detections_by_video_id.return_value = segments
+            mock_entity_query.get_entities_by_ids.return_value = [
+                Entity(id=7, alias=["a"], taxonomy_id=5),
+                Entity(id=8, alias=["b"], taxonomy_id=5),
+            ]
+            mock_taxonomy_query.get_taxonomies_by_ids.return_value = [
+                Taxonomy(id=5, label="Person"),
+                Taxonomy(id=6, label="Logo"),
+            ]
+
+            response = client.get(
+                f"{settings.API_V1_STR}/video/f50ec0b7-f960-400d-91f0-c42a6d44e3d0",
+                params={"expand": "segments, entities,taxonomies"},
+                headers=auth_headers,
+            )
+
+            assert response.status_code == 200
+            data = response.json()
+            assert data["uuid"] == "f50ec0b7-f960-400d-91f0-c42a6d44e3d0"
+            assert [segment["id"] for segment in data["segments"]] == [1, 2, 3]
+            assert [entity["id"] for entity in data["entities"]] == [7, 8]
+            assert [taxonomy["id"] for taxonomy in data["taxonomies"]] == [5, 6]
+            assert data["detections"] is None
+            mock_db_segment_detection.get_segment_detections_by_video_id.assert_called_once_with(video_id=1)
+            mock_entity_query.get_entities_by_ids.assert_called_once_with([7, 8])
+            mock_taxonomy_query.get_taxonomies_by_ids.assert_called_once_with([5, 6])
+            mock_db_detection.get_detections_by_video_id.assert_not_called()
+
+    def test_get_video_by_uuid_invalid_expansion(self, client, auth_headers):
+        """Test an unknown expansion is rejected."""
+        with patch("app.business.video.VideoManager.get_video_by_uuid") as mock_get_video:
+            response = client.get(
+                f"{settings.API_V1_STR}/video/f50ec0b7-f960-400d-91f0-c42a6d44e3d0",
+                params={"expand": "segments,thumbnails"},
+                headers=auth_headers,
+            )
+
+            assert response.status_code == 400
+            assert "thumbnails" in response.json()["detail"]
+            mock_get_video.assert_not_called()
+
     def test_get_video_by_uuid_unauthorized(self, client):
         """Test unauthorized access to get video by UUID."""
         response = client.get(f"{settings.API_V1_STR}/video/f50ec0b7-f960-400d-91f0-c42a6d44e3d0")
@@ -283,6 +413,38 @@ class TestVideoEndpoints:
                 in response.headers["content-disposition"]
             )
 
+    def test_get_video_bytes_resolves_video_once(self, client, auth_headers):
+        """Test that the video is read once per request for both the bytes and the extension."""
+        with patch("app.business.video.db_video_manager") as mock_db_video, patch(
+            "app.business.video.s3_manager"
+        ) as mock_s3:
+            mock_db_video.get_video_by_uuid.return_value = video_data[0]
+            mock_s3.decode_path.return_value = ("bucket", "key")
+            mock_s3.download_object.return_value = b"fake video content"
+
+            response = client.get(
+                f"{settings.API_V1_STR}/video/f50ec0b7-f960-400d-91f0-c42a6d44e3d0/bytes",
+                headers=auth_headers,
+            )
+
+            assert response.status_code == 200
+            assert response.content == b"fake video content"
+            mock_db_video.get_video_by_uuid.assert_called_once_with(video_uuid="f50ec0b7-f960-400d-91f0-c42a6d44e3d0")
+
+    def test_lookup_cache_evicted_on_change(self):
+        """Test that the looked up rows are cached until a change of their kind."""
+        cache = LookupCacheManager(maxsize=16, ttl=None)
+        loader = MagicMock(side_effect=[video_data[0], video_data[1], None, None])
+
+        assert cache.get_or_load(ChangeTopic.Video, ("id", 1), loader) == video_data[0]
+        assert cache.get_or_load(ChangeTopic.Video, ("id", 1), loader) == video_data[0]
+        cache.on_change(ChangeEvent(topic=ChangeTopic.Video, action=ChangeAction.Updated, ids=[1]))
+        assert cache.get_or_load(ChangeTopic.Video, ("id", 1), loader) == video_data[1]
+        # Missing rows are looked up again
+        assert cache.get_or_load(ChangeTopic.Video, ("id", 3), loader) is None
+        assert cache.get_or_load(ChangeTopic.Video, ("id", 3), loader) is None
+        assert loader.call_count == 4
+
     def test_get_video_bytes_not_found(self, client, auth_headers):
         """Test video bytes not found."""
         with patch("app.business.video.VideoManager.get_video_bytes") as mock_get_bytes:
@@ -319,3 +481,667 @@ class TestVideoEndpoints:
         """Test unauthorized access to get video bytes."""
         response = client.get(f"{settings.API_V1_STR}/video/f50ec0b7-f960-400d-91f0-c42a6d44e3d0/bytes")
         assert response.status_code == 403
+
+    def test_get_videos_by_entity_ids_success(self, client, auth_headers):
+        """Test successful retrieval of a page of videos by entity IDs."""
+        with patch("app.business.video.VideoManager.get_videos_by_entity_ids") as mock_get_by_entities:
+            mock_get_by_entities.return_value = video_data
+
+            response = client.post(
+                f"{settings.API_V1_STR}/video/by-entities",
+                headers=auth_headers,
+                json={"entity_ids": [300, 301], "offset": 20, "limit": 10},
+            )
+
+            assert response.status_code == 200
+            assert len(response.json()) == 2
+            mock_get_by_entities.assert_called_once_with([300, 301], offset=20, limit=10)
+
+    def test_get_videos_by_entity_ids_default_page(self, client, auth_headers):
+        """Test that the first page is returned when no pagination is given."""
+        with patch("app.business.video.VideoManager.get_videos_by_entity_ids") as mock_get_by_entities:
+            mock_get_by_entities.return_value = []
+
+            response = client.post(
+                f"{settings.API_V1_STR}/video/by-entities", headers=auth_headers, json={"entity_ids": [300]}
+            )
+
+            assert response.status_code == 200
+            mock_get_by_entities.assert_called_once_with([300], offset=0, limit=100)
+
+    def test_get_videos_by_entity_ids_invalid_limit(self, client, auth_headers):
+        """Test that page sizes outside the allowed range are rejected."""
+        response = client.post(
+            f"{settings.API_V1_STR}/video/by-entities", headers=auth_headers, json={"entity_ids": [300], "limit": 0}
+        )
+        assert response.status_code == 422
+
+    def test_get_videos_by_entity_ids_single_query(self, client, auth_headers):
+        """Test that videos by entity IDs are resolved with a single query when the inverted index is disabled."""
+        with patch.object(settings, "INVERTED_INDEX_ENABLED", False), patch(
+            "app.business.video.video_query_manager"
+        ) as mock_query:
+            mock_query.get_videos_by_entity_ids.return_value = [video_data[1]]
+
+            response = client.post(
+                f"{settings.API_V1_STR}/video/by-entities", headers=auth_headers, json={"entity_ids": [300]}
+            )
+
+            assert response.status_code == 200
+            assert [video["id"] for video in response.json()] == [2]
+            mock_query.get_videos_by_entity_ids.assert_called_once_with(entity_ids=[300], offset=0, limit=100)
+
+    def test_get_videos_by_entity_ids_inverted_index(self, client, auth_headers):
+        """Test that videos by entity IDs are paginated over the inverted index."""
+        index = InvertedIndexManager(refresh_seconds=None)
+        with patch("app.business.video.inverted_index_manager", index), patch(
+            "app.business.video.db_video_manager"
+        ) as mock_db_video, patch.object(index, "_segment_detection_query") as mock_query, patch.object(
+            index, "_video_query"
+        ) as mock_video_query:
+            mock_video_query.get_video_facet_fields.return_value = []
+            mock_query.get_video_terms.return_value = [(1, 300, 200), (2, 300, 200), (2, 301, 201), (3, 301, 201)]
+            mock_db_video.get_videos_by_ids.side_effect = lambda ids: [video for video in video_data if video.id in ids]
+
+            response = client.post(
+                f"{settings.API_V1_STR}/video/by-entities",
+                headers=auth_headers,
+                json={"entity_ids": [300, 301], "offset": 1, "limit": 1},
+            )
+
+            assert response.status_code == 200
+            assert [video["id"] for video in response.json()] == [2]
+            mock_db_video.get_videos_by_ids.assert_called_once_with([2])
+            mock_query.get_video_terms.assert_called_once_with()
+
+    def test_inverted_index_incremental_updates(self):
+        """Test that the inverted index follows the change events without a full rebuild."""
+        index = InvertedIndexManager(refresh_seconds=None)
+        with patch.object(index, "_segment_detection_query") as mock_query, patch.object(
+            index, "_video_query"
+        ) as mock_video_query:
+            mock_video_query.get_video_facet_fields.return_value = [(1, "20_11_2024_13_24_23_rtve", "mp4")]
+            mock_query.get_video_terms.return_value = [(1, 300, 200), (2, 300, 200), (2, 301, 201)]
+            index.build()
+
+            index.on_change(ChangeEvent(topic=ChangeTopic.Video, action=ChangeAction.Deleted, ids=[2]))
+            assert index.get_entity_videos(300).to_ids().tolist() == [1]
+            assert not index.get_entity_videos(301)
+
+            mock_query.get_video_terms.return_value = [(3, 301, 201)]
+            index.on_change(ChangeEvent(topic=ChangeTopic.SegmentDetection, action=ChangeAction.Created, video_ids=[3]))
+            assert index.get_entity_videos(301).to_ids().tolist() == [3]
+            assert index.get_taxonomy_videos(201).to_ids().tolist() == [3]
+            mock_query.get_video_terms.assert_called_with(video_ids=[3])
+
+            index.on_change(ChangeEvent(topic=ChangeTopic.Entity, action=ChangeAction.Deleted, ids=[300]))
+            assert not index.get_entity_videos(300)
+
+            mock_video_query.get_video_facet_fields.return_value = [(3, "21_11_2024_10_00_00_rtve", ".MP4")]
+            index.on_change(ChangeEvent(topic=ChangeTopic.Video, action=ChangeAction.Created, ids=[3]))
+            assert index.get_extension_videos("mp4").to_ids().tolist() == [1, 3]
+            assert index.get_videos_by_dates(from_date=date(2024, 11, 21)).to_ids().tolist() == [3]
+
+    def test_inverted_index_replaces_only_changed_posting_lists(self):
+        """Test that a change replaces the posting lists it touches, leaving the ones held by the readers untouched."""
+        index = InvertedIndexManager(refresh_seconds=None)
+        with patch.object(index, "_segment_detection_query") as mock_query, patch.object(
+            index, "_video_query"
+        ) as mock_video_query:
+            mock_video_query.get_video_facet_fields.return_value = [(1, "20_11_2024_13_24_23_rtve", "mp4")]
+            mock_query.get_video_terms.return_value = [(1, 300, 200), (2, 300, 200), (2, 301, 201)]
+            index.build()
+
+            held = index.get_entity_videos(300)
+            untouched = index.get_extension_videos("mp4")
+            index.on_change(ChangeEvent(topic=ChangeTopic.Video, action=ChangeAction.Deleted, ids=[2]))
+            assert held.to_ids().tolist() == [1, 2]
+            assert index.get_entity_videos(300).to_ids().tolist() == [1]
+            assert index.get_extension_videos("mp4") is untouched
+            # The keys left without videos are dropped
+            assert 301 not in index._maps.entity_videos and 201 not in index._maps.taxonomy_videos
+
+            mock_query.get_video_terms.return_value = [(1, 302, 200)]
+            held = index.get_taxonomy_videos(200)
+            index.on_change(ChangeEvent(topic=ChangeTopic.SegmentDetection, action=ChangeAction.Updated, video_ids=[1]))
+            assert index.get_taxonomy_videos(200) is held
+            assert index.get_entity_videos(300).to_ids().tolist() == []
+            assert index.get_entity_videos(302).to_ids().tolist() == [1]
+
+    def test_inverted_index_replays_events_received_while_building(self):
+        """Test that the events received while the index is read are applied once it is published."""
+        index = InvertedIndexManager(refresh_seconds=None)
+        with patch.object(index, "_segment_detection_query") as mock_query, patch.object(
+            index, "_video_query"
+        ) as mock_video_query:
+
+            def get_video_facet_fields(video_ids=None):
+                if video_ids is None:
+                    # A video is deleted while the full build reads the database
+                    index.on_change(ChangeEvent(topic=ChangeTopic.Video, action=ChangeAction.Deleted, ids=[2]))
+                return [(1, "20_11_2024_13_24_23_rtve", "mp4"), (2, "21_11_2024_09_00_00_rtve", "mp4")]
+
+            mock_video_query.get_video_facet_fields.side_effect = get_video_facet_fields
+            mock_query.get_video_terms.return_value = [(1, 300, 200), (2, 300, 200)]
+            index.build()
+
+            assert index.get_all_videos().to_ids().tolist() == [1]
+            assert index.get_entity_videos(300).to_ids().tolist() == [1]
+
+    def test_search_video_facets(self, client, auth_headers):
+        """Test that the faceted search filters and counts the videos on the index posting lists."""
+        index = InvertedIndexManager(refresh_seconds=None)
+        with patch("app.business.video_search.inverted_index_manager", index), patch(
+            "app.business.video_search.db_video_manager"
+        ) as mock_db_video, patch.object(index, "_segment_detection_query") as mock_query, patch.object(
+            index, "_video_query"
+        ) as mock_video_query:
+            mock_video_query.get_video_facet_fields.return_value = [
+                (1, "20_11_2024_13_24_23_rtve", "mp4"),
+                (2, "21_11_2024_09_00_00_rtve", ".mp4"),
+                (3, "21_11_2024_10_00_00_rtve", "mov"),
+                (4, "unknown", "mp4"),
+            ]
+            mock_query.get_video_terms.return_value = [
+                (1, 300, 200),
+                (2, 300, 200),
+                (2, 301, 201),
+                (3, 300, 200),
+                (4, 301, 201),
+            ]
+            mock_db_video.get_videos_by_ids.side_effect = lambda ids: [video for video in video_data if video.id in ids]
+
+            response = client.post(
+                f"{settings.API_V1_STR}/video/facets",
+                headers=auth_headers,
+                json={"entity_ids": [300], "extensions": ["MP4"], "from_date": "2024-11-21"},
+            )
+
+            assert response.status_code == 200
+            body = response.json()
+            assert body["total"] == 1
+            assert [video["id"] for video in body["videos"]] == [2]
+            assert body["facets"]["entities"] == [{"value": 300, "count": 1}, {"value": 301, "count": 1}]
+            assert body["facets"]["taxonomies"] == [{"value": 200, "count": 1}, {"value": 201, "count": 1}]
+            # Date and extension counts leave out their own filter
+            assert body["facets"]["dates"] == [
+                {"value": "2024-11-20", "count": 1},
+                {"value": "2024-11-21", "count": 1},
+            ]
+            assert body["facets"]["extensions"] == [{"value": "mov", "count": 1}, {"value": "mp4", "count": 1}]
+            mock_db_video.get_videos_by_ids.assert_called_once_with([2])
+
+    def test_search_video_facets_index_disabled(self, client, auth_headers):
+        """Test that the faceted search is resolved in the database, without building an index, when it is disabled."""
+        with patch.object(settings, "INVERTED_INDEX_ENABLED", False), patch(
+            "app.business.video_search.inverted_index_manager"
+        ) as mock_index, patch("app.managers.index.inverted.InvertedIndexManager.build") as mock_build, patch(
+            "app.business.video_search.db_video_manager"
+        ) as mock_db_video, patch(
+            "app.business.video_search.segment_detection_query_manager"
+        ) as mock_query, patch(
+            "app.business.video_search.video_query_manager"
+        ) as mock_video_query:
+            # The videos with the entity, as filtered by the semi-join
+            mock_video_query.get_video_facet_fields.return_value = [
+                (1, "20_11_2024_13_24_23_rtve", "mp4"),
+                (2, "21_11_2024_09_00_00_rtve", ".MP4"),
+                (3, "21_11_2024_10_00_00_rtve", "mov"),
+                (4, "unknown", "mp4"),
+            ]
+            mock_query.count_videos_by_entity.return_value = {300: 1}
+            mock_query.count_videos_by_taxonomy.return_value = {200: 1}
+            mock_db_video.get_videos_by_ids.side_effect = lambda ids: [video for video in video_data if video.id in ids]
+
+            response = client.post(
+                f"{settings.API_V1_STR}/video/facets",
+                headers=auth_headers,
+                json={"entity_ids": [300], "extensions": ["mp4"], "from_date": "2024-11-21"},
+            )
+
+            assert response.status_code == 200
+            body = response.json()
+            assert body["total"] == 1
+            assert [video["id"] for video in body["videos"]] == [2]
+            assert body["facets"]["entities"] == [{"value": 300, "count": 1}]
+            # Date and extension counts leave out their own filter
+            assert body["facets"]["dates"] == [
+                {"value": "2024-11-20", "count": 1},
+                {"value": "2024-11-21", "count": 1},
+            ]
+            assert body["facets"]["extensions"] == [{"value": "mov", "count": 1}, {"value": "mp4", "count": 1}]
+            mock_video_query.get_video_facet_fields.assert_called_once_with(entity_ids=[300], taxonomy_ids=[])
+            mock_query.count_videos_by_entity.assert_called_once_with([2])
+            mock_index.get_all_videos.assert_not_called()
+            mock_build.assert_not_called()
+
+    def test_inverted_index_stale_refresh_does_not_block(self):
+        """Test that a stale index keeps serving its maps while it is rebuilt in the background."""
+        index = InvertedIndexManager(refresh_seconds=60)
+        with patch.object(index, "_segment_detection_query") as mock_query, patch.object(
+            index, "_video_query"
+        ) as mock_video_query:
+            mock_video_query.get_video_facet_fields.return_value = [(1, "20_11_2024_13_24_23_rtve", "mp4")]
+            mock_query.get_video_terms.return_value = [(1, 300, 200)]
+            index.build()
+            index._maps = index._maps._replace(built_at=index._maps.built_at - 120)
+
+            released = threading.Event()
+            mock_query.get_video_terms.side_effect = lambda: released.wait(5) and [(1, 301, 201)]
+            assert index.get_entity_videos(300).to_ids().tolist() == [1]
+
+            released.set()
+            with index._build_lock:
+                assert index.get_entity_videos(301).to_ids().tolist() == [1]
+
+    def test_search_video_facets_invalid_date_range(self, client, auth_headers):
+        """Test that a faceted search with an inverted date range is rejected."""
+        response = client.post(
+            f"{settings.API_V1_STR}/video/facets",
+            headers=auth_headers,
+            json={"from_date": "2024-11-21", "to_date": "2024-11-20"},
+        )
+        assert response.status_code == 422
+
+    def test_search_videos_success(self, client, auth_headers):
+        """Test successful boolean search of videos."""
+        with patch("app.business.video_search.VideoSearchManager.search_videos") as mock_search:
+            mock_search.return_value = [video_data[0]]
+
+            response = client.post(
+                f"{settings.API_V1_STR}/video/search",
+                headers=auth_headers,
+                json={"all_entity_ids": [300], "not_taxonomy_ids": [200]},
+            )
+
+            assert response.status_code == 200
+            assert [video["id"] for video in response.json()] == [1]
+            mock_search.assert_called_once_with(VideoSearchRequest(all_entity_ids=[300], not_taxonomy_ids=[200]))
+
+    def test_search_videos_without_positive_terms(self, client, auth_headers):
+        """Test that a search made only of exclusions is rejected."""
+        response = client.post(
+            f"{settings.API_V1_STR}/video/search", headers=auth_headers, json={"not_entity_ids": [300]}
+        )
+        assert response.status_code == 422
+
+    def test_search_videos_co_occurrence_needs_two_participants(self, client, auth_headers):
+        """Test that a co-occurrence of a single entity is rejected."""
+        response = client.post(
+            f"{settings.API_V1_STR}/video/search",
+            headers=auth_headers,
+            json={"together": [{"entity_ids": [300], "within_seconds": 1}]},
+        )
+        assert response.status_code == 422
+
+    def test_search_videos_unauthorized(self, client):
+        """Test unauthorized access to search videos."""
+        response = client.post(f"{settings.API_V1_STR}/video/search", json={"all_entity_ids": [300]})
+        assert response.status_code == 403
+
+    def test_search_videos_boolean_and_co_occurrence(self, client, auth_headers):
+        """Test that boolean terms and co-occurrences are evaluated over the segment intervals."""
+        with patch.object(settings, "INVERTED_INDEX_ENABLED", False), patch(
+            "app.business.video_search.db_video_manager"
+        ) as mock_db_video, patch("app.business.video_search.segment_detection_query_manager") as mock_query:
+            mock_query.get_video_ids_by_entity_ids.return_value = defaultdict(
+                set, {300: {1, 2, 3}, 301: {1, 2, 3}, 302: {3}}
+            )
+            mock_query.get_video_ids_by_taxonomy_ids.return_value = defaultdict(set)
+            # Video 1: 300 and 301 overlap; video 2: 1 second apart at 60 fps; video 3: excluded by 302
+            mock_query.get_segment_intervals.return_value = [
+                (1, 300, 200, 0, 100, 60),
+                (1, 301, 200, 50, 150, 60),
+                (2, 300, 200, 0, 100, 60),
+                (2, 301, 200, 160, 200, 60),
+            ]
+            mock_db_video.get_videos_by_ids.side_effect = lambda ids: [video for video in video_data if video.id in ids]
+
+            together = client.post(
+                f"{settings.API_V1_STR}/video/search",
+                headers=auth_headers,
+                json={"not_entity_ids": [302], "together": [{"entity_ids": [300, 301]}]},
+            )
+            within = client.post(
+                f"{settings.API_V1_STR}/video/search",
+                headers=auth_headers,
+                json={"not_entity_ids": [302], "together": [{"entity_ids": [300, 301], "within_seconds": 1}]},
+            )
+
+            assert together.status_code == 200
+            assert [video["id"] for video in together.json()] == [1]
+            assert within.status_code == 200
+            assert [video["id"] for video in within.json()] == [1, 2]
+            mock_query.get_segment_intervals.assert_called_with(
+                video_ids=[1, 2], entity_ids=[300, 301], taxonomy_ids=[]
+            )
+
+    def test_get_video_timeline(self, client, auth_headers):
+        """Test the per-second presence is built once, stored next to the video and binned per request."""
+        video = Video(
+            id=40,
+            code="timeline",
+            uuid="7d1e7f4e-3b5a-4c55-9a53-2f1f4a1d0c40",
+            path="bucket/videos/7d1e7f4e-3b5a-4c55-9a53-2f1f4a1d0c40/video.mp4",
+            extension=".mp4",
+            frames=10,
+            length=4,
+            frame_rate=2.5,
+        )
+        segment_detections = [
+            SegmentDetection(id=1, video_id=40, start_frame=0, end_frame=3, taxonomy_id=200, entity_id=300),
+            SegmentDetection(id=2, video_id=40, start_frame=2, end_frame=5, taxonomy_id=201, entity_id=300),
+            SegmentDetection(id=3, video_id=40, start_frame=8, end_frame=9, taxonomy_id=200, entity_id=301),
+        ]
+        timeline_manager.clear()
+        with patch("app.business.video.db_video_manager") as mock_db_video, patch(
+            "app.business.video.db_segment_detection_manager"
+        ) as mock_db_segment_detection, patch(
+            "app.business.video.segment_detection_query_manager"
+        ) as mock_segment_detection_query, patch(
+            "app.business.video.s3_manager"
+        ) as mock_s3:
+            mock_db_video.get_video_by_uuid.return_value = video
+            mock_db_segment_detection.get_segment_detections_by_video_id.return_value = segment_detections
+            mock_segment_detection_query.get_segment_fingerprint.return_value = "3:3:10:17:901:601"
+            mock_s3.decode_path.side_effect = lambda path: tuple(path.split("/", 1))
+            mock_s3.exists.return_value = False
+
+            by_second = client.get(f"{settings.API_V1_STR}/video/{video.uuid}/timeline", headers=auth_headers)
+            binned = client.get(
+                f"{settings.API_V1_STR}/video/{video.uuid}/timeline?bin_seconds=3&entity_ids=300",
+                headers=auth_headers,
+            )
+
+            assert by_second.status_code == 200
+            # Seconds start at frames 0, 3, 5 and 8 at 2.5 frames per second
+            assert by_second.json() == {
+                "video_id": 40,
+                "frame_rate": 2.5,
+                "bin_seconds": 1,
+                "bins": 4,
+                "entities": [{"id": 300, "frames": [3, 2, 1, 0]}, {"id": 301, "frames": [0, 0, 0, 2]}],
+                "taxonomies": [{"id": 200, "frames": [3, 1, 0, 2]}, {"id": 201, "frames": [1, 2, 1, 0]}],
+            }
+            assert binned.status_code == 200
+            assert binned.json()["bins"] == 2
+            assert binned.json()["entities"] == [{"id": 300, "frames": [6, 0]}]
+            assert binned.json()["taxonomies"] == [{"id": 200, "frames": [4, 2]}, {"id": 201, "frames": [4, 0]}]
+
+            # Built once and stored next to the video, the second request is served from memory
+            mock_db_segment_detection.get_segment_detections_by_video_id.assert_called_once_with(video_id=40)
+            bucket, key, content = mock_s3.upload_object.call_args.args
+            assert (bucket, key) == ("bucket", f"videos/{video.uuid}/timeline.npz")
+
+            # Another worker reuses the stored timeline while the segment detections are unchanged
+            timeline_manager.clear()
+            mock_s3.exists.return_value = True
+            mock_s3.download_object.return_value = content
+            stored = client.get(f"{settings.API_V1_STR}/video/{video.uuid}/timeline", headers=auth_headers)
+
+            assert stored.json() == by_second.json()
+            mock_db_segment_detection.get_segment_detections_by_video_id.assert_called_once()
+
+            # A stale timeline is rebuilt
+            timeline_manager.clear()
+            mock_segment_detection_query.get_segment_fingerprint.return_value = "4:4:10:17:901:601"
+            client.get(f"{settings.API_V1_STR}/video/{video.uuid}/timeline", headers=auth_headers)
+
+            assert mock_db_segment_detection.get_segment_detections_by_video_id.call_count == 2
+
+            # A timeline stored for another frame rate is rebuilt, and updating the video drops the cached one
+            mock_s3.download_object.return_value = mock_s3.upload_object.call_args.args[2]
+            mock_db_video.get_video_by_uuid.return_value = video.model_copy(update={"frame_rate": 5})
+            event_bus.publish(ChangeEvent(topic=ChangeTopic.Video, action=ChangeAction.Updated, ids=[40]))
+            rebuilt = client.get(f"{settings.API_V1_STR}/video/{video.uuid}/timeline", headers=auth_headers)
+
+            assert rebuilt.json()["frame_rate"] == 5
+            assert rebuilt.json()["bins"] == 2
+            assert mock_db_segment_detection.get_segment_detections_by_video_id.call_count == 3
+        timeline_manager.clear()
+
+    def test_publish_video_snapshot(self, client, auth_headers):
+        """Test the published snapshot is served with its ETag until the detections of the video change."""
+        video = Video(
+            id=41,
+            code="snapshot",
+            uuid="0b6c5d1e-8f4a-4d2b-9c3e-5a7f1e2d3c41",
+            path="bucket/videos/0b6c5d1e-8f4a-4d2b-9c3e-5a7f1e2d3c41/video.mp4",
+            extension=".mp4",
+            frames=4,
+            length=1,
+            frame_rate=4,
+        )
+        segment_detections = [
+            SegmentDetection(id=1, video_id=41, start_frame=0, end_frame=3, taxonomy_id=200, entity_id=300),
+        ]
+        detections = [
+            Detection(
+                id=frame + 1,
+                uuid=f"0b6c5d1e-8f4a-4d2b-9c3e-5a7f1e2d3c0{frame}",
+                video_id=41,
+                frame=frame,
+                segment_detection_id=1,
+                detection_score=0.9,
+                entity_score=0.8,
+                bbox_x_min=0.1,
+                bbox_y_min=0.2,
+                bbox_x_max=0.3,
+                bbox_y_max=0.4,
+            )
+            for frame in range(4)
+        ]
+        objects = {}
+        mock_s3 = mock_s3_objects(objects)
+
+        snapshot_store.clear()
+        with patch.object(snapshot_store, "_enabled", True), patch.object(snapshot_store, "_s3", mock_s3), patch.object(
+            snapshot_store, "_segment_detection_query"
+        ) as mock_segment_detection_query, patch.object(
+            snapshot_store, "_detection_query"
+        ) as mock_detection_query, patch(
+            "app.business.video.db_video_manager"
+        ) as mock_db_video, patch(
+            "app.business.video.db_segment_detection_manager"
+        ) as mock_db_segment_detection, patch(
+            "app.business.video.db_detection_manager"
+        ) as mock_db_detection, patch(
+            "app.business.detection.db_detection_manager"
+        ) as mock_detection_db_detection:
+            mock_db_video.get_video_by_uuid.return_value = video
+            mock_db_video.get_video_by_id.return_value = video
+            mock_db_segment_detection.get_segment_detections_by_video_id.return_value = segment_detections
+            mock_db_detection.get_detections_by_video_id.return_value = detections
+            mock_detection_db_detection.get_detections_by_video_id.return_value = detections[:1]
+            mock_segment_detection_query.get_segment_fingerprint.return_value = "1:1:0:3:200:300"
+            mock_detection_query.get_detection_fingerprint.return_value = "4:4:6"
+
+            first = client.post(f"{settings.API_V1_STR}/video/{video.uuid}/snapshot", headers=auth_headers)
+            published = client.post(f"{settings.API_V1_STR}/video/{video.uuid}/snapshot", headers=auth_headers)
+
+            assert first.status_code == 200
+            assert first.json()["version"] == 1
+            assert published.status_code == 200
+            manifest = published.json()
+            assert manifest["version"] == 2
+            assert manifest["fingerprint"] == "1:1:0:3:200:300/4:4:6"
+            assert manifest["blobs"]["detections"]["rows"] == 4
+            assert manifest["blobs"]["segment_detections"]["rows"] == 1
+            # The blobs of the replaced version are deleted
+            assert sorted(objects) == [
+                f"{settings.S3_VIDEO_PATH}/{video.uuid}/snapshot/manifest.json",
+                f"{settings.S3_VIDEO_PATH}/{video.uuid}/snapshot/v2/detections.json.gz",
+                f"{settings.S3_VIDEO_PATH}/{video.uuid}/snapshot/v2/segment_detections.json.gz",
+            ]
+
+            served = client.get(f"{settings.API_V1_STR}/detection/by-video/41", headers=auth_headers)
+
+            assert served.status_code == 200
+            assert served.headers["etag"] == manifest["blobs"]["detections"]["etag"]
+            assert served.headers["content-encoding"] == "gzip"
+            assert served.headers["vary"] == "Accept-Encoding"
+            assert [detection["frame"] for detection in served.json()] == [0, 1, 2, 3]
+            mock_detection_db_detection.get_detections_by_video_id.assert_not_called()
+
+            not_modified = client.get(
+                f"{settings.API_V1_STR}/detection/by-video/41",
+                headers={**auth_headers, "If-None-Match": served.headers["etag"]},
+            )
+
+            assert not_modified.status_code == 304
+
+            # The identity body has its own ETag, the gzip one does not validate it
+            identity = client.get(
+                f"{settings.API_V1_STR}/detection/by-video/41",
+                headers={**auth_headers, "Accept-Encoding": "identity", "If-None-Match": served.headers["etag"]},
+            )
+
+            assert identity.status_code == 200
+            assert "content-encoding" not in identity.headers
+            assert identity.headers["vary"] == "Accept-Encoding"
+            assert identity.headers["etag"] != served.headers["etag"]
+            assert [detection["frame"] for detection in identity.json()] == [0, 1, 2, 3]
+
+            identity_not_modified = client.get(
+                f"{settings.API_V1_STR}/detection/by-video/41",
+                headers={**auth_headers, "Accept-Encoding": "identity", "If-None-Match": identity.headers["etag"]},
+            )
+
+            assert identity_not_modified.status_code == 304
+
+            # A write to the video leaves the snapshot stale, the detections are queried again
+            mock_detection_query.get_detection_fingerprint.return_value = "5:5:10"
+            snapshot_store.on_change(
+                ChangeEvent(topic=ChangeTopic.Detection, action=ChangeAction.Created, video_ids=[41])
+            )
+            live = client.get(f"{settings.API_V1_STR}/detection/by-video/41", headers=auth_headers)
+
+            assert live.status_code == 200
+            assert "etag" not in live.headers
+            assert [detection["frame"] for detection in live.json()] == [0]
+        snapshot_store.clear()
+
+    def test_snapshot_stale_after_in_place_update(self, client, auth_headers):
+        """Test that a detection box updated in place leaves the snapshot stale until it is published again."""
+        video = Video(
+            id=42,
+            code="snapshot",
+            uuid="5e0f8a2b-1c3d-4e5f-8a9b-0c1d2e3f4a42",
+            path="bucket/videos/5e0f8a2b-1c3d-4e5f-8a9b-0c1d2e3f4a42/video.mp4",
+            extension=".mp4",
+            frames=4,
+            length=1,
+            frame_rate=4,
+        )
+        # One in-memory database shared by the threads of the test client
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        DetectionDAO.metadata.create_all(
+            engine, tables=[VideoDAO.__table__, DetectionDAO.__table__, SegmentDetectionDAO.__table__]
+        )
+        with Session(engine) as session:
+            session.add(
+                SegmentDetectionDAO(
+                    id=1,
+                    uuid="5e0f8a2b-1c3d-4e5f-8a9b-0c1d2e3f4a01",
+                    video_id=42,
+                    start_frame=0,
+                    end_frame=3,
+                    taxonomy_id=200,
+                    entity_id=300,
+                    updated_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+                )
+            )
+            session.add(
+                DetectionDAO(
+                    id=1,
+                    uuid="5e0f8a2b-1c3d-4e5f-8a9b-0c1d2e3f4a11",
+                    video_id=42,
+                    frame=0,
+                    segment_detection_id=1,
+                    detection_score=0.9,
+                    entity_score=0.8,
+                    bbox_x_min=0.1,
+                    bbox_y_min=0.2,
+                    bbox_x_max=0.3,
+                    bbox_y_max=0.4,
+                    updated_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+                )
+            )
+            session.commit()
+
+        database = MagicMock()
+        database.session.side_effect = lambda: Session(engine)
+        detection_query, segment_detection_query = DetectionQueryManager(), SegmentDetectionQueryManager()
+        detection_query._postgres = segment_detection_query._postgres = database
+
+        def read_detections(video_id):
+            with Session(engine) as session:
+                return [
+                    Detection.model_validate(row, from_attributes=True) for row in session.scalars(select(DetectionDAO))
+                ]
+
+        snapshot_store.clear()
+        with patch.object(snapshot_store, "_enabled", True), patch.object(
+            snapshot_store, "_s3", mock_s3_objects({})
+        ), patch.object(snapshot_store, "_detection_query", detection_query), patch.object(
+            snapshot_store, "_segment_detection_query", segment_detection_query
+        ), patch(
+            "app.business.video.db_video_manager"
+        ) as mock_db_video, patch(
+            "app.business.video.db_segment_detection_manager"
+        ) as mock_db_segment_detection, patch(
+            "app.business.video.db_detection_manager"
+        ) as mock_db_detection, patch(
+            "app.business.detection.db_detection_manager"
+        ) as mock_detection_db_detection:
+            mock_db_video.get_video_by_uuid.return_value = video
+            mock_db_video.get_video_by_id.return_value = video
+            mock_db_segment_detection.get_segment_detections_by_video_id.return_value = []
+            mock_db_detection.get_detections_by_video_id.side_effect = lambda video_id: read_detections(video_id)
+            mock_detection_db_detection.get_detections_by_video_id.side_effect = lambda video_id: read_detections(
+                video_id
+            )
+
+            published = client.post(f"{settings.API_V1_STR}/video/{video.uuid}/snapshot", headers=auth_headers).json()
+            served = client.get(f"{settings.API_V1_STR}/detection/by-video/42", headers=auth_headers)
+
+            assert served.headers["etag"] == published["blobs"]["detections"]["etag"]
+            assert served.json()[0]["bbox_x_max"] == 0.3
+
+            # Same count, ids and frames, only the box and the update stamp change
+            with Session(engine) as session:
+                session.execute(
+                    update(DetectionDAO)
+                    .where(DetectionDAO.id == 1)
+                    .values(bbox_x_max=0.5, updated_at=datetime(2024, 1, 2, tzinfo=timezone.utc))
+                )
+                session.commit()
+            # Written by another service, so only the expiry of the cached manifest notices it
+            snapshot_store.clear()
+            live = client.get(
+                f"{settings.API_V1_STR}/detection/by-video/42",
+                headers={**auth_headers, "If-None-Match": served.headers["etag"]},
+            )
+
+            assert live.status_code == 200
+            assert "etag" not in live.headers
+            assert live.json()[0]["bbox_x_max"] == 0.5
+
+            republished = client.post(f"{settings.API_V1_STR}/video/{video.uuid}/snapshot", headers=auth_headers).json()
+            rebuilt = client.get(f"{settings.API_V1_STR}/detection/by-video/42", headers=auth_headers)
+
+            assert republished["version"] == 2
+            assert rebuilt.headers["etag"] == republished["blobs"]["detections"]["etag"] != served.headers["etag"]
+            assert rebuilt.json()[0]["bbox_x_max"] == 0.5
+        snapshot_store.clear()
+
+    def test_snapshot_gzip_negotiation(self):
+        """Test that gzip is only sent to the clients accepting it with a non zero q-value."""
+        assert accepts_gzip("gzip, deflate")
+        assert accepts_gzip("deflate, gzip;q=0.5")
+        assert accepts_gzip("*")
+        assert not accepts_gzip(None)
+        assert not accepts_gzip("gzip;q=0")
+        assert not accepts_gzip("gzip;q=0, *")
+        assert not accepts_gzip("identity, *;q=0")
+        assert not accepts_gzip("br")